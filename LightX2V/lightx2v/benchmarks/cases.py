@@ -0,0 +1,234 @@
+"""Benchmark cases: small, representative cpu shapes of the LightX2V building blocks.
+
+Each case builds its inputs once and returns `(fn, setup)`. `fn` is the timed
+call; `setup`, when not None, returns fresh arguments for `fn` before every
+round, untimed, for calls that mutate their inputs. Components are imported
+inside the case so a missing optional dependency only skips that case.
+"""
+
+import os
+import tempfile
+
+import torch
+
+# name -> (group, builder)
+BENCHMARKS = {}
+
+# linear layer of a small wan block, tokens x dim
+MM_TOKENS = 256
+MM_DIM = 1536
+LORA_RANK = 32
+LORA_LAYERS = 8
+# latent of a short low resolution video: c, f, h, w
+SCHEDULER_LATENT_SHAPE = (16, 5, 30, 52)
+SCHEDULER_STEPS = 4
+VAE_LATENT_SHAPE = (1, 16, 2, 16, 16)
+RIFE_FRAMES = 5
+RIFE_HW = (128, 192)
+VIDEO_FRAMES = 17
+VIDEO_HW = (256, 256)
+
+
+def register(name, group):
+    def decorator(builder):
+        BENCHMARKS[name] = (group, builder)
+        return builder
+
+    return decorator
+
+
+def _linear_weights(out_dim=MM_DIM, in_dim=MM_DIM, dtype=torch.bfloat16):
+    return torch.randn(out_dim, in_dim, dtype=torch.float32).div_(in_dim**0.5).to(dtype), torch.randn(out_dim, dtype=dtype)
+
+
+def _load_on_device(mm, weight, bias):
+    # MMWeight.load pins cpu tensors for offload, which needs an accelerator;
+    # mirror the branch taken for tensors already on the compute device
+    mm.weight = weight.t()
+    mm.bias = bias
+
+
+@register("mm.default.apply", "mm")
+def mm_default_apply():
+    from lightx2v.common.ops.mm.mm_weight import MMWeight
+    from lightx2v.utils.envs import GET_DTYPE
+
+    mm = MMWeight("blocks.0.ffn.0.weight", "blocks.0.ffn.0.bias")
+    _load_on_device(mm, *_linear_weights(dtype=GET_DTYPE()))
+    x = torch.randn(MM_TOKENS, MM_DIM, dtype=GET_DTYPE())
+    return lambda: mm.apply(x), None
+
+
+@register("mm.int8.weight_quant", "mm")
+def mm_int8_weight_quant():
+    from lightx2v.common.ops.mm.mm_weight import MMWeightWint8channelAint8channeldynamicTorchao
+
+    mm = MMWeightWint8channelAint8channeldynamicTorchao("blocks.0.ffn.0.weight", "blocks.0.ffn.0.bias")
+    mm.set_config({"weight_auto_quant": True})
+    weight, _ = _linear_weights()
+    # the load-time quantization of the weight_auto_quant path
+    return lambda: mm.load_func({mm.weight_name: weight}), None
+
+
+@register("mm.fp8.act_quant", "mm")
+def mm_fp8_act_quant():
+    from lightx2v.common.ops.mm.mm_weight import MMWeightWfp8channelAfp8channeldynamicTorchao
+    from lightx2v.utils.envs import GET_DTYPE
+
+    mm = MMWeightWfp8channelAfp8channeldynamicTorchao("blocks.0.ffn.0.weight", "blocks.0.ffn.0.bias")
+    x = torch.randn(MM_TOKENS, MM_DIM, dtype=GET_DTYPE())
+    return lambda: mm.act_quant_fp8_perchannel_sym_torchao(x), None
+
+
+@register("mm.int8.naive_quant", "mm")
+def mm_int8_naive_quant():
+    from lightx2v.utils.quant_utils import quant_naive_inplace
+
+    weight, _ = _linear_weights(dtype=torch.float32)
+    return lambda w: quant_naive_inplace(w, torch.int8), lambda: (weight.clone(),)
+
+
+@register("mm.int8.naive_dequant", "mm")
+def mm_int8_naive_dequant():
+    from lightx2v.utils.envs import GET_DTYPE
+    from lightx2v.utils.quant_utils import dequant_naive_inplace, quant_naive_inplace
+
+    weight, _ = _linear_weights(dtype=torch.float32)
+    weight, scale = quant_naive_inplace(weight, torch.int8)
+    return lambda: dequant_naive_inplace(weight, scale, GET_DTYPE()), None
+
+
+@register("mm.gguf_q8_0.apply", "mm")
+def mm_gguf_q8_0_apply():
+    import gguf
+
+    from lightx2v.common.ops.mm.mm_weight import MMWeightGGUFQ80
+    from lightx2v.utils.envs import GET_DTYPE
+    from lightx2v.utils.ggml_tensor import GGMLTensor
+
+    weight, bias = _linear_weights(dtype=torch.float32)
+    qtype = gguf.GGMLQuantizationType.Q8_0
+    mm = MMWeightGGUFQ80("blocks.0.ffn.0.weight", "blocks.0.ffn.0.bias")
+    # dequantized to the input dtype on every call
+    mm.weight = GGMLTensor(data=torch.from_numpy(gguf.quants.quantize(weight.numpy(), qtype)), gguf_type=qtype, orig_shape=weight.shape)
+    mm.bias = bias.to(GET_DTYPE())
+    x = torch.randn(MM_TOKENS, MM_DIM, dtype=GET_DTYPE())
+    return lambda: mm.apply(x), None
+
+
+def _lora_case(param_dtype):
+    from lightx2v.utils.lora_loader import LoRALoader
+    from lightx2v.utils.quant_utils import quant_naive_inplace
+
+    weight_dict, lora_weights = {}, {}
+    for i in range(LORA_LAYERS):
+        key = f"blocks.{i}.self_attn.q"
+        weight, _ = _linear_weights()
+        if param_dtype == torch.int8:
+            weight_dict[f"{key}.weight"], weight_dict[f"{key}.weight_scale"] = quant_naive_inplace(weight.float(), torch.int8)
+        else:
+            weight_dict[f"{key}.weight"] = weight
+        lora_weights[f"diffusion_model.{key}.lora_up.weight"] = torch.randn(MM_DIM, LORA_RANK, dtype=torch.bfloat16) * 0.01
+        lora_weights[f"diffusion_model.{key}.lora_down.weight"] = torch.randn(LORA_RANK, MM_DIM, dtype=torch.bfloat16) * 0.01
+        lora_weights[f"diffusion_model.{key}.alpha"] = torch.tensor(float(LORA_RANK))
+
+    loader = LoRALoader()
+    # apply_lora merges in place, every round starts from the original weights
+    return lambda weights: loader.apply_lora(weights, lora_weights), lambda: ({k: v.clone() for k, v in weight_dict.items()},)
+
+
+@register("lora.apply.bf16", "lora")
+def lora_apply_bf16():
+    return _lora_case(torch.bfloat16)
+
+
+@register("lora.apply.int8", "lora")
+def lora_apply_int8():
+    return _lora_case(torch.int8)
+
+
+@register("scheduler.wan.step", "scheduler")
+def scheduler_wan_step():
+    from lightx2v.models.schedulers.wan.scheduler import WanScheduler
+
+    config = {
+        "model_cls": "wan2.1",
+        "task": "t2v",
+        "infer_steps": SCHEDULER_STEPS,
+        "target_video_length": (SCHEDULER_LATENT_SHAPE[1] - 1) * 4 + 1,
+        "sample_shift": 5.0,
+        "sample_guide_scale": 5.0,
+        "seq_parallel": False,
+        "dim": MM_DIM,
+        "num_heads": 12,
+    }
+    scheduler = WanScheduler(config)
+    noise_pred = torch.randn(SCHEDULER_LATENT_SHAPE)
+
+    def setup():
+        scheduler.prepare(seed=42, latent_shape=SCHEDULER_LATENT_SHAPE)
+        return ()
+
+    def denoise():
+        # the scheduler side of a full denoising loop, the transformer replaced by a fixed prediction
+        for step_index in range(scheduler.infer_steps):
+            scheduler.step_pre(step_index=step_index)
+            scheduler.noise_pred = noise_pred
+            scheduler.step_post()
+
+    return denoise, setup
+
+
+@register("vae.wan.tiled_decode", "vae")
+def vae_wan_tiled_decode():
+    from lightx2v.models.video_encoders.hf.wan.vae import WanVAE_
+
+    # a narrow decoder of the wan2.1 layout with random weights
+    vae = WanVAE_(dim=32, z_dim=VAE_LATENT_SHAPE[1], temperal_downsample=[False, True, True]).eval()
+    # tiles small enough for a 3x3 grid over the latent
+    vae.tile_sample_min_height = vae.tile_sample_min_width = 64
+    vae.tile_sample_stride_height = vae.tile_sample_stride_width = 48
+    z = torch.randn(VAE_LATENT_SHAPE)
+
+    def decode():
+        with torch.no_grad():
+            return vae.tiled_decode(z, [0, 1])
+
+    return decode, None
+
+
+@register("rife.interpolate", "rife")
+def rife_interpolate():
+    from lightx2v.models.vfi.rife.rife_comfyui_wrapper import RIFEWrapper
+    from lightx2v.models.vfi.rife.train_log.RIFE_HDv3 import Model
+
+    # skip the checkpoint load of __init__, random weights cost the same
+    wrapper = RIFEWrapper.__new__(RIFEWrapper)
+    wrapper.device = torch.device("cpu")
+    wrapper.model = Model()
+    wrapper.model.eval()
+    images = torch.rand(RIFE_FRAMES, *RIFE_HW, 3)
+    return lambda: wrapper.interpolate_frames(images, source_fps=16, target_fps=32), None
+
+
+def _save_to_video_case(method):
+    from lightx2v.utils.utils import save_to_video
+
+    tmp_dir = tempfile.TemporaryDirectory(prefix="lightx2v_bench_")
+    images = torch.rand(VIDEO_FRAMES, *VIDEO_HW, 3)
+
+    def save():
+        # keeps tmp_dir alive as long as the case
+        save_to_video(images, os.path.join(tmp_dir.name, f"{method}.mp4"), fps=16, method=method)
+
+    return save, None
+
+
+@register("video.save.imageio", "video")
+def video_save_imageio():
+    return _save_to_video_case("imageio")
+
+
+@register("video.save.ffmpeg", "video")
+def video_save_ffmpeg():
+    return _save_to_video_case("ffmpeg")
@@ -0,0 +1,184 @@
+import gc
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime
+
+import torch
+
+RESULTS_VERSION = 1
+# statistics stored per benchmark, per iteration and in seconds
+STAT_KEYS = ("min", "max", "mean", "median", "stddev", "iqr")
+
+
+def _calibrate_iterations(fn, min_time, max_iterations=1 << 16):
+    """Iterations per round so one round lasts at least `min_time`, as pytest-benchmark does for fast calls."""
+    iterations = 1
+    while iterations < max_iterations:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        if time.perf_counter() - start >= min_time:
+            break
+        iterations *= 2
+    return iterations
+
+
+def _stats(samples):
+    samples = sorted(samples)
+    if len(samples) >= 4:
+        q1, _, q3 = statistics.quantiles(samples, n=4)
+    else:
+        q1, q3 = samples[0], samples[-1]
+    return {
+        "min": samples[0],
+        "max": samples[-1],
+        "mean": statistics.fmean(samples),
+        "median": statistics.median(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "iqr": q3 - q1,
+    }
+
+
+def time_rounds(fn, setup=None, warmup_rounds=1, min_rounds=5, max_time=1.0, min_time=0.002):
+    """Time `fn` in rounds, returning per-iteration statistics in seconds.
+
+    Without `setup` each round runs `fn()` a calibrated number of iterations.
+    With `setup` (pedantic mode, for calls that mutate their inputs) every
+    round runs once on fresh `setup()` arguments, untimed. Rounds continue
+    until `max_time` is spent, at least `min_rounds` of them.
+    """
+    if setup is None:
+        for _ in range(warmup_rounds):
+            fn()
+        iterations = _calibrate_iterations(fn, min_time)
+    else:
+        for _ in range(warmup_rounds):
+            fn(*setup())
+        iterations = 1
+
+    samples = []
+    deadline = time.perf_counter() + max_time
+    while len(samples) < min_rounds or time.perf_counter() < deadline:
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn()
+            samples.append((time.perf_counter() - start) / iterations)
+        else:
+            args = setup()
+            start = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - start)
+    return {**_stats(samples), "rounds": len(samples), "iterations": iterations}
+
+
+def _read_status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return None
+
+
+def _reset_peak_rss():
+    # writing 5 to clear_refs resets VmHWM to the current rss (linux >= 4.0)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_memory_mb(fn, setup=None):
+    """Peak resident memory one call of `fn` adds on top of the process rss, None where unsupported."""
+    args = setup() if setup is not None else ()
+    gc.collect()
+    if not _reset_peak_rss():
+        return None
+    before = _read_status_kb("VmRSS")
+    fn(*args)
+    peak = _read_status_kb("VmHWM")
+    if before is None or peak is None:
+        return None
+    return max(0, peak - before) / 1024
+
+
+def machine_info():
+    return {
+        "node": platform.node(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "num_threads": torch.get_num_threads(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+    }
+
+
+class BenchmarkResults:
+    """Results of one suite run, saved as json and compared against a stored baseline run."""
+
+    def __init__(self, benchmarks=None, skipped=None, info=None, created=None):
+        self.benchmarks = benchmarks or {}
+        self.skipped = skipped or {}
+        self.info = info or machine_info()
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+
+    def add(self, name, group, stats, peak_mem_mb):
+        self.benchmarks[name] = {"group": group, "stats": stats, "peak_mem_mb": peak_mem_mb}
+
+    def skip(self, name, reason):
+        self.skipped[name] = reason
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {"version": RESULTS_VERSION, "created": self.created, "machine_info": self.info, "benchmarks": self.benchmarks, "skipped": self.skipped}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != RESULTS_VERSION:
+            raise ValueError(f"Unsupported benchmark results version {data.get('version')} in {path}, expected {RESULTS_VERSION}")
+        return cls(data["benchmarks"], data.get("skipped"), data.get("machine_info"), data.get("created"))
+
+
+def compare(results, baseline, stat="median", threshold=0.1, mem_threshold=0.2, mem_floor_mb=16.0):
+    """Compare `results` against `baseline` benchmark by benchmark.
+
+    Time regresses when `stat` grows by more than `threshold` (a ratio),
+    memory when the peak grows by more than `mem_threshold` of the baseline
+    peak and at least `mem_floor_mb`, which absorbs allocator noise on small
+    shapes. Returns one row per benchmark with a status among "ok",
+    "regression", "improved", "new" (no baseline entry) and "missing" (not run).
+    """
+    rows = []
+    for name in sorted(set(results.benchmarks) | set(baseline.benchmarks)):
+        current, reference = results.benchmarks.get(name), baseline.benchmarks.get(name)
+        row = {"name": name, "status": "ok", "reasons": []}
+        if reference is None:
+            row["status"] = "new"
+        elif current is None:
+            row["status"] = "missing"
+        else:
+            cur_time, ref_time = current["stats"][stat], reference["stats"][stat]
+            row["time_ratio"] = cur_time / ref_time if ref_time > 0 else float("inf")
+            if row["time_ratio"] > 1 + threshold:
+                row["reasons"].append(f"{stat} {ref_time * 1000:.3f}ms -> {cur_time * 1000:.3f}ms")
+            elif row["time_ratio"] < 1 - threshold:
+                row["status"] = "improved"
+
+            cur_mem, ref_mem = current.get("peak_mem_mb"), reference.get("peak_mem_mb")
+            if cur_mem is not None and ref_mem is not None:
+                row["mem_delta_mb"] = cur_mem - ref_mem
+                if row["mem_delta_mb"] > max(mem_floor_mb, ref_mem * mem_threshold):
+                    row["reasons"].append(f"peak mem {ref_mem:.1f}MB -> {cur_mem:.1f}MB")
+            if row["reasons"]:
+                row["status"] = "regression"
+        rows.append(row)
+    return rows
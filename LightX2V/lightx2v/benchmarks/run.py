@@ -0,0 +1,111 @@
+"""CPU micro-benchmarks of the LightX2V building blocks with a stored baseline.
+
+Run the suite, save the results and compare them against a baseline run of
+the same machine, exiting non-zero on a regression beyond the threshold:
+
+    PLATFORM=cpu CUDA_VISIBLE_DEVICES= python -m lightx2v.benchmarks.run \
+        --output bench/current.json --baseline bench/baseline.json --threshold 0.1
+
+A baseline is any earlier `--output` file. `--filter mm lora` selects cases
+by name prefix, see `lightx2v.benchmarks.cases` for the shapes. Each case is
+timed in rounds after a warmup (min / median / stddev per call, as
+pytest-benchmark reports them), then called once more to capture the peak
+resident memory it adds to the process.
+"""
+
+import argparse
+import sys
+
+import torch
+from loguru import logger
+
+from lightx2v.benchmarks.cases import BENCHMARKS
+from lightx2v.benchmarks.harness import BenchmarkResults, compare, peak_memory_mb, time_rounds
+from lightx2v_platform.base import global_var
+
+
+def run_suite(names, warmup_rounds, min_rounds, max_time):
+    results = BenchmarkResults()
+    for name in names:
+        group, builder = BENCHMARKS[name]
+        torch.manual_seed(0)
+        try:
+            fn, setup = builder()
+        except ImportError as e:
+            logger.warning(f"[Bench] skip {name}: {e}")
+            results.skip(name, str(e))
+            continue
+        stats = time_rounds(fn, setup, warmup_rounds=warmup_rounds, min_rounds=min_rounds, max_time=max_time)
+        peak_mem = peak_memory_mb(fn, setup)
+        results.add(name, group, stats, peak_mem)
+        peak_mem_str = f"{peak_mem:.1f}MB" if peak_mem is not None else "n/a"
+        logger.info(
+            f"[Bench] {name}: min {stats['min'] * 1000:.3f}ms, median {stats['median'] * 1000:.3f}ms, "
+            f"stddev {stats['stddev'] * 1000:.3f}ms ({stats['rounds']}x{stats['iterations']}), peak mem {peak_mem_str}"
+        )
+    return results
+
+
+def report_comparison(rows, baseline):
+    for row in rows:
+        if row["status"] == "regression":
+            logger.error(f"[Bench] REGRESSION {row['name']}: {'; '.join(row['reasons'])}")
+        elif row["status"] in ("new", "missing"):
+            logger.warning(f"[Bench] {row['name']}: {row['status']} against the baseline")
+        else:
+            ratio = f"x{row['time_ratio']:.2f}"
+            mem = f", peak mem {row['mem_delta_mb']:+.1f}MB" if "mem_delta_mb" in row else ""
+            logger.info(f"[Bench] {row['name']}: {row['status']} {ratio}{mem}")
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    logger.info(f"[Bench] {len(rows)} compared against the baseline of {baseline.created}, {len(regressions)} regressions")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cpu micro-benchmarks and compare them against a baseline")
+    parser.add_argument("--output", type=str, default=None, help="path of the results json, usable as a later baseline")
+    parser.add_argument("--baseline", type=str, default=None, help="results json of an earlier run to compare against")
+    parser.add_argument("--filter", type=str, nargs="+", default=None, help="only run cases whose name starts with one of these")
+    parser.add_argument("--threshold", type=float, default=0.1, help="max relative slowdown of --stat before a case regresses")
+    parser.add_argument("--stat", type=str, default="median", choices=["min", "median", "mean"], help="statistic compared against the baseline")
+    parser.add_argument("--mem_threshold", type=float, default=0.2, help="max relative growth of the peak memory")
+    parser.add_argument("--mem_floor_mb", type=float, default=16.0, help="peak memory growth below this is never a regression")
+    parser.add_argument("--threads", type=int, default=4, help="torch intra-op threads, keep it fixed between baseline and runs")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--min_rounds", type=int, default=5)
+    parser.add_argument("--max_time", type=float, default=1.0, help="seconds of timed rounds per case")
+    parser.add_argument("--verbose", action="store_true", help="keep the logs of the benchmarked components")
+    args = parser.parse_args()
+
+    if global_var.AI_DEVICE != "cpu" or torch.cuda.is_available():
+        logger.error("[Bench] the suite measures cpu paths, run it with PLATFORM=cpu CUDA_VISIBLE_DEVICES=")
+        sys.exit(2)
+
+    names = [name for name in BENCHMARKS if args.filter is None or name.startswith(tuple(args.filter))]
+    if not names:
+        logger.error(f"[Bench] no case matches {args.filter}, available: {list(BENCHMARKS)}")
+        sys.exit(2)
+
+    torch.set_num_threads(args.threads)
+    if not args.verbose:
+        # per call logs of the components (e.g. LoRA merge) would be timed too
+        logger.disable("lightx2v")
+        logger.enable("lightx2v.benchmarks")
+
+    results = run_suite(names, args.warmup, args.min_rounds, args.max_time)
+    if args.output:
+        results.save(args.output)
+        logger.info(f"[Bench] wrote {len(results.benchmarks)} results to {args.output}")
+
+    if args.baseline:
+        baseline = BenchmarkResults.load(args.baseline)
+        for key in ("processor", "num_threads", "torch"):
+            if baseline.info.get(key) != results.info.get(key):
+                logger.warning(f"[Bench] baseline {key} {baseline.info.get(key)} differs from {results.info.get(key)}, timings may not be comparable")
+        rows = compare(results, baseline, stat=args.stat, threshold=args.threshold, mem_threshold=args.mem_threshold, mem_floor_mb=args.mem_floor_mb)
+        if report_comparison(rows, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+from lightx2v.common.offload.lazy_load_cache import lazy_load_batch
+
+
 class WeightModule:
     def __init__(self):
         self._modules = {}
@@ -46,12 +49,13 @@ class WeightModule:
         return destination
 
     def load_state_dict_from_disk(self, block_index, adapter_block_index=None):
-        for _, param in self._parameters.items():
-            if param is not None:
-                param.load_state_dict_from_disk(block_index, adapter_block_index)
-        for _, module in self._modules.items():
-            if module is not None:
-                module.load_state_dict_from_disk(block_index, adapter_block_index)
+        with lazy_load_batch():
+            for _, param in self._parameters.items():
+                if param is not None:
+                    param.load_state_dict_from_disk(block_index, adapter_block_index)
+            for _, module in self._modules.items():
+                if module is not None:
+                    module.load_state_dict_from_disk(block_index, adapter_block_index)
 
     def named_parameters(self, prefix=""):
         for name, param in self._parameters.items():
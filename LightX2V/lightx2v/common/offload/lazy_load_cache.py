@@ -0,0 +1,282 @@
+import ctypes
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import torch
+from loguru import logger
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+if hasattr(torch, "float8_e4m3fn"):
+    SAFETENSORS_DTYPES["F8_E4M3"] = torch.float8_e4m3fn
+if hasattr(torch, "float8_e5m2"):
+    SAFETENSORS_DTYPES["F8_E5M2"] = torch.float8_e5m2
+
+# Reads separated by less than this many bytes are merged into one sequential I/O.
+COALESCE_GAP_BYTES = 1 << 20
+IOV_MAX = 1024
+
+
+def resolve_lazy_load_path(lazy_load_file, block_index):
+    if Path(lazy_load_file).is_file():
+        return lazy_load_file
+    return os.path.join(lazy_load_file, f"block_{block_index}.safetensors")
+
+
+class LazyLoadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bytes_read = 0
+        self.read_seconds = 0.0
+        self.num_reads = 0
+        self.stall_seconds = 0.0
+        self.num_stalls = 0
+        self.file_opens = 0
+        self.file_hits = 0
+
+    def record_read(self, nbytes, seconds):
+        with self._lock:
+            self.bytes_read += nbytes
+            self.read_seconds += seconds
+            self.num_reads += 1
+
+    def record_stall(self, seconds):
+        with self._lock:
+            self.stall_seconds += seconds
+            self.num_stalls += 1
+
+    def record_open(self, hit):
+        with self._lock:
+            if hit:
+                self.file_hits += 1
+            else:
+                self.file_opens += 1
+
+    def report(self, name="lazy_load", reset=True):
+        with self._lock:
+            throughput = self.bytes_read / self.read_seconds / (1024**3) if self.read_seconds > 0 else 0.0
+            logger.info(
+                f"[LazyLoad] {name}: read {self.bytes_read / (1024**3):.3f} GB in {self.num_reads} reads, "
+                f"{throughput:.2f} GB/s, stall {self.stall_seconds:.4f}s over {self.num_stalls} waits, "
+                f"file cache {self.file_hits} hits / {self.file_opens} opens"
+            )
+            summary = {
+                "bytes_read": self.bytes_read,
+                "read_seconds": self.read_seconds,
+                "throughput_gbps": throughput,
+                "stall_seconds": self.stall_seconds,
+            }
+            if reset:
+                self.reset()
+        return summary
+
+
+LAZY_LOAD_STATS = LazyLoadStats()
+
+
+def _tensor_buffer(tensor):
+    return (ctypes.c_char * (tensor.numel() * tensor.element_size())).from_address(tensor.data_ptr())
+
+
+def _raw_target(dst, shape, dtype, transpose):
+    """Return the contiguous tensor whose bytes equal the file layout, or None when a conversion is needed."""
+    target = dst.t() if transpose else dst
+    if target.device.type != "cpu" or target.dtype != dtype or tuple(target.shape) != tuple(shape) or not target.is_contiguous():
+        return None
+    return target
+
+
+class SafetensorsBlockFile:
+    """An open, mmapped safetensors file with its header parsed once."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        stat = os.fstat(self.fd)
+        self.signature = (stat.st_mtime_ns, stat.st_size)
+        header_len = struct.unpack("<Q", os.pread(self.fd, 8, 0))[0]
+        header = json.loads(os.pread(self.fd, header_len, 8))
+        data_start = 8 + header_len
+        self.metadata = header.pop("__metadata__", None)
+        self.tensors = {}
+        for name, info in header.items():
+            begin, end = info["data_offsets"]
+            self.tensors[name] = (SAFETENSORS_DTYPES[info["dtype"]], tuple(info["shape"]), data_start + begin, data_start + end)
+        self.mmap = mmap.mmap(self.fd, 0, access=mmap.ACCESS_COPY) if stat.st_size > 0 else None
+        # guarded by the LazyLoadFileCache lock: in-flight read_into calls and whether the cache dropped the file
+        self.readers = 0
+        self.evicted = False
+
+    def keys(self):
+        return self.tensors.keys()
+
+    def get_tensor(self, name):
+        """Zero-copy view into the mapped file; copy it before keeping it past the cache lifetime."""
+        dtype, shape, begin, end = self.tensors[name]
+        if end == begin:
+            return torch.empty(shape, dtype=dtype)
+        return torch.frombuffer(self.mmap, dtype=dtype, count=math.prod(shape), offset=begin).reshape(shape)
+
+    def read_into(self, entries):
+        """Copy tensors into preallocated buffers.
+
+        entries is a list of (name, dst, transpose) where dst receives the file
+        tensor, transposed when requested and cast to dst's dtype if needed.
+        Buffers whose layout matches the file are filled with scatter reads
+        straight from disk, with neighbouring tensors merged into one preadv.
+        """
+        raw, converted = [], []
+        for name, dst, transpose in entries:
+            dtype, shape, begin, end = self.tensors[name]
+            target = _raw_target(dst, shape, dtype, transpose)
+            if target is None or end == begin:
+                converted.append((name, dst, transpose))
+            else:
+                raw.append((begin, end, target))
+
+        raw.sort(key=lambda item: item[0])
+        run = []
+        for item in raw:
+            if run and (item[0] - run[-1][1] > COALESCE_GAP_BYTES or len(run) * 2 >= IOV_MAX):
+                self._preadv_run(run)
+                run = []
+            run.append(item)
+        if run:
+            self._preadv_run(run)
+
+        for name, dst, transpose in converted:
+            start = time.perf_counter()
+            src = self.get_tensor(name)
+            dst.copy_(src.t() if transpose else src)
+            LAZY_LOAD_STATS.record_read(self.tensors[name][3] - self.tensors[name][2], time.perf_counter() - start)
+
+    def _preadv_run(self, run):
+        buffers, offset, cursor = [], run[0][0], run[0][0]
+        for begin, end, target in run:
+            if begin > cursor:
+                buffers.append(bytearray(begin - cursor))
+            buffers.append(_tensor_buffer(target))
+            cursor = end
+        total = cursor - offset
+        start = time.perf_counter()
+        nread = os.preadv(self.fd, buffers, offset)
+        if nread < total:
+            for begin, end, target in run:
+                target.reshape(-1).view(torch.uint8).copy_(torch.frombuffer(self.mmap, dtype=torch.uint8, count=end - begin, offset=begin))
+        LAZY_LOAD_STATS.record_read(total, time.perf_counter() - start)
+
+    def close(self):
+        # Only the descriptor is closed: handles and views handed out by get_tensor may still
+        # use the mapping, which stays valid without the fd and is released by GC.
+        os.close(self.fd)
+
+
+class LazyLoadFileCache:
+    """Per-process LRU of open block files shared by all lazy-load weights."""
+
+    def __init__(self, max_open_files=None):
+        self.max_open_files = max_open_files or int(os.getenv("LAZY_LOAD_MAX_OPEN_FILES", "128"))
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, path):
+        # caller holds self._lock
+        block_file = self._files.get(path)
+        if block_file is not None:
+            stat = os.stat(path)
+            if block_file.signature == (stat.st_mtime_ns, stat.st_size):
+                self._files.move_to_end(path)
+                LAZY_LOAD_STATS.record_open(hit=True)
+                return block_file
+            self._evict(self._files.pop(path))
+        block_file = SafetensorsBlockFile(path)
+        LAZY_LOAD_STATS.record_open(hit=False)
+        self._files[path] = block_file
+        while len(self._files) > self.max_open_files:
+            _, evicted = self._files.popitem(last=False)
+            self._evict(evicted)
+        return block_file
+
+    def _evict(self, block_file):
+        # caller holds self._lock; the fd of a file being read is closed by its last reader
+        block_file.evicted = True
+        if block_file.readers == 0:
+            block_file.close()
+
+    def get(self, path):
+        """Open block file for get_tensor, whose mapping stays valid after eviction."""
+        with self._lock:
+            return self._lookup(os.path.abspath(path))
+
+    def read_into(self, path, entries):
+        with self._lock:
+            block_file = self._lookup(os.path.abspath(path))
+            block_file.readers += 1
+        try:
+            block_file.read_into(entries)
+        finally:
+            with self._lock:
+                block_file.readers -= 1
+                if block_file.evicted and block_file.readers == 0:
+                    block_file.close()
+
+    def clear(self):
+        with self._lock:
+            for block_file in self._files.values():
+                self._evict(block_file)
+            self._files.clear()
+
+
+LAZY_LOAD_FILE_CACHE = LazyLoadFileCache()
+_batch_local = threading.local()
+
+
+def get_lazy_load_file(lazy_load_file, block_index):
+    return LAZY_LOAD_FILE_CACHE.get(resolve_lazy_load_path(lazy_load_file, block_index))
+
+
+def read_lazy_load_tensors(lazy_load_file, block_index, entries):
+    """Fill pinned buffers from a block file, deferring to the active batch if there is one."""
+    path = resolve_lazy_load_path(lazy_load_file, block_index)
+    pending = getattr(_batch_local, "pending", None)
+    if pending is not None:
+        pending.setdefault(path, []).extend(entries)
+        return
+    LAZY_LOAD_FILE_CACHE.read_into(path, entries)
+
+
+@contextmanager
+def lazy_load_batch():
+    """Collect every read issued inside the block and flush them per file in one coalesced pass."""
+    if getattr(_batch_local, "pending", None) is not None:
+        yield
+        return
+    _batch_local.pending = {}
+    try:
+        yield
+        pending = _batch_local.pending
+    finally:
+        _batch_local.pending = None
+    for path, entries in pending.items():
+        LAZY_LOAD_FILE_CACHE.read_into(path, entries)
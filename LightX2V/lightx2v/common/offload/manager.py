@@ -1,3 +1,4 @@
+import time
 from concurrent.futures import ThreadPoolExecutor
 
 import torch
@@ -5,6 +6,7 @@ from loguru import logger
 from packaging.version import parse
 from tqdm import tqdm
 
+from lightx2v.common.offload.lazy_load_cache import LAZY_LOAD_STATS
 from lightx2v.utils.profiler import ExcludedProfilingContext
 from lightx2v_platform.base.global_var import AI_DEVICE
 
@@ -121,15 +123,16 @@ class WeightAsyncStreamManager(object):
                 self.prefetch_futures.append(future)
 
     def swap_cpu_buffers(self):
-        # import time
-        # wait_start = time.time()
-        # already_done = all(f.done() for f in self.prefetch_futures)
+        wait_start = time.perf_counter()
         for f in self.prefetch_futures:
             f.result()
-        # wait_time = time.time() - wait_start
-        # logger.debug(f"[Prefetch] block {self.prefetch_block_idx}: wait={wait_time:.3f}s, already_done={already_done}")
+        LAZY_LOAD_STATS.record_stall(time.perf_counter() - wait_start)
         self.cpu_buffers = [self.cpu_buffers[1], self.cpu_buffers[0]]
 
+    def report_lazy_load_stats(self, name="lazy_load"):
+        if self.lazy_load:
+            return LAZY_LOAD_STATS.report(name)
+
     def __del__(self):
         if hasattr(self, "executor") and self.executor is not None:
             for f in self.prefetch_futures:
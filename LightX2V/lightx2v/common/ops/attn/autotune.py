@@ -0,0 +1,267 @@
+"""Offline attention-backend benchmark and load-time backend selection.
+
+Sweep the registered attention templates over a grid of shapes, check each
+output against torch_sdpa and time it, then persist a selection table:
+
+    python -m lightx2v.common.ops.attn.autotune --output attn_table.json \
+        --frames 21 --frame_hw 30x52 45x80 --head_dims 128 --num_heads 40 --sparsities 0 0.75
+
+Runners configured with `"self_attn_1_type": "auto"` (or `"attn_type": "auto"`)
+and `"attn_selection_table": "attn_table.json"` resolve the backend from the
+table before the transformer weights are built, see `resolve_auto_attn_types`.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+
+import torch
+from loguru import logger
+
+from lightx2v.utils.registry_factory import ATTN_WEIGHT_REGISTER
+
+REFERENCE_ATTN_TYPE = "torch_sdpa"
+# wrappers around another backend that need a process group, not benchmarked standalone
+PARALLEL_ATTN_TYPES = {"ring", "ulysses", "ulysses-4090"}
+# backends whose sparsity is a tunable ratio, the sweep runs them once per requested sparsity
+TUNABLE_SPARSE_ATTN_TYPES = {"draft_attn", "sla_attn", "svg_attn"}
+# backends with a fixed structural sparsity pattern
+STRUCTURAL_SPARSE_ATTN_TYPES = {"radial_attn", "nbhd_attn", "nbhd_attn_flashinfer", "svg2_attn", "spas_sage_attn"}
+# config keys holding a self-attention backend that may be set to "auto"
+AUTO_ATTN_KEYS = ("self_attn_1_type", "attn_type")
+TABLE_VERSION = 1
+
+
+def configure_backend(attn_type, frames, head_num, head_dim, sparsity):
+    """Set the class-level knobs a backend reads, mirroring the transformer weight setup."""
+    attn_cls = ATTN_WEIGHT_REGISTER[attn_type]
+    if attn_type == "svg_attn":
+        attn_cls.prepare(head_num=head_num, head_dim=head_dim, sample_mse_max_row=10000, num_sampled_rows=64, context_length=0, sparsity=sparsity)
+    if attn_type in ["svg_attn", "radial_attn", "nbhd_attn", "nbhd_attn_flashinfer"]:
+        attn_cls.attnmap_frame_num = frames
+    if attn_type in ["draft_attn", "sla_attn"]:
+        attn_cls.sparsity_ratio = sparsity
+    return attn_cls
+
+
+def backend_kwargs(attn_type, frame_h, frame_w):
+    if attn_type == "draft_attn":
+        # block 0 always runs dense in draft_attn, benchmark the sparse path
+        return {"frame_h": frame_h, "frame_w": frame_w, "block_idx": 1}
+    return {}
+
+
+def _synchronize(device):
+    device_module = getattr(torch, torch.device(device).type, None)
+    if device_module is not None and hasattr(device_module, "synchronize"):
+        device_module.synchronize()
+
+
+def _time_call(fn, device, warmup, iters):
+    for _ in range(warmup):
+        fn()
+    _synchronize(device)
+    start = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    _synchronize(device)
+    return (time.perf_counter() - start) / iters * 1000
+
+
+def compare_outputs(out, ref):
+    out = out.float().reshape(ref.shape)
+    ref = ref.float()
+    rel_l1 = ((out - ref).abs().mean() / ref.abs().mean().clamp_min(1e-12)).item()
+    cos_sim = torch.nn.functional.cosine_similarity(out.flatten(), ref.flatten(), dim=0).item()
+    return rel_l1, cos_sim
+
+
+def benchmark_shape(attn_types, frames, frame_h, frame_w, head_num, head_dim, sparsities, dtype, device, tol, sparse_tol, warmup, iters):
+    seq_len = frames * frame_h * frame_w
+    q, k, v = (torch.randn(seq_len, head_num, head_dim, dtype=dtype, device=device) for _ in range(3))
+    cu_seqlens = torch.tensor([0, seq_len], dtype=torch.int32, device=device)
+    inputs = {"cu_seqlens_q": cu_seqlens, "cu_seqlens_kv": cu_seqlens, "max_seqlen_q": seq_len, "max_seqlen_kv": seq_len}
+    ref = ATTN_WEIGHT_REGISTER[REFERENCE_ATTN_TYPE]().apply(q.float(), k.float(), v.float(), **inputs)
+
+    results = []
+    for attn_type in attn_types:
+        if attn_type in TUNABLE_SPARSE_ATTN_TYPES:
+            runs = [s for s in sparsities if s > 0]
+        elif attn_type in STRUCTURAL_SPARSE_ATTN_TYPES:
+            runs = [None]
+        else:
+            runs = [0.0]
+        for sparsity in runs:
+            result = {"backend": attn_type, "sparsity": sparsity, "ok": False}
+            try:
+                attn = configure_backend(attn_type, frames, head_num, head_dim, sparsity)()
+                kwargs = backend_kwargs(attn_type, frame_h, frame_w)
+
+                def call():
+                    return attn.apply(q, k, v, **inputs, **kwargs)
+
+                rel_l1, cos_sim = compare_outputs(call(), ref)
+                result["latency_ms"] = _time_call(call, device, warmup, iters)
+                result["rel_l1"] = rel_l1
+                result["cos_sim"] = cos_sim
+                result["ok"] = rel_l1 <= (tol if sparsity == 0.0 else sparse_tol)
+            except Exception as e:
+                # missing kernels or unsupported devices end up here, e.g. every non-torch backend on CPU
+                result["error"] = f"{type(e).__name__}: {e}"
+            results.append(result)
+            if "error" in result:
+                logger.info(f"[AttnAutotune] seq_len={seq_len} head_dim={head_dim} {attn_type}: unsupported ({result['error'][:120]})")
+            else:
+                logger.info(
+                    f"[AttnAutotune] seq_len={seq_len} head_dim={head_dim} {attn_type} sparsity={sparsity}: {result['latency_ms']:.3f} ms, rel_l1={result['rel_l1']:.4f}, cos={result['cos_sim']:.5f}, ok={result['ok']}"
+                )
+    return {"seq_len": seq_len, "frames": frames, "frame_h": frame_h, "frame_w": frame_w, "num_heads": head_num, "head_dim": head_dim, "results": results}
+
+
+def run_sweep(attn_types, frames_list, frame_hw_list, head_dims, num_heads, sparsities, dtype, device, tol=0.02, sparse_tol=0.15, warmup=3, iters=10):
+    entries = []
+    for head_dim in head_dims:
+        for frames in frames_list:
+            for frame_h, frame_w in frame_hw_list:
+                entries.append(benchmark_shape(attn_types, frames, frame_h, frame_w, num_heads, head_dim, sparsities, dtype, device, tol, sparse_tol, warmup, iters))
+    device_name = torch.cuda.get_device_name(torch.device(device)) if torch.device(device).type == "cuda" else torch.device(device).type
+    return AttnSelectionTable(
+        {
+            "version": TABLE_VERSION,
+            "device": device_name,
+            "dtype": str(dtype).replace("torch.", ""),
+            "tol": tol,
+            "sparse_tol": sparse_tol,
+            "entries": entries,
+        }
+    )
+
+
+class AttnSelectionTable:
+    """Persisted benchmark results and the lookup runners use to pick a backend."""
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != TABLE_VERSION:
+            raise ValueError(f"Unsupported attention selection table version {data.get('version')} in {path}")
+        return cls(data)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def select(self, seq_len, head_dim, max_sparsity=0.0, available=None):
+        """Fastest numerically acceptable result for the nearest benchmarked shape.
+
+        Dense backends are always eligible, tunable sparse backends only up to
+        `max_sparsity`, structural sparse backends only when `max_sparsity` > 0.
+        Returns the result dict, or None when no shape with this head_dim was benchmarked.
+        """
+        entries = [e for e in self.data["entries"] if e["head_dim"] == head_dim]
+        if not entries:
+            return None
+        entry = min(entries, key=lambda e: abs(math.log(e["seq_len"] / seq_len)))
+        candidates = []
+        for result in entry["results"]:
+            if not result["ok"] or (available is not None and result["backend"] not in available):
+                continue
+            sparsity = result["sparsity"]
+            if (sparsity is None and max_sparsity > 0) or (sparsity is not None and sparsity <= max_sparsity):
+                candidates.append(result)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda r: r["latency_ms"])
+
+
+def target_attn_shape(config):
+    """Self-attention sequence length and head dim of the configured target video."""
+    vae_stride = config.get("vae_stride", (4, 8, 8))
+    patch_size = config.get("patch_size", (1, 2, 2))
+    frames = (config.get("target_video_length", 81) - 1) // vae_stride[0] // patch_size[0] + 1
+    height = config.get("target_height", 480) // vae_stride[1] // patch_size[1]
+    width = config.get("target_width", 832) // vae_stride[2] // patch_size[2]
+    if "dim" in config and "num_heads" in config:
+        head_dim = config["dim"] // config["num_heads"]
+    elif "hidden_size" in config and "heads_num" in config:
+        head_dim = config["hidden_size"] // config["heads_num"]
+    else:
+        head_dim = config.get("attention_head_dim", 128)
+    return frames, frames * height * width, head_dim
+
+
+def resolve_auto_attn_types(config):
+    """Replace "auto" attention types in the config with the backend picked from the selection table."""
+    keys = [key for key in AUTO_ATTN_KEYS if config.get(key) == "auto"]
+    if not keys:
+        return
+    fallback = config.get("attn_auto_fallback", REFERENCE_ATTN_TYPE)
+    max_sparsity = config.get("attn_auto_max_sparsity", 0.0)
+    frames, seq_len, head_dim = target_attn_shape(config)
+    result = None
+    table_path = config.get("attn_selection_table", None)
+    if table_path and os.path.exists(table_path):
+        table = AttnSelectionTable.load(table_path)
+        result = table.select(seq_len, head_dim, max_sparsity=max_sparsity, available=set(ATTN_WEIGHT_REGISTER.keys()))
+    else:
+        logger.warning(f"[AttnAutotune] attention selection table {table_path} not found")
+
+    if result is None:
+        attn_type = fallback
+        logger.warning(f"[AttnAutotune] no benchmarked backend for seq_len={seq_len} head_dim={head_dim}, fall back to {attn_type}")
+    else:
+        attn_type = result["backend"]
+        logger.info(f"[AttnAutotune] seq_len={seq_len} head_dim={head_dim}: select {attn_type} (sparsity={result['sparsity']}, {result['latency_ms']:.3f} ms, rel_l1={result['rel_l1']:.4f})")
+        sparsity = result["sparsity"]
+        if attn_type in ["svg_attn", "radial_attn", "nbhd_attn", "nbhd_attn_flashinfer"]:
+            config.setdefault("attnmap_frame_num", frames)
+        if attn_type == "draft_attn":
+            config["draft_attn_sparsity_ratio"] = sparsity
+        elif attn_type == "sla_attn":
+            config["sla_attn_setting"] = {**config.get("sla_attn_setting", {}), "sparsity_ratio": sparsity}
+        elif attn_type == "svg_attn":
+            config["svg_sparsity"] = sparsity
+    for key in keys:
+        config[key] = attn_type
+
+
+def _parse_hw(value):
+    h, w = value.lower().split("x")
+    return int(h), int(w)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark attention backends and write a selection table")
+    parser.add_argument("--output", type=str, required=True, help="path of the selection table json")
+    parser.add_argument("--backends", type=str, nargs="+", default=None, help="attention types to sweep, default all registered non-parallel types")
+    parser.add_argument("--frames", type=int, nargs="+", default=[21], help="latent frames after patchify")
+    parser.add_argument("--frame_hw", type=_parse_hw, nargs="+", default=[(30, 52)], help="latent tokens per frame as HxW after patchify")
+    parser.add_argument("--head_dims", type=int, nargs="+", default=[128])
+    parser.add_argument("--num_heads", type=int, default=40)
+    parser.add_argument("--sparsities", type=float, nargs="+", default=[0.75], help="sparsity ratios for the tunable sparse backends")
+    parser.add_argument("--dtype", type=str, default=None, choices=["bfloat16", "float16", "float32"], help="default bfloat16 on gpu, float32 on cpu")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--tol", type=float, default=0.02, help="max relative L1 error against torch_sdpa for dense backends")
+    parser.add_argument("--sparse_tol", type=float, default=0.15, help="max relative L1 error against torch_sdpa for sparse backends")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--iters", type=int, default=10)
+    args = parser.parse_args()
+
+    attn_types = args.backends or sorted(name for name in ATTN_WEIGHT_REGISTER.keys() if name not in PARALLEL_ATTN_TYPES)
+    dtype = getattr(torch, args.dtype or ("float32" if args.device == "cpu" else "bfloat16"))
+    table = run_sweep(attn_types, args.frames, args.frame_hw, args.head_dims, args.num_heads, args.sparsities, dtype, args.device, args.tol, args.sparse_tol, args.warmup, args.iters)
+    table.save(args.output)
+    logger.info(f"[AttnAutotune] wrote {len(table.data['entries'])} shapes to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
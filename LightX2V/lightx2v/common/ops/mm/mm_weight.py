@@ -1,11 +1,9 @@
-import os
 import re
 from abc import ABCMeta, abstractmethod
-from pathlib import Path
 
 import torch
-from safetensors import safe_open
 
+from lightx2v.common.offload.lazy_load_cache import get_lazy_load_file, read_lazy_load_tensors
 from lightx2v.common.ops.mm.triton_kernels import (
     fp8_gemm_bias_triton,
     fp8_gemm_triton,
@@ -178,15 +176,8 @@ class MMWeight(MMWeightTemplate):
 
     def _get_source_tensor(self, source_name, weight_dict=None):
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{source_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                return lazy_load_file.get_tensor(source_name)
+            lazy_load_file = get_lazy_load_file(self.lazy_load_file, source_name.split(".")[1])
+            return lazy_load_file.get_tensor(source_name)
         return weight_dict[source_name]
 
     def _create_pin_tensor(self, tensor, transpose=False):
@@ -204,23 +195,16 @@ class MMWeight(MMWeightTemplate):
 
     def _load_cpu_pin_buffers(self):
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                weight_tensor = lazy_load_file.get_tensor(self.weight_name)
-                self.pin_weight = self._create_pin_tensor(weight_tensor, transpose=True)
+            lazy_load_file = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            weight_tensor = lazy_load_file.get_tensor(self.weight_name)
+            self.pin_weight = self._create_pin_tensor(weight_tensor, transpose=True)
 
-                if self.bias_name is not None:
-                    bias_tensor = lazy_load_file.get_tensor(self.bias_name)
-                    self.pin_bias = self._create_pin_tensor(bias_tensor)
-                else:
-                    self.bias = None
-                    self.pin_bias = None
+            if self.bias_name is not None:
+                bias_tensor = lazy_load_file.get_tensor(self.bias_name)
+                self.pin_bias = self._create_pin_tensor(bias_tensor)
+            else:
+                self.bias = None
+                self.pin_bias = None
 
     def _load_default_tensors(self, weight_dict):
         if not self.lazy_load:
@@ -275,19 +259,10 @@ class MMWeight(MMWeightTemplate):
                 )
             else:
                 self.bias_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.bias_name, count=1)
-        if Path(self.lazy_load_file).is_file():
-            lazy_load_file_path = self.lazy_load_file
-        else:
-            lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
-        with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-            weight_tensor = lazy_load_file.get_tensor(self.weight_name).t()
-            self.pin_weight = self.pin_weight.copy_(weight_tensor)
-            del weight_tensor
-
-            if self.bias_name is not None:
-                bias_tensor = lazy_load_file.get_tensor(self.bias_name)
-                self.pin_bias.copy_(bias_tensor)
-                del bias_tensor
+        entries = [(self.weight_name, self.pin_weight, True)]
+        if self.bias_name is not None:
+            entries.append((self.bias_name, self.pin_bias, False))
+        read_lazy_load_tensors(self.lazy_load_file, block_index, entries)
 
     def load_state_dict(self, destination, block_index, adapter_block_index=None):
         if self.is_post_adapter:
@@ -400,16 +375,9 @@ class MMWeightQuantTemplate(MMWeightTemplate):
 
     def _load_cuda_buffers(self, weight_dict):
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as source:
-                self.weight_cuda_buffer, self.weight_scale_cuda_buffer = self._get_cuda_tensor_pair(source, self.lazy_load)
-                self.bias_cuda_buffer = self._get_cuda_bias_tensor(source, self.lazy_load)
+            source = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            self.weight_cuda_buffer, self.weight_scale_cuda_buffer = self._get_cuda_tensor_pair(source, self.lazy_load)
+            self.bias_cuda_buffer = self._get_cuda_bias_tensor(source, self.lazy_load)
         else:
             source = weight_dict
             self.weight_cuda_buffer, self.weight_scale_cuda_buffer = self._get_cuda_tensor_pair(source, self.lazy_load)
@@ -446,19 +414,12 @@ class MMWeightQuantTemplate(MMWeightTemplate):
 
     def _get_cpu_pin_tensor_pair(self, source, is_lazy):
         if is_lazy:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as source:
-                weight_tensor = source.get_tensor(self.weight_name)
-                scale_tensor = source.get_tensor(self.weight_scale_name)
-                scale_dtype = torch.float
-                pin_weight = self._create_pin_tensor(weight_tensor)
-                pin_scale = self._create_pin_tensor(scale_tensor, scale_dtype)
+            source = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            weight_tensor = source.get_tensor(self.weight_name)
+            scale_tensor = source.get_tensor(self.weight_scale_name)
+            scale_dtype = torch.float
+            pin_weight = self._create_pin_tensor(weight_tensor)
+            pin_scale = self._create_pin_tensor(scale_tensor, scale_dtype)
         else:
             weight_tensor = source[self.weight_name]
             scale_tensor = source[self.weight_scale_name]
@@ -471,20 +432,13 @@ class MMWeightQuantTemplate(MMWeightTemplate):
         if self.bias_name is None:
             return None
         if is_lazy:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as source:
-                bias_tensor = source.get_tensor(self.bias_name)
-                if not self.bias_force_fp32:
-                    bias_tensor = bias_tensor.to(self.infer_dtype)
-                if self.bias_force_fp32:
-                    bias_tensor = bias_tensor.to(torch.float32)
-                return self._create_pin_tensor(bias_tensor)
+            source = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            bias_tensor = source.get_tensor(self.bias_name)
+            if not self.bias_force_fp32:
+                bias_tensor = bias_tensor.to(self.infer_dtype)
+            if self.bias_force_fp32:
+                bias_tensor = bias_tensor.to(torch.float32)
+            return self._create_pin_tensor(bias_tensor)
         else:
             bias_tensor = source[self.bias_name]
             if self.bias_force_fp32:
@@ -734,27 +688,13 @@ class MMWeightQuantTemplate(MMWeightTemplate):
                 )
             else:
                 self.bias_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.bias_name, count=1)
-        if Path(self.lazy_load_file).is_file():
-            lazy_load_file_path = self.lazy_load_file
-        else:
-            lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
-        with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-            if self.weight_need_transpose:
-                weight_tensor = lazy_load_file.get_tensor(self.weight_name).t()
-            else:
-                weight_tensor = lazy_load_file.get_tensor(self.weight_name)
-
-            self.pin_weight = self.pin_weight.copy_(weight_tensor)
-            del weight_tensor
-
-            weight_scale_tensor = lazy_load_file.get_tensor(self.weight_scale_name)
-            self.pin_weight_scale = self.pin_weight_scale.copy_(weight_scale_tensor)
-            del weight_scale_tensor
-
-            if self.bias_name is not None:
-                bias_tensor = lazy_load_file.get_tensor(self.bias_name)
-                self.pin_bias.copy_(bias_tensor)
-                del bias_tensor
+        entries = [
+            (self.weight_name, self.pin_weight, self.weight_need_transpose),
+            (self.weight_scale_name, self.pin_weight_scale, False),
+        ]
+        if self.bias_name is not None:
+            entries.append((self.bias_name, self.pin_bias, False))
+        read_lazy_load_tensors(self.lazy_load_file, block_index, entries)
 
 
 @MM_WEIGHT_REGISTER("fp8-vllm")
@@ -1061,21 +1001,14 @@ class MMWeightWnvfp4Anvfp4dynamic(MMWeightQuantTemplate):
 
     def _load_cuda_buffers(self, weight_dict):
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as source:
-                (
-                    self.weight_cuda_buffer,
-                    self.weight_scale_cuda_buffer,
-                    self.input_global_scale_cuda_buffer,
-                    self.alpha_cuda_buffer,
-                ) = self._get_cuda_tensor_pair(source, self.lazy_load)
-                self.bias_cuda_buffer = self._get_cuda_bias_tensor(source, self.lazy_load)
+            source = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            (
+                self.weight_cuda_buffer,
+                self.weight_scale_cuda_buffer,
+                self.input_global_scale_cuda_buffer,
+                self.alpha_cuda_buffer,
+            ) = self._get_cuda_tensor_pair(source, self.lazy_load)
+            self.bias_cuda_buffer = self._get_cuda_bias_tensor(source, self.lazy_load)
         else:
             source = weight_dict
             (
@@ -1139,28 +1072,21 @@ class MMWeightWnvfp4Anvfp4dynamic(MMWeightQuantTemplate):
 
     def _get_cpu_pin_tensor_pair(self, source, is_lazy):
         if is_lazy:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
+            source = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            weight_tensor = source.get_tensor(self.weight_name)
+            scale_tensor = source.get_tensor(self.weight_scale_name)
+            if source.get_tensor(self.input_absmax_name) is not None:
+                input_absmax = source.get_tensor(self.input_absmax_name)
+                input_global_scale = (2688.0 / input_absmax).to(torch.float32)
+                weight_global_scale = source.get_tensor(self.weight_global_scale_name)
+                alpha = 1.0 / (input_global_scale * weight_global_scale)
             else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as source:
-                weight_tensor = source.get_tensor(self.weight_name)
-                scale_tensor = source.get_tensor(self.weight_scale_name)
-                if source.get_tensor(self.input_absmax_name) is not None:
-                    input_absmax = source.get_tensor(self.input_absmax_name)
-                    input_global_scale = (2688.0 / input_absmax).to(torch.float32)
-                    weight_global_scale = source.get_tensor(self.weight_global_scale_name)
-                    alpha = 1.0 / (input_global_scale * weight_global_scale)
-                else:
-                    input_global_scale = source.get_tensor(self.input_global_scale_name).to(torch.float32)
-                    alpha = source.get_tensor(self.alpha_name).to(torch.float32)
-                pin_weight = self._create_pin_tensor(weight_tensor)
-                pin_scale = self._create_pin_tensor(scale_tensor)
-                pin_input_global_scale = self._create_pin_tensor(input_global_scale)
-                pin_alpha = self._create_pin_tensor(alpha)
+                input_global_scale = source.get_tensor(self.input_global_scale_name).to(torch.float32)
+                alpha = source.get_tensor(self.alpha_name).to(torch.float32)
+            pin_weight = self._create_pin_tensor(weight_tensor)
+            pin_scale = self._create_pin_tensor(scale_tensor)
+            pin_input_global_scale = self._create_pin_tensor(input_global_scale)
+            pin_alpha = self._create_pin_tensor(alpha)
         else:
             weight_tensor = source[self.weight_name]
             scale_tensor = source[self.weight_scale_name]
@@ -1183,20 +1109,13 @@ class MMWeightWnvfp4Anvfp4dynamic(MMWeightQuantTemplate):
         if self.bias_name is None:
             return None
         if is_lazy:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(
-                    self.lazy_load_file,
-                    f"block_{self.weight_name.split('.')[1]}.safetensors",
-                )
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as source:
-                bias_tensor = source.get_tensor(self.bias_name)
-                if not self.bias_force_fp32:
-                    bias_tensor = bias_tensor.to(self.infer_dtype)
-                if self.bias_force_fp32:
-                    bias_tensor = bias_tensor.to(torch.float32)
-                return self._create_pin_tensor(bias_tensor)
+            source = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            bias_tensor = source.get_tensor(self.bias_name)
+            if not self.bias_force_fp32:
+                bias_tensor = bias_tensor.to(self.infer_dtype)
+            if self.bias_force_fp32:
+                bias_tensor = bias_tensor.to(torch.float32)
+            return self._create_pin_tensor(bias_tensor)
         else:
             bias_tensor = source[self.bias_name]
             if self.bias_force_fp32:
@@ -1413,35 +1332,15 @@ class MMWeightWnvfp4Anvfp4dynamic(MMWeightQuantTemplate):
                 )
             else:
                 self.bias_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.bias_name, count=1)
-        if Path(self.lazy_load_file).is_file():
-            lazy_load_file_path = self.lazy_load_file
-        else:
-            lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
-        with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-            if self.weight_need_transpose:
-                weight_tensor = lazy_load_file.get_tensor(self.weight_name).t()
-            else:
-                weight_tensor = lazy_load_file.get_tensor(self.weight_name)
-
-            self.pin_weight = self.pin_weight.copy_(weight_tensor)
-            del weight_tensor
-
-            weight_scale_tensor = lazy_load_file.get_tensor(self.weight_scale_name)
-            self.pin_weight_scale = self.pin_weight_scale.copy_(weight_scale_tensor)
-            del weight_scale_tensor
-
-            input_global_scale_tensor = lazy_load_file.get_tensor(self.input_global_scale_name)
-            self.pin_input_global_scale = self.pin_input_global_scale.copy_(input_global_scale_tensor)
-            del input_global_scale_tensor
-
-            alpha_tensor = lazy_load_file.get_tensor(self.alpha_name)
-            self.pin_alpha = self.pin_alpha.copy_(alpha_tensor)
-            del alpha_tensor
-
-            if self.bias_name is not None:
-                bias_tensor = lazy_load_file.get_tensor(self.bias_name)
-                self.pin_bias.copy_(bias_tensor)
-                del bias_tensor
+        entries = [
+            (self.weight_name, self.pin_weight, self.weight_need_transpose),
+            (self.weight_scale_name, self.pin_weight_scale, False),
+            (self.input_global_scale_name, self.pin_input_global_scale, False),
+            (self.alpha_name, self.pin_alpha, False),
+        ]
+        if self.bias_name is not None:
+            entries.append((self.bias_name, self.pin_bias, False))
+        read_lazy_load_tensors(self.lazy_load_file, block_index, entries)
 
 
 @MM_WEIGHT_REGISTER("Calib")
@@ -1,11 +1,9 @@
-import os
 import re
 from abc import ABCMeta, abstractmethod
-from pathlib import Path
 
 import torch
-from safetensors import safe_open
 
+from lightx2v.common.offload.lazy_load_cache import get_lazy_load_file, read_lazy_load_tensors
 from lightx2v.utils.envs import *
 from lightx2v.utils.registry_factory import LN_WEIGHT_REGISTER
 from lightx2v_platform.base.global_var import AI_DEVICE
@@ -56,14 +54,10 @@ class LNWeightTemplate(metaclass=ABCMeta):
         if name is None:
             return None
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{name.split('.')[1]}.safetensors")
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                tensor = lazy_load_file.get_tensor(name)
-                if use_infer_dtype:
-                    tensor = tensor.to(self.infer_dtype)
+            lazy_load_file = get_lazy_load_file(self.lazy_load_file, name.split(".")[1])
+            tensor = lazy_load_file.get_tensor(name)
+            if use_infer_dtype:
+                tensor = tensor.to(self.infer_dtype)
         else:
             tensor = weight_dict[name]
         return tensor
@@ -158,36 +152,24 @@ class LNWeightTemplate(metaclass=ABCMeta):
             self.bias = None
 
     def load_state_dict_from_disk(self, block_index, adapter_block_index=None):
+        entries = []
         if self.weight_name is not None:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
             if self.is_post_adapter:
                 self.weight_name = re.sub(r"\.\d+", lambda m: f".{adapter_block_index}", self.weight_name, count=1)
             else:
                 self.weight_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.weight_name, count=1)
-
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                weight_tensor = lazy_load_file.get_tensor(self.weight_name).to(self.infer_dtype)
-                self.pin_weight = self.pin_weight.copy_(weight_tensor)
-            del weight_tensor
+            entries.append((self.weight_name, self.pin_weight, False))
 
         if self.bias_name is not None:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
             if self.is_post_adapter:
                 assert adapter_block_index is not None
                 self.bias_name = re.sub(r"\.\d+", lambda m: f".{adapter_block_index}", self.bias_name, count=1)
             else:
                 self.bias_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.bias_name, count=1)
+            entries.append((self.bias_name, self.pin_bias, False))
 
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                bias_tensor = lazy_load_file.get_tensor(self.bias_name).to(self.infer_dtype)
-                self.pin_bias.copy_(bias_tensor)
-            del bias_tensor
+        if entries:
+            read_lazy_load_tensors(self.lazy_load_file, block_index, entries)
 
 
 @LN_WEIGHT_REGISTER("Default")
@@ -1,11 +1,9 @@
-import os
 import re
 from abc import ABCMeta, abstractmethod
-from pathlib import Path
 
 import torch
-from safetensors import safe_open
 
+from lightx2v.common.offload.lazy_load_cache import get_lazy_load_file, read_lazy_load_tensors
 from lightx2v.common.ops.norm.triton_ops import rms_norm_kernel
 from lightx2v.utils.envs import *
 from lightx2v.utils.registry_factory import RMS_WEIGHT_REGISTER
@@ -50,14 +48,10 @@ class RMSWeightTemplate(metaclass=ABCMeta):
 
     def _get_weight_tensor(self, weight_dict=None, use_infer_dtype=False):
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{self.weight_name.split('.')[1]}.safetensors")
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                tensor = lazy_load_file.get_tensor(self.weight_name)
-                if use_infer_dtype:
-                    tensor = tensor.to(self.infer_dtype)
+            lazy_load_file = get_lazy_load_file(self.lazy_load_file, self.weight_name.split(".")[1])
+            tensor = lazy_load_file.get_tensor(self.weight_name)
+            if use_infer_dtype:
+                tensor = tensor.to(self.infer_dtype)
         else:
             tensor = weight_dict[self.weight_name]
         return tensor
@@ -116,14 +110,7 @@ class RMSWeightTemplate(metaclass=ABCMeta):
             self.weight_name = re.sub(r"\.\d+", lambda m: f".{adapter_block_index}", self.weight_name, count=1)
         else:
             self.weight_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.weight_name, count=1)
-        if Path(self.lazy_load_file).is_file():
-            lazy_load_file_path = self.lazy_load_file
-        else:
-            lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
-        with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-            weight_tensor = lazy_load_file.get_tensor(self.weight_name).to(self.infer_dtype)
-            self.pin_weight = self.pin_weight.copy_(weight_tensor)
-        del weight_tensor
+        read_lazy_load_tensors(self.lazy_load_file, block_index, [(self.weight_name, self.pin_weight, False)])
 
 
 @RMS_WEIGHT_REGISTER("Default")
@@ -1,10 +1,8 @@
-import os
 import re
-from pathlib import Path
 
 import torch
-from safetensors import safe_open
 
+from lightx2v.common.offload.lazy_load_cache import get_lazy_load_file, read_lazy_load_tensors
 from lightx2v.utils.envs import *
 from lightx2v.utils.registry_factory import TENSOR_REGISTER
 from lightx2v_platform.base.global_var import AI_DEVICE
@@ -42,14 +40,10 @@ class DefaultTensor:
 
     def _get_tensor(self, weight_dict=None, use_infer_dtype=False):
         if self.lazy_load:
-            if Path(self.lazy_load_file).is_file():
-                lazy_load_file_path = self.lazy_load_file
-            else:
-                lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{self.tensor_name.split('.')[1]}.safetensors")
-            with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-                tensor = lazy_load_file.get_tensor(self.tensor_name)
-                if use_infer_dtype:
-                    tensor = tensor.to(self.infer_dtype)
+            lazy_load_file = get_lazy_load_file(self.lazy_load_file, self.tensor_name.split(".")[1])
+            tensor = lazy_load_file.get_tensor(self.tensor_name)
+            if use_infer_dtype:
+                tensor = tensor.to(self.infer_dtype)
         else:
             tensor = weight_dict[self.tensor_name]
         return tensor
@@ -100,11 +94,4 @@ class DefaultTensor:
             self.tensor_name = re.sub(r"\.\d+", lambda m: f".{adapter_block_index}", self.tensor_name, count=1)
         else:
             self.tensor_name = re.sub(r"\.\d+", lambda m: f".{block_index}", self.tensor_name, count=1)
-        if Path(self.lazy_load_file).is_file():
-            lazy_load_file_path = self.lazy_load_file
-        else:
-            lazy_load_file_path = os.path.join(self.lazy_load_file, f"block_{block_index}.safetensors")
-        with safe_open(lazy_load_file_path, framework="pt", device="cpu") as lazy_load_file:
-            tensor = lazy_load_file.get_tensor(self.tensor_name).to(self.infer_dtype)
-            self.pin_tensor = self.pin_tensor.copy_(tensor)
-        del tensor
+        read_lazy_load_tensors(self.lazy_load_file, block_index, [(self.tensor_name, self.pin_tensor, False)])
@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import deque
+
+from loguru import logger
+
+from lightx2v.server.metrics import monitor_cli
+from lightx2v.utils.envs import *
+
+# what to do with a put when the queue is full
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+# what to do at a tick when the queue is empty
+UNDERFLOW_POLICIES = ("repeat", "skip")
+
+
+class FramePacer:
+    """Bounded queue releasing items (frames, or slices of frames) at a fixed rate.
+
+    `get` blocks until the next tick of a monotonic clock, ticks advance by
+    `interval` from the previous deadline so sleep jitter does not accumulate.
+    When generation outpaces the stream the queue holds at most `max_items`
+    (0 is unbounded) and `overflow` decides: "block" the producer, "drop_oldest"
+    to bound the latency, or "drop_newest". When generation lags, `underflow`
+    decides: "repeat" releases `filler(last_item)` to hold the fps, "skip"
+    stalls and restarts the clock with the next item. A consumer later than
+    `max_lag` seconds is resynced instead of bursting to catch up. Without
+    `realtime` items are released as soon as they are available.
+
+    Queue depth, queue latency and released / dropped / repeated / late counts
+    are exported per `name` through `monitor_cli` in recorder mode.
+    """
+
+    def __init__(self, name, interval, max_items=0, overflow="block", underflow="skip", max_lag=0.5, filler=None, realtime=True):
+        assert overflow in OVERFLOW_POLICIES, f"Unknown overflow policy: {overflow}"
+        assert underflow in UNDERFLOW_POLICIES, f"Unknown underflow policy: {underflow}"
+        self.name = name
+        self.interval = interval
+        self.max_items = max_items
+        self.overflow = overflow
+        self.underflow = underflow
+        self.max_lag = max_lag
+        self.filler = filler or (lambda item: item)
+        self.realtime = realtime
+        self.record_metrics = GET_RECORDER_MODE()
+
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.last_item = None
+        self.next_tick = None
+        self.stats = {"sent": 0, "dropped": 0, "repeated": 0, "late": 0}
+
+    @classmethod
+    def from_config(cls, name, fps, frames_per_item=1, pacing=None, filler=None, realtime=True, **defaults):
+        # pacing: {"max_queue_secs", "overflow", "underflow", "max_lag"}, missing keys fall back to `defaults`
+        pacing = {**defaults, **(pacing or {})}
+        interval = frames_per_item / fps
+        max_queue_secs = pacing.get("max_queue_secs", 10.0)
+        return cls(
+            name,
+            interval,
+            max_items=max(1, round(max_queue_secs / interval)) if max_queue_secs else 0,
+            overflow=pacing.get("overflow", "block"),
+            underflow=pacing.get("underflow", "skip"),
+            max_lag=pacing.get("max_lag", 0.5),
+            filler=filler,
+            realtime=realtime,
+        )
+
+    def put(self, items):
+        with self.cond:
+            for item in items:
+                if self.max_items and len(self.items) >= self.max_items:
+                    if self.overflow == "block":
+                        # wake the consumer before waiting for it to make room
+                        self.cond.notify_all()
+                        while len(self.items) >= self.max_items and not self.closed:
+                            self.cond.wait()
+                    elif self.overflow == "drop_oldest":
+                        self.items.popleft()
+                        self._record("dropped")
+                    else:
+                        self._record("dropped")
+                        continue
+                if self.closed:
+                    self._record("dropped")
+                    continue
+                self.items.append((item, time.monotonic()))
+            self._record_depth()
+            self.cond.notify_all()
+
+    def get(self):
+        """The next item at its tick, None once closed and drained."""
+        with self.cond:
+            while True:
+                if not self.realtime or self.next_tick is None:
+                    while len(self.items) == 0 and not self.closed:
+                        self.cond.wait()
+                    if len(self.items) == 0:
+                        return None
+                    if not self.realtime:
+                        return self._release()
+                    self.next_tick = time.monotonic()
+
+                now = time.monotonic()
+                if now < self.next_tick:
+                    self.cond.wait(self.next_tick - now)
+                    continue
+                if now - self.next_tick > self.max_lag:
+                    # the sink fell behind, resync the clock rather than burst
+                    self._record("late")
+                    self.next_tick = now
+                self.next_tick += self.interval
+
+                if len(self.items) > 0:
+                    return self._release()
+                if self.closed:
+                    return None
+                if self.underflow == "repeat" and self.last_item is not None:
+                    self._record("repeated")
+                    return self.filler(self.last_item)
+                # skip: stall until the next item arrives and start a new clock with it
+                self.next_tick = None
+
+    def _release(self):
+        item, put_t = self.items.popleft()
+        self.last_item = item
+        self._record("sent")
+        if self.record_metrics:
+            monitor_cli.lightx2v_stream_queue_latency.labels(self.name).observe(time.monotonic() - put_t)
+        self._record_depth()
+        self.cond.notify_all()
+        return item
+
+    def depth(self):
+        return len(self.items)
+
+    def latency(self):
+        """Seconds until an item put now would be released."""
+        return len(self.items) * self.interval
+
+    def truncate(self, size):
+        """Keep the oldest `size` items, returns the last kept item or None."""
+        with self.cond:
+            while len(self.items) > size:
+                self.items.pop()
+            self._record_depth()
+            self.cond.notify_all()
+            return self.items[-1][0] if len(self.items) > 0 else None
+
+    def close(self, drain=True):
+        """Stop accepting items; `get` returns the queued ones first unless not `drain`."""
+        with self.cond:
+            self.closed = True
+            if not drain:
+                self.items.clear()
+                self._record_depth()
+            self.cond.notify_all()
+
+    def _record(self, result):
+        self.stats[result] += 1
+        if self.record_metrics:
+            monitor_cli.lightx2v_stream_frames.labels(self.name, result).inc()
+        if result != "sent" and self.stats[result] % 100 == 1:
+            logger.warning(f"[FramePacer] {self.name} {result} items, {self.summary()}")
+
+    def _record_depth(self):
+        if self.record_metrics:
+            monitor_cli.lightx2v_stream_queue_depth.labels(self.name).set(len(self.items))
+
+    def summary(self):
+        return {**self.stats, "depth": len(self.items), "latency_s": round(self.latency(), 3)}
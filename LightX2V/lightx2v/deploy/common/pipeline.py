@@ -151,6 +151,9 @@ class Pipeline:
     def get_monitor_config(self):
         return self.meta["monitor"]
 
+    def get_encoder_cache_config(self):
+        return self.meta.get("encoder_cache", {})
+
     def get_queues(self):
         return self.queues
 
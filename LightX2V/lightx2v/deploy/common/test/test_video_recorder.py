@@ -0,0 +1,76 @@
+"""
+VideoRecorder against a local ffmpeg sink, with synthetic frames:
+
+PYTHONPATH=/path-to-LightX2V python -m pytest lightx2v/deploy/common/test/test_video_recorder.py
+PYTHONPATH=/path-to-LightX2V python lightx2v/deploy/common/test/test_video_recorder.py
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import pytest
+
+from lightx2v.deploy.common.video_recorder import VideoRecorder, create_simple_video
+
+FPS = 16
+WIDTH, HEIGHT = 320, 240
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None, reason="ffmpeg not found")
+
+
+def probe_frames(path):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-count_frames", "-select_streams", "v:0", "-show_entries", "stream=nb_read_frames,width,height", "-of", "json", path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    stream = json.loads(out)["streams"][0]
+    return int(stream["nb_read_frames"]), stream["width"], stream["height"]
+
+
+def test_record_local_file():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "out.mp4")
+        recorder = VideoRecorder(output_path, fps=FPS)
+        for _ in range(3):
+            recorder.pub_video(create_simple_video(FPS, HEIGHT, WIDTH))
+        recorder.stop()
+
+        assert recorder.video_pacer.stats["sent"] == 3 * FPS
+        assert probe_frames(output_path) == (3 * FPS, WIDTH, HEIGHT)
+
+
+def test_pub_video_does_not_block_after_sink_exits():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # realtime pacing with a small blocking queue, so a dead consumer would stall the producer
+        recorder = VideoRecorder(os.path.join(tmp_dir, "out.mp4"), fps=FPS, realtime=True, pacing={"max_queue_secs": 0.5, "overflow": "block"})
+        recorder.pub_video(create_simple_video(FPS, HEIGHT, WIDTH))
+        time.sleep(0.5)
+        recorder.ffmpeg_process.kill()
+        recorder.ffmpeg_process.wait()
+
+        published = threading.Event()
+
+        def publish():
+            for _ in range(4):
+                recorder.pub_video(create_simple_video(FPS, HEIGHT, WIDTH))
+            published.set()
+
+        threading.Thread(target=publish, daemon=True).start()
+        assert published.wait(timeout=20), "pub_video blocked after the ffmpeg sink exited"
+        recorder.video_thread.join(timeout=5)
+        assert not recorder.video_thread.is_alive()
+        assert recorder.video_pacer.closed
+        recorder.stop(wait=False)
+
+
+if __name__ == "__main__":
+    test_record_local_file()
+    test_pub_video_does_not_block_after_sink_exits()
+    print("ok")
@@ -43,6 +43,8 @@ class VAController:
             self.output_video_path = self.output_video_path["data"]
 
         self.audio_sr = config.get("audio_sr", 16000)
+        # live stream frame pacing (see FramePacer), a request's stream_config["pacing"] overrides it
+        self.stream_pacing = config.get("stream_pacing", None)
         self.target_fps = config.get("target_fps", 16)
         self.max_num_frames = config.get("target_video_length", 81)
         self.prev_frame_length = config.get("prev_frame_length", 5)
@@ -86,6 +88,7 @@ class VAController:
                 sample_rate=self.audio_sr,
                 slice_frame=self.slice_frame,
                 prev_frame=self.prev_frame_length,
+                pacing=self.stream_config.get("pacing", self.stream_pacing),
             )
         else:
             from lightx2v.deploy.common.va_recorder import VARecorder
@@ -10,6 +10,8 @@ import torchaudio as ta
 from loguru import logger
 from scipy.signal import resample
 
+from lightx2v.deploy.common.frame_pacer import FramePacer
+
 
 class X264VARecorder:
     def __init__(
@@ -20,6 +22,7 @@ class X264VARecorder:
         sample_rate: int = 16000,
         slice_frame: int = 1,
         prev_frame: int = 1,
+        pacing: dict = None,
     ):
         assert livestream_url.startswith("http"), "X264VARecorder only support whip http livestream"
         self.livestream_url = livestream_url
@@ -46,13 +49,12 @@ class X264VARecorder:
         self.target_sample_rate = 48000
         self.target_samples_per_frame = round(self.target_sample_rate / self.fps)
         self.target_chunks_per_frame = self.target_samples_per_frame * 2
-        self.stream_buffer = []
-        self.stream_buffer_lock = threading.Lock()
-        self.stop_schedule = False
         self.schedule_thread = None
         self.slice_frame = slice_frame
         self.prev_frame = prev_frame
         assert self.slice_frame >= self.prev_frame, "Slice frame must be greater than previous frame"
+        # paced buffer of (images, audios, gen_video) slices, released every slice_frame / fps seconds
+        self.stream_buffer = FramePacer.from_config("x264_va_recorder", fps, frames_per_item=slice_frame, pacing=pacing, filler=self.silent_slice, realtime=self.realtime)
 
     def worker(self):
         try:
@@ -157,53 +159,43 @@ class X264VARecorder:
             gen = gen_video[:, :, (end_frame - self.prev_frame) : end_frame]
             rets.append((img, aud, gen))
 
-        with self.stream_buffer_lock:
-            origin_size = len(self.stream_buffer)
-            self.stream_buffer.extend(rets)
-            logger.info(f"Buffered {origin_size} + {len(rets)} = {len(self.stream_buffer)} stream segments")
+        origin_size = self.stream_buffer.depth()
+        self.stream_buffer.put(rets)
+        logger.info(f"Buffered {origin_size} + {len(rets)} = {self.stream_buffer.depth()} stream segments")
 
     def get_buffer_stream_size(self):
-        return len(self.stream_buffer)
+        return self.stream_buffer.depth()
 
     def truncate_stream_buffer(self, size: int):
-        with self.stream_buffer_lock:
-            self.stream_buffer = self.stream_buffer[:size]
-            logger.info(f"Truncated stream buffer to {len(self.stream_buffer)} segments")
-            if len(self.stream_buffer) > 0:
-                return self.stream_buffer[-1][2]  # return the last video tensor
-            else:
-                return None
+        last = self.stream_buffer.truncate(size)
+        logger.info(f"Truncated stream buffer to {self.stream_buffer.depth()} segments")
+        if last is not None:
+            return last[2]  # return the last video tensor
+        return None
+
+    def silent_slice(self, last):
+        # underflow filler: hold the last frame with silence so the stream keeps its fps
+        img, aud, gen = last
+        return np.repeat(img[-1:], img.shape[0], axis=0), np.zeros_like(aud), gen
 
     def schedule_stream_buffer(self):
-        schedule_interval = self.slice_frame / self.fps
-        logger.info(f"Schedule stream buffer with interval: {schedule_interval} seconds")
-        t = None
+        logger.info(f"Schedule stream buffer with interval: {self.stream_buffer.interval} seconds")
         while True:
             try:
-                if self.stop_schedule:
+                item = self.stream_buffer.get()
+                if item is None:
                     break
-                img, aud, gen = None, None, None
-                with self.stream_buffer_lock:
-                    if len(self.stream_buffer) > 0:
-                        img, aud, gen = self.stream_buffer.pop(0)
-
-                if t is not None:
-                    wait_secs = schedule_interval - (time.time() - t)
-                    if wait_secs > 0:
-                        time.sleep(wait_secs)
-                t = time.time()
-
-                if img is not None and aud is not None:
-                    self.queue.put((aud, img))
-                    # logger.info(f"Scheduled {img.shape[0]} frames and {aud.shape[0]} audio samples to publish")
-                    del gen
-                    self.stoppable_t = time.time() + img.shape[0] / self.fps + 3
-                else:
-                    logger.warning(f"No stream buffer to schedule")
+                img, aud, gen = item
+                self.queue.put((aud, img))
+                # logger.info(f"Scheduled {img.shape[0]} frames and {aud.shape[0]} audio samples to publish")
+                del gen
+                self.stoppable_t = time.time() + img.shape[0] / self.fps + self.stream_buffer.latency() + 3
             except Exception:
                 logger.error(f"Schedule stream buffer error: {traceback.format_exc()}")
                 break
-        logger.info("Schedule stream buffer thread stopped")
+        # nothing consumes the buffer anymore, unblock buffer_stream and drop what it would queue
+        self.stream_buffer.close(drain=False)
+        logger.info(f"Schedule stream buffer thread stopped, pacing: {self.stream_buffer.summary()}")
 
     def stop(self, wait=True):
         if wait and self.stoppable_t:
@@ -214,7 +206,7 @@ class X264VARecorder:
             self.stoppable_t = None
 
         if self.schedule_thread:
-            self.stop_schedule = True
+            self.stream_buffer.close(drain=False)
             self.schedule_thread.join(timeout=5)
             if self.schedule_thread and self.schedule_thread.is_alive():
                 logger.error(f"Schedule thread did not stop after 5s")
@@ -1,5 +1,4 @@
 import os
-import queue
 import socket
 import subprocess
 import threading
@@ -10,6 +9,8 @@ import numpy as np
 import torch
 from loguru import logger
 
+from lightx2v.deploy.common.frame_pacer import FramePacer
+
 
 def pseudo_random(a, b):
     x = str(time.time()).split(".")[1]
@@ -22,6 +23,8 @@ class VideoRecorder:
         self,
         livestream_url: str,
         fps: float = 16.0,
+        pacing: dict = None,
+        realtime: bool = None,
     ):
         self.livestream_url = livestream_url
         self.fps = fps
@@ -32,7 +35,10 @@ class VideoRecorder:
         self.width = None
         self.height = None
         self.stoppable_t = None
-        self.realtime = True
+        # local files are written as fast as frames arrive, livestreams are paced at fps
+        if realtime is None:
+            realtime = self.livestream_url.startswith(("rtmp://", "http"))
+        self.realtime = realtime
 
         # ffmpeg process for video data and push to livestream
         self.ffmpeg_process = None
@@ -42,8 +48,8 @@ class VideoRecorder:
         self.video_conn = None
         self.video_thread = None
 
-        # queue for send data to ffmpeg process
-        self.video_queue = queue.Queue()
+        # paced frame queue for send data to ffmpeg process, a lagging generation repeats the last frame
+        self.video_pacer = FramePacer.from_config("video_recorder", fps, pacing=pacing, realtime=self.realtime, underflow="repeat")
 
     def init_sockets(self):
         # TCP socket for send and recv video data
@@ -59,27 +65,20 @@ class VideoRecorder:
             self.video_conn, _ = self.video_socket.accept()
             logger.info(f"Video connection established from {self.video_conn.getpeername()}")
             fail_time, max_fail_time = 0, 10
-            packet_secs = 1.0 / self.fps
             while True:
                 try:
-                    if self.video_queue is None:
-                        break
-                    data = self.video_queue.get()
+                    data = self.video_pacer.get()
                     if data is None:
-                        logger.info("Video thread received stop signal")
+                        logger.info(f"Video thread received stop signal, pacing: {self.video_pacer.summary()}")
                         break
 
                     # Convert to numpy and scale to [0, 255], convert RGB to BGR for OpenCV/FFmpeg
-                    for i in range(data.shape[0]):
-                        t0 = time.time()
-                        frame = (data[i] * 255).clamp(0, 255).to(torch.uint8).cpu().numpy()
-                        try:
-                            self.video_conn.send(frame.tobytes())
-                        except (BrokenPipeError, OSError, ConnectionResetError) as e:
-                            logger.info(f"Video connection closed, stopping worker: {type(e).__name__}")
-                            return
-                        if self.realtime:
-                            time.sleep(max(0, packet_secs - (time.time() - t0)))
+                    frame = (data * 255).clamp(0, 255).to(torch.uint8).cpu().numpy()
+                    try:
+                        self.video_conn.send(frame.tobytes())
+                    except (BrokenPipeError, OSError, ConnectionResetError) as e:
+                        logger.info(f"Video connection closed, stopping worker: {type(e).__name__}")
+                        return
 
                     fail_time = 0
                 except (BrokenPipeError, OSError, ConnectionResetError):
@@ -94,6 +93,8 @@ class VideoRecorder:
         except Exception:
             logger.error(f"Video push worker thread error: {traceback.format_exc()}")
         finally:
+            # nothing consumes the pacer anymore, unblock pub_video and drop what it would queue
+            self.video_pacer.close(drain=False)
             logger.info("Video push worker thread stopped")
 
     def start_ffmpeg_process_local(self):
@@ -266,7 +267,6 @@ class VideoRecorder:
             self.start_ffmpeg_process_whip()
         else:
             self.start_ffmpeg_process_local()
-            self.realtime = False
         self.video_thread = threading.Thread(target=self.video_worker)
         self.video_thread.start()
 
@@ -278,10 +278,11 @@ class VideoRecorder:
         logger.info(f"Publishing video [{N}x{width}x{height}]")
 
         self.set_video_size(width, height)
-        self.video_queue.put(images)
-        logger.info(f"Published {N} frames")
+        # blocks or drops when the stream is more than max_queue_secs behind, per the pacing policy
+        self.video_pacer.put(images.unbind(0))
+        logger.info(f"Published {N} frames, pacing: {self.video_pacer.summary()}")
 
-        self.stoppable_t = time.time() + N / self.fps + 3
+        self.stoppable_t = time.time() + self.video_pacer.latency() + 3
 
     def stop(self, wait=True):
         if wait and self.stoppable_t:
@@ -291,9 +292,8 @@ class VideoRecorder:
                 time.sleep(t)
             self.stoppable_t = None
 
-        # Send stop signals to queues
-        if self.video_queue:
-            self.video_queue.put(None)
+        # Send stop signals to queues, the worker sends the queued frames first
+        self.video_pacer.close()
 
         # Wait for threads to finish processing queued data (increased timeout)
         queue_timeout = 30  # Increased from 5s to 30s to allow sufficient time for large video frames
@@ -356,13 +356,7 @@ class VideoRecorder:
             finally:
                 self.video_socket = None
 
-        if self.video_queue:
-            while self.video_queue.qsize() > 0:
-                try:
-                    self.video_queue.get_nowait()
-                except:  # noqa
-                    break
-        self.video_queue = None
+        self.video_pacer.close(drain=False)
         logger.info("VideoRecorder stopped and resources cleaned up")
 
     def __del__(self):
@@ -405,6 +399,9 @@ if __name__ == "__main__":
         # livestream_url="https://reverse.st-oc-01.chielo.org/10.5.64.49:8000/rtc/v1/whip/?app=live&stream=ll_test_video&eip=127.0.0.1:8000",
         livestream_url="/path/to/output_video.mp4",
         fps=fps,
+        # pace the local file like a livestream to test the pacing policies
+        realtime=True,
+        pacing={"max_queue_secs": 3, "overflow": "drop_oldest", "underflow": "repeat"},
     )
 
     secs = 10  # 10秒视频
@@ -418,5 +415,7 @@ if __name__ == "__main__":
         logger.info(f"images: {images.shape} {images.dtype} {images.min()} {images.max()}")
 
         recorder.pub_video(images)
-        time.sleep(interval)
+        # bursty generation: every third second lags behind real time
+        time.sleep(interval * (1.8 if i % 3 == 2 else 0.6))
     recorder.stop()
+    logger.info(f"pacing: {recorder.video_pacer.summary()}")
@@ -1,3 +1,4 @@
+import asyncio
 import io
 import json
 import os
@@ -7,6 +8,41 @@ from PIL import Image
 
 from lightx2v.deploy.common.utils import class_try_catch_async
 
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+async def aiter_chunks(stream, chunk_size=STREAM_CHUNK_SIZE):
+    # bytes, a (sync or async) file handle, an async iterator or an iterator of bytes
+    if isinstance(stream, (bytes, bytearray, memoryview)):
+        stream = memoryview(stream)
+        for start in range(0, len(stream), chunk_size):
+            yield bytes(stream[start : start + chunk_size])
+    elif hasattr(stream, "read"):
+        read_async = asyncio.iscoroutinefunction(stream.read)
+        while True:
+            chunk = await stream.read(chunk_size) if read_async else await asyncio.to_thread(stream.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    elif hasattr(stream, "__aiter__"):
+        async for chunk in stream:
+            yield chunk
+    else:
+        for chunk in stream:
+            yield chunk
+
+
+async def aiter_parts(stream, part_size):
+    # regroup a stream into parts of exactly part_size bytes (the last one may be shorter)
+    buffer = bytearray()
+    async for chunk in aiter_chunks(stream, min(part_size, STREAM_CHUNK_SIZE)):
+        buffer += chunk
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
 
 class BaseDataManager:
     def __init__(self):
@@ -48,6 +84,20 @@ class BaseDataManager:
     async def delete_bytes(self, filename, abs_path=None):
         raise NotImplementedError
 
+    @class_try_catch_async
+    async def save_stream(self, stream, filename, abs_path=None):
+        # fallback for backends without a streaming path: buffer the whole stream
+        chunks = [chunk async for chunk in aiter_chunks(stream)]
+        return await self.save_bytes(b"".join(chunks), filename, abs_path=abs_path)
+
+    @class_try_catch_async
+    async def load_stream(self, filename, abs_path=None):
+        # returns an async iterator of bytes chunks, or None if the file cannot be read
+        bytes_data = await self.load_bytes(filename, abs_path=abs_path)
+        if bytes_data is None:
+            return None
+        return aiter_chunks(bytes_data)
+
     async def presign_url(self, filename, abs_path=None):
         return None
 
@@ -245,4 +295,4 @@ class BaseDataManager:
 from .local_data_manager import LocalDataManager  # noqa
 from .s3_data_manager import S3DataManager  # noqa
 
-__all__ = ["BaseDataManager", "LocalDataManager", "S3DataManager"]
+__all__ = ["BaseDataManager", "LocalDataManager", "S3DataManager", "aiter_chunks", "aiter_parts"]
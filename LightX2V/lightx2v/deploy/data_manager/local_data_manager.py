@@ -5,7 +5,7 @@ import shutil
 from loguru import logger
 
 from lightx2v.deploy.common.utils import class_try_catch_async
-from lightx2v.deploy.data_manager import BaseDataManager
+from lightx2v.deploy.data_manager import STREAM_CHUNK_SIZE, BaseDataManager, aiter_chunks
 
 
 class LocalDataManager(BaseDataManager):
@@ -48,6 +48,29 @@ class LocalDataManager(BaseDataManager):
         with open(inp_path, "rb") as fin:
             return fin.read()
 
+    @class_try_catch_async
+    async def save_stream(self, stream, filename, abs_path=None):
+        out_path = self.fmt_path(self.local_dir, filename, abs_path)
+        parent_dir = os.path.dirname(out_path)
+        if parent_dir and not os.path.exists(parent_dir):
+            os.makedirs(parent_dir, exist_ok=True)
+        with open(out_path, "wb") as fout:
+            async for chunk in aiter_chunks(stream):
+                await asyncio.to_thread(fout.write, chunk)
+        return True
+
+    @class_try_catch_async
+    async def load_stream(self, filename, abs_path=None):
+        inp_path = self.fmt_path(self.local_dir, filename, abs_path)
+        fin = open(inp_path, "rb")
+
+        async def iter_file():
+            with fin:
+                async for chunk in aiter_chunks(fin, STREAM_CHUNK_SIZE):
+                    yield chunk
+
+        return iter_file()
+
     @class_try_catch_async
     async def delete_bytes(self, filename, abs_path=None):
         inp_path = self.fmt_path(self.local_dir, filename, abs_path)
@@ -15,7 +15,7 @@ import aiofiles
 import uvicorn
 from fastapi import Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
@@ -33,6 +33,7 @@ from lightx2v.deploy.common.volcengine_tts import VolcEngineTTSClient
 from lightx2v.deploy.data_manager import LocalDataManager, S3DataManager
 from lightx2v.deploy.queue_manager import LocalQueueManager, RabbitMQQueueManager
 from lightx2v.deploy.server.auth import AuthManager
+from lightx2v.deploy.server.encoder_cache import EncoderCache
 from lightx2v.deploy.server.metrics import MetricMonitor
 from lightx2v.deploy.server.monitor import ServerMonitor, WorkerStatus
 from lightx2v.deploy.server.redis_monitor import RedisServerMonitor
@@ -84,6 +85,7 @@ task_manager = None
 data_manager = None
 queue_manager = None
 server_monitor = None
+encoder_cache = None
 auth_manager = None
 metrics_monitor = MetricMonitor()
 volcengine_tts_client = None
@@ -101,6 +103,8 @@ async def lifespan(app: FastAPI):
     await data_manager.init()
     await queue_manager.init()
     await server_monitor.init()
+    server_monitor.on_task_failed = lambda task_id: release_encoder_cache(task_id, keep_owned=True)
+    await recover_held_subtasks()
     asyncio.create_task(server_monitor.loop())
     yield
     await server_monitor.close()
@@ -323,11 +327,61 @@ async def refresh_access_token(request: RefreshTokenRequest):
 async def prepare_subtasks(task_id):
     # schedule next subtasks and pend, put to message queue
     subtasks = await task_manager.next_subtasks(task_id)
+    shared = False
     for sub in subtasks:
+        ret = await encoder_cache.hold(sub)
+        # an identical encoder subtask is running for another task, wait for its outputs
+        if ret == "hold":
+            logger.info(f"Hold ready subtask: ({task_id}, {sub['worker_name']}) for shared encoder outputs")
+            continue
+        # another task produced the outputs meanwhile, the subtask is already satisfied
+        if ret == "share":
+            shared = True
+            continue
         logger.info(f"Prepare ready subtask: ({task_id}, {sub['worker_name']})")
         r = await queue_manager.put_subtask(sub)
         assert r, "put subtask to queue error"
-        await server_monitor.pending_subtasks_add(sub["queue"], sub["task_id"])
+        await server_monitor.pending_subtasks_add(sub["queue"], sub["task_id"], sub.get("params"))
+    if shared:
+        await prepare_subtasks(task_id)
+
+
+async def release_held_subtasks(waiters, succeed):
+    for task_id, worker_name in waiters:
+        if succeed:
+            await prepare_subtasks(task_id)
+            continue
+        # the shared encoder failed, held subtasks compute their own outputs
+        task, subtasks = await task_manager.query_task(task_id, only_task=False)
+        for sub in subtasks:
+            if sub["worker_name"] == worker_name and sub["status"] == TaskStatus.PENDING:
+                sub["params"] = task["params"]
+                task_manager.align_extra_inputs(task, sub)
+                await task_manager.hold_subtask(task_id, worker_name, None)
+                logger.info(f"Prepare held subtask: ({task_id}, {worker_name})")
+                r = await queue_manager.put_subtask(sub)
+                assert r, "put subtask to queue error"
+                await server_monitor.pending_subtasks_add(sub["queue"], sub["task_id"], sub.get("params"))
+
+
+async def release_encoder_cache(task_id, keep_owned=False):
+    # a task that owned an unfinished shared encoder hands it to one of its held waiters
+    requeue = await encoder_cache.release(task_id, keep_owned=keep_owned)
+    await release_held_subtasks(requeue or [], False)
+
+
+async def recover_held_subtasks():
+    # resolve the holds stored on pending subtasks whose owner may have finished while no server was running
+    subtasks = await task_manager.list_tasks(status=TaskStatus.PENDING, subtasks=True)
+    for sub in subtasks:
+        if "held_by" not in sub["extra_info"]:
+            continue
+        ret = await encoder_cache.recover(sub)
+        logger.info(f"Recover held subtask: ({sub['task_id']}, {sub['worker_name']}) -> {ret}")
+        if ret == "share":
+            await prepare_subtasks(sub["task_id"])
+        elif ret != "hold":
+            await release_held_subtasks([(sub["task_id"], sub["worker_name"])], False)
 
 
 def format_task(task):
@@ -346,7 +400,7 @@ async def api_v1_model_list(user=Depends(verify_user_access)):
 
 @app.post("/api/v1/task/submit")
 async def api_v1_task_submit(request: Request, user=Depends(verify_user_access)):
-    task_id = None
+    task_id, quota_task_id = None, None
     try:
         msg = await server_monitor.check_user_busy(user["user_id"], active_new_task=True)
         if msg is not True:
@@ -365,21 +419,29 @@ async def api_v1_task_submit(request: Request, user=Depends(verify_user_access))
 
         # check if task can be published to queues
         queues = [v["queue"] for v in workers.values()]
-        wait_time = await server_monitor.check_queue_busy(keys, queues)
+        wait_time = await server_monitor.check_queue_busy(keys, queues, params)
         if wait_time is None:
             return error_response(f"Queue busy, please try again later", 500)
 
         # process multimodal inputs data
         inputs_data = await load_inputs(params, inputs, types)
 
+        # concurrent submits of the user may have passed the quota check together, the quota is
+        # taken under the new task id before the task exists so a rejected submit counts nowhere
+        quota_task_id = str(uuid.uuid4())
+        msg = await server_monitor.user_task_started(user["user_id"], quota_task_id)
+        if msg is not True:
+            return error_response(msg, 400)
+
         # init task (we need task_id before preprocessing to save processed files)
-        task_id = await task_manager.create_task(keys, workers, params, inputs, outputs, user["user_id"])
+        task_id = await task_manager.create_task(keys, workers, params, inputs, outputs, user["user_id"], task_id=quota_task_id)
         logger.info(f"Submit task: {task_id} {params}")
 
         # save multimodal inputs data
         for inp, data in inputs_data.items():
             await data_manager.save_bytes(data, data_name(inp, task_id))
 
+        await encoder_cache.attach(task_id, keys, workers, params, inputs_data)
         await prepare_subtasks(task_id)
         return {"task_id": task_id, "workers": workers, "params": params, "wait_time": wait_time}
 
@@ -387,6 +449,8 @@ async def api_v1_task_submit(request: Request, user=Depends(verify_user_access))
         traceback.print_exc()
         if task_id:
             await task_manager.finish_subtasks(task_id, TaskStatus.FAILED, fail_msg=f"submit failed: {e}")
+        if quota_task_id:
+            await server_monitor.user_task_finished(user["user_id"], quota_task_id)
         return error_response(str(e), 500)
 
 
@@ -401,7 +465,7 @@ async def api_v1_task_query(request: Request, user=Depends(verify_user_access)):
                 if task_id:
                     task, subtasks = await task_manager.query_task(task_id, user["user_id"], only_task=False)
                     if task is not None:
-                        task["subtasks"] = await server_monitor.format_subtask(subtasks)
+                        task["subtasks"] = await server_monitor.format_subtask(subtasks, task["params"])
                         format_task(task)
                         tasks.append(task)
             return {"tasks": tasks}
@@ -411,7 +475,7 @@ async def api_v1_task_query(request: Request, user=Depends(verify_user_access)):
         task, subtasks = await task_manager.query_task(task_id, user["user_id"], only_task=False)
         if task is None:
             return error_response(f"Task {task_id} not found", 404)
-        task["subtasks"] = await server_monitor.format_subtask(subtasks)
+        task["subtasks"] = await server_monitor.format_subtask(subtasks, task["params"])
         format_task(task)
         return task
     except Exception as e:
@@ -519,13 +583,14 @@ async def assets_task_result(request: Request, user=Depends(verify_user_access_f
         assert task["status"] == TaskStatus.SUCCEED, f"Task {task_id} not succeed"
         assert name in task["outputs"], f"Output {name} not found in task {task_id}"
         assert name not in task["params"], f"Output {name} is a stream"
-        data = await data_manager.load_bytes(task["outputs"][name])
+        stream = await data_manager.load_stream(task["outputs"][name])
+        assert stream is not None, f"Failed to load {name} of task {task_id}"
 
         #  set correct Content-Type
         content_type = guess_file_type(name, "application/octet-stream")
         headers = {"Content-Disposition": f'attachment; filename="{name}"'}
         headers["Cache-Control"] = "public, max-age=3600"
-        return Response(content=data, media_type=content_type, headers=headers)
+        return StreamingResponse(stream, media_type=content_type, headers=headers)
 
     except Exception as e:
         traceback.print_exc()
@@ -553,13 +618,14 @@ async def assets_task_input(request: Request, user=Depends(verify_user_access_fr
             name = f"{name}/{filename}"
             assert name in task["inputs"], f"Extra input {name} not found in task {task_id}"
             assert name in extra_inputs, f"Filename {filename} not found in extra inputs"
-        data = await data_manager.load_bytes(task["inputs"][name])
+        stream = await data_manager.load_stream(task["inputs"][name])
+        assert stream is not None, f"Failed to load {name} of task {task_id}"
 
         #  set correct Content-Type
         content_type = guess_file_type(name, "application/octet-stream")
         headers = {"Content-Disposition": f'attachment; filename="{name}"'}
         headers["Cache-Control"] = "public, max-age=3600"
-        return Response(content=data, media_type=content_type, headers=headers)
+        return StreamingResponse(stream, media_type=content_type, headers=headers)
 
     except Exception as e:
         traceback.print_exc()
@@ -573,6 +639,9 @@ async def api_v1_task_cancel(request: Request, user=Depends(verify_user_access))
         ret = await task_manager.cancel_task(task_id, user_id=user["user_id"])
         logger.warning(f"Task {task_id} cancelled: {ret}")
         if ret is True:
+            await release_encoder_cache(task_id, keep_owned=True)
+            await server_monitor.pending_costs_remove(task_id)
+            await server_monitor.user_task_finished(user["user_id"], task_id)
             return {"msg": "Task cancelled successfully"}
         else:
             return error_response({"error": f"Task {task_id} cancel failed: {ret}"}, 400)
@@ -593,6 +662,7 @@ async def api_v1_task_resume(request: Request, user=Depends(verify_user_access))
 
         ret = await task_manager.resume_task(task_id, user_id=user["user_id"], all_subtask=False)
         if ret is True:
+            await server_monitor.user_task_started(user["user_id"], task_id, enforce=False)
             await prepare_subtasks(task_id)
             return {"msg": "ok"}
         else:
@@ -689,9 +759,18 @@ async def api_v1_worker_report(request: Request, valid=Depends(verify_worker_acc
         identity = params.pop("worker_identity")
         queue = params.pop("queue")
         fail_msg = params.pop("fail_msg", None)
-        await server_monitor.worker_update(queue, identity, WorkerStatus.REPORT)
+        infer_cost = await server_monitor.worker_update(queue, identity, WorkerStatus.REPORT)
 
         ret = await task_manager.finish_subtasks(task_id, status, worker_identity=identity, worker_name=worker_name, fail_msg=fail_msg, should_running=True)
+        task = None
+        if (infer_cost is not None and status == TaskStatus.SUCCEED) or ret in [TaskStatus.SUCCEED, TaskStatus.FAILED]:
+            task = await task_manager.query_task(task_id)
+        if task is not None and infer_cost is not None and status == TaskStatus.SUCCEED:
+            await server_monitor.observe_infer_cost(queue, task["params"], infer_cost)
+        if task is not None and ret in [TaskStatus.SUCCEED, TaskStatus.FAILED]:
+            await server_monitor.user_task_finished(task["user_id"], task_id)
+        waiters = await encoder_cache.subtask_finished(task_id, worker_name, status == TaskStatus.SUCCEED)
+        await release_held_subtasks(waiters or [], status == TaskStatus.SUCCEED)
 
         # not all subtasks finished, prepare new ready subtasks
         if ret not in [TaskStatus.SUCCEED, TaskStatus.FAILED]:
@@ -700,16 +779,21 @@ async def api_v1_worker_report(request: Request, valid=Depends(verify_worker_acc
         # all subtasks succeed, delete temp data
         elif ret == TaskStatus.SUCCEED:
             logger.info(f"Task {task_id} succeed")
-            task = await task_manager.query_task(task_id)
             keys = [task["task_type"], task["model_cls"], task["stage"]]
             temps = model_pipelines.get_temps(keys)
+            managed = await encoder_cache.managed_temps(task_id)
             for temp in temps:
+                # shared encoder outputs are deleted by the cache once no task references them
+                if managed is None or temp in managed:
+                    continue
                 type = model_pipelines.get_type(temp)
                 name = data_name(temp, task_id)
                 await data_manager.get_delete_func(type)(name)
+            await release_encoder_cache(task_id)
 
         elif ret == TaskStatus.FAILED:
             logger.warning(f"Task {task_id} failed")
+            await release_encoder_cache(task_id, keep_owned=True)
 
         return {"msg": "ok"}
 
@@ -1750,5 +1834,6 @@ if __name__ == "__main__":
         server_monitor = RedisServerMonitor(model_pipelines, task_manager, queue_manager, args.redis_url)
     else:
         server_monitor = ServerMonitor(model_pipelines, task_manager, queue_manager)
+    encoder_cache = EncoderCache(model_pipelines, task_manager, data_manager)
 
     uvicorn.run(app, host=args.ip, port=args.port, reload=False, workers=1)
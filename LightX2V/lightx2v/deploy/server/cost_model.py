@@ -0,0 +1,130 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# reference request the work term is normalized to: 720p, 81 frames, 4 steps
+REF_PIXELS = 1280 * 720
+REF_FRAMES = 81
+REF_STEPS = 4
+
+
+def cost_features(params):
+    # request parameters that drive inference time, missing ones are neutral
+    params = params or {}
+    features = {"pixels": 1.0, "frames": 1.0, "steps": 1.0, "lora": 0.0}
+    shape = params.get("custom_shape") or params.get("target_shape")
+    if isinstance(shape, (list, tuple)) and len(shape) == 2:
+        features["pixels"] = max(float(shape[0]) * float(shape[1]), 1.0) / REF_PIXELS
+    frames = params.get("target_video_length", None)
+    if frames is None and params.get("video_duration", None) is not None:
+        frames = float(params["video_duration"]) * float(params.get("fps", 16))
+    if frames is not None:
+        features["frames"] = max(float(frames), 1.0) / REF_FRAMES
+    if params.get("infer_steps", None) is not None:
+        features["steps"] = max(float(params["infer_steps"]), 1.0) / REF_STEPS
+    if params.get("lora_name", None) or params.get("lora_configs", None) or params.get("loras", None):
+        features["lora"] = 1.0
+    return features
+
+
+class CostPredictor:
+    """Per-queue inference cost model trained online from finished subtasks."""
+
+    def __init__(self, window=200, min_samples=8):
+        self.window = window
+        self.min_samples = min_samples
+        self.samples = {}
+
+    def observe(self, queue, features, cost):
+        if queue not in self.samples:
+            self.samples[queue] = deque(maxlen=self.window)
+        self.samples[queue].append((features, float(cost)))
+        self.on_change(queue)
+
+    def load(self, queue, samples):
+        # replace the samples of a queue, eg. with the ones shared through redis
+        self.samples[queue] = deque([(s["features"], float(s["cost"])) for s in samples], maxlen=self.window)
+        self.on_change(queue)
+
+    def on_change(self, queue):
+        pass
+
+    def predict(self, queue, features):
+        # predicted seconds, None if there are not enough samples yet
+        raise NotImplementedError
+
+
+class LinearCostPredictor(CostPredictor):
+    """cost = a + b * pixels * frames * steps + c * lora, ridge least squares."""
+
+    def __init__(self, window=200, min_samples=8, ridge=1e-3):
+        super().__init__(window, min_samples)
+        self.ridge = ridge
+        self.coefs = {}
+
+    @staticmethod
+    def design(features):
+        work = features["pixels"] * features["frames"] * features["steps"]
+        return [1.0, work, features["lora"]]
+
+    def on_change(self, queue):
+        self.coefs.pop(queue, None)
+
+    def fit(self, queue):
+        samples = self.samples.get(queue, [])
+        if len(samples) < self.min_samples:
+            return None
+        if queue not in self.coefs:
+            x = np.array([self.design(f) for f, _ in samples], dtype=np.float64)
+            y = np.array([c for _, c in samples], dtype=np.float64)
+            gram = x.T @ x + self.ridge * len(samples) * np.eye(x.shape[1])
+            self.coefs[queue] = (np.linalg.solve(gram, x.T @ y), float(y.min()))
+        return self.coefs[queue]
+
+    def predict(self, queue, features):
+        fitted = self.fit(queue)
+        if fitted is None:
+            return None
+        coef, min_cost = fitted
+        cost = float(np.dot(coef, self.design(features)))
+        # a badly conditioned fit must not predict free or negative jobs
+        return max(cost, min_cost * 0.5, 1.0)
+
+
+class BinnedCostPredictor(CostPredictor):
+    """Mean cost of the samples in the same power-of-two bin of every feature."""
+
+    @staticmethod
+    def bin_key(features):
+        return tuple(round(math.log2(max(features[k], 1e-3))) for k in ["pixels", "frames", "steps"]) + (features["lora"] > 0,)
+
+    def predict(self, queue, features):
+        samples = self.samples.get(queue, [])
+        if len(samples) < self.min_samples:
+            return None
+        key = self.bin_key(features)
+        costs = [c for f, c in samples if self.bin_key(f) == key]
+        if len(costs) == 0:
+            # unseen bin: scale the queue mean by the work ratio
+            mean_work = sum(f["pixels"] * f["frames"] * f["steps"] for f, _ in samples) / len(samples)
+            mean_cost = sum(c for _, c in samples) / len(samples)
+            work = features["pixels"] * features["frames"] * features["steps"]
+            return max(mean_cost * work / max(mean_work, 1e-6), 1.0)
+        return sum(costs) / len(costs)
+
+
+COST_PREDICTORS = {
+    "linear": LinearCostPredictor,
+    "binned": BinnedCostPredictor,
+}
+
+
+def build_cost_predictor(config):
+    # config: {"type": "linear" | "binned" | "mean", ...predictor kwargs}, "mean" keeps the rolling average only
+    config = dict(config or {})
+    predictor_type = config.pop("type", "linear")
+    if predictor_type == "mean":
+        return None
+    assert predictor_type in COST_PREDICTORS, f"Unknown cost model: {predictor_type}"
+    return COST_PREDICTORS[predictor_type](**config)
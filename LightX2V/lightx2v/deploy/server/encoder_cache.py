@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import json
+import time
+
+from loguru import logger
+
+from lightx2v.deploy.common.utils import class_try_catch_async, data_name
+from lightx2v.deploy.task_manager import ActiveStatus, TaskStatus
+
+
+class EncoderCacheEntry:
+    def __init__(self, key, owner_task_id, worker_name, outputs, types):
+        self.key = key
+        self.owner_task_id = owner_task_id
+        self.worker_name = worker_name
+        # output name -> data name in data manager, always the owner task's names
+        self.outputs = outputs
+        self.types = types
+        self.ready = False
+        self.idle_t = None
+
+
+def is_producer(subtask):
+    # a subtask tagged with a cache key computes the outputs itself unless it waits for or was given another task's
+    return "held_by" not in subtask["extra_info"] and "shared_from" not in subtask["extra_info"]
+
+
+class EncoderCache:
+    """Shares encoder subtask outputs between tasks with identical encoder inputs.
+
+    An entry is keyed by a content hash of (task type, model_cls, worker name,
+    the worker's input bytes and the configured params). The first task
+    computing it owns the data; later tasks reference the owner's data names
+    instead of queueing their own encoder subtask.
+
+    References and holds live in the task store, not in this process: every
+    subtask attached to an entry is tagged with extra_info["cache_key"], a
+    waiting subtask with extra_info["held_by"] and a satisfied one with
+    extra_info["shared_from"]. The tasks referencing an entry are the active
+    tasks with a tagged subtask, so restarts and other server replicas see the
+    same references. The in-memory entries only index the keys this server
+    knows of for new submits and the idle entries it will evict; the data is
+    only deleted once no active task references it.
+    """
+
+    def __init__(self, model_pipelines, task_manager, data_manager):
+        self.model_pipelines = model_pipelines
+        self.task_manager = task_manager
+        self.data_manager = data_manager
+        self.config = model_pipelines.get_encoder_cache_config()
+        self.workers = self.config.get("workers", {})
+        self.max_idle_entries = self.config.get("max_idle_entries", 256)
+        self.idle_ttl = self.config.get("idle_ttl", 3600)
+        self.entries = {}
+        self.lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def enabled(self):
+        return len(self.workers) > 0
+
+    def cache_key(self, keys, worker_name, worker_item, params, inputs_data):
+        task_type, model_cls, _ = keys
+        hasher = hashlib.sha256()
+        hasher.update(json.dumps([task_type, model_cls, worker_name], ensure_ascii=False).encode("utf-8"))
+        for inp in sorted(worker_item["inputs"]):
+            if inp not in inputs_data:
+                return None
+            hasher.update(inp.encode("utf-8"))
+            hasher.update(hashlib.sha256(inputs_data[inp]).digest())
+        param_keys = self.workers[worker_name]
+        relevant = {k: params.get(k) for k in param_keys}
+        hasher.update(json.dumps(relevant, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return hasher.hexdigest()
+
+    @class_try_catch_async
+    async def attach(self, task_id, keys, workers, params, inputs_data):
+        """Register the cacheable encoder subtasks of a new task, sharing any ready outputs."""
+        if not self.enabled() or "extra_inputs" in params:
+            return
+        temps = set(self.model_pipelines.get_temps(keys))
+        async with self.lock:
+            for worker_name, worker_item in workers.items():
+                if worker_name not in self.workers or not set(worker_item["outputs"]).issubset(temps):
+                    continue
+                key = self.cache_key(keys, worker_name, worker_item, params, inputs_data)
+                if key is None:
+                    continue
+                entry = self.entries.get(key)
+                if entry is None:
+                    outputs = {x: data_name(x, task_id) for x in worker_item["outputs"]}
+                    types = {x: self.model_pipelines.get_type(x) for x in worker_item["outputs"]}
+                    self.entries[key] = EncoderCacheEntry(key, task_id, worker_name, outputs, types)
+                    self.misses += 1
+                else:
+                    entry.idle_t = None
+                    self.hits += 1
+                if not await self.task_manager.cache_subtask(task_id, worker_name, key):
+                    continue
+                if entry is not None and entry.ready:
+                    await self.share(task_id, worker_name, entry)
+            logger.info(f"EncoderCache: {len(self.entries)} entries, hits={self.hits}, misses={self.misses}")
+
+    async def share(self, task_id, worker_name, entry):
+        ret = await self.task_manager.share_subtask(task_id, worker_name, entry.outputs, entry.owner_task_id)
+        if ret:
+            logger.info(f"EncoderCache: subtask ({task_id}, {worker_name}) satisfied by {entry.owner_task_id}")
+        return ret
+
+    async def find_owner(self, key, task_id):
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry.owner_task_id if entry.owner_task_id != task_id else None
+        # the entry was created by another server or before a restart
+        for sub in await self.task_manager.list_cache_subtasks(key) or []:
+            if sub["task_id"] != task_id and is_producer(sub) and sub["status"] in ActiveStatus:
+                return sub["task_id"]
+        return None
+
+    @class_try_catch_async
+    async def hold(self, subtask):
+        """Decide whether a ready subtask waits for an identical encoder of another task.
+
+        Returns "share" when the outputs are ready (the subtask is satisfied),
+        "hold" when another task is still computing them and the subtask must not
+        be queued, and "own" when the subtask computes its own outputs.
+        """
+        task_id, worker_name = subtask["task_id"], subtask["worker_name"]
+        key = subtask["extra_info"].get("cache_key")
+        if key is None:
+            return "own"
+        owner_task_id = await self.find_owner(key, task_id)
+        if owner_task_id is None:
+            return "own"
+        held_by = {"owner": owner_task_id, "key": key}
+        await self.task_manager.hold_subtask(task_id, worker_name, held_by)
+        # the owner may have finished on another server before the hold was stored, check it afterwards
+        ret = await self.resolve(task_id, worker_name, held_by)
+        if ret == "own":
+            await self.task_manager.hold_subtask(task_id, worker_name, None)
+        return ret
+
+    async def resolve(self, task_id, worker_name, held_by):
+        owner_task_id, key = held_by["owner"], held_by["key"]
+        ret = await self.task_manager.query_task(owner_task_id, only_task=False)
+        if not ret:
+            return "own"
+        owner, owner_subtasks = ret
+        owner_sub = next((sub for sub in owner_subtasks if sub["worker_name"] == worker_name), None)
+        if owner_sub is None:
+            return "own"
+        async with self.lock:
+            entry = self.entries.get(key)
+            if owner_sub["status"] == TaskStatus.SUCCEED:
+                if entry is None or entry.owner_task_id != owner_task_id:
+                    types = {x: self.model_pipelines.get_type(x) for x in owner_sub["outputs"]}
+                    entry = EncoderCacheEntry(key, owner_task_id, worker_name, dict(owner_sub["outputs"]), types)
+                    self.entries[key] = entry
+                entry.ready = True
+                return "share" if await self.share(task_id, worker_name, entry) else "own"
+            # two producers holding on each other at the same time both compute their own outputs
+            if owner_sub["status"] in ActiveStatus and owner["status"] in ActiveStatus and is_producer(owner_sub):
+                return "hold"
+            if entry is not None and entry.owner_task_id == owner_task_id:
+                self.entries.pop(key, None)
+            return "own"
+
+    async def waiters(self, key, owner_task_id):
+        subs = await self.task_manager.list_cache_subtasks(key) or []
+        return [sub for sub in subs if sub["status"] == TaskStatus.PENDING and sub["extra_info"].get("held_by", {}).get("owner") == owner_task_id]
+
+    @class_try_catch_async
+    async def subtask_finished(self, task_id, worker_name, succeed):
+        """Called on worker report; returns the (task_id, worker_name) waiters to schedule again."""
+        ret = await self.task_manager.query_task(task_id, only_task=False)
+        if not ret:
+            return []
+        _, subtasks = ret
+        sub = next((sub for sub in subtasks if sub["worker_name"] == worker_name), None)
+        if sub is None or "cache_key" not in sub["extra_info"] or not is_producer(sub):
+            return []
+        key = sub["extra_info"]["cache_key"]
+        async with self.lock:
+            entry = self.entries.get(key)
+            if not succeed:
+                # the owner failed, waiters compute their own outputs
+                if entry is not None and entry.owner_task_id == task_id:
+                    self.entries.pop(key, None)
+                return [(w["task_id"], w["worker_name"]) for w in await self.waiters(key, task_id)]
+            if entry is None or not entry.ready:
+                types = {x: self.model_pipelines.get_type(x) for x in sub["outputs"]}
+                entry = EncoderCacheEntry(key, task_id, worker_name, dict(sub["outputs"]), types)
+                self.entries[key] = entry
+            entry.ready = True
+            # identical content, tagged subtasks that are not ready yet or held are satisfied by these outputs
+            shared = []
+            for w in await self.task_manager.list_cache_subtasks(key) or []:
+                if w["status"] == TaskStatus.CREATED or (w["status"] == TaskStatus.PENDING and "held_by" in w["extra_info"]):
+                    if await self.share(w["task_id"], w["worker_name"], entry):
+                        shared.append((w["task_id"], w["worker_name"]))
+            return shared
+
+    @class_try_catch_async
+    async def managed_temps(self, task_id):
+        """Temp outputs of a task that belong to a shared entry, the cache deletes them."""
+        if not self.enabled():
+            return set()
+        ret = await self.task_manager.query_task(task_id, only_task=False)
+        if not ret:
+            return set()
+        _, subtasks = ret
+        return {x for sub in subtasks if "cache_key" in sub["extra_info"] for x in sub["outputs"]}
+
+    async def hand_over(self, key, waiters):
+        """The owner of an unfinished entry is gone, the first waiter computes the outputs for the others."""
+        task_id, worker_name = waiters[0]["task_id"], waiters[0]["worker_name"]
+        outputs = {x: data_name(x, task_id) for x in waiters[0]["outputs"]}
+        types = {x: self.model_pipelines.get_type(x) for x in outputs}
+        self.entries[key] = EncoderCacheEntry(key, task_id, worker_name, outputs, types)
+        for waiter in waiters[1:]:
+            await self.task_manager.hold_subtask(waiter["task_id"], waiter["worker_name"], {"owner": task_id, "key": key})
+        logger.info(f"EncoderCache: {key} handed over to ({task_id}, {worker_name}), {len(waiters) - 1} waiters")
+        return task_id, worker_name
+
+    @class_try_catch_async
+    async def release(self, task_id, keep_owned=False):
+        """Drop the references of a finished task and mark entries no task references any more as idle.
+
+        Failed or cancelled tasks pass keep_owned so the temps they produced stay
+        on disk for resume, same as tasks that never hit the cache. Returns the
+        held (task_id, worker_name) that must now compute their own outputs
+        because this task owned an entry it will never finish.
+        """
+        ret = await self.task_manager.query_task(task_id, only_task=False)
+        if not ret:
+            return []
+        _, subtasks = ret
+        requeue = []
+        async with self.lock:
+            for sub in subtasks:
+                key = sub["extra_info"].get("cache_key")
+                if key is None:
+                    continue
+                entry = self.entries.get(key)
+                if is_producer(sub) and sub["status"] != TaskStatus.SUCCEED:
+                    if entry is not None and entry.owner_task_id == task_id:
+                        self.entries.pop(key, None)
+                    waiters = await self.waiters(key, task_id)
+                    if len(waiters) > 0:
+                        requeue.append(await self.hand_over(key, waiters))
+                    continue
+                if sub["status"] != TaskStatus.SUCCEED:
+                    continue
+                # the task is finished, any subtask tagged with the key belongs to another active task
+                refs = await self.task_manager.list_cache_subtasks(key)
+                if refs is None or len(refs) > 0:
+                    continue
+                owner_task_id = sub["extra_info"].get("shared_from", task_id)
+                if keep_owned and owner_task_id == task_id:
+                    if entry is not None and entry.owner_task_id == task_id:
+                        self.entries.pop(key, None)
+                    continue
+                if entry is None or entry.owner_task_id != owner_task_id:
+                    types = {x: self.model_pipelines.get_type(x) for x in sub["outputs"]}
+                    entry = EncoderCacheEntry(key, owner_task_id, sub["worker_name"], dict(sub["outputs"]), types)
+                    self.entries[key] = entry
+                entry.ready = True
+                entry.idle_t = time.time()
+            await self.evict_idle()
+        return requeue
+
+    @class_try_catch_async
+    async def recover(self, subtask):
+        """Resolve the hold of a pending subtask recorded before a server restart.
+
+        Returns "share" when the owner already produced the outputs (the subtask
+        is satisfied), "hold" when the owner is still computing them and "own"
+        when the subtask has to compute its own outputs.
+        """
+        task_id, worker_name = subtask["task_id"], subtask["worker_name"]
+        held_by = subtask["extra_info"]["held_by"]
+        ret = await self.resolve(task_id, worker_name, held_by)
+        if ret == "hold":
+            async with self.lock:
+                if held_by["key"] not in self.entries:
+                    owner_task_id = held_by["owner"]
+                    outputs = {x: data_name(x, owner_task_id) for x in subtask["outputs"]}
+                    types = {x: self.model_pipelines.get_type(x) for x in outputs}
+                    self.entries[held_by["key"]] = EncoderCacheEntry(held_by["key"], owner_task_id, worker_name, outputs, types)
+        return ret
+
+    async def evict(self, entry):
+        self.entries.pop(entry.key, None)
+        if not entry.ready:
+            return
+        # a task attached on another server may use the outputs again, it marks them idle once done
+        refs = await self.task_manager.list_cache_subtasks(entry.key)
+        if refs is None or len(refs) > 0:
+            return
+        for name, fname in entry.outputs.items():
+            await self.data_manager.get_delete_func(entry.types[name])(fname)
+        logger.info(f"EncoderCache: evict {entry.key} from {entry.owner_task_id}")
+
+    async def evict_idle(self):
+        idles = sorted([e for e in self.entries.values() if e.idle_t is not None], key=lambda e: e.idle_t)
+        now = time.time()
+        for idx, entry in enumerate(idles):
+            if len(idles) - idx > self.max_idle_entries or now - entry.idle_t > self.idle_ttl:
+                await self.evict(entry)
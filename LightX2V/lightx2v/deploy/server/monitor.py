@@ -5,6 +5,7 @@ from enum import Enum
 from loguru import logger
 
 from lightx2v.deploy.common.utils import class_try_catch_async
+from lightx2v.deploy.server.cost_model import build_cost_predictor, cost_features
 from lightx2v.deploy.task_manager import TaskStatus
 
 
@@ -64,9 +65,11 @@ class WorkerClient:
                 if cur_cost < self.infer_timeout:
                     self.infer_cost.append(max(cur_cost, 1))
                     logger.info(f"Worker {self.identity} {self.queue} avg infer cost update: {self.infer_cost.avg:.2f} s")
+                    return max(cur_cost, 1)
 
         elif status == WorkerStatus.FETCHED:
             self.fetched_t = time.time()
+        return None
 
     def check(self):
         # infer too long
@@ -110,6 +113,8 @@ class ServerMonitor:
         self.worker_clients = {}
         self.subtask_run_timeouts = {}
         self.pending_subtasks = {}
+        self.pending_costs = {}  # queue -> {task_id: predicted infer cost}
+        self.on_task_failed = None  # async callback(task_id) for tasks failed by the timeouts below
 
         self.all_queues = self.model_pipelines.get_queues()
         self.config = self.model_pipelines.get_monitor_config()
@@ -131,6 +136,9 @@ class ServerMonitor:
         self.user_max_daily_tasks = self.config["user_max_daily_tasks"]
         self.user_visit_frequency = self.config["user_visit_frequency"]
 
+        # per-request infer cost prediction from request shape, falls back to the rolling average
+        self.cost_predictor = build_cost_predictor(self.config.get("cost_model", {}))
+
         assert self.worker_avg_window > 0
         assert self.worker_offline_timeout > 0
         assert self.worker_min_capacity > 0
@@ -170,8 +178,9 @@ class ServerMonitor:
     @class_try_catch_async
     async def worker_update(self, queue, identity, status):
         worker = self.init_worker(queue, identity)
-        worker.update(status)
+        infer_cost = worker.update(status)
         logger.info(f"Worker {identity} {queue} update [{status}]")
+        return infer_cost
 
     @class_try_catch_async
     async def clean_workers(self):
@@ -201,8 +210,9 @@ class ServerMonitor:
                 continue
             elapse = time.time() - t["update_t"]
             logger.warning(f"Subtask {fmt_subtask(t)} CREATED / PENDING timeout: {elapse:.2f} s")
-            await self.task_manager.finish_subtasks(t["task_id"], TaskStatus.FAILED, worker_name=t["worker_name"], fail_msg=f"CREATED / PENDING timeout: {elapse:.2f} s")
+            ret = await self.task_manager.finish_subtasks(t["task_id"], TaskStatus.FAILED, worker_name=t["worker_name"], fail_msg=f"CREATED / PENDING timeout: {elapse:.2f} s")
             fails.add(t["task_id"])
+            await self.task_failed(t["task_id"], ret)
 
         running_tasks = await self.task_manager.list_tasks(status=TaskStatus.RUNNING, subtasks=True)
 
@@ -213,14 +223,26 @@ class ServerMonitor:
                 ping_elapse = time.time() - t["ping_t"]
                 if ping_elapse >= self.ping_timeout:
                     logger.warning(f"Subtask {fmt_subtask(t)} PING timeout: {ping_elapse:.2f} s")
-                    await self.task_manager.finish_subtasks(t["task_id"], TaskStatus.FAILED, worker_name=t["worker_name"], fail_msg=f"PING timeout: {ping_elapse:.2f} s")
+                    ret = await self.task_manager.finish_subtasks(t["task_id"], TaskStatus.FAILED, worker_name=t["worker_name"], fail_msg=f"PING timeout: {ping_elapse:.2f} s")
                     fails.add(t["task_id"])
+                    await self.task_failed(t["task_id"], ret)
             elapse = time.time() - t["update_t"]
             limit = self.subtask_run_timeouts[t["queue"]]
             if elapse >= limit:
                 logger.warning(f"Subtask {fmt_subtask(t)} RUNNING timeout: {elapse:.2f} s")
-                await self.task_manager.finish_subtasks(t["task_id"], TaskStatus.FAILED, worker_name=t["worker_name"], fail_msg=f"RUNNING timeout: {elapse:.2f} s")
+                ret = await self.task_manager.finish_subtasks(t["task_id"], TaskStatus.FAILED, worker_name=t["worker_name"], fail_msg=f"RUNNING timeout: {elapse:.2f} s")
                 fails.add(t["task_id"])
+                await self.task_failed(t["task_id"], ret)
+
+    async def task_failed(self, task_id, ret):
+        # the task is finished once a subtask fails, its active quota is released here as on a worker report
+        if ret == TaskStatus.FAILED:
+            task = await self.task_manager.query_task(task_id)
+            if task is not None:
+                await self.user_task_finished(task["user_id"], task_id)
+        await self.pending_costs_remove(task_id)
+        if self.on_task_failed is not None:
+            await self.on_task_failed(task_id)
 
     @class_try_catch_async
     async def get_avg_worker_infer_cost(self, queue):
@@ -234,6 +256,36 @@ class ServerMonitor:
             return self.subtask_run_timeouts[queue]
         return sum(infer_costs) / len(infer_costs)
 
+    @class_try_catch_async
+    async def observe_infer_cost(self, queue, params, cost):
+        if self.cost_predictor is not None:
+            self.cost_predictor.observe(queue, cost_features(params), cost)
+
+    @class_try_catch_async
+    async def predict_infer_cost(self, queue, params):
+        cost = None
+        if self.cost_predictor is not None and params is not None:
+            cost = self.cost_predictor.predict(queue, cost_features(params))
+        if cost is None:
+            return await self.get_avg_worker_infer_cost(queue)
+        return min(cost, self.subtask_run_timeouts[queue])
+
+    # predicted seconds of work queued in front of a new subtask
+    @class_try_catch_async
+    async def get_pending_cost(self, queue, pending_num):
+        costs = list(self.pending_costs.get(queue, {}).values())
+        return await self.sum_pending_cost(queue, costs, pending_num)
+
+    async def sum_pending_cost(self, queue, costs, pending_num):
+        if len(costs) > pending_num:
+            # subtasks that left the queue without being fetched (eg. cancelled)
+            return sum(costs) * pending_num / len(costs)
+        unknown = pending_num - len(costs)
+        total = sum(costs)
+        if unknown > 0:
+            total += unknown * await self.get_avg_worker_infer_cost(queue)
+        return total
+
     @class_try_catch_async
     async def check_user_busy(self, user_id, active_new_task=False):
         # check if user visit too frequently
@@ -259,23 +311,34 @@ class ServerMonitor:
 
         return True
 
+    # called once a task of the user is created or resumed, True if it fits in the user quota
+    @class_try_catch_async
+    async def user_task_started(self, user_id, task_id, enforce=True):
+        return True
+
+    # called once a task of the user reaches a finished status
+    @class_try_catch_async
+    async def user_task_finished(self, user_id, task_id):
+        pass
+
     # check if a task can be published to queues
     @class_try_catch_async
-    async def check_queue_busy(self, keys, queues):
+    async def check_queue_busy(self, keys, queues, params=None):
         wait_time = 0
 
         for queue in queues:
-            avg_cost = await self.get_avg_worker_infer_cost(queue)
+            cost = await self.predict_infer_cost(queue, params)
             worker_cnt = await self.get_ready_worker_count(queue)
             subtask_pending = await self.queue_manager.pending_num(queue)
-            capacity = self.task_timeout * max(worker_cnt, 1) // avg_cost
-            capacity = max(self.worker_min_capacity, capacity)
+            pending_cost = await self.get_pending_cost(queue, subtask_pending)
+            # the queued work, not the count of queued jobs, must finish within task_timeout
+            budget = self.task_timeout * max(worker_cnt, 1)
 
-            if subtask_pending >= capacity:
-                ss = f"pending={subtask_pending}, capacity={capacity}"
+            if subtask_pending >= self.worker_min_capacity and pending_cost + cost > budget:
+                ss = f"pending={subtask_pending}, pending_cost={pending_cost:.0f}s, cost={cost:.0f}s, budget={budget:.0f}s"
                 logger.warning(f"Queue {queue} busy, {ss}, task {keys} cannot be publised!")
                 return None
-            wait_time += avg_cost * subtask_pending / max(worker_cnt, 1)
+            wait_time += pending_cost / max(worker_cnt, 1)
         return wait_time
 
     @class_try_catch_async
@@ -300,13 +363,14 @@ class ServerMonitor:
         logger.info(f"Init pending subtasks: {self.pending_subtasks}")
 
     @class_try_catch_async
-    async def pending_subtasks_add(self, queue, task_id):
+    async def pending_subtasks_add(self, queue, task_id, params=None):
         if queue not in self.pending_subtasks:
             logger.warning(f"Queue {queue} not found in self.pending_subtasks")
             return
         max_count = self.pending_subtasks[queue]["max_count"]
         self.pending_subtasks[queue]["subtasks"][task_id] = max_count + 1
         self.pending_subtasks[queue]["max_count"] = max_count + 1
+        self.pending_costs.setdefault(queue, {})[task_id] = await self.predict_infer_cost(queue, params)
         # logger.warning(f"Pending subtasks {queue} add {task_id}: {self.pending_subtasks[queue]}")
 
     @class_try_catch_async
@@ -317,8 +381,15 @@ class ServerMonitor:
         self.pending_subtasks[queue]["consume_count"] += 1
         if task_id in self.pending_subtasks[queue]["subtasks"]:
             self.pending_subtasks[queue]["subtasks"].pop(task_id)
+        self.pending_costs.get(queue, {}).pop(task_id, None)
         # logger.warning(f"Pending subtasks {queue} sub {task_id}: {self.pending_subtasks[queue]}")
 
+    # pending subtasks leaving the queues unfetched (cancel, timeout) drop their predicted costs here
+    @class_try_catch_async
+    async def pending_costs_remove(self, task_id):
+        for costs in self.pending_costs.values():
+            costs.pop(task_id, None)
+
     @class_try_catch_async
     async def pending_subtasks_get_order(self, queue, task_id):
         if queue not in self.pending_subtasks:
@@ -340,7 +411,7 @@ class ServerMonitor:
         return len(self.worker_clients[queue])
 
     @class_try_catch_async
-    async def format_subtask(self, subtasks):
+    async def format_subtask(self, subtasks, params=None):
         ret = []
         for sub in subtasks:
             cur = {
@@ -354,15 +425,19 @@ class ServerMonitor:
                 "ready_worker_count": None,
             }
             if sub["status"] in [TaskStatus.PENDING, TaskStatus.RUNNING]:
-                cur["estimated_running_secs"] = await self.get_avg_worker_infer_cost(sub["queue"])
+                cur["estimated_running_secs"] = await self.predict_infer_cost(sub["queue"], params)
                 cur["ready_worker_count"] = await self.get_ready_worker_count(sub["queue"])
                 if sub["status"] == TaskStatus.PENDING:
                     order = await self.pending_subtasks_get_order(sub["queue"], sub["task_id"])
                     worker_count = max(cur["ready_worker_count"], 1e-7)
                     if order is not None:
                         cur["estimated_pending_order"] = order
+                        # subtasks ahead run at the mean predicted cost of the queued work
+                        pending_num = await self.queue_manager.pending_num(sub["queue"])
+                        pending_cost = await self.get_pending_cost(sub["queue"], pending_num)
+                        ahead_cost = pending_cost / pending_num if pending_num and pending_cost else cur["estimated_running_secs"]
                         wait_cycle = (order - 1) // worker_count + 1
-                        cur["estimated_pending_secs"] = cur["estimated_running_secs"] * wait_cycle
+                        cur["estimated_pending_secs"] = ahead_cost * wait_cycle
 
             if isinstance(sub["extra_info"], dict):
                 if "elapses" in sub["extra_info"]:
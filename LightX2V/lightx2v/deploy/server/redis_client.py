@@ -80,6 +80,78 @@ class RedisClient:
             end
             return tostring(sum / count)
         """
+        self.script_sliding_window = """
+            local key = KEYS[1]
+            local now = tonumber(ARGV[1])
+            local window = tonumber(ARGV[2])
+            local limit = tonumber(ARGV[3])
+            local member = ARGV[4]
+            redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+            if redis.call('ZCARD', key) >= limit then
+                local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+                return {0, tostring(oldest[2])}
+            end
+            redis.call('ZADD', key, now, member)
+            redis.call('PEXPIRE', key, math.ceil(window * 1000))
+            return {1, tostring(now)}
+        """
+        self.script_quota_acquire = """
+            local active_key = KEYS[1]
+            local daily_key = KEYS[2]
+            local users_key = KEYS[3]
+            local member = ARGV[1]
+            local now = tonumber(ARGV[2])
+            local max_active = tonumber(ARGV[3])
+            local max_daily = tonumber(ARGV[4])
+            local window = tonumber(ARGV[5])
+            local enforce = tonumber(ARGV[6])
+            local user_id = ARGV[7]
+            redis.call('ZREMRANGEBYSCORE', daily_key, '-inf', now - window)
+            if member ~= '' and redis.call('SISMEMBER', active_key, member) == 1 then
+                return {1, redis.call('SCARD', active_key)}
+            end
+            local active = redis.call('SCARD', active_key)
+            local daily = redis.call('ZCARD', daily_key)
+            if enforce == 1 and active >= max_active then
+                return {-1, active}
+            end
+            if enforce == 1 and daily >= max_daily then
+                return {-2, daily}
+            end
+            if member == '' then
+                return {1, active}
+            end
+            redis.call('SADD', active_key, member)
+            redis.call('SADD', users_key, user_id)
+            if redis.call('ZSCORE', daily_key, member) == false then
+                redis.call('ZADD', daily_key, now, member)
+            end
+            redis.call('EXPIRE', daily_key, math.ceil(window))
+            return {1, active + 1}
+        """
+        self.script_set_merge = """
+            local key = KEYS[1]
+            local num_add = tonumber(ARGV[1])
+            for i = 2, num_add + 1 do
+                redis.call('SADD', key, ARGV[i])
+            end
+            for i = num_add + 2, #ARGV do
+                redis.call('SREM', key, ARGV[i])
+            end
+            return redis.call('SCARD', key)
+        """
+        self.script_zset_merge = """
+            local key = KEYS[1]
+            local ttl = tonumber(ARGV[1])
+            for i = 2, #ARGV, 2 do
+                redis.call('ZADD', key, tonumber(ARGV[i + 1]), ARGV[i])
+            end
+            local count = redis.call('ZCARD', key)
+            if #ARGV > 1 then
+                redis.call('EXPIRE', key, ttl)
+            end
+            return count
+        """
 
     async def init(self):
         for i in range(self.retry_times):
@@ -182,6 +254,54 @@ class RedisClient:
         result = await script(keys=[key], args=[limit])
         return float(result)
 
+    @class_try_catch_async
+    async def list_range(self, key, limit):
+        key = self.fmt_key(key)
+        return await self.client.lrange(key, 0, limit - 1)
+
+    @class_try_catch_async
+    async def sliding_window_hit(self, key, now, window, limit, member):
+        # returns (allowed, oldest visit time in the window)
+        key = self.fmt_key(key)
+        script = self.client.register_script(self.script_sliding_window)
+        allowed, oldest = await script(keys=[key], args=[now, window, limit, member])
+        return int(allowed) == 1, float(oldest)
+
+    @class_try_catch_async
+    async def quota_acquire(self, active_key, daily_key, users_key, user_id, member, now, max_active, max_daily, window, enforce=True):
+        # add member to the active set and daily window if both are under limit, member "" only checks
+        # returns (code, count): 1 ok, -1 active limit reached, -2 daily limit reached
+        keys = [self.fmt_key(active_key), self.fmt_key(daily_key), self.fmt_key(users_key)]
+        script = self.client.register_script(self.script_quota_acquire)
+        code, count = await script(keys=keys, args=[member, now, max_active, max_daily, window, 1 if enforce else 0, user_id])
+        return int(code), int(count)
+
+    @class_try_catch_async
+    async def set_remove(self, key, member):
+        key = self.fmt_key(key)
+        return await self.client.srem(key, member)
+
+    @class_try_catch_async
+    async def set_members(self, key):
+        key = self.fmt_key(key)
+        return await self.client.smembers(key)
+
+    @class_try_catch_async
+    async def set_merge(self, key, adds, removes):
+        # add and remove members in one step, members added meanwhile by others are kept
+        key = self.fmt_key(key)
+        script = self.client.register_script(self.script_set_merge)
+        return await script(keys=[key], args=[len(adds), *adds, *removes])
+
+    @class_try_catch_async
+    async def zset_merge(self, key, items, ttl):
+        key = self.fmt_key(key)
+        script = self.client.register_script(self.script_zset_merge)
+        args = [ttl]
+        for member, score in items.items():
+            args.extend([member, score])
+        return await script(keys=[key], args=args)
+
     async def close(self):
         try:
             if self.client:
@@ -1,12 +1,15 @@
 import asyncio
 import json
 import time
+import uuid
 
 from loguru import logger
 
 from lightx2v.deploy.common.utils import class_try_catch_async
+from lightx2v.deploy.server.cost_model import cost_features
 from lightx2v.deploy.server.monitor import ServerMonitor, WorkerStatus
 from lightx2v.deploy.server.redis_client import RedisClient
+from lightx2v.deploy.task_manager import TaskStatus
 
 
 class RedisServerMonitor(ServerMonitor):
@@ -16,6 +19,14 @@ class RedisServerMonitor(ServerMonitor):
         self.redis_client = RedisClient(redis_url)
         self.last_correct = None
         self.correct_interval = 60 * 60 * 24
+        # cost samples are shared by all servers through redis, local predictors resync periodically
+        self.cost_sync_interval = self.config.get("cost_sync_interval", 30)
+        self.cost_synced_t = {}
+        # user visit windows and active / daily task counters live in redis, shared by all servers,
+        # and are rebuilt from the task store every quota_correct_interval seconds
+        self.user_visit_limit = self.config.get("user_visit_limit", 1)
+        self.quota_correct_interval = self.config.get("quota_correct_interval", 300)
+        self.last_quota_correct = None
 
     async def init(self):
         await self.redis_client.init()
@@ -28,6 +39,9 @@ class RedisServerMonitor(ServerMonitor):
             if self.last_correct is None or time.time() - self.last_correct > self.correct_interval:
                 self.last_correct = time.time()
                 await self.correct_pending_info()
+            if self.last_quota_correct is None or time.time() - self.last_quota_correct > self.quota_correct_interval:
+                self.last_quota_correct = time.time()
+                await self.correct_user_quotas()
             await self.clean_workers()
             await self.clean_subtasks()
             await asyncio.sleep(self.interval)
@@ -62,12 +76,17 @@ class RedisServerMonitor(ServerMonitor):
             if cur_cost < self.subtask_run_timeouts[queue]:
                 await self.redis_client.list_push(infer_key, max(cur_cost, 1), self.worker_avg_window)
                 logger.info(f"Worker {identity} {queue} avg infer cost update: {cur_cost:.2f} s")
+            else:
+                cur_cost = None
 
         elif status == WorkerStatus.FETCHED.name:
             worker["fetched_t"] = update_t
 
         await self.redis_client.hset(key, identity, json.dumps(worker))
         logger.info(f"Worker {identity} {queue} update [{status}]")
+        if status == WorkerStatus.REPORT.name and pre_fetched_t > 0 and cur_cost is not None:
+            return max(cur_cost, 1)
+        return None
 
     @class_try_catch_async
     async def clean_workers(self):
@@ -124,10 +143,110 @@ class RedisServerMonitor(ServerMonitor):
             return self.subtask_run_timeouts[queue]
         return infer_cost
 
+    def quota_keys(self, user_id):
+        return f"quota:{user_id}:active", f"quota:{user_id}:daily", "quota:users"
+
+    @class_try_catch_async
+    async def check_user_busy(self, user_id, active_new_task=False):
+        cur_t = time.time()
+        allowed, oldest_t = await self.redis_client.sliding_window_hit(f"quota:{user_id}:visits", cur_t, self.user_visit_frequency, self.user_visit_limit, f"{cur_t}-{uuid.uuid4().hex[:8]}")
+        if not allowed:
+            return f"User {user_id} visit too frequently, {cur_t - oldest_t:.2f} s vs {self.user_visit_frequency:.2f} s"
+
+        if active_new_task:
+            code, count = await self.redis_client.quota_acquire(*self.quota_keys(user_id), user_id, "", cur_t, self.user_max_active_tasks, self.user_max_daily_tasks, 86400)
+            if code == -1:
+                return f"User {user_id} has too many active tasks, {count} vs {self.user_max_active_tasks}"
+            if code == -2:
+                return f"User {user_id} has too many daily tasks, {count} vs {self.user_max_daily_tasks}"
+        return True
+
+    @class_try_catch_async
+    async def user_task_started(self, user_id, task_id, enforce=True):
+        code, count = await self.redis_client.quota_acquire(*self.quota_keys(user_id), user_id, task_id, time.time(), self.user_max_active_tasks, self.user_max_daily_tasks, 86400, enforce=enforce)
+        if code == -1:
+            return f"User {user_id} has too many active tasks, {count} vs {self.user_max_active_tasks}"
+        if code == -2:
+            return f"User {user_id} has too many daily tasks, {count} vs {self.user_max_daily_tasks}"
+        return True
+
+    @class_try_catch_async
+    async def user_task_finished(self, user_id, task_id):
+        await self.redis_client.set_remove(f"quota:{user_id}:active", task_id)
+
+    @class_try_catch_async
+    async def correct_user_quotas(self):
+        # one scan of the last day of tasks fixes counters missed by crashed servers,
+        # merged into the counters so tasks acquired while scanning are not lost
+        cur_t = time.time()
+        active_statuses = [TaskStatus.RUNNING, TaskStatus.PENDING, TaskStatus.CREATED]
+        statuses = active_statuses + [TaskStatus.SUCCEED, TaskStatus.CANCEL, TaskStatus.FAILED]
+        tasks = await self.task_manager.list_tasks(status=statuses, start_created_t=cur_t - 86400, include_delete=True)
+        actives, finisheds, dailies = {}, {}, {}
+        for task in tasks:
+            dailies.setdefault(task["user_id"], {})[task["task_id"]] = task["create_t"]
+            if task["status"] in active_statuses:
+                actives.setdefault(task["user_id"], set()).add(task["task_id"])
+            else:
+                finisheds.setdefault(task["user_id"], set()).add(task["task_id"])
+        # older active tasks (eg. long pending) are not in the daily scan
+        for task in await self.task_manager.list_tasks(status=active_statuses, end_created_t=cur_t - 86400):
+            actives.setdefault(task["user_id"], set()).add(task["task_id"])
+
+        users = set(x.decode() if isinstance(x, bytes) else x for x in await self.redis_client.set_members("quota:users") or [])
+        users |= set(dailies.keys()) | set(actives.keys())
+        idle_users = []
+        for user_id in users:
+            active_key, daily_key, _ = self.quota_keys(user_id)
+            user_actives, user_finisheds = actives.get(user_id, set()), finisheds.get(user_id, set())
+            # members older than the scan are looked up one by one, unknown ones may be submits in flight
+            members = set(x.decode() if isinstance(x, bytes) else x for x in await self.redis_client.set_members(active_key) or [])
+            for task_id in members - user_actives - user_finisheds:
+                task = await self.task_manager.query_task(task_id)
+                if task is not None and task["status"] not in active_statuses:
+                    user_finisheds.add(task_id)
+            active_count = await self.redis_client.set_merge(active_key, list(user_actives), list(user_finisheds))
+            daily_count = await self.redis_client.zset_merge(daily_key, dailies.get(user_id, {}), 86400)
+            if not active_count and not daily_count:
+                idle_users.append(user_id)
+        await self.redis_client.set_merge("quota:users", list(dailies.keys() | actives.keys()), idle_users)
+        logger.info(f"Corrected quotas of {len(users)} users, {sum(len(v) for v in actives.values())} active tasks")
+
+    @class_try_catch_async
+    async def observe_infer_cost(self, queue, params, cost):
+        if self.cost_predictor is None:
+            return
+        sample = {"features": cost_features(params), "cost": cost}
+        await self.redis_client.list_push(f"workers:{queue}:cost_samples", json.dumps(sample), self.cost_predictor.window)
+        self.cost_predictor.observe(queue, sample["features"], cost)
+
+    async def predict_infer_cost(self, queue, params):
+        if self.cost_predictor is not None and time.time() - self.cost_synced_t.get(queue, 0) > self.cost_sync_interval:
+            self.cost_synced_t[queue] = time.time()
+            samples = await self.redis_client.list_range(f"workers:{queue}:cost_samples", self.cost_predictor.window)
+            if samples is not None:
+                self.cost_predictor.load(queue, [json.loads(x) for x in reversed(samples)])
+        return await super().predict_infer_cost(queue, params)
+
+    async def get_pending_cost(self, queue, pending_num):
+        costs = await self.redis_client.hgetall(f"pendings:{queue}:costs")
+        costs = [float(v) for v in (costs or {}).values()]
+        return await self.sum_pending_cost(queue, costs, pending_num)
+
+    @class_try_catch_async
     async def correct_pending_info(self):
+        # costs are read before the pending subtasks, so a cost added meanwhile is never dropped
+        costs = {queue: await self.redis_client.hgetall(f"pendings:{queue}:costs") or {} for queue in self.all_queues}
+        pendings = await self.task_manager.list_tasks(status=TaskStatus.PENDING, subtasks=True)
         for queue in self.all_queues:
             pending_num = await self.queue_manager.pending_num(queue)
             await self.redis_client.correct_pending_info(f"pendings:{queue}:info", pending_num)
+            # costs left behind by subtasks no longer pending, e.g. by a crashed server
+            pending_ids = {t["task_id"] for t in pendings or [] if t["queue"] == queue}
+            for task_id in costs[queue]:
+                task_id = task_id.decode() if isinstance(task_id, bytes) else task_id
+                if task_id not in pending_ids:
+                    await self.redis_client.hdel(f"pendings:{queue}:costs", task_id)
 
     @class_try_catch_async
     async def init_pending_subtasks(self):
@@ -142,17 +261,24 @@ class RedisServerMonitor(ServerMonitor):
         logger.info(f"Inited pending subtasks to redis")
 
     @class_try_catch_async
-    async def pending_subtasks_add(self, queue, task_id):
+    async def pending_subtasks_add(self, queue, task_id, params=None):
         max_count = await self.redis_client.increment_and_get(f"pendings:{queue}:info", "max_count", 1)
         await self.redis_client.set(f"pendings:{queue}:subtasks:{task_id}", max_count)
+        await self.redis_client.hset(f"pendings:{queue}:costs", task_id, await self.predict_infer_cost(queue, params))
         # logger.warning(f"Redis pending subtasks {queue} add {task_id}: {max_count}")
 
     @class_try_catch_async
     async def pending_subtasks_sub(self, queue, task_id):
         consume_count = await self.redis_client.increment_and_get(f"pendings:{queue}:info", "consume_count", 1)
         await self.redis_client.delete_key(f"pendings:{queue}:subtasks:{task_id}")
+        await self.redis_client.hdel(f"pendings:{queue}:costs", task_id)
         # logger.warning(f"Redis pending subtasks {queue} sub {task_id}: {consume_count}")
 
+    @class_try_catch_async
+    async def pending_costs_remove(self, task_id):
+        for queue in self.all_queues:
+            await self.redis_client.hdel(f"pendings:{queue}:costs", task_id)
+
     @class_try_catch_async
     async def pending_subtasks_get_order(self, queue, task_id):
         order = await self.redis_client.get(f"pendings:{queue}:subtasks:{task_id}")
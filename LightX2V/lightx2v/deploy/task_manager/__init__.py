@@ -51,6 +51,9 @@ class BaseTaskManager:
     async def run_subtasks(self, subtasks, worker_identity):
         raise NotImplementedError
 
+    async def claim_subtasks(self, queue, worker_identity, max_batch=1):
+        raise NotImplementedError
+
     async def ping_subtask(self, task_id, worker_name, worker_identity):
         raise NotImplementedError
 
@@ -66,6 +69,18 @@ class BaseTaskManager:
     async def delete_task(self, task_id, user_id=None):
         raise NotImplementedError
 
+    async def share_subtask(self, task_id, worker_name, outputs, shared_from):
+        raise NotImplementedError
+
+    async def hold_subtask(self, task_id, worker_name, held_by):
+        raise NotImplementedError
+
+    async def cache_subtask(self, task_id, worker_name, cache_key):
+        raise NotImplementedError
+
+    async def list_cache_subtasks(self, cache_key):
+        raise NotImplementedError
+
     async def insert_share(self, share_info):
         raise NotImplementedError
 
@@ -114,6 +129,46 @@ class BaseTaskManager:
                         subtask["inputs"][f] = task["inputs"][f]
                         logger.info(f"Align extra input: {f} for subtask {subtask['task_id']} {subtask['worker_name']}")
 
+    def mark_subtask_shared(self, records, subtasks, worker_name, outputs, shared_from):
+        # point the subtask and its consumers to the outputs produced by another task
+        target = None
+        for sub in subtasks:
+            if sub["worker_name"] == worker_name:
+                target = sub
+        if target is None or target["status"] not in [TaskStatus.CREATED, TaskStatus.PENDING]:
+            return None
+        remap = {target["outputs"][x]: outputs[x] for x in target["outputs"] if x in outputs}
+        target["outputs"] = {x: remap.get(v, v) for x, v in target["outputs"].items()}
+        changed = [target]
+        for sub in subtasks:
+            if sub is not target and any(v in remap for v in sub["inputs"].values()):
+                sub["inputs"] = {x: remap.get(v, v) for x, v in sub["inputs"].items()}
+                changed.append(sub)
+        self.mark_subtask_change(records, target, target["status"], TaskStatus.SUCCEED)
+        target["status"] = TaskStatus.SUCCEED
+        target["extra_info"]["shared_from"] = shared_from
+        target["update_t"] = current_time()
+        return changed
+
+    def mark_subtask_held(self, subtasks, worker_name, held_by):
+        # record (or clear with None) the shared encoder a pending subtask waits for
+        for sub in subtasks:
+            if sub["worker_name"] == worker_name and sub["status"] == TaskStatus.PENDING:
+                if held_by is None:
+                    sub["extra_info"].pop("held_by", None)
+                else:
+                    sub["extra_info"]["held_by"] = held_by
+                return sub
+        return None
+
+    def mark_subtask_cached(self, subtasks, worker_name, cache_key):
+        # record the shared encoder entry whose outputs the subtask produces or uses
+        for sub in subtasks:
+            if sub["worker_name"] == worker_name:
+                sub["extra_info"]["cache_key"] = cache_key
+                return sub
+        return None
+
     async def create_share(self, task_id, user_id, share_type, valid_days, auth_type, auth_value):
         assert share_type in ["task", "template"], f"do not support {share_type} share type!"
         assert auth_type in ["public", "login", "user_id"], f"do not support {auth_type} auth type!"
@@ -157,10 +212,10 @@ class BaseTaskManager:
         assert await self.insert_user_if_not_exists(data), f"create user {data} failed"
         return user_id
 
-    async def create_task(self, worker_keys, workers, params, inputs, outputs, user_id):
+    async def create_task(self, worker_keys, workers, params, inputs, outputs, user_id, task_id=None):
         task_type, model_cls, stage = worker_keys
         cur_t = current_time()
-        task_id = str(uuid.uuid4())
+        task_id = task_id or str(uuid.uuid4())
         extra_inputs = []
         for fs in params.get("extra_inputs", {}).values():
             extra_inputs.extend(fs)
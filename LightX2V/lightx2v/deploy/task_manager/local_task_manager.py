@@ -295,6 +295,52 @@ class LocalTaskManager(BaseTaskManager):
         self.metrics_commit(records)
         return True
 
+    @class_try_catch_async
+    async def share_subtask(self, task_id, worker_name, outputs, shared_from):
+        records = []
+        task, subtasks = self.load(task_id)
+        if task["status"] not in ActiveStatus:
+            return False
+        if self.mark_subtask_shared(records, subtasks, worker_name, outputs, shared_from) is None:
+            return False
+        task["update_t"] = current_time()
+        self.save(task, subtasks)
+        self.metrics_commit(records)
+        return True
+
+    @class_try_catch_async
+    async def hold_subtask(self, task_id, worker_name, held_by):
+        task, subtasks = self.load(task_id)
+        if self.mark_subtask_held(subtasks, worker_name, held_by) is None:
+            return False
+        self.save(task, subtasks)
+        return True
+
+    @class_try_catch_async
+    async def cache_subtask(self, task_id, worker_name, cache_key):
+        task, subtasks = self.load(task_id)
+        if self.mark_subtask_cached(subtasks, worker_name, cache_key) is None:
+            return False
+        self.save(task, subtasks)
+        return True
+
+    @class_try_catch_async
+    async def list_cache_subtasks(self, cache_key):
+        subs = []
+        for f in os.listdir(self.local_dir):
+            if not f.startswith("task_"):
+                continue
+            info = json.load(open(os.path.join(self.local_dir, f)))
+            task = info["task"]
+            self.parse_dict(task)
+            if task["status"] not in ActiveStatus or task.get("tag", "") == "delete":
+                continue
+            for sub in info["subtasks"]:
+                if isinstance(sub["extra_info"], dict) and sub["extra_info"].get("cache_key") == cache_key:
+                    self.parse_dict(sub)
+                    subs.append(sub)
+        return subs
+
     @class_try_catch_async
     async def resume_task(self, task_id, all_subtask=False, user_id=None):
         records = []
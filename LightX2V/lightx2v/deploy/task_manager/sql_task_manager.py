@@ -6,7 +6,7 @@ from datetime import datetime
 import asyncpg
 from loguru import logger
 
-from lightx2v.deploy.common.utils import class_try_catch_async
+from lightx2v.deploy.common.utils import class_try_catch_async, current_time
 from lightx2v.deploy.task_manager import ActiveStatus, BaseTaskManager, FinishedStatus, TaskStatus
 
 
@@ -77,6 +77,8 @@ class PostgresSQLTaskManager(BaseTaskManager):
             (2, "Add shares table", self.upgrade_v2),
             (3, "Add podcasts table", self.upgrade_v3),
             (4, "Add voice clones table", self.upgrade_v4),
+            (5, "Add subtask claim index", self.upgrade_v5),
+            (6, "Add subtask cache key index", self.upgrade_v6),
         ]
         logger.info(f"upgrade_db: {self.db_url}")
         cur_ver = await self.query_version()
@@ -269,6 +271,36 @@ class PostgresSQLTaskManager(BaseTaskManager):
         finally:
             await self.release_conn(conn)
 
+    async def upgrade_v5(self, version, description):
+        conn = await self.get_conn()
+        try:
+            async with conn.transaction(isolation="read_uncommitted"):
+                # ready subtasks of a queue in pending order, used by claim_subtasks
+                await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_subtasks}_claim ON {self.table_subtasks}(queue, status, update_t)")
+                # update version
+                await conn.execute(f"INSERT INTO {self.table_versions} (version, description, create_t) VALUES ($1, $2, $3)", version, description, datetime.now())
+                return True
+        except:  # noqa
+            logger.error(f"upgrade_v5 error: {traceback.format_exc()}")
+            return False
+        finally:
+            await self.release_conn(conn)
+
+    async def upgrade_v6(self, version, description):
+        conn = await self.get_conn()
+        try:
+            async with conn.transaction(isolation="read_uncommitted"):
+                # subtasks sharing an encoder entry, used by list_cache_subtasks
+                await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table_subtasks}_cache_key ON {self.table_subtasks}((extra_info ->> 'cache_key'))")
+                # update version
+                await conn.execute(f"INSERT INTO {self.table_versions} (version, description, create_t) VALUES ($1, $2, $3)", version, description, datetime.now())
+                return True
+        except:  # noqa
+            logger.error(f"upgrade_v6 error: {traceback.format_exc()}")
+            return False
+        finally:
+            await self.release_conn(conn)
+
     async def load(self, conn, task_id, user_id=None, only_task=False, worker_name=None):
         query = f"SELECT * FROM {self.table_tasks} WHERE task_id = $1 AND tag != 'delete'"
         params = [task_id]
@@ -363,6 +395,14 @@ class PostgresSQLTaskManager(BaseTaskManager):
             param_idx += 1
             conds.append(f"extra_info = ${param_idx}")
             params.append(json.dumps(kwargs["extra_info"], ensure_ascii=False))
+        if "inputs" in kwargs:
+            param_idx += 1
+            conds.append(f"inputs = ${param_idx}")
+            params.append(json.dumps(kwargs["inputs"], ensure_ascii=False))
+        if "outputs" in kwargs:
+            param_idx += 1
+            conds.append(f"outputs = ${param_idx}")
+            params.append(json.dumps(kwargs["outputs"], ensure_ascii=False))
 
         limit_conds = [f"task_id = ${param_idx + 1}", f"worker_name = ${param_idx + 2}"]
         param_idx += 2
@@ -610,43 +650,107 @@ class PostgresSQLTaskManager(BaseTaskManager):
         finally:
             await self.release_conn(conn)
 
+    async def claim(self, conn, worker_identity, records, cond, params, limit):
+        """Claim up to `limit` PENDING subtasks matching `cond` in one statement and return them with their task params.
+
+        The rows are locked with FOR UPDATE SKIP LOCKED, so concurrent claimers skip
+        each other's rows instead of waiting on them and never claim the same subtask.
+        The same statement marks the subtasks and their tasks RUNNING and records the
+        PENDING-RUNNING elapse in extra_info, the way mark_subtask_change does.
+        """
+        n = len(params)
+        t = current_time()
+        now = datetime.fromtimestamp(t)
+        elapse_key = f"{TaskStatus.PENDING.name}-{TaskStatus.RUNNING.name}"
+        query = f"""
+            WITH picked AS (
+                SELECT s.task_id, s.worker_name,
+                    CASE WHEN jsonb_typeof(s.extra_info) = 'object' THEN s.extra_info ELSE '{{}}'::jsonb END AS old_extra_info
+                FROM {self.table_subtasks} s JOIN {self.table_tasks} t ON s.task_id = t.task_id
+                WHERE s.status = '{TaskStatus.PENDING.name}' AND t.tag != 'delete' AND NOT (t.status = ANY(${n + 1}::varchar[])) AND {cond}
+                ORDER BY s.update_t
+                LIMIT ${n + 2}
+                FOR UPDATE OF s SKIP LOCKED
+            ), claimed AS (
+                UPDATE {self.table_subtasks} s
+                SET status = ${n + 3}, worker_identity = ${n + 4}, ping_t = ${n + 5}, update_t = ${n + 5},
+                    extra_info = (p.old_extra_info - 'fail_msg' - 'start_t')
+                        || jsonb_build_object('start_t', ${n + 6}::float8)
+                        || CASE WHEN p.old_extra_info ? 'start_t' THEN jsonb_build_object(
+                            'elapses',
+                            COALESCE(p.old_extra_info -> 'elapses', '{{}}'::jsonb)
+                                || jsonb_build_object('{elapse_key}', ${n + 6}::float8 - (p.old_extra_info ->> 'start_t')::float8)
+                        ) ELSE '{{}}'::jsonb END
+                FROM picked p
+                WHERE s.task_id = p.task_id AND s.worker_name = p.worker_name
+                RETURNING s.*, p.old_extra_info
+            ), running AS (
+                UPDATE {self.table_tasks} SET status = ${n + 3}, update_t = ${n + 5}
+                WHERE task_id IN (SELECT task_id FROM claimed)
+            )
+            SELECT c.*, t.params AS task_params, t.inputs AS task_inputs
+            FROM claimed c JOIN {self.table_tasks} t ON c.task_id = t.task_id
+        """
+        finished = [s.name for s in FinishedStatus]
+        rows = await conn.fetch(query, *params, finished, limit, TaskStatus.RUNNING.name, worker_identity, now, t)
+
+        subs = []
+        for row in rows:
+            sub = dict(row)
+            task = {"task_id": sub["task_id"], "params": json.loads(sub.pop("task_params")), "inputs": json.loads(sub.pop("task_inputs"))}
+            old_extra_info = json.loads(sub.pop("old_extra_info"))
+            self.parse_dict(sub)
+            # the elapse is already stored, replay the change on the old extra_info for logs and metrics
+            extra_info, sub["extra_info"] = sub["extra_info"], old_extra_info
+            self.mark_subtask_change(records, sub, TaskStatus.PENDING, TaskStatus.RUNNING)
+            sub["extra_info"] = extra_info
+            sub["params"] = task["params"]
+            self.align_extra_inputs(task, sub)
+            subs.append(sub)
+        return subs
+
     @class_try_catch_async
     async def run_subtasks(self, cands, worker_identity):
         conn = await self.get_conn()
         records = []
         try:
             async with conn.transaction(isolation="read_uncommitted"):
-                valids = []
-                for cand in cands:
-                    task_id = cand["task_id"]
-                    worker_name = cand["worker_name"]
-                    task, subs = await self.load(conn, task_id, worker_name=worker_name)
-                    assert len(subs) == 1, f"task {task_id} has multiple subtasks: {subs} with worker_name: {worker_name}"
-                    if task["status"] in [TaskStatus.SUCCEED, TaskStatus.FAILED, TaskStatus.CANCEL]:
-                        continue
-
-                    self.mark_subtask_change(records, subs[0], subs[0]["status"], TaskStatus.RUNNING)
-                    await self.update_subtask(
-                        conn,
-                        task_id,
-                        worker_name,
-                        status=TaskStatus.RUNNING,
-                        worker_identity=worker_identity,
-                        ping_t=True,
-                        extra_info=subs[0]["extra_info"],
-                        src_status=subs[0]["status"],
-                    )
-                    await self.update_task(conn, task_id, status=TaskStatus.RUNNING)
-                    valids.append(cand)
-                    break
-                self.metrics_commit(records)
-                return valids
+                task_ids = [cand["task_id"] for cand in cands]
+                worker_names = [cand["worker_name"] for cand in cands]
+                cond = "(s.task_id, s.worker_name) IN (SELECT * FROM unnest($1::varchar[], $2::varchar[]))"
+                subs = await self.claim(conn, worker_identity, records, cond, [task_ids, worker_names], len(cands))
+            self.metrics_commit(records)
+            # hand out the claimed rows rather than the queued messages, their params and inputs are current
+            claimed = {(sub["task_id"], sub["worker_name"]): sub for sub in subs}
+            keys = ["queue", "task_id", "worker_name", "inputs", "outputs", "params"]
+            valids = []
+            for cand in cands:
+                sub = claimed.get((cand["task_id"], cand["worker_name"]))
+                if sub is not None:
+                    valids.append({k: sub[k] for k in keys})
+            return valids
         except:  # noqa
             logger.error(f"run_subtasks error: {traceback.format_exc()}")
             return []
         finally:
             await self.release_conn(conn)
 
+    @class_try_catch_async
+    async def claim_subtasks(self, queue, worker_identity, max_batch=1):
+        """Claim up to `max_batch` ready subtasks of `queue` in pending order, with their task params."""
+        conn = await self.get_conn()
+        records = []
+        try:
+            async with conn.transaction(isolation="read_uncommitted"):
+                subs = await self.claim(conn, worker_identity, records, "s.queue = $1", [queue], max_batch)
+            self.metrics_commit(records)
+            return subs
+        except:  # noqa
+            logger.error(f"claim_subtasks error: {traceback.format_exc()}")
+            return []
+        finally:
+            await self.release_conn(conn)
+
     @class_try_catch_async
     async def ping_subtask(self, task_id, worker_name, worker_identity):
         conn = await self.get_conn()
@@ -796,6 +900,91 @@ class PostgresSQLTaskManager(BaseTaskManager):
         finally:
             await self.release_conn(conn)
 
+    @class_try_catch_async
+    async def share_subtask(self, task_id, worker_name, outputs, shared_from):
+        conn = await self.get_conn()
+        records = []
+        try:
+            async with conn.transaction(isolation="read_uncommitted"):
+                task, subtasks = await self.load(conn, task_id)
+                if task["status"] not in ActiveStatus:
+                    return False
+                src_status = {sub["worker_name"]: sub["status"] for sub in subtasks}
+                changed = self.mark_subtask_shared(records, subtasks, worker_name, outputs, shared_from)
+                if changed is None:
+                    return False
+                for sub in changed:
+                    await self.update_subtask(
+                        conn,
+                        task_id,
+                        sub["worker_name"],
+                        status=sub["status"],
+                        inputs=sub["inputs"],
+                        outputs=sub["outputs"],
+                        extra_info=sub["extra_info"],
+                        src_status=src_status[sub["worker_name"]],
+                    )
+                await self.update_task(conn, task_id)
+                self.metrics_commit(records)
+                return True
+        except:  # noqa
+            logger.error(f"share_subtask error: {traceback.format_exc()}")
+            return False
+        finally:
+            await self.release_conn(conn)
+
+    @class_try_catch_async
+    async def hold_subtask(self, task_id, worker_name, held_by):
+        conn = await self.get_conn()
+        try:
+            async with conn.transaction(isolation="read_uncommitted"):
+                task, subtasks = await self.load(conn, task_id)
+                sub = self.mark_subtask_held(subtasks, worker_name, held_by)
+                if sub is None:
+                    return False
+                await self.update_subtask(conn, task_id, worker_name, extra_info=sub["extra_info"], src_status=TaskStatus.PENDING, update_t=False)
+                return True
+        except:  # noqa
+            logger.error(f"hold_subtask error: {traceback.format_exc()}")
+            return False
+        finally:
+            await self.release_conn(conn)
+
+    @class_try_catch_async
+    async def cache_subtask(self, task_id, worker_name, cache_key):
+        conn = await self.get_conn()
+        try:
+            async with conn.transaction(isolation="read_uncommitted"):
+                task, subtasks = await self.load(conn, task_id, worker_name=worker_name)
+                sub = self.mark_subtask_cached(subtasks, worker_name, cache_key)
+                if sub is None:
+                    return False
+                await self.update_subtask(conn, task_id, worker_name, extra_info=sub["extra_info"], update_t=False)
+                return True
+        except:  # noqa
+            logger.error(f"cache_subtask error: {traceback.format_exc()}")
+            return False
+        finally:
+            await self.release_conn(conn)
+
+    @class_try_catch_async
+    async def list_cache_subtasks(self, cache_key):
+        conn = await self.get_conn()
+        try:
+            query = f"""
+                SELECT s.* FROM {self.table_subtasks} s JOIN {self.table_tasks} t ON s.task_id = t.task_id
+                WHERE s.extra_info ->> 'cache_key' = $1 AND t.status = ANY($2::varchar[]) AND t.tag != 'delete'
+            """
+            rows = await conn.fetch(query, cache_key, [x.name for x in ActiveStatus])
+            subs = []
+            for row in rows:
+                sub = dict(row)
+                self.parse_dict(sub)
+                subs.append(sub)
+            return subs
+        finally:
+            await self.release_conn(conn)
+
     @class_try_catch_async
     async def resume_task(self, task_id, all_subtask=False, user_id=None):
         conn = await self.get_conn()
@@ -1231,6 +1420,8 @@ async def test():
     print(" - next_subtasks:", subtasks)
 
     await m.run_subtasks(subtasks, "fake-worker")
+    claimed = await m.claim_subtasks(subtasks[0]["queue"], "fake-worker-2", max_batch=8) if subtasks else []
+    print(" - claim_subtasks (already running, expect none):", claimed)
     await m.finish_subtasks(task_id, TaskStatus.FAILED)
     await m.cancel_task(task_id)
     await m.resume_task(task_id)
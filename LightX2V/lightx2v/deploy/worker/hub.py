@@ -247,14 +247,14 @@ class BaseWorker:
     async def save_output_video(self, tmp_video_path, output_video_path, data_manager):
         # save output video
         if data_manager.name != "local" and self.rank == self.out_video_rank and isinstance(tmp_video_path, str):
-            video_data = open(tmp_video_path, "rb").read()
-            await data_manager.save_bytes(video_data, output_video_path)
+            with open(tmp_video_path, "rb") as fin:
+                await data_manager.save_stream(fin, output_video_path)
 
     async def save_output_image(self, tmp_image_path, output_image_path, data_manager):
         # save output image
         if data_manager.name != "local" and self.rank == self.out_video_rank and isinstance(tmp_image_path, str):
-            image_data = open(tmp_image_path, "rb").read()
-            await data_manager.save_bytes(image_data, output_image_path)
+            with open(tmp_image_path, "rb") as fin:
+                await data_manager.save_stream(fin, output_image_path)
 
     def is_audio_model(self):
         return "audio" in self.runner.config["model_cls"] or "seko_talk" in self.runner.config["model_cls"]
@@ -1,4 +1,6 @@
 import argparse
+import copy
+import json
 import os
 
 import torch
@@ -120,6 +122,13 @@ def main():
     )
     parser.add_argument("--save_result_path", type=str, default=None, help="The path to save video path/file")
     parser.add_argument("--return_result_tensor", action="store_true", help="Whether to return result tensor. (Useful for comfyui)")
+    parser.add_argument(
+        "--request_list",
+        type=str,
+        default=None,
+        help="A json file with a list of per-request overrides (prompt, image_path, seed, save_result_path, ...), run back to back with pipelined encode / DiT / save.",
+    )
+    parser.add_argument("--pipeline_compare", action="store_true", help="Also run the request list sequentially and report the videos/hour of both modes.")
     args = parser.parse_args()
     validate_task_arguments(args)
 
@@ -137,8 +146,19 @@ def main():
 
     with ProfilingContext4DebugL1("Total Cost"):
         runner = init_runner(config)
-        input_info = set_input_info(args)
-        runner.run_pipeline(input_info)
+        if args.request_list is not None:
+            with open(args.request_list, "r") as f:
+                requests = json.load(f)
+            input_infos = []
+            for request in requests:
+                request_args = copy.copy(args)
+                for k, v in request.items():
+                    setattr(request_args, k, v)
+                input_infos.append(set_input_info(request_args))
+            runner.run_pipeline_requests(input_infos, compare_sequential=args.pipeline_compare)
+        else:
+            input_info = set_input_info(args)
+            runner.run_pipeline(input_info)
 
     # Clean up distributed process group
     if dist.is_initialized():
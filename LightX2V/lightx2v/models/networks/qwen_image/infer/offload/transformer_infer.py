@@ -102,6 +102,9 @@ class QwenImageOffloadTransformerInfer(QwenImageTransformerInfer):
                         )
                 self.offload_manager.swap_phases()
 
+        if self.lazy_load:
+            self.offload_manager.report_lazy_load_stats("qwen_image_dit_step")
+
         return hidden_states
 
     def infer_with_blocks_offload(
@@ -141,4 +144,7 @@ class QwenImageOffloadTransformerInfer(QwenImageTransformerInfer):
 
             self.offload_manager.swap_blocks()
 
+        if self.lazy_load:
+            self.offload_manager.report_lazy_load_stats("qwen_image_dit_step")
+
         return hidden_states
@@ -42,12 +42,37 @@ class WanTransformerInferTeaCaching(WanTransformerInferCaching):
             self.coefficients = self.config["coefficients"][1]
             self.ret_steps = 1
             self.cutoff_steps = self.config["infer_steps"] - 1
+        # calibration args, see lightx2v.utils.feature_cache_calibration
+        self.calibrating = config.get("teacache_calibration", False)
+        self.calibration_records = {True: {"input": [], "output": []}, False: {"input": [], "output": []}}
+
+    @staticmethod
+    def rel_l1(cur, prev):
+        prev = prev.to(AI_DEVICE)
+        return ((cur - prev).abs().mean() / prev.abs().mean()).cpu().item()
+
+    @torch.no_grad()
+    def record_input_delta(self, modulated_inp):
+        # always compute during calibration, only record the modulated input distance
+        infer_condition = self.scheduler.infer_condition
+        previous_e0 = self.previous_e0_even if infer_condition else self.previous_e0_odd
+        self.calibration_records[infer_condition]["input"].append(None if previous_e0 is None else self.rel_l1(modulated_inp, previous_e0))
+        previous_e0 = modulated_inp.clone()
+        if self.config["cpu_offload"]:
+            previous_e0 = previous_e0.cpu()
+        if infer_condition:
+            self.previous_e0_even = previous_e0
+        else:
+            self.previous_e0_odd = previous_e0
+        return True
 
     # calculate should_calc
     @torch.no_grad()
     def calculate_should_calc(self, embed, embed0):
         # 1. timestep embedding
         modulated_inp = embed0 if self.use_ret_steps else embed
+        if self.calibrating:
+            return self.record_input_delta(modulated_inp)
 
         # 2. L1 calculate
         should_calc = False
@@ -134,6 +159,9 @@ class WanTransformerInferTeaCaching(WanTransformerInferCaching):
         ori_x = pre_infer_out.x.clone()
 
         x = super().infer_main_blocks(weights, pre_infer_out)
+        if self.calibrating:
+            previous_residual = self.previous_residual_even if self.scheduler.infer_condition else self.previous_residual_odd
+            self.calibration_records[self.scheduler.infer_condition]["output"].append(None if previous_residual is None else self.rel_l1(x - ori_x, previous_residual))
         if self.scheduler.infer_condition:
             self.previous_residual_even = x - ori_x
             if self.config["cpu_offload"]:
@@ -999,6 +1027,7 @@ class WanTransformerInferMagCaching(WanTransformerInferCaching):
         self.K = config["magcache_K"]
         self.retention_ratio = config["magcache_retention_ratio"]
         self.mag_ratios = np.array(config["magcache_ratios"])
+        self.calibrating = config["magcache_calibration"]
         # {True: cond_param, False: uncond_param}
         self.accumulated_err = {True: 0.0, False: 0.0}
         self.accumulated_steps = {True: 0, False: 0}
@@ -1014,7 +1043,7 @@ class WanTransformerInferMagCaching(WanTransformerInferCaching):
         step_index = self.scheduler.step_index
         infer_condition = self.scheduler.infer_condition
 
-        if self.config["magcache_calibration"]:
+        if self.calibrating:
             skip_forward = False
         else:
             if step_index >= int(self.config["infer_steps"] * self.retention_ratio):
@@ -1057,7 +1086,7 @@ class WanTransformerInferMagCaching(WanTransformerInferCaching):
         if self.config["cpu_offload"]:
             previous_residual = previous_residual.cpu()
 
-        if self.config["magcache_calibration"] and step_index >= 1:
+        if self.calibrating and step_index >= 1:
             norm_ratio = ((previous_residual.norm(dim=-1) / self.residual_cache[infer_condition].norm(dim=-1)).mean()).item()
             norm_std = (previous_residual.norm(dim=-1) / self.residual_cache[infer_condition].norm(dim=-1)).std().item()
             cos_dis = (1 - F.cosine_similarity(previous_residual, self.residual_cache[infer_condition], dim=-1, eps=1e-8)).mean().item()
@@ -1086,7 +1115,7 @@ class WanTransformerInferMagCaching(WanTransformerInferCaching):
         self.accumulated_steps = {True: 0, False: 0}
         self.accumulated_ratio = {True: 1.0, False: 1.0}
         self.residual_cache = {True: None, False: None}
-        if self.config["magcache_calibration"]:
+        if self.calibrating:
             print("norm ratio")
             print(self.norm_ratio)
             print("norm std")
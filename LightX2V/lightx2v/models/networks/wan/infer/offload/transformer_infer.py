@@ -76,6 +76,9 @@ class WanOffloadTransformerInfer(WanTransformerInfer):
         if self.clean_cuda_cache:
             self.clear_offload_params(pre_infer_out)
 
+        if self.lazy_load:
+            self.offload_manager.report_lazy_load_stats("wan_dit_step")
+
         return x
 
     def infer_phases(self, block_idx, blocks, x, pre_infer_out):
@@ -30,6 +30,7 @@ from lightx2v.models.networks.wan.weights.pre_weights import WanPreWeights
 from lightx2v.models.networks.wan.weights.transformer_weights import (
     WanTransformerWeights,
 )
+from lightx2v.utils.ckpt_cache import resolve_quantized_ckpt
 from lightx2v.utils.custom_compiler import CompiledMethodsMixin, compiled_method
 from lightx2v.utils.envs import *
 from lightx2v.utils.ggml_tensor import load_gguf_sd_ckpt
@@ -40,9 +41,11 @@ class WanModel(CompiledMethodsMixin):
     pre_weight_class = WanPreWeights
     transformer_weight_class = WanTransformerWeights
 
-    def __init__(self, model_path, config, device, model_type="wan2.1"):
+    def __init__(self, model_path, config, device, model_type="wan2.1", ckpt_path=None):
         super().__init__()
         self.model_path = model_path
+        # checkpoint with LoRAs already merged or a cached quantized conversion, overrides the configured ckpt paths
+        self.ckpt_path = ckpt_path
         self.config = config
         self.cpu_offload = self.config.get("cpu_offload", False)
         self.offload_granularity = self.config.get("offload_granularity", "block")
@@ -92,6 +95,8 @@ class WanModel(CompiledMethodsMixin):
                 "gguf-Q3_K_M",
                 "int8-npu",
             ]
+            if self.ckpt_path is None:
+                self.ckpt_path = resolve_quantized_ckpt(self.config, model_path)
         self.device = device
         self._init_infer_class()
         self._init_weights()
@@ -138,6 +143,8 @@ class WanModel(CompiledMethodsMixin):
         return False
 
     def _should_init_empty_model(self):
+        if self.ckpt_path is not None:
+            return False
         if self.config.get("lora_configs") and self.config["lora_configs"]:
             if self.model_type in ["wan2.1"]:
                 return True
@@ -167,7 +174,9 @@ class WanModel(CompiledMethodsMixin):
             }
 
     def _load_ckpt(self, unified_dtype, sensitive_layer):
-        if self.config.get("dit_original_ckpt", None):
+        if self.ckpt_path is not None:
+            safetensors_path = self.ckpt_path
+        elif self.config.get("dit_original_ckpt", None):
             safetensors_path = self.config["dit_original_ckpt"]
         else:
             safetensors_path = self.model_path
@@ -200,7 +209,9 @@ class WanModel(CompiledMethodsMixin):
 
     def _load_quant_ckpt(self, unified_dtype, sensitive_layer):
         remove_keys = self.remove_keys if hasattr(self, "remove_keys") else []
-        if self.config.get("dit_quantized_ckpt", None):
+        if self.ckpt_path is not None:
+            safetensors_path = self.ckpt_path
+        elif self.config.get("dit_quantized_ckpt", None):
             safetensors_path = self.config["dit_quantized_ckpt"]
         else:
             safetensors_path = self.model_path
@@ -146,6 +146,9 @@ class BaseRunner(ABC):
         stopped, paused = 0, 0
         if rank == stop_rank and hasattr(self, "stop_signal") and self.stop_signal:
             stopped = 1
+        # cooperative cancellation from the hosting process, set from another thread or process
+        if rank == stop_rank and getattr(self, "stop_event", None) is not None and self.stop_event.is_set():
+            stopped = 1
         if rank == pause_rank and hasattr(self, "pause_signal") and self.pause_signal:
             paused = 1
 
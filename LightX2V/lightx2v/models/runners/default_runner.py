@@ -9,13 +9,19 @@ from PIL import Image
 from loguru import logger
 from requests.exceptions import RequestException
 
+from lightx2v.common.ops.attn.autotune import resolve_auto_attn_types
 from lightx2v.models.runners.base_runner import BaseRunner
+from lightx2v.models.runners.request_pipeline import RequestPipeline, ThreadLocalAttr, run_sequential
 from lightx2v.server.metrics import monitor_cli
+from lightx2v.utils.checkpoint import DenoiseCheckpoint, request_fingerprint
 from lightx2v.utils.envs import *
 from lightx2v.utils.generate_task_id import generate_task_id
 from lightx2v.utils.global_paras import CALIB
+from lightx2v.utils.image_latent_cache import ImageLatentCache, hash_image_input
+from lightx2v.utils.latent_preview import LatentPreviewer
 from lightx2v.utils.memory_profiler import peak_memory_decorator
 from lightx2v.utils.profiler import *
+from lightx2v.utils.shape_bucket import ShapeBucketer
 from lightx2v.utils.utils import get_optimal_patched_size_with_sp, isotropic_crop_resize, save_to_video, vae_to_comfyui_image
 from lightx2v_platform.base.global_var import AI_DEVICE
 
@@ -54,10 +60,19 @@ def resize_image(img, resolution, bucket_shape=None):
 
 
 class DefaultRunner(BaseRunner):
+    # per-request state, shadowed per thread when requests are pipelined
+    input_info = ThreadLocalAttr()
+    inputs = ThreadLocalAttr()
+    gen_video_final = ThreadLocalAttr()
+
     def __init__(self, config):
         super().__init__(config)
         self.has_prompt_enhancer = False
         self.progress_callback = None
+        self.preview_callback = None
+        self.latent_previewer = None
+        self.checkpoint = None
+        self.image_latent_cache = ImageLatentCache.from_config(self.config)
         if self.config["task"] == "t2v" and self.config.get("sub_servers", {}).get("prompt_enhancer") is not None:
             self.has_prompt_enhancer = True
             if not self.check_sub_servers("prompt_enhancer"):
@@ -65,6 +80,7 @@ class DefaultRunner(BaseRunner):
                 logger.warning("No prompt enhancer server available, disable prompt enhancer.")
         if not self.has_prompt_enhancer:
             self.config["use_prompt_enhancer"] = False
+        resolve_auto_attn_types(self.config)
         self.set_init_device()
         self.init_scheduler()
 
@@ -88,6 +104,8 @@ class DefaultRunner(BaseRunner):
             self.run_input_encoder = self._run_input_encoder_local_animate
         elif self.config["task"] == "s2v":
             self.run_input_encoder = self._run_input_encoder_local_s2v
+        self.shape_bucketer = ShapeBucketer(self.config) if self.config.get("shape_bucketing", False) else None
+        self._bucket_config_backup = None
         self.config.lock()  # lock config to avoid modification
         if self.config.get("compile", False) and hasattr(self.model, "compile"):
             logger.info(f"[Compile] Compile all shapes: {self.config.get('compile_shapes', [])}")
@@ -113,7 +131,14 @@ class DefaultRunner(BaseRunner):
             from lightx2v.models.runners.vsr.vsr_wrapper import VSRWrapper
 
             logger.info("Loading VSR model...")
-            return VSRWrapper(self.config["video_super_resolution"]["model_path"])
+            vsr_config = self.config["video_super_resolution"]
+            return VSRWrapper(
+                vsr_config["model_path"],
+                window_frames=vsr_config.get("window_frames", None),
+                overlap_frames=vsr_config.get("overlap_frames", 8),
+                tile_size=vsr_config.get("tile_size", None),
+                tile_overlap=vsr_config.get("tile_overlap", 128),
+            )
         else:
             return None
 
@@ -167,19 +192,42 @@ class DefaultRunner(BaseRunner):
     def set_progress_callback(self, callback):
         self.progress_callback = callback
 
+    def set_preview_callback(self, callback):
+        self.preview_callback = callback
+
+    def load_preview_vae(self):
+        """Decoder used for latent previews during denoising, None if the model has no tiny VAE."""
+        return None
+
+    def init_latent_previewer(self):
+        if not (self.config.get("latent_preview") or {}).get("path"):
+            self.latent_previewer = None
+            return
+        try:
+            preview_vae = self.load_preview_vae()
+        except Exception as e:
+            logger.warning(f"[LatentPreview] disabled: failed to load tiny VAE: {e}")
+            self.latent_previewer = None
+            return
+        self.latent_previewer = LatentPreviewer.from_config(self.config, preview_vae, self.preview_callback)
+        if self.latent_previewer is None:
+            logger.warning("[LatentPreview] disabled: no tiny VAE for this model")
+
     @peak_memory_decorator
-    def run_segment(self, segment_idx=0):
+    def run_segment(self, segment_idx=0, start_step=0):
         infer_steps = self.model.scheduler.infer_steps
+        if self.latent_previewer is not None:
+            self.latent_previewer.start()
 
-        for step_index in range(infer_steps):
-            # only for single segment, check stop signal every step
+        for step_index in range(start_step, infer_steps):
+            # only for single segment or cooperative cancellation, check stop signal every step
             with ProfilingContext4DebugL1(
                 f"Run Dit every step",
                 recorder_mode=GET_RECORDER_MODE(),
                 metrics_func=monitor_cli.lightx2v_run_per_step_dit_duration,
                 metrics_labels=[step_index + 1, infer_steps],
             ):
-                if self.video_segment_num == 1:
+                if self.video_segment_num == 1 or getattr(self, "stop_event", None) is not None:
                     self.check_stop()
                 logger.info(f"==> step_index: {step_index + 1} / {infer_steps}")
 
@@ -192,11 +240,17 @@ class DefaultRunner(BaseRunner):
                 with ProfilingContext4DebugL1("step_post"):
                     self.model.scheduler.step_post()
 
+                if self.checkpoint is not None and self.checkpoint.should_save(step_index, infer_steps):
+                    self.checkpoint.save(self, segment_idx, step_index, self.checkpoint_fingerprint)
+
                 if self.progress_callback:
                     current_step = segment_idx * infer_steps + step_index + 1
                     total_all_steps = self.video_segment_num * infer_steps
                     self.progress_callback((current_step / total_all_steps) * 100, 100)
 
+                if self.latent_previewer is not None:
+                    self.latent_previewer.on_step_end(self.model.scheduler.latents, segment_idx * infer_steps + step_index + 1, self.video_segment_num * infer_steps)
+
         if segment_idx is not None and segment_idx == self.video_segment_num - 1:
             del self.inputs
             torch_device_module.empty_cache()
@@ -214,9 +268,13 @@ class DefaultRunner(BaseRunner):
 
     def end_run(self):
         self.model.scheduler.clear()
+        if self.latent_previewer is not None:
+            logger.info(f"[LatentPreview] {self.latent_previewer.summary()}")
+            self.latent_previewer = None
         if hasattr(self, "inputs"):
             del self.inputs
         self.input_info = None
+        self.restore_shape_bucket()
         if self.config.get("lazy_load", False) or self.config.get("unload_modules", False):
             if hasattr(self.model, "model") and len(self.model.model) == 2:  # MultiModelStruct
                 for model in self.model.model:
@@ -250,7 +308,9 @@ class DefaultRunner(BaseRunner):
         img = TF.to_tensor(img_ori).sub_(0.5).div_(0.5).unsqueeze(0).to(self.init_device)
         self.input_info.original_size = img_ori.size
 
-        if self.config.get("resize_mode", None) == "adaptive":
+        if getattr(self.input_info, "shape_bucket", None):
+            img = self.resize_image_to_shape_bucket(img)
+        elif self.config.get("resize_mode", None) == "adaptive":
             img, h, w = resize_image(img, self.config.get("resolution", "480p"), self.config.get("bucket_shape", None))
             logger.info(f"resize_image target_h: {h}, target_w: {w}")
             patched_h = h // self.config["vae_stride"][1] // self.config["patch_size"][1]
@@ -272,11 +332,94 @@ class DefaultRunner(BaseRunner):
 
         return img, img_ori
 
+    def apply_shape_bucket(self):
+        """Snap the request to a shape bucket so it reuses one compiled graph per bucket."""
+        if self.shape_bucketer is None or "shape_bucket" not in self.input_info.__dataclass_fields__:
+            return
+        num_frames = self.config["target_video_length"]
+        bucket_frames = self.shape_bucketer.select_frames(num_frames)
+        if bucket_frames is None:
+            self.shape_bucketer.record_eager([self.config.get("target_height"), self.config.get("target_width"), num_frames])
+            return
+        if self.config["task"] == "t2v":
+            height, width = int(self.config["target_height"]), int(self.config["target_width"])
+            bucket_h, bucket_w = self.shape_bucketer.select_hw(height, width)
+            self.input_info.requested_shape = [height, width, num_frames]
+            self.input_info.shape_bucket = [bucket_h, bucket_w, bucket_frames]
+            modify = {"target_height": bucket_h, "target_width": bucket_w, "target_video_length": bucket_frames}
+        else:
+            # i2v keeps the output at the bucket size, the image is cropped to the bucket aspect in read_image_input
+            self.input_info.shape_bucket = [None, None, bucket_frames]
+            modify = {"target_video_length": bucket_frames}
+            if num_frames != bucket_frames:
+                self.input_info.requested_shape = [None, None, num_frames]
+        self._bucket_config_backup = {k: self.config.get(k) for k in modify}
+        with self.config.temporarily_unlocked():
+            self.config.update(modify)
+        logger.info(f"[ShapeBucket] snap request to {self.input_info.shape_bucket}")
+
+    def restore_shape_bucket(self):
+        if self._bucket_config_backup is None:
+            return
+        with self.config.temporarily_unlocked():
+            self.config.update(self._bucket_config_backup)
+        self._bucket_config_backup = None
+
+    def resize_image_to_shape_bucket(self, img):
+        area = self.config["target_height"] * self.config["target_width"]
+        aspect_ratio = img.shape[-2] / img.shape[-1]
+        bucket_h, bucket_w = self.shape_bucketer.select_hw(np.sqrt(area * aspect_ratio), np.sqrt(area / aspect_ratio))
+        img = isotropic_crop_resize(img, (bucket_h, bucket_w))
+        self.input_info.shape_bucket[:2] = [bucket_h, bucket_w]
+        self.input_info.latent_shape = self.get_latent_shape_with_lat_hw(bucket_h // self.config["vae_stride"][1], bucket_w // self.config["vae_stride"][2])
+        self.input_info.target_shape = [bucket_h, bucket_w]
+        return img
+
+    def select_shape_bucket_graph(self):
+        bucket = self.input_info.shape_bucket
+        if not hasattr(self.model, "select_graph"):
+            return None
+        graph_name = self.shape_bucketer.graph_name(bucket)
+        status = self.model.get_compile_status().get("_infer_cond_uncond", {})
+        if graph_name in status.get("available_graphs", []):
+            self.model.select_graph("_infer_cond_uncond", graph_name)
+            self.shape_bucketer.record(bucket)
+            return None
+        self.model.select_graph("_infer_cond_uncond", graph_name, compile_if_missing=True)
+        return graph_name
+
+    def image_latent_cache_key(self, image, encoder, **params):
+        """Key of the encoder outputs for `image`, None when the image latent cache is disabled."""
+        if self.image_latent_cache is None or image is None:
+            return None
+        encoder_id = [type(self).__name__, encoder, self.config.get("model_cls"), self.config.get("model_path"), str(GET_DTYPE())]
+        return self.image_latent_cache.make_key(hash_image_input(image), encoder_id, params)
+
     @ProfilingContext4DebugL2("Run Encoders")
     def _run_input_encoder_local_i2v(self):
         img, img_ori = self.read_image_input(self.input_info.image_path)
-        clip_encoder_out = self.run_image_encoder(img) if self.config.get("use_image_encoder", True) else None
-        vae_encode_out, latent_shape = self.run_vae_encoder(img_ori if self.vae_encoder_need_img_original else img)
+        cache_key = self.image_latent_cache_key(
+            self.input_info.image_path,
+            "i2v_image_encoders",
+            img_shape=list(img.shape),
+            target_video_length=self.config["target_video_length"],
+            target_hw=[self.config.get("target_height"), self.config.get("target_width")],
+            resize_mode=self.config.get("resize_mode", None),
+            latent_shape=getattr(self.input_info, "latent_shape", None),
+            shape_bucket=getattr(self.input_info, "shape_bucket", None),
+            resolution_rate=self.config.get("resolution_rate") if self.config.get("changing_resolution", False) else None,
+            use_image_encoder=self.config.get("use_image_encoder", True),
+            need_img_original=self.vae_encoder_need_img_original,
+            world_size=dist.get_world_size() if dist.is_initialized() else 1,
+        )
+        cached = self.image_latent_cache.get(cache_key, AI_DEVICE) if cache_key is not None else None
+        if cached is not None:
+            clip_encoder_out, vae_encode_out, latent_shape = cached["clip_encoder_out"], cached["vae_encode_out"], cached["latent_shape"]
+        else:
+            clip_encoder_out = self.run_image_encoder(img) if self.config.get("use_image_encoder", True) else None
+            vae_encode_out, latent_shape = self.run_vae_encoder(img_ori if self.vae_encoder_need_img_original else img)
+            if cache_key is not None:
+                self.image_latent_cache.put(cache_key, {"clip_encoder_out": clip_encoder_out, "vae_encode_out": vae_encode_out, "latent_shape": latent_shape})
         self.input_info.latent_shape = latent_shape  # Important: set latent_shape in input_info
         text_encoder_output = self.run_text_encoder(self.input_info)
         torch_device_module.empty_cache()
@@ -357,10 +500,44 @@ class DefaultRunner(BaseRunner):
 
     @ProfilingContext4DebugL2("Run DiT")
     def run_main(self):
+        self.run_main_segments()
+        gen_video_final = self.process_images_after_vae_decoder()
+        self.remove_checkpoint()
+        self.end_run()
+        return gen_video_final
+
+    def remove_checkpoint(self):
+        """Drop the step checkpoint of a finished request so a later run does not resume from it."""
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
+            self.checkpoint = None
+
+    def init_checkpoint(self):
+        """Set up step-level checkpointing for this request and load a matching saved state."""
+        self.checkpoint = None
+        checkpoint_path = self.config.get("checkpoint_path", None)
+        if not checkpoint_path or self.config.get("checkpoint_interval", 0) <= 0:
+            return None
+        reason = DenoiseCheckpoint.unsupported_reason(self)
+        if reason is not None:
+            logger.warning(f"[Checkpoint] disabled: {reason}")
+            return None
+        self.checkpoint = DenoiseCheckpoint(checkpoint_path, self.config["checkpoint_interval"])
+        self.checkpoint_fingerprint = request_fingerprint(self)
+        return self.checkpoint.load(self.checkpoint_fingerprint)
+
+    def run_main_segments(self):
         self.init_run()
-        if self.config.get("compile", False) and hasattr(self.model, "comple"):
-            self.model.select_graph_for_compile(self.input_info)
-        for segment_idx in range(self.video_segment_num):
+        resume_state = self.init_checkpoint()
+        self.init_latent_previewer()
+        start_segment = resume_state["segment_idx"] if resume_state is not None else 0
+        compiling_graph = None
+        if self.config.get("compile", False):
+            if self.shape_bucketer is not None and getattr(self.input_info, "shape_bucket", None):
+                compiling_graph = self.select_shape_bucket_graph()
+            elif hasattr(self.model, "select_graph_for_compile"):
+                self.model.select_graph_for_compile(self.input_info)
+        for segment_idx in range(start_segment, self.video_segment_num):
             logger.info(f"🔄 start segment {segment_idx + 1}/{self.video_segment_num}")
             with ProfilingContext4DebugL1(
                 f"segment end2end {segment_idx + 1}/{self.video_segment_num}",
@@ -371,8 +548,13 @@ class DefaultRunner(BaseRunner):
                 self.check_stop()
                 # 1. default do nothing
                 self.init_run_segment(segment_idx)
+                start_step = 0
+                if resume_state is not None:
+                    self.checkpoint.restore(self, resume_state)
+                    start_step = resume_state["step_index"]
+                    resume_state = None
                 # 2. main inference loop
-                latents = self.run_segment(segment_idx)
+                latents = self.run_segment(segment_idx, start_step)
                 # 3. vae decoder
                 if self.config.get("use_stream_vae", False):
                     frames = []
@@ -384,9 +566,10 @@ class DefaultRunner(BaseRunner):
                     self.gen_video = self.run_vae_decoder(latents)
                 # 4. default do nothing
                 self.end_run_segment(segment_idx)
-        gen_video_final = self.process_images_after_vae_decoder()
-        self.end_run()
-        return gen_video_final
+        if compiling_graph is not None:
+            compile_times = self.model.get_compile_status()["_infer_cond_uncond"]["compile_times"]
+            if compiling_graph in compile_times:
+                self.shape_bucketer.record(self.input_info.shape_bucket, compile_seconds=compile_times[compiling_graph])
 
     @ProfilingContext4DebugL1("Run VAE Decoder", recorder_mode=GET_RECORDER_MODE(), metrics_func=monitor_cli.lightx2v_run_vae_decode_duration, metrics_labels=["DefaultRunner"])
     def run_vae_decoder(self, latents):
@@ -429,6 +612,11 @@ class DefaultRunner(BaseRunner):
                     return enhanced_prompt
 
     def process_images_after_vae_decoder(self):
+        if getattr(self.input_info, "requested_shape", None):
+            requested_shape = self.input_info.requested_shape
+            height = requested_shape[0] or self.gen_video_final.shape[-2]
+            width = requested_shape[1] or self.gen_video_final.shape[-1]
+            self.gen_video_final = self.shape_bucketer.fit_video(self.gen_video_final, [height, width, requested_shape[2]])
         self.gen_video_final = vae_to_comfyui_image(self.gen_video_final)
 
         if "video_frame_interpolation" in self.config:
@@ -465,14 +653,38 @@ class DefaultRunner(BaseRunner):
         if self.config["use_prompt_enhancer"]:
             self.input_info.prompt_enhanced = self.post_prompt_enhancer()
 
-        self.inputs = self.run_input_encoder()
-
-        gen_video_final = self.run_main()
+        self.apply_shape_bucket()
+        try:
+            self.inputs = self.run_input_encoder()
+            gen_video_final = self.run_main()
+        finally:
+            # end_run restores it too, but a failed request must not leave the bucket in the config
+            self.restore_shape_bucket()
 
         if GET_RECORDER_MODE():
             monitor_cli.lightx2v_worker_request_success.inc()
         return gen_video_final
 
+    def run_pipeline_requests(self, input_infos, compare_sequential=False):
+        """Run several requests, overlapping encode / DiT / save of neighbours when possible."""
+        reason = RequestPipeline.unsupported_reason(self)
+        if reason is not None or len(input_infos) < 2:
+            logger.warning(f"[RequestPipeline] fall back to sequential mode: {reason or 'single request'}")
+            results, stats = run_sequential(self, input_infos)
+            logger.info(f"[RequestPipeline] sequential: {stats}")
+            return results
+
+        if compare_sequential:
+            _, seq_stats = run_sequential(self, input_infos)
+            logger.info(f"[RequestPipeline] sequential: {seq_stats}")
+
+        pipeline = RequestPipeline(self, self.config.get("pipeline_max_prefetch", 1), self.config.get("pipeline_max_pending_saves", 1))
+        results, stats = pipeline.run(input_infos)
+        logger.info(f"[RequestPipeline] pipelined: {stats}")
+        if compare_sequential and seq_stats["videos_per_hour"] > 0:
+            logger.info(f"[RequestPipeline] steady-state speedup: {stats['videos_per_hour'] / seq_stats['videos_per_hour']:.2f}x")
+        return results
+
     def __del__(self):
         if hasattr(self, "model"):
             del self.model
@@ -142,8 +142,13 @@ class QwenImageRunner(DefaultRunner):
         if self.config.get("lazy_load", False) or self.config.get("unload_modules", False):
             del self.text_encoders[0]
         image_encoder_output_list = []
-        for vae_image in text_encoder_output["image_info"]["vae_image_list"]:
-            image_encoder_output = self.run_vae_encoder(image=vae_image)
+        for image_path, vae_image in zip(image_paths_list, text_encoder_output["image_info"]["vae_image_list"]):
+            cache_key = self.image_latent_cache_key(image_path, "qwen_vae", vae_image_shape=list(vae_image.shape), layered=self.is_layered)
+            image_encoder_output = self.image_latent_cache.get(cache_key, AI_DEVICE) if cache_key is not None else None
+            if image_encoder_output is None:
+                image_encoder_output = self.run_vae_encoder(image=vae_image)
+                if cache_key is not None:
+                    self.image_latent_cache.put(cache_key, image_encoder_output)
             image_encoder_output_list.append(image_encoder_output)
         torch_device_module.empty_cache()
         gc.collect()
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+import torch.distributed as dist
+from loguru import logger
+
+from lightx2v_platform.base.global_var import AI_DEVICE
+
+torch_device_module = getattr(torch, AI_DEVICE)
+
+
+class ThreadLocalAttr:
+    """Runner attribute that pipeline worker threads can shadow with their own request state.
+
+    The main thread (and every runner not driven by RequestPipeline) keeps using
+    the instance dict, so sequential runs behave exactly as before.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def _overrides(self, obj):
+        local = obj.__dict__.get("_pipeline_local")
+        return getattr(local, "attrs", None) if local is not None else None
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        overrides = self._overrides(obj)
+        if overrides is not None and self.name in overrides:
+            return overrides[self.name]
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name) from None
+
+    def __set__(self, obj, value):
+        overrides = self._overrides(obj)
+        if overrides is not None:
+            overrides[self.name] = value
+        else:
+            obj.__dict__[self.name] = value
+
+    def __delete__(self, obj):
+        overrides = self._overrides(obj)
+        if overrides is not None:
+            if self.name not in overrides:
+                raise AttributeError(self.name)
+            del overrides[self.name]
+        elif self.name in obj.__dict__:
+            del obj.__dict__[self.name]
+        else:
+            raise AttributeError(self.name)
+
+
+def record_stream(obj, stream):
+    if isinstance(obj, torch.Tensor):
+        if obj.device.type != "cpu":
+            obj.record_stream(stream)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            record_stream(v, stream)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            record_stream(v, stream)
+
+
+class RequestPipeline:
+    """Overlap the stages of consecutive requests on one runner.
+
+    While request N runs its DiT steps and VAE decode on the main thread, the
+    encoders of request N+1 run on a side stream in a background thread and
+    the post-processing / ffmpeg save of request N-1 runs on another. At most
+    `max_prefetch` encoded requests and `max_pending_saves` decoded videos are
+    alive at any time, and results are returned in submission order.
+    """
+
+    def __init__(self, runner, max_prefetch=1, max_pending_saves=1):
+        self.runner = runner
+        self.max_prefetch = max(1, max_prefetch)
+        self.max_pending_saves = max(1, max_pending_saves)
+        self.local = threading.local()
+        self.encode_stream = torch_device_module.Stream()
+        self.save_stream = torch_device_module.Stream()
+
+    @staticmethod
+    def unsupported_reason(runner):
+        from lightx2v.models.runners.default_runner import DefaultRunner
+
+        if runner.config.get("lazy_load", False) or runner.config.get("unload_modules", False):
+            return "lazy_load / unload_modules reload models per request"
+        if runner.config.get("shape_bucketing", False):
+            return "shape bucketing rewrites the config per request"
+        if dist.is_initialized():
+            return "encoder collectives would interleave with DiT collectives"
+        vae_encoder = getattr(runner, "vae_encoder", None)
+        if vae_encoder is not None and vae_encoder is getattr(runner, "vae_decoder", None):
+            # encode and decode both clear the VAE's feature cache, one would corrupt the other
+            return "vae encoder and decoder share one instance"
+        if type(runner).run_main is not DefaultRunner.run_main:
+            return f"{type(runner).__name__} overrides run_main"
+        if type(runner).run_pipeline is not DefaultRunner.run_pipeline:
+            return f"{type(runner).__name__} overrides run_pipeline"
+        if type(runner).process_images_after_vae_decoder is not DefaultRunner.process_images_after_vae_decoder:
+            return f"{type(runner).__name__} post-processes with runner state"
+        return None
+
+    def _in_thread(self, attrs, func, *args):
+        self.local.attrs = attrs
+        try:
+            return func(*args)
+        finally:
+            self.local.attrs = None
+
+    def _encode(self, input_info, main_stream):
+        runner = self.runner
+        with torch_device_module.stream(self.encode_stream):
+            if runner.config["use_prompt_enhancer"]:
+                input_info.prompt_enhanced = runner.post_prompt_enhancer()
+            inputs = runner.run_input_encoder()
+            # tensors are consumed and freed on the main stream
+            record_stream(inputs, main_stream)
+        self.encode_stream.synchronize()
+        return inputs
+
+    def _save(self, ready_event, gen_video_final):
+        with torch_device_module.stream(self.save_stream):
+            self.save_stream.wait_event(ready_event)
+            record_stream(gen_video_final, self.save_stream)
+            result = self.runner.process_images_after_vae_decoder()
+        self.save_stream.synchronize()
+        return result
+
+    def submit_encode(self, executor, input_info, main_stream):
+        attrs = {"input_info": input_info}
+        return executor.submit(self._in_thread, attrs, self._encode, input_info, main_stream)
+
+    def run(self, input_infos):
+        runner = self.runner
+        runner._pipeline_local = self.local
+        main_stream = torch_device_module.current_stream()
+        results = []
+        finish_times = []
+        pending_encodes = deque()
+        pending_saves = deque()
+
+        def collect_save():
+            results.append(pending_saves.popleft().result())
+            finish_times.append(time.perf_counter())
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="lightx2v-encode") as encoder, ThreadPoolExecutor(max_workers=1, thread_name_prefix="lightx2v-save") as saver:
+            queued = 0
+            try:
+                while queued < len(input_infos) and len(pending_encodes) < self.max_prefetch:
+                    pending_encodes.append(self.submit_encode(encoder, input_infos[queued], main_stream))
+                    queued += 1
+                for idx, input_info in enumerate(input_infos):
+                    inputs = pending_encodes.popleft().result()
+                    if queued < len(input_infos):
+                        pending_encodes.append(self.submit_encode(encoder, input_infos[queued], main_stream))
+                        queued += 1
+
+                    logger.info(f"[RequestPipeline] DiT for request {idx + 1}/{len(input_infos)}")
+                    runner.input_info = input_info
+                    runner.inputs = inputs
+                    runner.run_main_segments()
+                    gen_video_final = runner.gen_video_final
+                    ready_event = main_stream.record_event()
+                    # denoising is done, the save below no longer needs the step checkpoint
+                    runner.remove_checkpoint()
+                    runner.end_run()
+
+                    while len(pending_saves) >= self.max_pending_saves:
+                        collect_save()
+                    attrs = {"input_info": input_info, "gen_video_final": gen_video_final}
+                    pending_saves.append(saver.submit(self._in_thread, attrs, self._save, ready_event, gen_video_final))
+                    del gen_video_final, inputs
+                while pending_saves:
+                    collect_save()
+            finally:
+                for fut in pending_encodes:
+                    fut.cancel()
+                runner._pipeline_local = None
+
+        return results, self.throughput(start, finish_times)
+
+    @staticmethod
+    def throughput(start, finish_times):
+        total = finish_times[-1] - start if finish_times else 0.0
+        # steady state excludes the first request, which cannot overlap with anything
+        if len(finish_times) > 1:
+            steady = (len(finish_times) - 1) / (finish_times[-1] - finish_times[0]) * 3600
+        else:
+            steady = len(finish_times) / total * 3600 if total > 0 else 0.0
+        return {"num_requests": len(finish_times), "total_seconds": total, "videos_per_hour": steady}
+
+
+def run_sequential(runner, input_infos):
+    results = []
+    finish_times = []
+    start = time.perf_counter()
+    for input_info in input_infos:
+        results.append(runner.run_pipeline(input_info))
+        finish_times.append(time.perf_counter())
+    return results, RequestPipeline.throughput(start, finish_times)
@@ -1,7 +1,8 @@
 import os
-from typing import Optional
+from typing import Iterator, Optional
 
 import torch
+from loguru import logger
 from torch.nn import functional as F
 
 from lightx2v.utils.profiler import *
@@ -79,6 +80,20 @@ def prepare_input_tensor(input_tensor, scale: float = 2.0, dtype=torch.bfloat16,
     return vid, tH, tW, F_target
 
 
+def tile_starts(length: int, tile: int, overlap: int):
+    # tile offsets covering [0, length), the last tile is aligned to the end
+    if tile >= length:
+        return [0]
+    stride = max(tile - overlap, 1)
+    starts = list(range(0, length - tile, stride))
+    return starts + [length - tile]
+
+
+def blend_ramp(length: int, device):
+    # weights of the later window across a seam, strictly inside (0, 1)
+    return torch.arange(1, length + 1, device=device, dtype=torch.float32) / (length + 1)
+
+
 def init_pipeline(model_path):
     # print(torch.cuda.current_device(), torch.cuda.get_device_name(torch.cuda.current_device()))
     mm = ModelManager(torch_dtype=torch.bfloat16, device="cpu")
@@ -107,8 +122,41 @@ def init_pipeline(model_path):
 
 
 class VSRWrapper:
-    def __init__(self, model_path, device: Optional[torch.device] = None):
+    """
+    FlashVSR super resolution.
+
+    With `window_frames` set, clips longer than one window are processed as
+    overlapping temporal windows (`window_frames` is rounded down to 8n-3, so no
+    frame is dropped by the 8n+1 padding), each optionally split into overlapping
+    spatial tiles of `tile_size` output pixels (a multiple of 128). Overlapping
+    frames re-prime the causal buffers of the pipeline for the next window and
+    are cross-faded at the seams, so peak memory depends on the window, not on
+    the clip length.
+    """
+
+    def __init__(
+        self,
+        model_path,
+        device: Optional[torch.device] = None,
+        window_frames: Optional[int] = None,
+        overlap_frames: int = 8,
+        tile_size: Optional[int] = None,
+        tile_overlap: int = 128,
+    ):
         self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        if window_frames is not None and (window_frames + 3) % 8 != 0:
+            # other lengths lose their tail frames to the 8n+1 padding of the pipeline
+            rounded = (window_frames + 3) // 8 * 8 - 3
+            logger.warning(f"VSR window_frames {window_frames} is not 8n-3, using {rounded}")
+            window_frames = rounded
+        self.window_frames = window_frames
+        self.overlap_frames = overlap_frames
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        if window_frames is not None:
+            assert window_frames > overlap_frames >= 0, f"window_frames {window_frames} must be larger than overlap_frames {overlap_frames}"
+        if tile_size is not None:
+            assert tile_size % 128 == 0 and tile_overlap < tile_size, f"Invalid VSR tile_size {tile_size} / tile_overlap {tile_overlap}"
 
         # Setup torch for optimal performance
         torch.set_grad_enabled(False)
@@ -136,10 +184,14 @@ class VSRWrapper:
         seed: float = 0.0,
         scale: float = 2.0,
     ) -> torch.Tensor:
-        torch.cuda.empty_cache()
-        torch.cuda.ipc_collect()
-        LQ, th, tw, F = prepare_input_tensor(video, scale=scale, dtype=self.dtype, device=self.device)
-
+        if self.window_frames is None or (video.shape[0] <= self.window_frames and self.tile_size is None):
+            torch.cuda.empty_cache()
+            torch.cuda.ipc_collect()
+            LQ, th, tw, F = prepare_input_tensor(video, scale=scale, dtype=self.dtype, device=self.device)
+            return self.run_pipe(LQ, th, tw, F, seed)
+        return torch.cat(list(self._resolve_windows(video, seed=seed, scale=scale)), dim=0)
+
+    def run_pipe(self, LQ, th, tw, F, seed):
         video = self.pipe(
             prompt="",
             negative_prompt="",
@@ -160,3 +212,76 @@ class VSRWrapper:
         video = (video + 1.0) / 2.0  # 将 [-1,1] 映射到 [0,1]
         video = video.permute(1, 2, 3, 0).clamp(0.0, 1.0)  # [C,T,H,W] -> [T,H,W,C]
         return video
+
+    def resolve_window(self, frames, seed, scale):
+        LQ, th, tw, F = prepare_input_tensor(frames, scale=scale, dtype=self.dtype, device=self.device)
+        if self.tile_size is None or (th <= self.tile_size and tw <= self.tile_size):
+            return self.run_pipe(LQ, th, tw, F, seed)
+
+        out, weight = None, torch.zeros((1, th, tw, 1), dtype=torch.float32, device=LQ.device)
+        ys, xs = tile_starts(th, self.tile_size, self.tile_overlap), tile_starts(tw, self.tile_size, self.tile_overlap)
+        for y0 in ys:
+            for x0 in xs:
+                h, w = min(self.tile_size, th), min(self.tile_size, tw)
+                tile = self.run_pipe(LQ[:, :, :, y0 : y0 + h, x0 : x0 + w], h, w, F, seed)
+                out_dtype, tile = tile.dtype, tile.float()
+                # feather the tile edges that overlap a neighbour tile
+                mask = torch.ones((h, w), dtype=torch.float32, device=tile.device)
+                ramp_h, ramp_w = min(self.tile_overlap, h), min(self.tile_overlap, w)
+                if y0 > 0:
+                    mask[:ramp_h] *= blend_ramp(ramp_h, tile.device)[:, None]
+                if y0 + h < th:
+                    mask[-ramp_h:] *= blend_ramp(ramp_h, tile.device).flip(0)[:, None]
+                if x0 > 0:
+                    mask[:, :ramp_w] *= blend_ramp(ramp_w, tile.device)[None, :]
+                if x0 + w < tw:
+                    mask[:, -ramp_w:] *= blend_ramp(ramp_w, tile.device).flip(0)[None, :]
+                mask = mask[None, :, :, None]
+                if out is None:
+                    out = torch.zeros((tile.shape[0], th, tw, tile.shape[-1]), dtype=torch.float32, device=tile.device)
+                out[:, y0 : y0 + h, x0 : x0 + w] += tile * mask
+                weight[:, y0 : y0 + h, x0 : x0 + w] += mask
+                del tile
+        return (out / weight).clamp(0.0, 1.0).to(out_dtype)
+
+    def _resolve_windows(
+        self,
+        video: torch.Tensor,  # [T,H,W,C]
+        seed: float = 0.0,
+        scale: float = 2.0,
+    ) -> Iterator[torch.Tensor]:
+        """Yields the super resolved clip as consecutive [t,H,W,C] chunks, window by window."""
+        total = video.shape[0]
+        window = min(self.window_frames or total, total)
+        overlap = min(self.overlap_frames, window - 1)
+
+        torch.cuda.empty_cache()
+        start = 0
+        emitted = 0  # frames [0, emitted) have been yielded
+        held = None  # tail of the previous window, frames [emitted, emitted + len(held))
+        while True:
+            out = self.resolve_window(video[start : start + window], seed, scale)
+            end = start + out.shape[0]
+            if held is not None:
+                # cross-fade the frames shared with the previous window
+                seam = min(held.shape[0], end - emitted)
+                if seam <= 0:
+                    raise RuntimeError(f"VSR window at frame {start} yields no frame after {emitted}")
+                w = blend_ramp(seam, out.device)[:, None, None, None]
+                blended = held[:seam].float() * (1.0 - w) + out[emitted - start : emitted - start + seam].float() * w
+                yield blended.to(out.dtype)
+                emitted += seam
+            if start + window >= total:
+                if end > emitted:
+                    yield out[emitted - start :]
+                return
+            # hold back the last `overlap` frames, the next window starts no later than them
+            hold_from = max(end - overlap, emitted)
+            next_start = min(hold_from, total - window)
+            assert next_start > start, f"VSR window of {window} frames yields {out.shape[0]} frames, too few for overlap {overlap}"
+            if hold_from > emitted:
+                yield out[emitted - start : hold_from - start]
+                emitted = hold_from
+            held = out[hold_from - start :].clone() if end > hold_from else None
+            start = next_start
+            del out
@@ -24,6 +24,8 @@ from lightx2v.models.runners.wan.wan_runner import WanRunner
 from lightx2v.models.schedulers.wan.audio.scheduler import EulerScheduler
 from lightx2v.models.video_encoders.hf.wan.vae_2_2 import Wan2_2_VAE
 from lightx2v.server.metrics import monitor_cli
+from lightx2v.utils.audio_feature_cache import AudioFeatureCache
+from lightx2v.utils.ckpt_cache import fingerprint_weights, hash_file
 from lightx2v.utils.envs import *
 from lightx2v.utils.profiler import *
 from lightx2v.utils.registry_factory import RUNNER_REGISTER
@@ -284,6 +286,9 @@ class WanAudioRunner(WanRunner):  # type:ignore
         self.video_duration = self.config.get("video_duration", 5)
 
         self.frame_preprocessor = FramePreprocessorTorchVersion()
+        self.audio_feature_cache = AudioFeatureCache.from_config(self.config)
+        self.audio_cache_key = None
+        self._audio_model_fingerprint = None
 
     def init_scheduler(self):
         """Initialize consistency model scheduler"""
@@ -294,6 +299,7 @@ class WanAudioRunner(WanRunner):  # type:ignore
         audio_sr = self.config.get("audio_sr", 16000)
         target_fps = self.config.get("target_fps", 16)
         self._audio_processor = AudioProcessor(audio_sr, target_fps)
+        self.audio_cache_key = None
 
         if not isinstance(audio_path, str):
             return [], 0, None, 0
@@ -301,6 +307,51 @@ class WanAudioRunner(WanRunner):  # type:ignore
         # Get audio files from person objects or legacy format
         audio_files, mask_files = self.get_audio_files_from_audio_path(audio_path)
 
+        if self.audio_feature_cache is not None:
+            self.audio_cache_key = self.audio_feature_cache.make_key(
+                {
+                    "audio": [hash_file(f) for f in audio_files],
+                    "audio_sr": audio_sr,
+                    "target_fps": target_fps,
+                    "video_duration": self.video_duration,
+                    "target_video_length": self.config.get("target_video_length", 81),
+                    "prev_frame_length": self.prev_frame_length,
+                }
+            )
+        cached = self.audio_feature_cache.get(self.audio_cache_key) if self.audio_cache_key is not None else None
+        if cached is not None:
+            audio_segments = [AudioSegment(audio, start, end) for audio, (start, end) in zip(cached["audio"], cached["frames"])]
+            expected_frames, audio_len = cached["expected_frames"], cached["audio_len"]
+            logger.info(f"[AudioFeatureCache] reuse {len(audio_segments)} audio segments of {audio_files}")
+        else:
+            audio_segments, expected_frames, audio_len = self.load_audio_segments(audio_files)
+            if self.audio_cache_key is not None:
+                self.audio_feature_cache.put(
+                    self.audio_cache_key,
+                    {
+                        # segments are views of the whole track, clone so only the segment is stored
+                        "audio": [seg.audio_array.clone() for seg in audio_segments],
+                        "frames": [[seg.start_frame, seg.end_frame] for seg in audio_segments],
+                        "expected_frames": expected_frames,
+                        "audio_len": audio_len,
+                    },
+                )
+        if GET_RECORDER_MODE():
+            monitor_cli.lightx2v_input_audio_len.observe(audio_len)
+
+        # Mask latent for multi-person s2v
+        if mask_files is not None:
+            mask_latents = [self.process_single_mask(mask_file) for mask_file in mask_files]
+            mask_latents = torch.cat(mask_latents, dim=0)
+        else:
+            mask_latents = None
+
+        return audio_segments, expected_frames, mask_latents, len(audio_files)
+
+    def load_audio_segments(self, audio_files):
+        """Load, resample and segment the audio files"""
+        audio_sr = self._audio_processor.audio_sr
+        target_fps = self._audio_processor.target_fps
         # Load audio based on single or multi-person mode
         if len(audio_files) == 1:
             audio_array = self._audio_processor.load_audio(audio_files[0])
@@ -309,24 +360,13 @@ class WanAudioRunner(WanRunner):  # type:ignore
             audio_array = self._audio_processor.load_multi_person_audio(audio_files)
 
         audio_len = int(audio_array.shape[1] / audio_sr * target_fps)
-        if GET_RECORDER_MODE():
-            monitor_cli.lightx2v_input_audio_len.observe(audio_len)
-
         expected_frames = min(max(1, int(self.video_duration * target_fps)), audio_len)
         if expected_frames < int(self.video_duration * target_fps):
             logger.warning(f"Input video duration is greater than actual audio duration, using audio duration instead: audio_duration={audio_len / target_fps}, video_duration={self.video_duration}")
 
         # Segment audio
         audio_segments = self._audio_processor.segment_audio(audio_array, expected_frames, self.config.get("target_video_length", 81), self.prev_frame_length)
-
-        # Mask latent for multi-person s2v
-        if mask_files is not None:
-            mask_latents = [self.process_single_mask(mask_file) for mask_file in mask_files]
-            mask_latents = torch.cat(mask_latents, dim=0)
-        else:
-            mask_latents = None
-
-        return audio_segments, expected_frames, mask_latents, len(audio_files)
+        return audio_segments, expected_frames, audio_len
 
     def get_audio_files_from_audio_path(self, audio_path):
         if os.path.isdir(audio_path):
@@ -547,6 +587,25 @@ class WanAudioRunner(WanRunner):  # type:ignore
             self.gen_video_final = None
             self.cut_audio_final = None
 
+    def audio_feature_key(self, segment_idx):
+        """Cache key of the audio encoder + adapter output of one segment of the current audio"""
+        if self._audio_model_fingerprint is None:
+            audio_encoder_path = self.config.get("audio_encoder_path", os.path.join(self.config["model_path"], "TencentGameMate-chinese-hubert-large"))
+            self._audio_model_fingerprint = {
+                "audio_encoder": [os.path.abspath(audio_encoder_path), fingerprint_weights(audio_encoder_path)],
+                "audio_adapter": [os.path.abspath(self.config["adapter_model_path"]), fingerprint_weights(self.config["adapter_model_path"])],
+                "adapter_quant_scheme": self.config.get("adapter_quant_scheme", None) if self.config.get("adapter_quantized", False) else None,
+                "dtype": str(GET_DTYPE()),
+            }
+        return self.audio_feature_cache.make_key(
+            {
+                "audio": self.audio_cache_key,
+                "segment_idx": segment_idx,
+                "latent_frames": self.model.scheduler.latents.shape[1],
+                **self._audio_model_fingerprint,
+            }
+        )
+
     @ProfilingContext4DebugL1(
         "Init run segment",
         recorder_mode=GET_RECORDER_MODE(),
@@ -566,15 +625,23 @@ class WanAudioRunner(WanRunner):  # type:ignore
         torch.manual_seed(self.input_info.seed)
         # logger.info(f"Processing segment {segment_idx + 1}/{self.video_segment_num}, seed: {self.config.seed}")
 
-        if (self.config.get("lazy_load", False) or self.config.get("unload_modules", False)) and not hasattr(self, "audio_encoder"):
-            self.audio_encoder = self.load_audio_encoder()
-
-        features_list = []
-        for i in range(self.segment.audio_array.shape[0]):
-            feat = self.audio_encoder.infer(self.segment.audio_array[i])
-            feat = self.audio_adapter.forward_audio_proj(feat, self.model.scheduler.latents.shape[1])
-            features_list.append(feat.squeeze(0))
-        audio_features = torch.stack(features_list, dim=0)
+        # streamed audio (audio_array given) is never cached
+        feature_key = self.audio_feature_key(segment_idx) if audio_array is None and self.audio_cache_key is not None else None
+        audio_features = self.audio_feature_cache.get(feature_key) if feature_key is not None else None
+        if audio_features is not None:
+            audio_features = audio_features.to(AI_DEVICE)
+        else:
+            if (self.config.get("lazy_load", False) or self.config.get("unload_modules", False)) and not hasattr(self, "audio_encoder"):
+                self.audio_encoder = self.load_audio_encoder()
+
+            features_list = []
+            for i in range(self.segment.audio_array.shape[0]):
+                feat = self.audio_encoder.infer(self.segment.audio_array[i])
+                feat = self.audio_adapter.forward_audio_proj(feat, self.model.scheduler.latents.shape[1])
+                features_list.append(feat.squeeze(0))
+            audio_features = torch.stack(features_list, dim=0)
+            if feature_key is not None:
+                self.audio_feature_cache.put(feature_key, audio_features.cpu())
 
         self.inputs["audio_encoder_output"] = audio_features
         self.inputs["previmg_encoder_output"] = self.prepare_prev_latents(self.prev_video, prev_frame_length=self.prev_frame_length)
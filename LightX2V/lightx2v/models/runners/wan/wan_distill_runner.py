@@ -3,8 +3,6 @@ import os
 from loguru import logger
 
 from lightx2v.models.networks.wan.distill_model import WanDistillModel
-from lightx2v.models.networks.wan.lora_adapter import WanLoraWrapper
-from lightx2v.models.networks.wan.model import WanModel
 from lightx2v.models.runners.wan.wan_runner import MultiModelStruct, WanRunner
 from lightx2v.models.schedulers.wan.step_distill.scheduler import Wan21MeanFlowStepDistillScheduler, Wan22StepDistillScheduler, WanStepDistillScheduler
 from lightx2v.utils.profiler import *
@@ -18,18 +16,7 @@ class WanDistillRunner(WanRunner):
 
     def load_transformer(self):
         if self.config.get("lora_configs") and self.config["lora_configs"]:
-            model = WanModel(
-                self.config["model_path"],
-                self.config,
-                self.init_device,
-            )
-            lora_wrapper = WanLoraWrapper(model)
-            for lora_config in self.config["lora_configs"]:
-                lora_path = lora_config["path"]
-                strength = lora_config.get("strength", 1.0)
-                lora_name = lora_wrapper.load_lora(lora_path)
-                lora_wrapper.apply_lora(lora_name, strength)
-                logger.info(f"Loaded LoRA: {lora_name} with strength: {strength}")
+            model = self.load_lora_model(self.config["model_path"], self.config["lora_configs"])
         else:
             model = WanDistillModel(self.config["model_path"], self.config, self.init_device)
         return model
@@ -152,20 +139,8 @@ class Wan22MoeDistillRunner(WanDistillRunner):
                         use_low_lora = True
 
             if use_high_lora:
-                high_noise_model = WanModel(
-                    self.high_noise_model_path,
-                    self.config,
-                    self.init_device,
-                    model_type="wan2.2_moe_high_noise",
-                )
-                high_lora_wrapper = WanLoraWrapper(high_noise_model)
-                for lora_config in self.config["lora_configs"]:
-                    if lora_config.get("name", "") == "high_noise_model":
-                        lora_path = lora_config["path"]
-                        strength = lora_config.get("strength", 1.0)
-                        lora_name = high_lora_wrapper.load_lora(lora_path)
-                        high_lora_wrapper.apply_lora(lora_name, strength)
-                        logger.info(f"High noise model loaded LoRA: {lora_name} with strength: {strength}")
+                high_lora_configs = [c for c in self.config["lora_configs"] if c.get("name", "") == "high_noise_model"]
+                high_noise_model = self.load_lora_model(self.high_noise_model_path, high_lora_configs, model_type="wan2.2_moe_high_noise")
             else:
                 high_noise_model = WanDistillModel(
                     self.high_noise_model_path,
@@ -175,20 +150,8 @@ class Wan22MoeDistillRunner(WanDistillRunner):
                 )
 
             if use_low_lora:
-                low_noise_model = WanModel(
-                    self.low_noise_model_path,
-                    self.config,
-                    self.init_device,
-                    model_type="wan2.2_moe_low_noise",
-                )
-                low_lora_wrapper = WanLoraWrapper(low_noise_model)
-                for lora_config in self.config["lora_configs"]:
-                    if lora_config.get("name", "") == "low_noise_model":
-                        lora_path = lora_config["path"]
-                        strength = lora_config.get("strength", 1.0)
-                        lora_name = low_lora_wrapper.load_lora(lora_path)
-                        low_lora_wrapper.apply_lora(lora_name, strength)
-                        logger.info(f"Low noise model loaded LoRA: {lora_name} with strength: {strength}")
+                low_lora_configs = [c for c in self.config["lora_configs"] if c.get("name", "") == "low_noise_model"]
+                low_noise_model = self.load_lora_model(self.low_noise_model_path, low_lora_configs, model_type="wan2.2_moe_low_noise")
             else:
                 low_noise_model = WanDistillModel(
                     self.low_noise_model_path,
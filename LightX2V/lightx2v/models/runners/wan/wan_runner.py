@@ -26,6 +26,7 @@ from lightx2v.models.video_encoders.hf.wan.vae_2_2 import Wan2_2_VAE
 from lightx2v.models.video_encoders.hf.wan.vae_tiny import Wan2_2_VAE_tiny, WanVAE_tiny
 from lightx2v.server.metrics import monitor_cli
 from lightx2v.utils.envs import *
+from lightx2v.utils.merged_lora_cache import MergedLoraCache
 from lightx2v.utils.profiler import *
 from lightx2v.utils.registry_factory import RUNNER_REGISTER
 from lightx2v.utils.utils import *
@@ -40,21 +41,32 @@ class WanRunner(DefaultRunner):
         self.tiny_vae_cls = WanVAE_tiny
         self.vae_name = config.get("vae_name", "Wan2.1_VAE.pth")
         self.tiny_vae_name = "taew2_1.pth"
+        self.merged_lora_cache = MergedLoraCache.from_config(self.config)
 
     def load_transformer(self):
-        model = WanModel(
+        if self.config.get("lora_configs") and self.config.lora_configs:
+            return self.load_lora_model(self.config["model_path"], self.config.lora_configs)
+        return WanModel(
             self.config["model_path"],
             self.config,
             self.init_device,
         )
-        if self.config.get("lora_configs") and self.config.lora_configs:
-            lora_wrapper = WanLoraWrapper(model)
-            for lora_config in self.config.lora_configs:
-                lora_path = lora_config["path"]
-                strength = lora_config.get("strength", 1.0)
-                lora_name = lora_wrapper.load_lora(lora_path)
-                lora_wrapper.apply_lora(lora_name, strength)
-                logger.info(f"Loaded LoRA: {lora_name} with strength: {strength}")
+
+    def load_lora_model(self, model_path, lora_configs, model_type="wan2.1"):
+        """WanModel with `lora_configs` merged, loaded pre-merged from the merged LoRA cache when possible."""
+        if self.merged_lora_cache is not None:
+            merged_ckpt = self.merged_lora_cache.get_or_build(self.config, model_path, lora_configs)
+            if merged_ckpt is not None:
+                logger.info(f"Loaded pre-merged LoRAs {[c['path'] for c in lora_configs]} from {merged_ckpt}")
+                return WanModel(model_path, self.config, self.init_device, model_type=model_type, ckpt_path=merged_ckpt)
+        model = WanModel(model_path, self.config, self.init_device, model_type=model_type)
+        lora_wrapper = WanLoraWrapper(model)
+        for lora_config in lora_configs:
+            lora_path = lora_config["path"]
+            strength = lora_config.get("strength", 1.0)
+            lora_name = lora_wrapper.load_lora(lora_path)
+            lora_wrapper.apply_lora(lora_name, strength)
+            logger.info(f"Loaded LoRA: {lora_name} with strength: {strength}")
         return model
 
     def load_image_encoder(self):
@@ -190,6 +202,14 @@ class WanRunner(DefaultRunner):
             vae_decoder = self.vae_cls(**vae_config)
         return vae_decoder
 
+    def load_preview_vae(self):
+        if self.config.get("use_tae", False) and getattr(self, "vae_decoder", None) is not None:
+            return self.vae_decoder
+        if getattr(self, "preview_vae", None) is None:
+            tae_path = find_torch_model_path(self.config, "tae_path", self.tiny_vae_name)
+            self.preview_vae = self.tiny_vae_cls(vae_path=tae_path, device=self.init_device, need_scaled=self.config.get("need_scaled", False)).to(AI_DEVICE)
+        return self.preview_vae
+
     def load_vae(self):
         vae_encoder = self.load_vae_encoder()
         if vae_encoder is None or self.config.get("use_tae", False):
@@ -337,7 +357,7 @@ class WanRunner(DefaultRunner):
         metrics_labels=["WanRunner"],
     )
     def run_vae_encoder(self, first_frame, last_frame=None):
-        if self.config.get("resize_mode", None) is None:
+        if self.config.get("resize_mode", None) is None and not getattr(self.input_info, "shape_bucket", None):
             h, w = first_frame.shape[2:]
             aspect_ratio = h / w
             max_area = self.config["target_height"] * self.config["target_width"]
@@ -117,6 +117,7 @@ class WanSFRunner(WanRunner):
             self.video_recorder = VideoRecorder(
                 livestream_url=output_video_path,
                 fps=record_fps,
+                pacing=self.config.get("stream_pacing", None),
             )
 
     @ProfilingContext4DebugL1("End run segment")
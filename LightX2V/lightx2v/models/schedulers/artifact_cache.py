@@ -0,0 +1,58 @@
+import os
+import threading
+from collections import OrderedDict
+
+from loguru import logger
+
+from lightx2v.server.metrics import monitor_cli
+from lightx2v.utils.envs import *
+
+
+class SchedulerArtifactCache:
+    """Process-wide LRU of per-shape scheduler artifacts.
+
+    Rope cos/sin tables and sigma/timestep schedules only depend on the latent
+    shape, step count and a few config values, so requests sharing a shape
+    reuse the tensors built by the first one. Entries are keyed by
+    (kind, scheduler class, key) and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.getenv("SCHEDULER_CACHE_MAX_ENTRIES", "16"))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def get_or_build(self, kind, key, build):
+        cache_key = (kind,) + tuple(key)
+        with self._lock:
+            if cache_key in self._entries:
+                self._entries.move_to_end(cache_key)
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                self._record(kind, "hit")
+                return self._entries[cache_key]
+        value = build()
+        with self._lock:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            self._entries[cache_key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"[SchedulerCache] {kind} miss for {key[1:]}, {self.hits.get(kind, 0)} hits / {self.misses[kind]} misses, {len(self._entries)} entries")
+        self._record(kind, "miss")
+        return value
+
+    def _record(self, kind, result):
+        if GET_RECORDER_MODE():
+            monitor_cli.lightx2v_scheduler_cache_requests.labels(kind, result).inc()
+
+    def stats(self):
+        with self._lock:
+            return {kind: {"hits": self.hits.get(kind, 0), "misses": self.misses.get(kind, 0)} for kind in set(self.hits) | set(self.misses)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+SCHEDULER_ARTIFACT_CACHE = SchedulerArtifactCache()
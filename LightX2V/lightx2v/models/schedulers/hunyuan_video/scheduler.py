@@ -28,7 +28,7 @@ class HunyuanVideo15Scheduler(BaseScheduler):
         self.set_timesteps(self.infer_steps, device=AI_DEVICE, shift=self.sample_shift)
         self.multitask_mask = self.get_task_mask(self.config["task"], latent_shape[-3])
         self.cond_latents_concat, self.mask_concat = self._prepare_cond_latents_and_mask(self.config["task"], image_encoder_output["cond_latents"], self.latents, self.multitask_mask, self.reorg_token)
-        self.cos_sin = self.prepare_cos_sin((latent_shape[1], latent_shape[2], latent_shape[3]))
+        self.cos_sin = self.get_cos_sin((latent_shape[1], latent_shape[2], latent_shape[3]))
 
     def prepare_latents(self, seed, latent_shape, dtype=torch.bfloat16):
         self.generator = torch.Generator(device=AI_DEVICE).manual_seed(seed)
@@ -44,6 +44,10 @@ class HunyuanVideo15Scheduler(BaseScheduler):
         )
 
     def set_timesteps(self, num_inference_steps, device, shift):
+        key = (num_inference_steps, shift, self.reverse, self.num_train_timesteps, str(device))
+        self.sigmas, self.timesteps = self.cached_artifact("timesteps", key, lambda: self.compute_timesteps(num_inference_steps, device, shift))
+
+    def compute_timesteps(self, num_inference_steps, device, shift):
         sigmas = torch.linspace(1, 0, num_inference_steps + 1)
 
         # Apply timestep shift
@@ -53,8 +57,7 @@ class HunyuanVideo15Scheduler(BaseScheduler):
         if not self.reverse:
             sigmas = 1 - sigmas
 
-        self.sigmas = sigmas
-        self.timesteps = (sigmas[:-1] * self.num_train_timesteps).to(dtype=torch.float32, device=device)
+        return sigmas, (sigmas[:-1] * self.num_train_timesteps).to(dtype=torch.float32, device=device)
 
     def sd3_time_shift(self, t: torch.Tensor, shift):
         return (shift * t) / (1 + (shift - 1) * t)
@@ -120,6 +123,11 @@ class HunyuanVideo15Scheduler(BaseScheduler):
         dt = self.sigmas[self.step_index + 1] - self.sigmas[self.step_index]
         self.latents = sample + model_output * dt
 
+    def get_cos_sin(self, rope_sizes):
+        seq_p = (dist.get_world_size(self.seq_p_group), dist.get_rank(self.seq_p_group)) if self.seq_p_group is not None else None
+        key = (tuple(rope_sizes), self.config["hidden_size"], self.config["heads_num"], str(self.config["rope_dim_list"]), self.config["rope_theta"], seq_p)
+        return self.cached_artifact("cos_sin", key, lambda: self.prepare_cos_sin(rope_sizes))
+
     def prepare_cos_sin(self, rope_sizes):
         target_ndim = 3
         head_dim = self.config["hidden_size"] // self.config["heads_num"]
@@ -151,7 +159,7 @@ class HunyuanVideo15SRScheduler(HunyuanVideo15Scheduler):
         dtype = lq_latents.dtype
         self.prepare_latents(seed, latent_shape, lq_latents, dtype=dtype)
         self.set_timesteps(self.infer_steps, device=AI_DEVICE, shift=self.sample_shift)
-        self.cos_sin = self.prepare_cos_sin((latent_shape[1], latent_shape[2], latent_shape[3]))
+        self.cos_sin = self.get_cos_sin((latent_shape[1], latent_shape[2], latent_shape[3]))
 
         tgt_shape = latent_shape[-2:]
         bsz = lq_latents.shape[0]
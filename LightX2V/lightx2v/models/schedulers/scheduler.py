@@ -1,7 +1,11 @@
+from lightx2v.models.schedulers.artifact_cache import SCHEDULER_ARTIFACT_CACHE
 from lightx2v.utils.envs import *
 
 
 class BaseScheduler:
+    # attributes persisted by step-level checkpoints, extended by stateful solvers
+    checkpoint_keys = ["latents", "step_index"]
+
     def __init__(self, config):
         self.config = config
         self.latents = None
@@ -20,3 +24,24 @@ class BaseScheduler:
 
     def clear(self):
         pass
+
+    def cached_artifact(self, kind, key, build):
+        """Return the per-shape artifact built by `build`, shared across requests with the same key."""
+        if not self.config.get("scheduler_cache", True):
+            return build()
+        return SCHEDULER_ARTIFACT_CACHE.get_or_build(kind, (type(self).__name__,) + tuple(key), build)
+
+    def state_dict(self):
+        state = {k: getattr(self, k) for k in self.checkpoint_keys if hasattr(self, k)}
+        if getattr(self, "generator", None) is not None:
+            state["generator"] = self.generator.get_state()
+        return state
+
+    def load_state_dict(self, state):
+        state = dict(state)
+        if "generator" in state:
+            generator_state = state.pop("generator")
+            if getattr(self, "generator", None) is not None:
+                self.generator.set_state(generator_state.cpu())
+        for k, v in state.items():
+            setattr(self, k, v)
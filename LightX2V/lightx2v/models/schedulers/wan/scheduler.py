@@ -11,6 +11,8 @@ from lightx2v_platform.base.global_var import AI_DEVICE
 
 
 class WanScheduler(BaseScheduler):
+    checkpoint_keys = BaseScheduler.checkpoint_keys + ["model_outputs", "timestep_list", "last_sample", "this_order", "lower_order_nums"]
+
     def __init__(self, config):
         super().__init__(config)
         self.infer_steps = self.config["infer_steps"]
@@ -54,30 +56,36 @@ class WanScheduler(BaseScheduler):
 
         self.prepare_latents(seed, latent_shape, dtype=torch.float32)
 
-        alphas = np.linspace(1, 1 / self.num_train_timesteps, self.num_train_timesteps)[::-1].copy()
-        sigmas = 1.0 - alphas
-        sigmas = torch.from_numpy(sigmas).to(dtype=torch.float32)
-
-        sigmas = self.shift * sigmas / (1 + (self.shift - 1) * sigmas)
-
-        self.sigmas = sigmas
-        self.timesteps = sigmas * self.num_train_timesteps
-
         self.model_outputs = [None] * self.solver_order
         self.timestep_list = [None] * self.solver_order
         self.last_sample = None
 
-        self.sigmas = self.sigmas.to("cpu")
-        self.sigma_min = self.sigmas[-1].item()
-        self.sigma_max = self.sigmas[0].item()
+        self.sigma_min, self.sigma_max = self.cached_artifact("sigma_range", (self.num_train_timesteps, self.shift), self.compute_sigma_range)
 
         self.set_timesteps(self.infer_steps, device=AI_DEVICE, shift=self.sample_shift)
 
-        self.cos_sin = self.prepare_cos_sin((latent_shape[1] // self.patch_size[0], latent_shape[2] // self.patch_size[1], latent_shape[3] // self.patch_size[2]))
+        self.cos_sin = self.get_cos_sin((latent_shape[1] // self.patch_size[0], latent_shape[2] // self.patch_size[1], latent_shape[3] // self.patch_size[2]))
 
-    def prepare_cos_sin(self, grid_sizes):
+    def compute_sigma_range(self):
+        alphas = np.linspace(1, 1 / self.num_train_timesteps, self.num_train_timesteps)[::-1].copy()
+        sigmas = 1.0 - alphas
+        sigmas = torch.from_numpy(sigmas).to(dtype=torch.float32)
+        sigmas = self.shift * sigmas / (1 + (self.shift - 1) * sigmas)
+        return sigmas[-1].item(), sigmas[0].item()
+
+    def get_cos_sin(self, grid_sizes, zero_t_from=None):
+        seq_p = (dist.get_world_size(self.seq_p_group), dist.get_rank(self.seq_p_group)) if self.seq_p_group is not None else None
+        key = (tuple(grid_sizes), self.head_size, self.config.get("rope_type", "flashinfer"), self.padding_multiple, seq_p, zero_t_from)
+        return self.cached_artifact("cos_sin", key, lambda: self.prepare_cos_sin(grid_sizes, zero_t_from))
+
+    def prepare_cos_sin(self, grid_sizes, zero_t_from=None):
         c = self.head_size // 2
-        freqs = self.freqs.split([c - 2 * (c // 3), c // 3, c // 3], dim=1)
+        freqs = self.freqs
+        if zero_t_from is not None:
+            # frames from zero_t_from on (e.g. the reference frame of audio models) get no temporal rotation
+            freqs = freqs.clone()
+            freqs[zero_t_from:, : c - 2 * (c // 3)] = 0
+        freqs = freqs.split([c - 2 * (c // 3), c // 3, c // 3], dim=1)
         f, h, w = grid_sizes
         seq_len = f * h * w
         cos_sin = torch.cat(
@@ -139,19 +147,10 @@ class WanScheduler(BaseScheduler):
         mu: Optional[Union[float, None]] = None,
         shift: Optional[Union[float, None]] = None,
     ):
-        sigmas = np.linspace(self.sigma_max, self.sigma_min, infer_steps + 1).copy()[:-1]
-
         if shift is None:
             shift = self.shift
-        sigmas = shift * sigmas / (1 + (shift - 1) * sigmas)
-
-        sigma_last = 0
-
-        timesteps = sigmas * self.num_train_timesteps
-        sigmas = np.concatenate([sigmas, [sigma_last]]).astype(np.float32)
-
-        self.sigmas = torch.from_numpy(sigmas)
-        self.timesteps = torch.from_numpy(timesteps).to(device=device, dtype=torch.int64)
+        key = (infer_steps, shift, self.sigma_max, self.sigma_min, self.num_train_timesteps, str(device))
+        self.sigmas, self.timesteps = self.cached_artifact("timesteps", key, lambda: self.compute_timesteps(infer_steps, device, shift))
 
         assert len(self.timesteps) == self.infer_steps
         self.model_outputs = [
@@ -160,7 +159,17 @@ class WanScheduler(BaseScheduler):
         self.lower_order_nums = 0
         self.last_sample = None
         self._begin_index = None
-        self.sigmas = self.sigmas.to("cpu")
+
+    def compute_timesteps(self, infer_steps, device, shift):
+        sigmas = np.linspace(self.sigma_max, self.sigma_min, infer_steps + 1).copy()[:-1]
+        sigmas = shift * sigmas / (1 + (shift - 1) * sigmas)
+
+        sigma_last = 0
+
+        timesteps = sigmas * self.num_train_timesteps
+        sigmas = np.concatenate([sigmas, [sigma_last]]).astype(np.float32)
+
+        return torch.from_numpy(sigmas).to("cpu"), torch.from_numpy(timesteps).to(device=device, dtype=torch.int64)
 
     def _sigma_to_alpha_sigma_t(self, sigma):
         return 1 - sigma, sigma
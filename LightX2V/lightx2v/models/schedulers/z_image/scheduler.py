@@ -491,6 +491,31 @@ class ZImageScheduler(BaseScheduler):
         self._num_timesteps = len(timesteps)
         self.num_warmup_steps = num_warmup_steps
 
+    def get_rotary_emb(self, txt_seq_len):
+        seq_p = (dist.get_world_size(self.seq_p_group), dist.get_rank(self.seq_p_group)) if self.seq_p_group is not None else None
+        key = (str(self.input_info.image_shapes), txt_seq_len, self.config.get("rope_type", "flashinfer"), seq_p, str(AI_DEVICE))
+        # the cached tensors are shared across requests, each request gets its own list of them
+        return list(self.cached_artifact("rotary_emb", key, lambda: self.prepare_rotary_emb(txt_seq_len)))
+
+    def prepare_rotary_emb(self, txt_seq_len):
+        rotary_emb = self.pos_embed(self.input_info.image_shapes, txt_seq_len, device=AI_DEVICE)
+        if self.config.get("rope_type", "flashinfer") == "flashinfer":
+            cos_half_img = rotary_emb[0].real.contiguous()
+            sin_half_img = rotary_emb[0].imag.contiguous()
+            cos_half_txt = rotary_emb[1].real.contiguous()
+            sin_half_txt = rotary_emb[1].imag.contiguous()
+            rotary_emb[0] = torch.cat([cos_half_img, sin_half_img], dim=-1)
+            rotary_emb[1] = torch.cat([cos_half_txt, sin_half_txt], dim=-1)
+        if self.seq_p_group is not None:
+            world_size = dist.get_world_size(self.seq_p_group)
+            cur_rank = dist.get_rank(self.seq_p_group)
+            seqlen = rotary_emb[0].shape[0]
+            padding_size = (world_size - (seqlen % world_size)) % world_size
+            if padding_size > 0:
+                rotary_emb[0] = F.pad(rotary_emb[0], (0, 0, 0, padding_size))
+            rotary_emb[0] = torch.chunk(rotary_emb[0], world_size, dim=0)[cur_rank]
+        return rotary_emb
+
     def prepare(self, input_info):
         self.generator = torch.Generator(device=AI_DEVICE).manual_seed(input_info.seed)
         self.prepare_latents(input_info)
@@ -520,41 +545,9 @@ class ZImageScheduler(BaseScheduler):
                         image_latents = image_latents.repeat(1, repeat_factor, 1, 1)
                     self.latents = self.scheduler.scale_noise(image_latents, latent_timestep, noise)
 
-        self.image_rotary_emb = self.pos_embed(self.input_info.image_shapes, input_info.txt_seq_lens[0], device=AI_DEVICE)
-
-        if self.config.get("rope_type", "flashinfer") == "flashinfer":
-            cos_half_img = self.image_rotary_emb[0].real.contiguous()
-            sin_half_img = self.image_rotary_emb[0].imag.contiguous()
-            cos_half_txt = self.image_rotary_emb[1].real.contiguous()
-            sin_half_txt = self.image_rotary_emb[1].imag.contiguous()
-            self.image_rotary_emb[0] = torch.cat([cos_half_img, sin_half_img], dim=-1)
-            self.image_rotary_emb[1] = torch.cat([cos_half_txt, sin_half_txt], dim=-1)
-        if self.seq_p_group is not None:
-            world_size = dist.get_world_size(self.seq_p_group)
-            cur_rank = dist.get_rank(self.seq_p_group)
-            seqlen = self.image_rotary_emb[0].shape[0]
-            padding_size = (world_size - (seqlen % world_size)) % world_size
-            if padding_size > 0:
-                self.image_rotary_emb[0] = F.pad(self.image_rotary_emb[0], (0, 0, 0, padding_size))
-            self.image_rotary_emb[0] = torch.chunk(self.image_rotary_emb[0], world_size, dim=0)[cur_rank]
-
+        self.image_rotary_emb = self.get_rotary_emb(input_info.txt_seq_lens[0])
         if self.config["enable_cfg"]:
-            self.negative_image_rotary_emb = self.pos_embed(self.input_info.image_shapes, input_info.txt_seq_lens[1], device=AI_DEVICE)
-            if self.config.get("rope_type", "flashinfer") == "flashinfer":
-                cos_half_img = self.negative_image_rotary_emb[0].real.contiguous()
-                sin_half_img = self.negative_image_rotary_emb[0].imag.contiguous()
-                cos_half_txt = self.negative_image_rotary_emb[1].real.contiguous()
-                sin_half_txt = self.negative_image_rotary_emb[1].imag.contiguous()
-                self.negative_image_rotary_emb[0] = torch.cat([cos_half_img, sin_half_img], dim=-1)
-                self.negative_image_rotary_emb[1] = torch.cat([cos_half_txt, sin_half_txt], dim=-1)
-            if self.seq_p_group is not None:
-                world_size = dist.get_world_size(self.seq_p_group)
-                cur_rank = dist.get_rank(self.seq_p_group)
-                seqlen = self.negative_image_rotary_emb[0].shape[0]
-                padding_size = (world_size - (seqlen % world_size)) % world_size
-                if padding_size > 0:
-                    self.negative_image_rotary_emb[0] = F.pad(self.negative_image_rotary_emb[0], (0, 0, 0, padding_size))
-                self.negative_image_rotary_emb[0] = torch.chunk(self.negative_image_rotary_emb[0], world_size, dim=0)[cur_rank]
+            self.negative_image_rotary_emb = self.get_rotary_emb(input_info.txt_seq_lens[1])
 
         if self.zero_cond_t:
             self.modulate_index = torch.tensor([[0] * prod(sample[0]) + [1] * sum([prod(s) for s in sample[1:]]) for sample in self.input_info.image_shapes], device=AI_DEVICE, dtype=torch.int)
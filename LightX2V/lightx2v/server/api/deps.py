@@ -5,6 +5,7 @@ from urllib.parse import urlparse
 import httpx
 from loguru import logger
 
+from ..config import server_config
 from ..services import DistributedInferenceService, FileService, ImageGenerationService, VideoGenerationService
 
 
@@ -25,7 +26,11 @@ class ServiceContainer:
         return cls._instance
 
     def initialize(self, cache_dir: Path, inference_service: DistributedInferenceService, max_queue_size: int = 10):
-        self.file_service = FileService(cache_dir)
+        self.file_service = FileService(
+            cache_dir,
+            media_cache_max_bytes=server_config.media_cache_max_bytes,
+            media_cache_revalidate_after=server_config.media_cache_revalidate_after,
+        )
         self.inference_service = inference_service
         self.video_service = VideoGenerationService(self.file_service, inference_service)
         self.image_service = ImageGenerationService(self.file_service, inference_service)
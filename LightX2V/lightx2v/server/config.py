@@ -20,6 +20,9 @@ class ServerConfig:
     cache_dir: str = str(Path(__file__).parent.parent / "server_cache")
     max_upload_size: int = 500 * 1024 * 1024  # 500MB
 
+    media_cache_max_bytes: int = 2 * 1024 * 1024 * 1024  # 2GB, 0 disables the media download cache
+    media_cache_revalidate_after: float = 0.0  # seconds a cached URL is served without a conditional request
+
     @classmethod
     def from_env(cls) -> "ServerConfig":
         config = cls()
@@ -44,6 +47,18 @@ class ServerConfig:
         if env_cache_dir := os.environ.get("LIGHTX2V_CACHE_DIR"):
             config.cache_dir = env_cache_dir
 
+        if env_media_cache_mb := os.environ.get("LIGHTX2V_MEDIA_CACHE_MAX_MB"):
+            try:
+                config.media_cache_max_bytes = int(env_media_cache_mb) * 1024 * 1024
+            except ValueError:
+                logger.warning(f"Invalid media cache size: {env_media_cache_mb}")
+
+        if env_revalidate_after := os.environ.get("LIGHTX2V_MEDIA_CACHE_REVALIDATE_AFTER"):
+            try:
+                config.media_cache_revalidate_after = float(env_revalidate_after)
+            except ValueError:
+                logger.warning(f"Invalid media cache revalidate interval: {env_revalidate_after}")
+
         return config
 
     def validate(self) -> bool:
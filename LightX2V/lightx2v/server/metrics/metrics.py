@@ -295,6 +295,44 @@ METRICS_INFO = {
         type_="histogram",
         labels=["model_cls"],
     ),
+    "lightx2v_shape_bucket_requests": MetricsConfig(
+        name="lightx2v_shape_bucket_requests",
+        desc="The number of requests per shape bucket and graph result (hit, compile, eager)",
+        type_="counter",
+        labels=["bucket", "result"],
+    ),
+    "lightx2v_shape_bucket_compile_duration": MetricsConfig(
+        name="lightx2v_shape_bucket_compile_duration",
+        desc="Duration of lazily compiling the graph of a shape bucket (s)",
+        type_="histogram",
+        labels=["bucket"],
+        buckets=HYBRID_30_900S_BUCKETS,
+    ),
+    "lightx2v_scheduler_cache_requests": MetricsConfig(
+        name="lightx2v_scheduler_cache_requests",
+        desc="The number of scheduler artifact lookups per kind and result (hit, miss)",
+        type_="counter",
+        labels=["kind", "result"],
+    ),
+    "lightx2v_stream_queue_depth": MetricsConfig(
+        name="lightx2v_stream_queue_depth",
+        desc="Number of items waiting in the pacing queue of a live stream",
+        type_="gauge",
+        labels=["sink"],
+    ),
+    "lightx2v_stream_queue_latency": MetricsConfig(
+        name="lightx2v_stream_queue_latency",
+        desc="Time an item waited in the pacing queue of a live stream before being sent (s)",
+        type_="histogram",
+        labels=["sink"],
+        buckets=(0.05, 0.1, 0.25, 0.5) + HYBRID_1_30S_BUCKETS,
+    ),
+    "lightx2v_stream_frames": MetricsConfig(
+        name="lightx2v_stream_frames",
+        desc="The number of live stream items per result (sent, dropped, repeated, late)",
+        type_="counter",
+        labels=["sink", "result"],
+    ),
 }
 
 
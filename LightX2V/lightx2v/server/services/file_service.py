@@ -1,4 +1,5 @@
 import asyncio
+import os
 import uuid
 from pathlib import Path
 from typing import Optional
@@ -7,9 +8,11 @@ from urllib.parse import urlparse
 import httpx
 from loguru import logger
 
+from .media_cache import MediaCache
+
 
 class FileService:
-    def __init__(self, cache_dir: Path):
+    def __init__(self, cache_dir: Path, media_cache_max_bytes: int = 0, media_cache_revalidate_after: float = 0.0):
         self.cache_dir = cache_dir
         self.input_image_dir = cache_dir / "inputs" / "imgs"
         self.input_audio_dir = cache_dir / "inputs" / "audios"
@@ -29,6 +32,8 @@ class FileService:
         ]:
             directory.mkdir(parents=True, exist_ok=True)
 
+        self.media_cache = MediaCache(cache_dir / "media_cache", media_cache_max_bytes, media_cache_revalidate_after) if media_cache_max_bytes > 0 else None
+
     async def _get_http_client(self) -> httpx.AsyncClient:
         async with self._client_lock:
             if self._http_client is None or self._http_client.is_closed:
@@ -42,7 +47,7 @@ class FileService:
                 self._http_client = httpx.AsyncClient(verify=False, timeout=timeout, limits=limits, follow_redirects=True)
             return self._http_client
 
-    async def _download_with_retry(self, url: str, max_retries: Optional[int] = None) -> httpx.Response:
+    async def _download_with_retry(self, url: str, max_retries: Optional[int] = None, headers: Optional[dict] = None) -> httpx.Response:
         if max_retries is None:
             max_retries = self.max_retries
 
@@ -52,9 +57,9 @@ class FileService:
         for attempt in range(max_retries):
             try:
                 client = await self._get_http_client()
-                response = await client.get(url)
+                response = await client.get(url, headers=headers)
 
-                if response.status_code == 200:
+                if response.status_code == 200 or (headers and response.status_code == 304):
                     return response
                 elif response.status_code >= 500:
                     logger.warning(f"Server error {response.status_code} for {url}, attempt {attempt + 1}/{max_retries}")
@@ -88,8 +93,6 @@ class FileService:
             if not parsed_url.scheme or not parsed_url.netloc:
                 raise ValueError(f"Invalid URL format: {url}")
 
-            response = await self._download_with_retry(url)
-
             media_name = Path(parsed_url.path).name
             if not media_name:
                 default_ext = "jpg" if media_type == "image" else "mp3"
@@ -103,8 +106,19 @@ class FileService:
             media_path = target_dir / media_name
             media_path.parent.mkdir(parents=True, exist_ok=True)
 
-            with open(media_path, "wb") as f:
-                f.write(response.content)
+            if self.media_cache is not None:
+                cached_path = await self.media_cache.get(url, lambda headers: self._download_with_retry(url, headers=headers))
+                # link instead of copy; the task keeps its input even if the cache entry is evicted
+                tmp_path = media_path.with_name(f".{uuid.uuid4().hex}{media_path.suffix}")
+                try:
+                    os.link(cached_path, tmp_path)
+                except OSError:
+                    tmp_path.write_bytes(cached_path.read_bytes())
+                os.replace(tmp_path, media_path)
+            else:
+                response = await self._download_with_retry(url)
+                with open(media_path, "wb") as f:
+                    f.write(response.content)
 
             logger.info(f"Successfully downloaded {media_type} from {url} to {media_path}")
             return media_path
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from loguru import logger
+
+
+class MediaCache:
+    """URL-keyed on-disk cache of downloaded media.
+
+    Each entry is the body (`<sha256(url)>.bin`) plus a `.json` with the
+    ETag / Last-Modified validators. A cached URL is revalidated with a
+    conditional GET (304 reuses the body), entries younger than
+    `revalidate_after` seconds are served without a request, and a failed
+    revalidation falls back to the cached body. Concurrent requests for one URL
+    share a single in-flight fetch. Least recently used bodies are removed
+    beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int, revalidate_after: float = 0.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"hit": 0, "revalidated": 0, "stale": 0, "miss": 0}
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.bin"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load_meta(self, key: str) -> Optional[dict]:
+        if not self._body_path(key).exists() or not self._meta_path(key).exists():
+            return None
+        try:
+            with open(self._meta_path(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    async def get(self, url: str, fetch: Callable[[Dict[str, str]], Awaitable[httpx.Response]]) -> Path:
+        """Path of the cached body of `url`; `fetch(headers)` performs the (conditional) GET."""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._get(url, fetch))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def _get(self, url: str, fetch: Callable[[Dict[str, str]], Awaitable[httpx.Response]]) -> Path:
+        key = self._key(url)
+        meta = self._load_meta(key)
+        if meta is not None and time.time() - meta["validated_at"] < self.revalidate_after:
+            return self._hit(key, "hit")
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = await fetch(headers)
+        except (httpx.ConnectError, httpx.TimeoutException, httpx.NetworkError) as e:
+            if meta is None:
+                raise
+            logger.warning(f"[MediaCache] revalidating {url} failed, serving cached copy: {e}")
+            return self._hit(key, "stale")
+
+        if response.status_code == 304 and meta is not None:
+            meta["validated_at"] = time.time()
+            self._write_meta(key, meta)
+            return self._hit(key, "revalidated")
+
+        body_path = self._body_path(key)
+        tmp_path = body_path.with_suffix(f".tmp-{os.getpid()}")
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, body_path)
+        self._write_meta(
+            key,
+            {
+                "url": url,
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "size": len(response.content),
+                "validated_at": time.time(),
+            },
+        )
+        self._record("miss")
+        self._evict(keep=key)
+        return body_path
+
+    def _hit(self, key: str, result: str) -> Path:
+        body_path = self._body_path(key)
+        os.utime(body_path)
+        self._record(result)
+        return body_path
+
+    def _write_meta(self, key: str, meta: dict):
+        tmp_path = self._meta_path(key).with_suffix(f".json.tmp-{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(key))
+
+    def _evict(self, keep: Optional[str] = None):
+        bodies = sorted(self.cache_dir.glob("*.bin"), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in bodies)
+        for body_path in bodies:
+            if total <= self.max_bytes:
+                break
+            if body_path.stem == keep:
+                continue
+            total -= body_path.stat().st_size
+            body_path.unlink(missing_ok=True)
+            self._meta_path(body_path.stem).unlink(missing_ok=True)
+
+    def _record(self, result: str):
+        self.stats[result] += 1
+        total = sum(self.stats.values())
+        reused = total - self.stats["miss"]
+        logger.info(f"[MediaCache] {result}, reuse rate {reused / total:.2%} ({self.stats})")
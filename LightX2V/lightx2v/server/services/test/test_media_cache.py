@@ -0,0 +1,146 @@
+"""
+MediaCache against a local http.server stand-in of a media host:
+
+PYTHONPATH=/path-to-LightX2V python -m pytest lightx2v/server/services/test/test_media_cache.py
+"""
+
+import asyncio
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+
+from lightx2v.server.services.media_cache import MediaCache
+
+BODY = b"\x89PNG fake image body" * 64
+ETAG = '"v1"'
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serves BODY with an ETag, answers 304 to a matching If-None-Match, records every request."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        time.sleep(server.delay)
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MediaServer:
+    def __init__(self, delay=0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), MediaHandler)
+        self.httpd.requests = []
+        self.httpd.delay = delay
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/media/image.png"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+def make_fetch(url):
+    async def fetch(headers):
+        async with httpx.AsyncClient() as client:
+            return await client.get(url, headers=headers)
+
+    return fetch
+
+
+def test_conditional_get_reuses_body_on_304():
+    server = MediaServer()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MediaCache(Path(cache_dir), max_bytes=1 << 20)
+            first = asyncio.run(cache.get(server.url, make_fetch(server.url)))
+            second = asyncio.run(cache.get(server.url, make_fetch(server.url)))
+
+            assert first == second and second.read_bytes() == BODY
+            assert len(server.requests) == 2
+            assert "If-None-Match" not in server.requests[0]
+            assert server.requests[1]["If-None-Match"] == ETAG
+            assert cache.stats["miss"] == 1 and cache.stats["revalidated"] == 1
+    finally:
+        server.close()
+
+
+def test_fresh_entry_is_served_without_request():
+    server = MediaServer()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MediaCache(Path(cache_dir), max_bytes=1 << 20, revalidate_after=60)
+            asyncio.run(cache.get(server.url, make_fetch(server.url)))
+            asyncio.run(cache.get(server.url, make_fetch(server.url)))
+
+            assert len(server.requests) == 1
+            assert cache.stats["hit"] == 1
+    finally:
+        server.close()
+
+
+def test_stale_fallback_when_origin_is_down():
+    server = MediaServer()
+    url = server.url
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = MediaCache(Path(cache_dir), max_bytes=1 << 20)
+        asyncio.run(cache.get(url, make_fetch(url)))
+        server.close()
+
+        path = asyncio.run(cache.get(url, make_fetch(url)))
+        assert path.read_bytes() == BODY
+        assert cache.stats["stale"] == 1
+
+        # without a cached copy the error reaches the caller
+        other_url = url.replace("image.png", "other.png")
+        try:
+            asyncio.run(cache.get(other_url, make_fetch(other_url)))
+        except httpx.ConnectError:
+            pass
+        else:
+            raise AssertionError("expected a ConnectError for an uncached url")
+
+
+def test_concurrent_requests_share_one_fetch():
+    server = MediaServer(delay=0.3)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MediaCache(Path(cache_dir), max_bytes=1 << 20)
+
+            async def fetch_all():
+                return await asyncio.gather(*[cache.get(server.url, make_fetch(server.url)) for _ in range(8)])
+
+            paths = asyncio.run(fetch_all())
+            assert len(set(paths)) == 1 and paths[0].read_bytes() == BODY
+            assert len(server.requests) == 1
+            assert cache.stats["miss"] == 1
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    test_conditional_get_reuses_body_on_304()
+    test_fresh_entry_is_served_without_request()
+    test_stale_fallback_when_origin_is_down()
+    test_concurrent_requests_share_one_fetch()
+    print("ok")
@@ -1,8 +1,15 @@
 import argparse
+import errno
 import json
 import os
+import queue
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Tuple, Union
@@ -214,6 +221,177 @@ def save_audio(
     return out_video
 
 
+class StreamingAVWriter:
+    """持久 ffmpeg 进程，逐 clip 写入视频帧与对应音频，输出边写边可播放的 fragmented mp4"""
+
+    def __init__(self, output_path: str, fps: int = 16, sample_rate: int = 16000, max_pending_clips: int = 2):
+        self.output_path = output_path
+        self.fps = fps
+        self.sample_rate = sample_rate
+        # 有界队列: 编码跟不上生成时反压主线程, 内存不随视频时长增长
+        self.video_queue = queue.Queue(maxsize=max_pending_clips)
+        self.audio_queue = queue.Queue(maxsize=max_pending_clips)
+        self.process = None
+        self.tmp_dir = None
+        self.threads = []
+        self.num_frames = 0
+
+    def start(self, width: int, height: int):
+        parent_dir = os.path.dirname(self.output_path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        # 音频走命名管道, 与 stdin 上的视频各由一个线程写入, 避免两路管道互相阻塞
+        self.tmp_dir = tempfile.mkdtemp(prefix="shot_stream_")
+        audio_fifo = os.path.join(self.tmp_dir, "audio.pcm")
+        os.mkfifo(audio_fifo)
+        command = [
+            "ffmpeg",
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            f"{self.fps}",
+            "-i",
+            "pipe:0",
+            "-f",
+            "s16le",
+            "-ar",
+            f"{self.sample_rate}",
+            "-ac",
+            "1",
+            "-i",
+            audio_fifo,
+            "-c:v",
+            "libx264",
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "aac",
+            "-movflags",
+            "+frag_keyframe+empty_moov+default_base_moof",
+            self.output_path,
+        ]
+        logger.info(f"Start streaming writer: {' '.join(command)}")
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        self.threads = [
+            threading.Thread(target=self._pipe_worker, args=(self.video_queue, self.process.stdin), daemon=True),
+            threading.Thread(target=self._fifo_worker, args=(self.audio_queue, audio_fifo), daemon=True),
+        ]
+        for t in self.threads:
+            t.start()
+
+    def _fifo_worker(self, data_queue, fifo_path):
+        try:
+            f = self._open_fifo(fifo_path)
+        except OSError as e:
+            logger.error(f"Streaming writer fifo not opened: {e}")
+            self._drain(data_queue)
+            return
+        with f:
+            self._pipe_worker(data_queue, f)
+
+    def _open_fifo(self, fifo_path, poll_interval=0.05):
+        # 阻塞打开会一直等到 ffmpeg 打开读端, ffmpeg 提前退出时将永久阻塞;
+        # 改为非阻塞打开并重试, 同时检查 ffmpeg 是否已退出
+        while True:
+            try:
+                fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+            if self.process.poll() is not None:
+                raise BrokenPipeError(f"ffmpeg exited with code {self.process.returncode} before opening {fifo_path}")
+            time.sleep(poll_interval)
+        # 打开后恢复阻塞写, 由管道缓冲区对生成反压
+        os.set_blocking(fd, True)
+        return os.fdopen(fd, "wb")
+
+    def _drain(self, data_queue):
+        # 继续取空队列, 避免生成线程在 put 上永久阻塞
+        while data_queue.get() is not None:
+            pass
+
+    def _pipe_worker(self, data_queue, pipe):
+        try:
+            while True:
+                data = data_queue.get()
+                if data is None:
+                    break
+                pipe.write(data.cpu().numpy().tobytes())
+        except (BrokenPipeError, OSError) as e:
+            logger.error(f"Streaming writer pipe closed: {e}")
+            self._drain(data_queue)
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def write_clip(self, video: torch.Tensor, audio: torch.Tensor):
+        """
+        写入一个已对齐的 clip
+        video: [B, C, T, H, W], 取值 [-1, 1]
+        audio: [T * audio_per_frame], 取值 [-1, 1]
+        """
+        frames = rearrange(video[0], "C T H W -> T H W C")
+        frames = (frames.float().clamp(-1, 1) * 127.5 + 127.5).round().to(torch.uint8)
+        # libx264 yuv420p 需要偶数宽高
+        pad_h, pad_w = frames.shape[1] % 2, frames.shape[2] % 2
+        if pad_h or pad_w:
+            frames = torch.nn.functional.pad(frames, (0, 0, 0, pad_w, 0, pad_h))
+        if self.process is None:
+            self.start(frames.shape[2], frames.shape[1])
+        pcm = torch.clamp(torch.round(torch.as_tensor(audio).float() * 32767), -32768, 32767).to(torch.int16)
+        self.video_queue.put(frames)
+        self.audio_queue.put(pcm)
+        self.num_frames += frames.shape[0]
+
+    def _put_end(self, data_queue, deadline):
+        try:
+            data_queue.put(None, timeout=max(0, deadline - time.monotonic()))
+            return True
+        except queue.Full:
+            return False
+
+    def close(self, timeout: float = 60, check: bool = True):
+        """check 为 False 时 ffmpeg 异常退出只记录日志, 供生成已失败时调用, 不掩盖原始异常"""
+        if self.process is None:
+            return None
+        deadline = time.monotonic() + timeout
+        # 写线程卡在管道写入且队列已满时 put 会永久阻塞, 结束标记同样受 deadline 限制
+        unsent = [q for q in (self.video_queue, self.audio_queue) if not self._put_end(q, deadline)]
+        for t in self.threads:
+            t.join(max(0, deadline - time.monotonic()))
+        try:
+            self.process.wait(max(0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            logger.error(f"Streaming writer ffmpeg did not exit within {timeout}s, killing it")
+            self.process.kill()
+            self.process.wait()
+        # ffmpeg 退出后写线程的管道随之断开并取空队列, 补发未放入的结束标记后再等一次即可结束
+        for q in unsent:
+            self._put_end(q, time.monotonic() + 5)
+        for t in self.threads:
+            t.join(timeout=5)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        returncode = self.process.returncode
+        if returncode != 0:
+            msg = f"Streaming writer ffmpeg exited with code {returncode}, {self.output_path} is incomplete"
+            if check:
+                raise RuntimeError(msg)
+            logger.error(msg)
+            return None
+        logger.info(f"Streaming writer finished {self.num_frames} frames to {self.output_path}")
+        return self.output_path
+
+
 def load_clip_configs(main_json_path: str):
     with open(main_json_path, "r", encoding="utf-8") as f:
         cfg = json.load(f)
@@ -241,6 +419,7 @@ class ShotConfig:
     negative_prompt: str
     save_result_path: str
     clip_configs: list[ClipConfig]
+    stream_output: bool = False
 
 
 class ShotStreamPipeline:
@@ -290,10 +469,34 @@ class ShotStreamPipeline:
             config = json.load(f)
         return config
 
+    def next_clip(self, i, audio_clip):
+        """第 i 个 clip 的 pipe 与输入（交替使用 s2v / f2v）"""
+        if i % 2 == 0:
+            pipe = self.clip_generators["s2v_clip"]  # s2v一致性强，动态相应差
+            inputs = self.clip_inputs["s2v_clip"]
+        else:
+            pipe = self.clip_generators["f2v_clip"]  # f2v一致性差，动态响应强
+            inputs = self.clip_inputs["f2v_clip"]
+            inputs.prompt = "A man speaks to the camera with a slightly furrowed brow and focused gaze. He raises both hands upward in powerful, emphatic gestures. "  # 添加动作提示
+
+        inputs.seed = self.shot_cfg.seed + i  # 不同 clip 使用不同随机种子
+        inputs.audio_clip = audio_clip
+        return pipe, inputs
+
+    def load_audio_reader(self):
+        audio_array, ori_sr = ta.load(self.shot_cfg.audio_path)
+        audio_array = audio_array.mean(0)
+        if ori_sr != 16000:
+            audio_array = ta.functional.resample(audio_array, ori_sr, 16000)
+        return SlidingWindowReader(audio_array, frame_len=33)
+
     @torch.no_grad()
     def generate(self):
-        s2v = self.clip_generators["s2v_clip"]  # s2v一致性强，动态相应差
-        f2v = self.clip_generators["f2v_clip"]  # f2v一致性差，动态响应强
+        if self.shot_cfg.stream_output:
+            return self.generate_stream()
+
+        s2v = self.clip_generators["s2v_clip"]
+        f2v = self.clip_generators["f2v_clip"]
         # 根据 pipe 最长 overlap_len 初始化 tail buffer
         self.max_tail_len = max(s2v.prev_frame_length, f2v.prev_frame_length)
         self.global_tail_video = None
@@ -301,11 +504,7 @@ class ShotStreamPipeline:
         gen_video_list = []
         cut_audio_list = []
 
-        audio_array, ori_sr = ta.load(self.shot_cfg.audio_path)
-        audio_array = audio_array.mean(0)
-        if ori_sr != 16000:
-            audio_array = ta.functional.resample(audio_array, ori_sr, 16000)
-        audio_reader = SlidingWindowReader(audio_array, frame_len=33)
+        audio_reader = self.load_audio_reader()
 
         # Demo 交替生成 clip
         i = 0
@@ -315,16 +514,7 @@ class ShotStreamPipeline:
             if audio_clip is None:
                 break
 
-            if i % 2 == 0:
-                pipe = s2v
-                inputs = self.clip_inputs["s2v_clip"]
-            else:
-                pipe = f2v
-                inputs = self.clip_inputs["f2v_clip"]
-                inputs.prompt = "A man speaks to the camera with a slightly furrowed brow and focused gaze. He raises both hands upward in powerful, emphatic gestures. "  # 添加动作提示
-
-            inputs.seed = self.shot_cfg.seed + i  # 不同 clip 使用不同随机种子
-            inputs.audio_clip = audio_clip
+            pipe, inputs = self.next_clip(i, audio_clip)
             i = i + 1
 
             if self.global_tail_video is not None:  # 根据当前 pipe 需要多少 overlap_len 来裁剪 tail
@@ -350,6 +540,67 @@ class ShotStreamPipeline:
         os.remove(out_path)
         os.remove(audio_file)
 
+    def prepare_clip(self, pipe, inputs):
+        # 输入编码只依赖 prompt / 图像 / 音频, 与上一个 clip 的输出无关, 可提前在后台线程执行
+        with torch.no_grad():
+            pipe.input_info = inputs
+            pipe.inputs = pipe.run_input_encoder()
+
+    @torch.no_grad()
+    def generate_stream(self):
+        """
+        流式生成: 每个对齐后的 clip 立即送入持久 ffmpeg 编码并混入对应音频,
+        下一个 clip 的音频切窗与输入编码在当前 clip 生成时于后台执行
+        """
+        s2v = self.clip_generators["s2v_clip"]
+        f2v = self.clip_generators["f2v_clip"]
+        self.max_tail_len = max(s2v.prev_frame_length, f2v.prev_frame_length)
+        self.global_tail_video = None
+
+        out_path = self.shot_cfg.save_result_path or "./output_lightx2v_seko_talk.mp4"
+        audio_reader = self.load_audio_reader()
+        writer = StreamingAVWriter(out_path, fps=16, sample_rate=16000)
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        def schedule(i, overlap):
+            # s2v / f2v 交替, 相邻 clip 使用不同 runner, 后台准备不会与当前 clip 冲突
+            audio_clip = audio_reader.next_frame(overlap=overlap)
+            if audio_clip is None:
+                return None
+            pipe, inputs = self.next_clip(i, audio_clip)
+            return pipe, inputs, executor.submit(self.prepare_clip, pipe, inputs)
+
+        finished = False
+        try:
+            i = 0
+            overlap = 0
+            cur = schedule(i, overlap)
+            while cur is not None:
+                pipe, inputs, prepared = cur
+                prepared.result()
+                # 下一个 clip 的音频窗口起点只取决于当前 pipe 的 overlap 长度
+                nxt = schedule(i + 1, pipe.prev_frame_length)
+
+                if self.global_tail_video is not None:  # 根据当前 pipe 需要多少 overlap_len 来裁剪 tail
+                    inputs.overlap_frame = self.global_tail_video[:, :, -pipe.prev_frame_length :]
+
+                with ProfilingContext4DebugL1(f"Shot clip {i}"):
+                    gen_clip_video, audio_clip = pipe.run_clip_main()
+
+                aligned_len = gen_clip_video.shape[2] - overlap
+                writer.write_clip(gen_clip_video[:, :, :aligned_len], audio_clip[: aligned_len * audio_reader.audio_per_frame])
+
+                overlap = pipe.prev_frame_length
+                self.global_tail_video = gen_clip_video[:, :, -self.max_tail_len :].clone()
+                del gen_clip_video
+                i += 1
+                cur = nxt
+            finished = True
+        finally:
+            executor.shutdown(wait=True)
+            writer.close(check=finished)
+        return out_path
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -361,6 +612,7 @@ def main():
     parser.add_argument("--audio_path", type=str, default="", help="The path to input audio file or directory for audio-to-video (s2v) task")
     parser.add_argument("--save_result_path", type=str, default=None, help="The path to save video path/file")
     parser.add_argument("--return_result_tensor", action="store_true", help="Whether to return result tensor. (Useful for comfyui)")
+    parser.add_argument("--stream_output", action="store_true", help="Encode and mux each clip as soon as it is generated")
     args = parser.parse_args()
 
     seed_all(args.seed)
@@ -375,6 +627,7 @@ def main():
         negative_prompt=args.negative_prompt,
         save_result_path=args.save_result_path,
         clip_configs=clip_configs,
+        stream_output=args.stream_output,
     )
 
     with ProfilingContext4DebugL1("Total Cost"):
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import torch
+from loguru import logger
+
+AUDIO_FEATURE_CACHE_VERSION = 1
+
+
+def cached_nbytes(value):
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, dict):
+        return sum(cached_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(cached_nbytes(v) for v in value)
+    return 0
+
+
+class AudioFeatureCache:
+    """Two-tier cache of the audio front end of audio driven runners.
+
+    Values are CPU tensors (or dicts / lists of them) such as the resampled and
+    segmented audio of a request or the audio encoder + adapter output of one
+    segment. The RAM tier is an LRU bounded by `ram_bytes`, the optional disk
+    tier keeps one `<key>.pt` per entry in `<cache_dir>/v<AUDIO_FEATURE_CACHE_VERSION>/`,
+    written to a temp file and renamed into place so concurrent workers never
+    read a partial entry. Least recently used files are removed beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=None, ram_bytes=512 << 20, max_bytes=None):
+        self.cache_dir = os.path.join(cache_dir, f"v{AUDIO_FEATURE_CACHE_VERSION}") if cache_dir else None
+        self.ram_bytes = ram_bytes
+        self.max_bytes = max_bytes
+        self._ram = OrderedDict()
+        self._ram_used = 0
+        self.stats = {"ram": 0, "disk": 0, "miss": 0}
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("audio_feature_cache", None)
+        if not cache_config:
+            return None
+        max_gb = cache_config.get("max_gb", None)
+        return cls(
+            cache_dir=cache_config.get("cache_dir", None) or None,
+            ram_bytes=int(cache_config.get("ram_mb", 512) * (1 << 20)),
+            max_bytes=int(max_gb * (1 << 30)) if max_gb else None,
+        )
+
+    @staticmethod
+    def make_key(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pt")
+
+    def get(self, key):
+        if key in self._ram:
+            self._ram.move_to_end(key)
+            self._record("ram")
+            return self._ram[key]
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            try:
+                value = torch.load(self._path(key), map_location="cpu", weights_only=True)
+            except Exception as e:
+                logger.warning(f"[AudioFeatureCache] dropping unreadable entry {key}: {e}")
+                self._remove_file(key)
+            else:
+                os.utime(self._path(key))
+                self._put_ram(key, value)
+                self._record("disk")
+                return value
+        self._record("miss")
+        return None
+
+    def put(self, key, value):
+        self._put_ram(key, value)
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        try:
+            torch.save(value, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # a full or read-only disk only loses the disk tier
+            logger.warning(f"[AudioFeatureCache] writing {key} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict(keep=key)
+
+    def _put_ram(self, key, value):
+        nbytes = cached_nbytes(value)
+        if nbytes > self.ram_bytes:
+            return
+        if key in self._ram:
+            self._ram_used -= cached_nbytes(self._ram.pop(key))
+        self._ram[key] = value
+        self._ram_used += nbytes
+        while self._ram_used > self.ram_bytes:
+            _, evicted = self._ram.popitem(last=False)
+            self._ram_used -= cached_nbytes(evicted)
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pt"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[: -len(".pt")]))
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._remove_file(key)
+            total -= size
+
+    def _record(self, result):
+        self.stats[result] += 1
+        total = sum(self.stats.values())
+        logger.debug(f"[AudioFeatureCache] {result}, hit rate {(total - self.stats['miss']) / total:.2%} ({self.stats})")
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import random
+import time
+
+import numpy as np
+import torch
+import torch.distributed as dist
+from loguru import logger
+
+from lightx2v_platform.base.global_var import AI_DEVICE
+
+torch_device_module = getattr(torch, AI_DEVICE)
+
+
+def to_device(obj, device):
+    if isinstance(obj, torch.Tensor):
+        return obj.to(device)
+    if isinstance(obj, dict):
+        return {k: to_device(v, device) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(to_device(v, device) for v in obj)
+    return obj
+
+
+def request_fingerprint(runner):
+    """Hash of everything that must match for a saved denoising state to be reusable."""
+    input_info = runner.input_info
+    latent_shape = getattr(input_info, "latent_shape", None)
+    fields = {
+        "model_cls": runner.config.get("model_cls"),
+        "task": runner.config.get("task"),
+        "seed": getattr(input_info, "seed", None),
+        "prompt": getattr(input_info, "prompt", None),
+        "negative_prompt": getattr(input_info, "negative_prompt", None),
+        "image_path": getattr(input_info, "image_path", None),
+        "latent_shape": list(latent_shape) if latent_shape is not None else None,
+        "infer_steps": runner.model.scheduler.infer_steps,
+        "video_segment_num": runner.video_segment_num,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class DenoiseCheckpoint:
+    """Step-level checkpoint of a running denoising loop.
+
+    Every `interval` steps the scheduler state (latents, step index, solver
+    history, generator), the global RNG state and the segment index are
+    written to `path`, so a retried or migrated task continues from the last
+    saved step instead of step 0. Writes go through a temp file and an atomic
+    rename, a crash mid-write keeps the previous checkpoint.
+    """
+
+    def __init__(self, path, interval):
+        if dist.is_initialized() and dist.get_world_size() > 1:
+            root, ext = os.path.splitext(path)
+            path = f"{root}.rank{dist.get_rank()}{ext}"
+        self.path = path
+        self.interval = interval
+
+    @staticmethod
+    def unsupported_reason(runner):
+        from lightx2v.models.runners.default_runner import DefaultRunner
+
+        if type(runner).run_main_segments is not DefaultRunner.run_main_segments:
+            return f"{type(runner).__name__} overrides run_main_segments"
+        if type(runner).run_segment is not DefaultRunner.run_segment:
+            return f"{type(runner).__name__} overrides run_segment"
+        if runner.video_segment_num > 1 and type(runner).end_run_segment is not DefaultRunner.end_run_segment:
+            return f"{type(runner).__name__} keeps per-segment state"
+        if getattr(runner, "sr_version", None) is not None:
+            return "super resolution stage is not checkpointed"
+        return None
+
+    def should_save(self, step_index, infer_steps):
+        # the last step is followed by vae decoding, nothing left to resume
+        return self.interval > 0 and (step_index + 1) % self.interval == 0 and step_index + 1 < infer_steps
+
+    def save(self, runner, segment_idx, step_index, fingerprint):
+        start = time.perf_counter()
+        state = {
+            "fingerprint": fingerprint,
+            "segment_idx": segment_idx,
+            "step_index": step_index + 1,
+            "scheduler": to_device(runner.model.scheduler.state_dict(), "cpu"),
+            "rng": {
+                "python": random.getstate(),
+                "numpy": np.random.get_state(),
+                "torch": torch.get_rng_state(),
+                "device": torch_device_module.get_rng_state() if hasattr(torch_device_module, "get_rng_state") else None,
+            },
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, self.path)
+        logger.info(f"[Checkpoint] saved segment {segment_idx + 1} step {step_index + 1} to {self.path} in {time.perf_counter() - start:.2f}s")
+
+    def load(self, fingerprint):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            state = torch.load(self.path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            logger.warning(f"[Checkpoint] failed to read {self.path}: {e}, start from scratch")
+            return None
+        if state.get("fingerprint") != fingerprint:
+            logger.warning(f"[Checkpoint] {self.path} belongs to a different request, start from scratch")
+            return None
+        logger.info(f"[Checkpoint] resume from segment {state['segment_idx'] + 1} step {state['step_index']}")
+        return state
+
+    def restore(self, runner, state):
+        """Restore the scheduler and RNG state; call after the segment has been prepared."""
+        scheduler = runner.model.scheduler
+        scheduler.load_state_dict(to_device(state["scheduler"], AI_DEVICE))
+        rng = state["rng"]
+        random.setstate(rng["python"])
+        np.random.set_state(rng["numpy"])
+        torch.set_rng_state(rng["torch"])
+        if rng["device"] is not None and hasattr(torch_device_module, "set_rng_state"):
+            torch_device_module.set_rng_state(rng["device"])
+
+    def remove(self):
+        for path in (self.path, f"{self.path}.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
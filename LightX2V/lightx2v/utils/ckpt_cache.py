@@ -0,0 +1,399 @@
+"""Disk caches of checkpoints produced by `tools/convert/converter.py`.
+
+Entries live in `<cache_dir>/v<CKPT_CACHE_VERSION>/<key>/`, each with a
+`meta.json` recording what was converted and a sha256 per output file. Bump
+`CKPT_CACHE_VERSION` whenever the converter output format changes, older
+entries are then ignored and can be pruned; entries of the first, unversioned
+layout (`<cache_dir>/<key>/`) count as version 0. A process using an entry
+holds a shared lease on `<key>.lease` until it exits, eviction and prune skip
+leased entries. Inspect a cache with:
+
+    python -m lightx2v.utils.ckpt_cache list   --cache_dir /cache
+    python -m lightx2v.utils.ckpt_cache verify --cache_dir /cache [--remove_broken]
+    python -m lightx2v.utils.ckpt_cache prune  --cache_dir /cache [--max_gb 200] [--older_than_days 30] [--stale_versions]
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+from loguru import logger
+from safetensors import safe_open
+
+CKPT_CACHE_VERSION = 1
+CONVERTER_PATH = Path(__file__).resolve().parents[2] / "tools" / "convert" / "converter.py"
+SAMPLE_BYTES = 1 << 20
+HASH_CHUNK_BYTES = 1 << 24
+FILE_HASH_MEMO_SIZE = 1024
+
+# (path, size, mtime) -> sha256, least recently used first
+_file_hash_memo = OrderedDict()
+# entry path -> lease file locked with LOCK_SH, held until the process exits
+_leases = {}
+
+
+def weight_files(path):
+    if os.path.isdir(path):
+        return sorted(str(p) for p in Path(path).glob("*.safetensors"))
+    return [path] if os.path.exists(path) else []
+
+
+def fingerprint_weights(path):
+    """Cheap identity of a (possibly very large) checkpoint: names, sizes, mtimes and head/tail samples."""
+    hasher = hashlib.sha256()
+    for file_path in weight_files(path):
+        stat = os.stat(file_path)
+        hasher.update(json.dumps([os.path.basename(file_path), stat.st_size, stat.st_mtime_ns]).encode("utf-8"))
+        with open(file_path, "rb") as f:
+            hasher.update(f.read(SAMPLE_BYTES))
+            if stat.st_size > SAMPLE_BYTES:
+                f.seek(-SAMPLE_BYTES, os.SEEK_END)
+                hasher.update(f.read(SAMPLE_BYTES))
+    return hasher.hexdigest()
+
+
+def hash_file(path, memo=True):
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo and memo_key in _file_hash_memo:
+        _file_hash_memo.move_to_end(memo_key)
+        return _file_hash_memo[memo_key]
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+    _file_hash_memo[memo_key] = digest
+    _file_hash_memo.move_to_end(memo_key)
+    while len(_file_hash_memo) > FILE_HASH_MEMO_SIZE:
+        _file_hash_memo.popitem(last=False)
+    return digest
+
+
+def dir_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+def has_quantized_weights(path):
+    """Whether the checkpoint at `path` holds converter-quantized linear weights (a `.weight_scale` per weight)."""
+    for file_path in weight_files(path):
+        with safe_open(file_path, framework="pt") as f:
+            if any(key.endswith(".weight_scale") for key in f.keys()):
+                return True
+    return False
+
+
+def acquire_lease(artifact):
+    """Keep `artifact` from being evicted while this process runs, False if it was removed meanwhile."""
+    if artifact in _leases:
+        return True
+    lease_file = open(f"{artifact}.lease", "a")
+    # blocks while an eviction of the entry is in progress
+    fcntl.flock(lease_file, fcntl.LOCK_SH)
+    if not os.path.exists(os.path.join(artifact, "meta.json")):
+        lease_file.close()
+        return False
+    _leases[artifact] = lease_file
+    return True
+
+
+def remove_entry(path):
+    """Remove an entry unless some process holds its lease, True once removed."""
+    with open(f"{path}.lease", "a") as lease_file:
+        try:
+            fcntl.flock(lease_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+class ConvertedCkptCache:
+    """Versioned disk LRU of converter outputs, one directory per key.
+
+    A miss converts into a temp directory under a per-key file lock (other
+    workers asking for the same key wait and then reuse it) and renames it
+    into place once `meta.json` is written, so readers never see a partial
+    entry. Least recently used entries are removed beyond `max_bytes`, except
+    the ones leased by a running process.
+    """
+
+    kind = None
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.root = cache_dir
+        self.cache_dir = os.path.join(cache_dir, f"v{CKPT_CACHE_VERSION}")
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+    def lookup(self, key):
+        artifact = os.path.join(self.cache_dir, key)
+        if not self._is_complete(artifact) or not acquire_lease(artifact):
+            return None
+        self._touch(artifact)
+        return artifact
+
+    def get_or_convert(self, key, source, converter_args, params, save_by_block=False):
+        """Path of the converted checkpoint for `key`, converting `source` on a miss. None if conversion failed."""
+        artifact = self.lookup(key)
+        if artifact is not None:
+            logger.info(f"[{type(self).__name__}] hit {key}")
+            return artifact
+        artifact = os.path.join(self.cache_dir, key)
+        with open(os.path.join(self.cache_dir, f"{key}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not self._is_complete(artifact):
+                try:
+                    self._convert(artifact, source, converter_args, params, save_by_block)
+                except Exception as e:
+                    logger.error(f"[{type(self).__name__}] converting {source} for {key} failed: {e}")
+                    return None
+            if not acquire_lease(artifact):
+                return None
+            self._touch(artifact)
+        self.evict()
+        return artifact
+
+    def _convert(self, artifact, source, converter_args, params, save_by_block):
+        start = time.perf_counter()
+        tmp_dir = f"{artifact}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        cmd = [
+            sys.executable,
+            str(CONVERTER_PATH),
+            "--source",
+            source,
+            "--output",
+            tmp_dir,
+            "--output_name",
+            self.kind,
+            "--model_type",
+            "wan_dit",
+            "--device",
+            "cuda" if torch.cuda.is_available() else "cpu",
+            *converter_args,
+        ]
+        if save_by_block:
+            cmd.append("--save_by_block")
+        logger.info(f"[{type(self).__name__}] converting into {os.path.basename(artifact)}: {' '.join(cmd)}")
+        try:
+            subprocess.run(cmd, check=True)
+            calib_path = os.path.join(source if os.path.isdir(source) else os.path.dirname(source), "calib.pt")
+            if os.path.exists(calib_path):
+                shutil.copy2(calib_path, tmp_dir)
+            files = {p.name: hash_file(str(p)) for p in Path(tmp_dir).iterdir() if p.is_file()}
+            meta = {
+                "kind": self.kind,
+                "version": CKPT_CACHE_VERSION,
+                "source": source,
+                "params": params,
+                "files": files,
+                "size": dir_size(tmp_dir),
+                "created_at": time.time(),
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=2)
+            os.rename(tmp_dir, artifact)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        logger.info(f"[{type(self).__name__}] converted {os.path.basename(artifact)} ({meta['size'] / (1 << 30):.2f} GB) in {time.perf_counter() - start:.1f}s")
+
+    @staticmethod
+    def _is_complete(artifact):
+        return os.path.exists(os.path.join(artifact, "meta.json"))
+
+    @staticmethod
+    def _touch(artifact):
+        os.utime(os.path.join(artifact, "meta.json"))
+
+    def evict(self):
+        if not self.max_bytes:
+            return
+        entries = list_entries(self.root)
+        total = sum(e["size"] for e in entries)
+        for entry in sorted(entries, key=lambda e: e["last_used"]):
+            if total <= self.max_bytes:
+                break
+            # entries in use, including the one just returned, are leased
+            if not remove_entry(entry["path"]):
+                continue
+            logger.info(f"[{type(self).__name__}] evicted v{entry['version']} {entry['key']}")
+            total -= entry["size"]
+
+
+class QuantizedCkptCache(ConvertedCkptCache):
+    """Quantized variants of original checkpoints, keyed by source fingerprint and quant scheme."""
+
+    kind = "quantized"
+    # dit_quant_scheme prefix -> converter --linear_type
+    LINEAR_TYPES = {"fp8": "fp8", "int8": "int8", "mxfp4": "mxfp4", "mxfp6": "mxfp6", "mxfp8": "mxfp8"}
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("quantized_ckpt_cache", None)
+        if not cache_config or not cache_config.get("cache_dir"):
+            return None
+        max_gb = cache_config.get("max_gb", None)
+        return cls(cache_config["cache_dir"], max_bytes=int(max_gb * (1 << 30)) if max_gb else None)
+
+    def get_or_quantize(self, source, quant_scheme, save_by_block=False):
+        linear_type = self.LINEAR_TYPES.get(quant_scheme.split("-")[0], None)
+        if linear_type is None:
+            logger.warning(f"[QuantizedCkptCache] quant scheme {quant_scheme} cannot be produced by the converter")
+            return None
+        params = {"quant_scheme": quant_scheme, "linear_type": linear_type, "save_by_block": save_by_block}
+        key = self.make_key({"source": fingerprint_weights(source), **params})
+        converter_args = ["--quantized", "--linear_type", linear_type, "--non_linear_dtype", "torch.bfloat16"]
+        return self.get_or_convert(key, source, converter_args, params, save_by_block=save_by_block)
+
+
+def resolve_quantized_ckpt(config, model_path):
+    """Checkpoint a dit_quantized model should load from the quantized cache, or None to keep the configured one.
+
+    When the configured quantized checkpoint is missing or holds unquantized
+    weights, the original checkpoint is converted once and cached.
+    """
+    if not config.get("dit_quantized", False) or "gguf" in config.get("dit_quant_scheme", ""):
+        return None
+    cache = QuantizedCkptCache.from_config(config)
+    if cache is None:
+        return None
+    target = config.get("dit_quantized_ckpt", None) or model_path
+    if weight_files(target) and has_quantized_weights(target):
+        return None
+    source = target if weight_files(target) else config.get("dit_original_ckpt", None)
+    if not source or not weight_files(source):
+        logger.warning(f"[QuantizedCkptCache] no quantized weights at {target} and no original checkpoint to convert")
+        return None
+    logger.info(f"[QuantizedCkptCache] {target} has no {config['dit_quant_scheme']} weights, using a converted copy of {source}")
+    return cache.get_or_quantize(source, config["dit_quant_scheme"], save_by_block=config.get("lazy_load", False))
+
+
+def _entry_dirs(root):
+    """(version dir, entry dir) of every directory that may hold an entry, "" for the unversioned layout."""
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.isdir(path):
+            continue
+        if name.startswith("v"):
+            for entry_name in os.listdir(path):
+                yield name, entry_name
+        else:
+            yield "", name
+
+
+def list_entries(root):
+    """All complete entries under a cache root, across versions."""
+    entries = []
+    if not os.path.isdir(root):
+        return entries
+    for version_dir, name in _entry_dirs(root):
+        path = os.path.join(root, version_dir, name)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        # entries of the unversioned layout have no version, kind or file hashes
+        params = meta.get("params", {key: meta[key] for key in ("loras", "quant_scheme") if key in meta})
+        entries.append(
+            {
+                "key": name,
+                "path": path,
+                "version": meta.get("version", 0),
+                "kind": meta.get("kind", "merged"),
+                "source": meta.get("source"),
+                "params": params,
+                "size": meta.get("size", 0),
+                "last_used": os.path.getmtime(meta_path),
+                "files": meta.get("files", {}),
+            }
+        )
+    return entries
+
+
+def verify_entry(entry):
+    """Names of files that are missing or whose sha256 no longer matches."""
+    broken = []
+    for name, expected in entry["files"].items():
+        path = os.path.join(entry["path"], name)
+        if not os.path.exists(path) or hash_file(path, memo=False) != expected:
+            broken.append(name)
+    return broken
+
+
+def prune(root, max_bytes=None, older_than_s=None, stale_versions=False):
+    """Remove stale-version, unused or over-budget entries and leftovers of interrupted conversions."""
+    removed = []
+    now = time.time()
+    for version_dir, name in _entry_dirs(root) if os.path.isdir(root) else []:
+        path = os.path.join(root, version_dir, name)
+        if ".tmp-" in name and now - os.path.getmtime(path) > 24 * 3600:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(os.path.join(version_dir, name))
+    entries = sorted(list_entries(root), key=lambda e: e["last_used"])
+    total = sum(e["size"] for e in entries)
+    for entry in entries:
+        stale = stale_versions and entry["version"] != CKPT_CACHE_VERSION
+        unused = older_than_s is not None and now - entry["last_used"] > older_than_s
+        over_budget = max_bytes is not None and total > max_bytes
+        if (stale or unused or over_budget) and remove_entry(entry["path"]):
+            total -= entry["size"]
+            removed.append(entry["key"])
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the converted checkpoint caches (quantized / merged LoRA)")
+    parser.add_argument("command", choices=["list", "verify", "prune"])
+    parser.add_argument("--cache_dir", type=str, required=True)
+    parser.add_argument("--remove_broken", action="store_true", help="verify: delete entries that fail verification")
+    parser.add_argument("--max_gb", type=float, default=None, help="prune: least recently used entries beyond this size")
+    parser.add_argument("--older_than_days", type=float, default=None, help="prune: entries unused for this long")
+    parser.add_argument("--stale_versions", action="store_true", help=f"prune: entries not at cache version v{CKPT_CACHE_VERSION}")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        entries = list_entries(args.cache_dir)
+        for entry in sorted(entries, key=lambda e: e["last_used"], reverse=True):
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"v{entry['version']} {entry['key']} {entry['kind']:<10} {entry['size'] / (1 << 30):7.2f} GB  last used {last_used}  {entry['source']}  {entry['params']}")
+        print(f"{len(entries)} entries, {sum(e['size'] for e in entries) / (1 << 30):.2f} GB")
+    elif args.command == "verify":
+        failed = 0
+        for entry in list_entries(args.cache_dir):
+            broken = verify_entry(entry)
+            if broken:
+                failed += 1
+                print(f"BROKEN {entry['key']}: {broken}")
+                if args.remove_broken:
+                    shutil.rmtree(entry["path"], ignore_errors=True)
+            else:
+                print(f"OK     {entry['key']}")
+        sys.exit(1 if failed and not args.remove_broken else 0)
+    else:
+        removed = prune(
+            args.cache_dir,
+            max_bytes=int(args.max_gb * (1 << 30)) if args.max_gb is not None else None,
+            older_than_s=args.older_than_days * 86400 if args.older_than_days is not None else None,
+            stale_versions=args.stale_versions,
+        )
+        print(f"removed {len(removed)} entries: {removed}")
+
+
+if __name__ == "__main__":
+    main()
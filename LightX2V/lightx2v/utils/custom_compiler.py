@@ -1,4 +1,5 @@
 import functools
+import time
 from typing import Dict, List, Optional
 
 import torch
@@ -16,6 +17,8 @@ def compiled_method(compile_options: Optional[Dict] = None):
             "compile_mode": False,
             "selected_graph": None,
             "selected_compiled": None,
+            "pending_graph": None,
+            "compile_times": {},
         }
 
         @functools.wraps(func)
@@ -41,6 +44,24 @@ def compiled_method(compile_options: Optional[Dict] = None):
                     logger.info(f"[Compile] Using existing compiled graph '{graph_name}'")
                     return state["compiled_graphs"][graph_name](self, *args, **kwargs)
 
+            elif state["pending_graph"]:
+                # lazily compile the selected graph on its first call
+                graph_name = state["pending_graph"]
+                state["pending_graph"] = None
+                logger.info(f"[Compile] Lazily compiling {func_name} as '{graph_name}'...")
+                compiled_func = torch.compile(state["original_func"], **compile_opts)
+                start = time.perf_counter()
+                try:
+                    result = compiled_func(self, *args, **kwargs)
+                except Exception as e:
+                    logger.info(f"[Compile] Failed to compile {func_name} as '{graph_name}': {e}")
+                    return state["original_func"](self, *args, **kwargs)
+                state["compile_times"][graph_name] = time.perf_counter() - start
+                state["compiled_graphs"][graph_name] = compiled_func
+                state["selected_graph"] = graph_name
+                state["selected_compiled"] = compiled_func
+                logger.info(f"[Compile] Compiled {func_name} as '{graph_name}' in {state['compile_times'][graph_name]:.2f}s")
+                return result
             elif state["selected_compiled"]:
                 return state["selected_compiled"](self, *args, **kwargs)
             else:
@@ -54,8 +75,14 @@ def compiled_method(compile_options: Optional[Dict] = None):
             logger.info(f"[Compile] Disabling compile mode for {func_name}")
             state["compile_mode"] = False
 
-        def _select_graph(graph_name: str):
-            if graph_name not in state["compiled_graphs"]:
+        def _select_graph(graph_name: str, compile_if_missing: bool = False):
+            state["pending_graph"] = None
+            if graph_name not in state["compiled_graphs"] and compile_if_missing:
+                logger.info(f"[Compile] Graph '{graph_name}' for {func_name} will be compiled on next call")
+                state["selected_graph"] = None
+                state["selected_compiled"] = None
+                state["pending_graph"] = graph_name
+            elif graph_name not in state["compiled_graphs"]:
                 logger.warning(f"[Compile] Graph '{graph_name}' not found. Available graphs: {list(state['compiled_graphs'].keys())}, returning to original function.")
                 state["selected_graph"] = None
                 state["selected_compiled"] = None
@@ -69,6 +96,7 @@ def compiled_method(compile_options: Optional[Dict] = None):
             logger.info(f"[Compile] Unselecting graph for {func_name}, returning to original function")
             state["selected_graph"] = None
             state["selected_compiled"] = None
+            state["pending_graph"] = None
 
         def _get_status():
             return {
@@ -76,13 +104,16 @@ def compiled_method(compile_options: Optional[Dict] = None):
                 "compiled_count": len(state["compiled_graphs"]),
                 "selected_graph": state["selected_graph"],
                 "compile_mode": state["compile_mode"],
+                "compile_times": dict(state["compile_times"]),
                 "mode": "compile" if state["compile_mode"] else ("inference" if state["selected_compiled"] else "original"),
             }
 
         def _clear_graphs():
             state["compiled_graphs"].clear()
+            state["compile_times"].clear()
             state["selected_graph"] = None
             state["selected_compiled"] = None
+            state["pending_graph"] = None
             state["compile_mode"] = False
             logger.info(f"[Compile] Cleared all compiled graphs for {func_name}")
 
@@ -145,12 +176,12 @@ class CompiledMethodsMixin:
                 method._disable_compile_mode()
             logger.info("[Compile] Disabled compile mode for all methods")
 
-    def select_graph(self, method_name: str, graph_name: str):
+    def select_graph(self, method_name: str, graph_name: str, compile_if_missing: bool = False):
         if method_name not in self._compiled_methods:
             raise ValueError(f"Method '{method_name}' is not a compiled method")
 
         method = self._compiled_methods[method_name]
-        method._select_graph(graph_name)
+        method._select_graph(graph_name, compile_if_missing=compile_if_missing)
 
     def unselect_graph(self, method_name: str):
         if method_name not in self._compiled_methods:
@@ -0,0 +1,308 @@
+"""Measured threshold calibration for the Tea and Mag feature caches.
+
+One reference pass runs every step (the uncached output) while the caching
+transformer infer records per-step signals: modulated-input and residual
+relative L1 distances for TeaCache, residual magnitude ratios for MagCache.
+Both skip rules are deterministic functions of those signals, so thresholds
+for a target skip ratio are fitted by bisection on a replay of the rule.
+Each fitted candidate is then rendered once and compared against the
+reference (PSNR / SSIM, wall time):
+
+    python -m lightx2v.utils.feature_cache_calibration --model_cls wan2.1 --task t2v \
+        --model_path /path/to/Wan2.1-T2V-1.3B --config_json configs/caching/teacache/wan_t2v_1_3b_tea_480p.json \
+        --method Tea --target_skip_ratios 0.2 0.3 0.4 0.5 --min_psnr 30 --prompt "..."
+
+The chosen candidate is written as a ready-to-use config next to a report.
+"""
+
+import argparse
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from loguru import logger
+
+TEA_DEFAULT_COEFFICIENTS = [[1.0, 0.0], [1.0, 0.0]]
+MAG_DEFAULTS = {"magcache_K": 6, "magcache_thresh": 0.24, "magcache_retention_ratio": 0.2}
+
+
+def simulate_teacache(input_deltas, coefficients, thresh, ret_steps, cutoff_steps):
+    """Replay the TeaCache rule of one cfg branch, returns the per-step should_calc list."""
+    rescale_func = np.poly1d(coefficients)
+    accumulated = 0.0
+    decisions = []
+    for step_index, delta in enumerate(input_deltas):
+        if step_index < ret_steps or step_index >= cutoff_steps or delta is None:
+            decisions.append(True)
+            accumulated = 0.0
+            continue
+        accumulated += rescale_func(delta)
+        if accumulated < thresh:
+            decisions.append(False)
+        else:
+            decisions.append(True)
+            accumulated = 0.0
+    return decisions
+
+
+def simulate_magcache(mag_ratios, thresh, K, retention_steps):
+    """Replay the MagCache rule of one cfg branch, returns the per-step should_calc list."""
+    accumulated_err, accumulated_steps, accumulated_ratio = 0.0, 0, 1.0
+    decisions = []
+    for step_index, ratio in enumerate(mag_ratios):
+        if step_index < retention_steps:
+            decisions.append(True)
+            continue
+        accumulated_ratio *= ratio
+        accumulated_steps += 1
+        accumulated_err += np.abs(1 - accumulated_ratio)
+        if accumulated_err < thresh and accumulated_steps <= K:
+            decisions.append(False)
+        else:
+            decisions.append(True)
+            accumulated_err, accumulated_steps, accumulated_ratio = 0.0, 0, 1.0
+    return decisions
+
+
+def skip_ratio(decisions_per_branch):
+    total = sum(len(d) for d in decisions_per_branch)
+    return sum(d.count(False) for d in decisions_per_branch) / total if total else 0.0
+
+
+def fit_threshold(simulate, target_skip_ratio, hi=1.0, iters=40):
+    """Smallest threshold whose replayed skip ratio reaches the target (skips grow monotonically with it)."""
+    while skip_ratio(simulate(hi)) < target_skip_ratio and hi < 1e4:
+        hi *= 2
+    lo = 0.0
+    for _ in range(iters):
+        mid = (lo + hi) / 2
+        if skip_ratio(simulate(mid)) >= target_skip_ratio:
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def fit_teacache_coefficients(records, degree=4):
+    """Polynomial mapping modulated-input distance to residual distance, as in the TeaCache paper."""
+    xs, ys = [], []
+    for branch in records.values():
+        for x, y in zip(branch["input"], branch["output"]):
+            if x is not None and y is not None:
+                xs.append(x)
+                ys.append(y)
+    if len(xs) <= degree:
+        return None
+    return np.polyfit(xs, ys, degree).tolist()
+
+
+def psnr(video, ref):
+    mse = ((video.float() - ref.float()) ** 2).flatten(1).mean(dim=1).clamp_min(1e-10)
+    return (10 * torch.log10(1.0 / mse)).mean().item()
+
+
+def ssim(video, ref, window_size=11, sigma=1.5, chunk=8):
+    """Mean SSIM of [N, H, W, C] frames in [0, 1] with a gaussian window."""
+    coords = torch.arange(window_size, dtype=torch.float32) - window_size // 2
+    g = torch.exp(-(coords**2) / (2 * sigma**2))
+    g = g / g.sum()
+    channels = video.shape[-1]
+    window = (g[:, None] * g[None, :]).expand(channels, 1, window_size, window_size).to(video.device)
+    c1, c2 = 0.01**2, 0.03**2
+    scores = []
+    for start in range(0, video.shape[0], chunk):
+        x = video[start : start + chunk].float().permute(0, 3, 1, 2)
+        y = ref[start : start + chunk].float().permute(0, 3, 1, 2)
+        mu_x = F.conv2d(x, window, groups=channels)
+        mu_y = F.conv2d(y, window, groups=channels)
+        sigma_x = F.conv2d(x * x, window, groups=channels) - mu_x**2
+        sigma_y = F.conv2d(y * y, window, groups=channels) - mu_y**2
+        sigma_xy = F.conv2d(x * y, window, groups=channels) - mu_x * mu_y
+        ssim_map = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / ((mu_x**2 + mu_y**2 + c1) * (sigma_x + sigma_y + c2))
+        scores.append(ssim_map.flatten(1).mean(dim=1))
+    return torch.cat(scores).mean().item()
+
+
+class FeatureCacheCalibrator:
+    """Drives the reference and candidate passes on an initialized runner."""
+
+    def __init__(self, runner, method):
+        self.runner = runner
+        self.method = method
+        self.infer = runner.model.transformer_infer
+        self.infer_steps = runner.config["infer_steps"]
+        self.records = None
+
+    def _run(self, input_info):
+        from lightx2v.utils.utils import seed_all
+
+        seed_all(input_info.seed)
+        start = time.perf_counter()
+        video = self.runner.run_pipeline(copy.deepcopy(input_info))["video"]
+        return video.cpu(), time.perf_counter() - start
+
+    def run_reference(self, input_info):
+        self.infer.calibrating = True
+        if self.method == "Tea":
+            self.infer.calibration_records = {True: {"input": [], "output": []}, False: {"input": [], "output": []}}
+        else:
+            self.infer.norm_ratio = [[1.0], [1.0]]
+            self.infer.norm_std = [[0.0], [0.0]]
+            self.infer.cos_dis = [[0.0], [0.0]]
+        video, elapsed = self._run(input_info)
+        self.infer.calibrating = False
+        if self.method == "Tea":
+            self.records = {branch: records for branch, records in self.infer.calibration_records.items() if records["input"]}
+        else:
+            cond = self.infer.norm_ratio[0]
+            uncond = self.infer.norm_ratio[1] if len(self.infer.norm_ratio[1]) == len(cond) else cond
+            self.records = [cond, uncond]
+        return video, elapsed
+
+    def fit(self, target_skip_ratio, fit_coefficients=True):
+        """Cache parameters that reach `target_skip_ratio` on the reference signals."""
+        if self.method == "Tea":
+            coefficients = fit_teacache_coefficients(self.records) if fit_coefficients else None
+            coefficients = coefficients or self.infer.coefficients
+
+            def simulate(thresh):
+                return [simulate_teacache(r["input"], coefficients, thresh, self.infer.ret_steps, self.infer.cutoff_steps) for r in self.records.values()]
+
+            thresh = fit_threshold(simulate, target_skip_ratio)
+            return {"teacache_thresh": thresh, "coefficients": coefficients}, simulate(thresh)
+
+        retention_steps = int(self.infer_steps * self.infer.retention_ratio)
+        branches = self.records[:2] if self.runner.config["enable_cfg"] else self.records[:1]
+
+        def simulate(thresh):
+            return [simulate_magcache(ratios, thresh, self.infer.K, retention_steps) for ratios in branches]
+
+        thresh = fit_threshold(simulate, target_skip_ratio)
+        return {"magcache_thresh": thresh, "magcache_ratios": self.records}, simulate(thresh)
+
+    def apply(self, params):
+        if self.method == "Tea":
+            self.infer.teacache_thresh = params["teacache_thresh"]
+            self.infer.coefficients = params["coefficients"]
+        else:
+            self.infer.magcache_thresh = params["magcache_thresh"]
+            self.infer.mag_ratios = np.array(params["magcache_ratios"])
+
+    def run_candidate(self, input_info, params):
+        self.apply(params)
+        return self._run(input_info)
+
+
+def to_config(base_config, method, params, use_ret_steps=True):
+    config = copy.deepcopy(base_config)
+    config["feature_caching"] = method
+    if method == "Tea":
+        coefficients = config.get("coefficients", copy.deepcopy(TEA_DEFAULT_COEFFICIENTS))
+        coefficients[0 if use_ret_steps else 1] = params["coefficients"]
+        config["coefficients"] = coefficients
+        config["teacache_thresh"] = round(params["teacache_thresh"], 5)
+        config["use_ret_steps"] = use_ret_steps
+        config.pop("teacache_calibration", None)
+    else:
+        config["magcache_calibration"] = False
+        config["magcache_thresh"] = round(params["magcache_thresh"], 5)
+        config["magcache_ratios"] = params["magcache_ratios"]
+        for k, v in MAG_DEFAULTS.items():
+            config.setdefault(k, v)
+    return config
+
+
+def main():
+    from lightx2v.infer import init_runner
+    from lightx2v.utils.input_info import set_input_info
+    from lightx2v.utils.set_config import set_config
+
+    parser = argparse.ArgumentParser(description="Fit Tea/Mag feature cache thresholds against an uncached reference pass")
+    parser.add_argument("--model_cls", type=str, default="wan2.1")
+    parser.add_argument("--task", type=str, choices=["t2v", "i2v"], default="t2v")
+    parser.add_argument("--model_path", type=str, required=True)
+    parser.add_argument("--config_json", type=str, required=True)
+    parser.add_argument("--prompt", type=str, default="")
+    parser.add_argument("--negative_prompt", type=str, default="")
+    parser.add_argument("--image_path", type=str, default="")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--method", type=str, choices=["Tea", "Mag"], default="Tea")
+    parser.add_argument("--target_skip_ratios", type=float, nargs="+", default=[0.2, 0.3, 0.4, 0.5])
+    parser.add_argument("--min_psnr", type=float, default=None, help="quality budget, pick the most aggressive candidate above it")
+    parser.add_argument("--min_ssim", type=float, default=None, help="quality budget, pick the most aggressive candidate above it")
+    parser.add_argument("--keep_coefficients", action="store_true", help="Tea: keep the configured rescale coefficients instead of refitting them")
+    parser.add_argument("--output_config", type=str, default=None, help="default: <config_json>_calibrated.json")
+    args = parser.parse_args()
+    args.use_prompt_enhancer = False
+    args.save_result_path = None
+    args.return_result_tensor = True
+
+    config = set_config(args)
+    config["feature_caching"] = args.method
+    if args.method == "Tea":
+        config.setdefault("use_ret_steps", True)
+        config.setdefault("coefficients", copy.deepcopy(TEA_DEFAULT_COEFFICIENTS))
+        config.setdefault("teacache_thresh", 0.0)
+    else:
+        for k, v in MAG_DEFAULTS.items():
+            config.setdefault(k, v)
+        config.setdefault("magcache_ratios", [[1.0] * config["infer_steps"]] * 2)
+        config["magcache_calibration"] = False
+    runner = init_runner(config)
+    input_info = set_input_info(args)
+    calibrator = FeatureCacheCalibrator(runner, args.method)
+
+    ref_video, ref_time = calibrator.run_reference(input_info)
+    logger.info(f"[FeatureCacheCalibration] reference pass: {ref_time:.2f}s")
+
+    candidates = []
+    for target in sorted(args.target_skip_ratios):
+        params, decisions = calibrator.fit(target, fit_coefficients=not args.keep_coefficients)
+        video, elapsed = calibrator.run_candidate(input_info, params)
+        candidate = {
+            "target_skip_ratio": target,
+            "skip_ratio": skip_ratio(decisions),
+            "skipped_steps": [[i for i, calc in enumerate(d) if not calc] for d in decisions],
+            "params": {k: v for k, v in params.items() if k != "magcache_ratios"},
+            "time_s": elapsed,
+            "speedup": ref_time / elapsed,
+            "psnr": psnr(video, ref_video),
+            "ssim": ssim(video, ref_video),
+        }
+        candidate["within_budget"] = (args.min_psnr is None or candidate["psnr"] >= args.min_psnr) and (args.min_ssim is None or candidate["ssim"] >= args.min_ssim)
+        logger.info(
+            f"[FeatureCacheCalibration] target {target:.2f}: skip {candidate['skip_ratio']:.2%}, {elapsed:.2f}s ({candidate['speedup']:.2f}x), psnr {candidate['psnr']:.2f}, ssim {candidate['ssim']:.4f}, params {candidate['params']}"
+        )
+        candidates.append((candidate, params))
+
+    within_budget = [c for c in candidates if c[0]["within_budget"]]
+    chosen, chosen_params = within_budget[-1] if within_budget else candidates[0]
+    if not within_budget:
+        logger.warning("[FeatureCacheCalibration] no candidate meets the quality budget, emitting the least aggressive one")
+
+    with open(args.config_json, "r") as f:
+        base_config = json.load(f)
+    output_config = args.output_config or f"{os.path.splitext(args.config_json)[0]}_calibrated.json"
+    with open(output_config, "w") as f:
+        json.dump(to_config(base_config, args.method, chosen_params, config.get("use_ret_steps", True)), f, indent=4)
+    report = {
+        "method": args.method,
+        "infer_steps": config["infer_steps"],
+        "shape": [config.get("target_video_length"), config.get("target_height"), config.get("target_width")],
+        "reference_time_s": ref_time,
+        "min_psnr": args.min_psnr,
+        "min_ssim": args.min_ssim,
+        "chosen_target_skip_ratio": chosen["target_skip_ratio"],
+        "candidates": [c for c, _ in candidates],
+    }
+    with open(f"{os.path.splitext(output_config)[0]}_report.json", "w") as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"[FeatureCacheCalibration] wrote {output_config}, chosen target skip ratio {chosen['target_skip_ratio']}")
+
+
+if __name__ == "__main__":
+    main()
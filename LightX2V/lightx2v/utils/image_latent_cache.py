@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+from PIL import Image
+from loguru import logger
+
+from lightx2v.utils.checkpoint import to_device
+
+
+def hash_image_input(image):
+    """Content hash of a reference image given as a path or a PIL image."""
+    hasher = hashlib.sha256()
+    if isinstance(image, Image.Image):
+        hasher.update(json.dumps([image.mode, list(image.size)]).encode("utf-8"))
+        hasher.update(image.tobytes())
+    else:
+        with open(image, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def nbytes(obj):
+    if isinstance(obj, torch.Tensor):
+        return obj.numel() * obj.element_size()
+    if isinstance(obj, dict):
+        return sum(nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(nbytes(v) for v in obj)
+    return 0
+
+
+class ImageLatentCache:
+    """Two-tier cache of image encoder outputs (VAE latents, CLIP features).
+
+    Keys hash the reference image bytes, the preprocessing parameters and the
+    encoder identity, so requests re-using one uploaded image skip the image
+    encoders. Values are kept on CPU in a byte-bounded LRU and, when `disk_dir`
+    is set, written through to disk so they survive restarts and RAM eviction.
+    """
+
+    def __init__(self, ram_max_bytes, disk_dir=None, disk_max_bytes=None):
+        self.ram_max_bytes = ram_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._ram_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"ram_hit": 0, "disk_hit": 0, "miss": 0}
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("image_latent_cache", None)
+        if not cache_config:
+            return None
+        disk_max_gb = cache_config.get("disk_max_gb", None)
+        return cls(
+            ram_max_bytes=int(cache_config.get("ram_max_mb", 2048) * (1 << 20)),
+            disk_dir=cache_config.get("disk_dir", None),
+            disk_max_bytes=int(disk_max_gb * (1 << 30)) if disk_max_gb else None,
+        )
+
+    @staticmethod
+    def make_key(image_hash, encoder_id, params):
+        payload = json.dumps([image_hash, encoder_id, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pt")
+
+    def get(self, key, device):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._record("ram_hit")
+                return to_device(value, device)
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                value = torch.load(self._disk_path(key), map_location="cpu", weights_only=True)
+            except Exception as e:
+                logger.warning(f"[ImageLatentCache] failed to read {self._disk_path(key)}: {e}")
+            else:
+                os.utime(self._disk_path(key))
+                self._put_ram(key, value)
+                self._record("disk_hit")
+                return to_device(value, device)
+        self._record("miss")
+        return None
+
+    def put(self, key, value):
+        value = to_device(value, "cpu")
+        self._put_ram(key, value)
+        if self.disk_dir:
+            tmp_path = f"{self._disk_path(key)}.tmp"
+            torch.save(value, tmp_path)
+            os.replace(tmp_path, self._disk_path(key))
+            self._evict_disk()
+
+    def _put_ram(self, key, value):
+        size = nbytes(value)
+        if size > self.ram_max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = value
+            self._ram_bytes += size
+            while self._ram_bytes > self.ram_max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._ram_bytes -= nbytes(evicted)
+
+    def _evict_disk(self):
+        if not self.disk_max_bytes:
+            return
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith(".pt")]
+        files = sorted(files, key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in files)
+        for path in files:
+            if total <= self.disk_max_bytes:
+                break
+            total -= os.path.getsize(path)
+            os.remove(path)
+
+    def _record(self, result):
+        with self._lock:
+            self.stats[result] += 1
+            total = sum(self.stats.values())
+            hits = self.stats["ram_hit"] + self.stats["disk_hit"]
+            logger.debug(f"[ImageLatentCache] {result}, hit rate {hits / total:.2%} ({self.stats}), ram {self._ram_bytes / (1 << 20):.1f} MB in {len(self._entries)} entries")
@@ -16,6 +16,8 @@ class T2VInputInfo:
     latent_shape: list = field(default_factory=list)
     target_shape: int = field(default_factory=int)
     custom_shape: list = field(default_factory=list)
+    requested_shape: list = field(default_factory=list)
+    shape_bucket: list = field(default_factory=list)
 
 
 @dataclass
@@ -32,6 +34,8 @@ class I2VInputInfo:
     resized_shape: list = field(default_factory=list)
     latent_shape: list = field(default_factory=list)
     target_shape: int = field(default_factory=int)
+    requested_shape: list = field(default_factory=list)
+    shape_bucket: list = field(default_factory=list)
 
 
 @dataclass
@@ -0,0 +1,135 @@
+import json
+import os
+import time
+
+import torch
+import torch.distributed as dist
+import torch.nn.functional as F
+from PIL import Image
+from loguru import logger
+
+from lightx2v.utils.envs import *
+
+
+class LatentPreviewer:
+    """Low resolution previews of the latent being denoised.
+
+    Every `every_n_steps` steps the middle latent frame is downscaled so the
+    decoded image fits in `max_side` pixels, decoded with the tiny VAE and
+    written to `path` (format from the extension, .jpg or .webp) together with
+    a `<path>.json` sidecar holding the step and the preview cost. Previews are
+    skipped while their total cost exceeds `max_overhead` of the denoising
+    time, so a slow decoder cannot stretch the job by more than that.
+    """
+
+    def __init__(self, vae, path, spatial_stride, every_n_steps=2, max_side=320, quality=75, max_overhead=0.1, callback=None):
+        self.vae = vae
+        self.path = path
+        self.spatial_stride = spatial_stride
+        self.every_n_steps = max(1, every_n_steps)
+        self.max_side = max_side
+        self.quality = quality
+        self.max_overhead = max_overhead
+        self.callback = callback
+        self.preview_s = 0.0
+        self.denoise_s = 0.0
+        self.num_previews = 0
+        self._last_step_end = None
+
+    @classmethod
+    def from_config(cls, config, vae, callback=None):
+        preview_config = config.get("latent_preview", None)
+        if not preview_config or not preview_config.get("path") or vae is None:
+            return None
+        return cls(
+            vae,
+            preview_config["path"],
+            spatial_stride=config["vae_stride"][1],
+            every_n_steps=preview_config.get("every_n_steps", 2),
+            max_side=preview_config.get("max_side", 320),
+            quality=preview_config.get("quality", 75),
+            max_overhead=preview_config.get("max_overhead", 0.1),
+            callback=callback,
+        )
+
+    def start(self):
+        self._last_step_end = time.perf_counter()
+
+    def on_step_end(self, latents, step, total_steps):
+        """Called after each scheduler step, publishes a preview when due and within budget."""
+        now = time.perf_counter()
+        if self._last_step_end is not None:
+            self.denoise_s += now - self._last_step_end
+        self._last_step_end = now
+        if dist.is_initialized() and dist.get_rank() != 0:
+            return
+        if step % self.every_n_steps != 0 and step != total_steps:
+            return
+        if self.preview_s > self.max_overhead * self.denoise_s:
+            logger.info(f"[LatentPreview] skip step {step}/{total_steps}, overhead {self.preview_s:.2f}s / {self.denoise_s:.2f}s over budget {self.max_overhead:.0%}")
+            return
+
+        start = time.perf_counter()
+        try:
+            image = self.decode(latents)
+            self.save(image)
+        except Exception as e:
+            # a failed preview must never fail the generation
+            logger.warning(f"[LatentPreview] step {step}/{total_steps} failed: {e}")
+            self._last_step_end = time.perf_counter()
+            return
+        cost_s = time.perf_counter() - start
+        self.preview_s += cost_s
+        self.num_previews += 1
+        # preview time is not denoising time
+        self._last_step_end = time.perf_counter()
+
+        info = {
+            "step": step,
+            "total_steps": total_steps,
+            "path": self.path,
+            "width": image.width,
+            "height": image.height,
+            "preview_ms": round(cost_s * 1000, 1),
+            "overhead": round(self.preview_s / max(self.denoise_s, 1e-6), 4),
+            "updated_at": time.time(),
+        }
+        self._write_json(info)
+        logger.info(f"[LatentPreview] step {step}/{total_steps} {image.width}x{image.height} in {cost_s * 1000:.1f}ms, overhead {info['overhead']:.1%}")
+        if self.callback is not None:
+            self.callback(info)
+
+    @torch.no_grad()
+    def decode(self, latents):
+        # [C, T, H, W] -> middle frame [C, 1, h, w] sized so the decoded image fits max_side
+        latent = latents[:, latents.shape[1] // 2 : latents.shape[1] // 2 + 1]
+        h, w = latent.shape[-2:]
+        scale = min(1.0, self.max_side / (max(h, w) * self.spatial_stride))
+        if scale < 1.0:
+            size = (max(1, round(h * scale)), max(1, round(w * scale)))
+            latent = F.interpolate(latent.transpose(0, 1).float(), size=size, mode="area").transpose(0, 1)
+        frames = self.vae.decode(latent.to(GET_DTYPE()))
+        frame = frames[0, :, -1].float().add(1).div(2).clamp(0, 1)
+        return Image.fromarray(frame.mul(255).round().to(torch.uint8).permute(1, 2, 0).cpu().numpy())
+
+    def save(self, image):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        ext = os.path.splitext(self.path)[1].lower()
+        image_format = "WEBP" if ext == ".webp" else "JPEG"
+        tmp_path = f"{self.path}.tmp"
+        image.save(tmp_path, format=image_format, quality=self.quality)
+        os.replace(tmp_path, self.path)
+
+    def _write_json(self, info):
+        tmp_path = f"{self.path}.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(info, f)
+        os.replace(tmp_path, f"{self.path}.json")
+
+    def summary(self):
+        return {
+            "num_previews": self.num_previews,
+            "preview_s": round(self.preview_s, 3),
+            "denoise_s": round(self.denoise_s, 3),
+            "overhead": round(self.preview_s / max(self.denoise_s, 1e-6), 4),
+        }
@@ -0,0 +1,89 @@
+from loguru import logger
+
+from lightx2v.utils.ckpt_cache import ConvertedCkptCache, fingerprint_weights, hash_file, resolve_quantized_ckpt
+
+# quant schemes whose checkpoints are plain safetensors the converter can round-trip
+SUPPORTED_QUANT_PREFIXES = ("fp8", "int8", "Default")
+
+
+class MergedLoraCache(ConvertedCkptCache):
+    """Disk LRU of base checkpoints with LoRAs already merged in.
+
+    Keys hash the base checkpoint, the LoRA files and strengths and the quant
+    scheme. A miss runs `tools/convert/converter.py` on the same checkpoint the
+    model would load, with the LoRAs merged by the same `LoRALoader` (quantized
+    weights are dequantized, merged and requantized once, here, instead of at
+    every load). A hit is loaded as a plain checkpoint and skips the merge.
+    """
+
+    kind = "merged"
+
+    def __init__(self, cache_dir, max_bytes=None, build_on_miss=True):
+        super().__init__(cache_dir, max_bytes=max_bytes)
+        self.build_on_miss = build_on_miss
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get("merged_lora_cache", None)
+        if not cache_config or not cache_config.get("cache_dir"):
+            return None
+        max_gb = cache_config.get("max_gb", None)
+        return cls(
+            cache_dir=cache_config["cache_dir"],
+            max_bytes=int(max_gb * (1 << 30)) if max_gb else None,
+            build_on_miss=cache_config.get("build_on_miss", True),
+        )
+
+    @staticmethod
+    def source_ckpt(config, model_path):
+        """The checkpoint WanModel would load for `model_path`, the LoRAs are merged into it."""
+        if config.get("dit_quantized", False):
+            return resolve_quantized_ckpt(config, model_path) or config.get("dit_quantized_ckpt", None) or model_path
+        return config.get("dit_original_ckpt", None) or model_path
+
+    @staticmethod
+    def unsupported_reason(config):
+        if config.get("dit_quantized", False):
+            quant_scheme = config.get("dit_quant_scheme", "Default")
+            if not quant_scheme.startswith(SUPPORTED_QUANT_PREFIXES):
+                return f"quant scheme {quant_scheme} is not supported"
+        return None
+
+    def get_or_build(self, config, model_path, lora_configs):
+        """Path of the merged checkpoint, or None when the caller should merge at load time."""
+        reason = self.unsupported_reason(config)
+        if reason is not None:
+            logger.warning(f"[MergedLoraCache] disabled: {reason}")
+            return None
+        source = self.source_ckpt(config, model_path)
+        quant_scheme = config.get("dit_quant_scheme", "Default") if config.get("dit_quantized", False) else "bf16"
+        params = {
+            "loras": [{"path": c["path"], "strength": c.get("strength", 1.0)} for c in lora_configs],
+            "quant_scheme": quant_scheme,
+        }
+        key = self.make_key(
+            {
+                "base": fingerprint_weights(source),
+                "loras": [[hash_file(c["path"]), float(c.get("strength", 1.0))] for c in lora_configs],
+                "quant_scheme": quant_scheme,
+            }
+        )
+        artifact = self.lookup(key)
+        if artifact is not None:
+            logger.info(f"[MergedLoraCache] hit {key}")
+            return artifact
+        if not self.build_on_miss:
+            logger.info(f"[MergedLoraCache] miss {key}, merge at load time")
+            return None
+
+        strengths = [str(c.get("strength", 1.0)) for c in lora_configs]
+        converter_args = [
+            "--lora_path",
+            *[c["path"] for c in lora_configs],
+            # WanLoraWrapper applies alpha=strength and strength=strength
+            "--lora_alpha",
+            *strengths,
+            "--lora_strength",
+            *strengths,
+        ]
+        return self.get_or_convert(key, source, converter_args, params, save_by_block=config.get("lazy_load", False))
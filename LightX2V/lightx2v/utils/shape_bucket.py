@@ -0,0 +1,126 @@
+import math
+import os
+import threading
+
+import torch
+from loguru import logger
+
+from lightx2v.server.metrics import monitor_cli
+from lightx2v.utils.envs import *
+from lightx2v.utils.utils import isotropic_crop_resize
+
+DEFAULT_HW_BUCKETS = [
+    [480, 832],
+    [544, 960],
+    [720, 1280],
+    [832, 480],
+    [960, 544],
+    [1280, 720],
+    [480, 480],
+    [576, 576],
+    [960, 960],
+]
+
+CACHE_ARTIFACTS_FILE = "lightx2v_cache_artifacts.bin"
+
+
+class ShapeBucketer:
+    """Snap request shapes to a fixed set of (height, width, frames) buckets.
+
+    Each bucket maps to one compiled graph, so arbitrary request sizes reuse
+    a small number of graphs. Spatial buckets are chosen by nearest aspect
+    ratio then nearest area; frame buckets by the smallest bucket that holds
+    the requested frames, the extra frames are cropped after decoding.
+    """
+
+    def __init__(self, config):
+        self.hw_buckets = [tuple(hw) for hw in config.get("shape_buckets", DEFAULT_HW_BUCKETS)]
+        self.frame_buckets = sorted(config.get("frame_buckets", [config.get("target_video_length", 81)]))
+        self.vae_stride = config["vae_stride"]
+        self.patch_size = config["patch_size"]
+        for h, w in self.hw_buckets:
+            assert h % (self.vae_stride[1] * self.patch_size[1]) == 0 and w % (self.vae_stride[2] * self.patch_size[2]) == 0, f"shape bucket {h}x{w} is not aligned to vae_stride * patch_size"
+        for frames in self.frame_buckets:
+            assert (frames - 1) % self.vae_stride[0] == 0, f"frame bucket {frames} is not 1 + k * {self.vae_stride[0]}"
+        self.cache_dir = config.get("compile_cache_dir", None)
+        self.stats = {}
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            self.enable_persistent_cache(self.cache_dir)
+
+    def select_hw(self, height, width):
+        ratio = height / width
+        area = height * width
+        return min(self.hw_buckets, key=lambda hw: (round(abs(math.log(hw[0] / hw[1] / ratio)), 3), abs(hw[0] * hw[1] - area)))
+
+    def select_frames(self, num_frames):
+        for frames in self.frame_buckets:
+            if frames >= num_frames:
+                return frames
+        return None
+
+    @staticmethod
+    def graph_name(bucket):
+        return "bucket_{}x{}x{}".format(*bucket)
+
+    def fit_video(self, video, requested_shape):
+        """Crop the padded frames and resize a [B, C, T, H, W] decoder output back to the requested shape."""
+        height, width, num_frames = requested_shape
+        video = video[:, :, :num_frames]
+        if tuple(video.shape[-2:]) != (height, width):
+            b, c, t = video.shape[:3]
+            frames = video.permute(0, 2, 1, 3, 4).reshape(b * t, c, *video.shape[-2:])
+            frames = isotropic_crop_resize(frames.float(), (height, width)).to(video.dtype)
+            video = frames.reshape(b, t, c, height, width).permute(0, 2, 1, 3, 4)
+        return video
+
+    def record(self, bucket, compile_seconds=None):
+        name = self.graph_name(bucket)
+        result = "compile" if compile_seconds is not None else "hit"
+        with self._lock:
+            stat = self.stats.setdefault(name, {"hit": 0, "compile": 0, "compile_seconds": 0.0})
+            stat[result] += 1
+            if compile_seconds is not None:
+                stat["compile_seconds"] += compile_seconds
+            total = stat["hit"] + stat["compile"]
+            logger.info(f"[ShapeBucket] {name}: {result}, hit rate {stat['hit'] / total:.2%} ({total} requests), compile {stat['compile_seconds']:.1f}s")
+        if GET_RECORDER_MODE():
+            monitor_cli.lightx2v_shape_bucket_requests.labels(name, result).inc()
+            if compile_seconds is not None:
+                monitor_cli.lightx2v_shape_bucket_compile_duration.labels(name).observe(compile_seconds)
+        if compile_seconds is not None and self.cache_dir:
+            self.save_cache_artifacts()
+
+    def record_eager(self, requested_shape):
+        logger.info(f"[ShapeBucket] no bucket for {requested_shape}, run eager")
+        if GET_RECORDER_MODE():
+            monitor_cli.lightx2v_shape_bucket_requests.labels("none", "eager").inc()
+
+    def enable_persistent_cache(self, cache_dir):
+        # inductor and aot-autograd caches live on disk and are shared across restarts
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+        inductor_config = getattr(getattr(torch, "_inductor", None), "config", None)
+        if inductor_config is not None and hasattr(inductor_config, "fx_graph_cache"):
+            inductor_config.fx_graph_cache = True
+        functorch_config = getattr(getattr(torch, "_functorch", None), "config", None)
+        if functorch_config is not None and hasattr(functorch_config, "enable_autograd_cache"):
+            functorch_config.enable_autograd_cache = True
+        artifacts_path = os.path.join(cache_dir, CACHE_ARTIFACTS_FILE)
+        if os.path.exists(artifacts_path) and hasattr(torch.compiler, "load_cache_artifacts"):
+            with open(artifacts_path, "rb") as f:
+                torch.compiler.load_cache_artifacts(f.read())
+            logger.info(f"[ShapeBucket] Loaded compile cache artifacts from {artifacts_path}")
+        logger.info(f"[ShapeBucket] Persistent compile cache: {cache_dir}")
+
+    def save_cache_artifacts(self):
+        if not hasattr(torch.compiler, "save_cache_artifacts"):
+            return
+        artifacts = torch.compiler.save_cache_artifacts()
+        if artifacts is None:
+            return
+        artifacts_path = os.path.join(self.cache_dir, CACHE_ARTIFACTS_FILE)
+        tmp_path = f"{artifacts_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(artifacts[0])
+        os.replace(tmp_path, artifacts_path)
@@ -2,6 +2,7 @@ from lightx2v_platform.base.base import check_ai_device, init_ai_device  # noqa
 from lightx2v_platform.base.amd_rocm import AmdRocmDevice
 from lightx2v_platform.base.ascend_npu import NpuDevice
 from lightx2v_platform.base.cambricon_mlu import MluDevice
+from lightx2v_platform.base.cpu import CpuDevice
 from lightx2v_platform.base.hygon_dcu import HygonDcuDevice
 from lightx2v_platform.base.mthreads_musa import MusaDevice
 from lightx2v_platform.base.metax_cuda import MetaxDevice
@@ -12,6 +13,7 @@ __all__ = [
     "init_ai_device",
     "check_ai_device",
     "CudaDevice",
+    "CpuDevice",
     "MluDevice",
     "MetaxDevice",
     "HygonDcuDevice",
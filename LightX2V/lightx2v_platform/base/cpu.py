@@ -0,0 +1,26 @@
+import torch.distributed as dist
+
+from lightx2v_platform.registry_factory import PLATFORM_DEVICE_REGISTER
+
+
+@PLATFORM_DEVICE_REGISTER("cpu")
+class CpuDevice:
+    """Host-only platform, for benchmarks and debugging of the device independent paths."""
+
+    name = "cpu"
+
+    @staticmethod
+    def init_device_env():
+        pass
+
+    @staticmethod
+    def is_available() -> bool:
+        return True
+
+    @staticmethod
+    def get_device() -> str:
+        return "cpu"
+
+    @staticmethod
+    def init_parallel_env():
+        dist.init_process_group(backend="gloo")
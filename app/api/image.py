@@ -1,9 +1,11 @@
+import os
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from utils.task_manager import task_manager
 from utils.logger import logger
 from middlewares.auth import auth_required
 from utils.lora_utils import validate_lora_names, validate_lora_files
+from utils.result_delivery import send_result_file
 
 # 创建命名空间
 image_ns = Namespace('image', description='图片生成接口')
@@ -190,4 +192,29 @@ class ImageResult(Resource):
             
         except Exception as e:
             logger.error(f"获取图片生成结果失败: {e}")
-            return {'code': 500, 'msg': '获取任务结果失败', 'data': None}, 200
\ No newline at end of file
+            return {'code': 500, 'msg': '获取任务结果失败', 'data': None}, 200
+
+@image_ns.route('/result/<task_id>/file')
+class ImageResultFile(Resource):
+    @image_ns.response(200, '图片文件')
+    @image_ns.response(304, '图片未修改')
+    @auth_required
+    def get(self, task_id):
+        """下载图片生成结果，支持 Range 请求与 ETag 条件请求"""
+        try:
+            task_info = task_manager.get_task(task_id)
+            
+            if not task_info:
+                return {'code': 404, 'msg': '任务不存在', 'data': None}, 200
+            if task_info['status'] != 'completed' or not task_info['result']:
+                return {'code': 400, 'msg': '任务尚未完成', 'data': None}, 200
+            
+            image_path = task_info['result']['image_path']
+            if not os.path.exists(image_path):
+                return {'code': 404, 'msg': '结果文件不存在', 'data': None}, 200
+            
+            return send_result_file(image_path, etag=task_info['result'].get('image_etag'))
+            
+        except Exception as e:
+            logger.error(f"下载图片生成结果失败: {e}")
+            return {'code': 500, 'msg': '下载任务结果失败', 'data': None}, 200
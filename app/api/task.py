@@ -116,4 +116,27 @@ class TaskRetry(Resource):
             
         except Exception as e:
             logger.error(f"重试任务失败: {e}")
-            return {'code': 500, 'msg': '重试任务失败', 'data': None}, 200
\ No newline at end of file
+            return {'code': 500, 'msg': '重试任务失败', 'data': None}, 200
+
+
+@task_ns.route('/<task_id>/cancel')
+class TaskCancel(Resource):
+    @task_ns.response(200, '取消任务')
+    @auth_required
+    def post(self, task_id):
+        """取消任务，执行中的任务在下一个去噪步骤前停止"""
+        try:
+            success = task_manager.cancel_task(task_id)
+            
+            if not success:
+                return {'code': 400, 'msg': '任务不存在或已结束，无法取消', 'data': None}, 200
+            
+            return {
+                'code': 200,
+                'msg': '任务取消成功',
+                'data': None
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"取消任务失败: {e}")
+            return {'code': 500, 'msg': '取消任务失败', 'data': None}, 200
@@ -2,21 +2,60 @@ from flask import request
 from flask_restx import Namespace, Resource, fields
 from middlewares.auth import auth_required
 from utils.logger import logger
+from utils.upload_store import upload_store, UPLOAD_DIR
 import os
-import uuid
-import time
-from config.config import config
 
 # 创建命名空间
 upload_ns = Namespace('upload', description='文件上传接口')
 
-# 文件上传目录配置
-UPLOAD_DIR = os.path.join(config.FILE_SAVE_DIR, "ai-api-uploads")
-
 # 允许的图片和视频文件类型
 ALLOWED_IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'gif'}
 ALLOWED_VIDEO_TYPES = {'mp4', 'avi', 'mov', 'mkv'}
 
+# 定义请求模型
+upload_session_model = upload_ns.model('UploadSessionRequest', {
+    'file_name': fields.String(required=True, description='原始文件名，用于校验文件类型'),
+    'file_size': fields.Integer(required=True, description='文件总大小（字节）'),
+    'sha256': fields.String(required=False, description='文件内容的SHA-256，内容已存在时返回秒传校验挑战')
+})
+
+upload_proof_model = upload_ns.model('UploadProofRequest', {
+    'chunk_sha256': fields.String(required=True, description='会话挑战指定片段的SHA-256')
+})
+
+
+def _get_file_ext(filename):
+    """获取文件扩展名，不支持的类型返回 None"""
+    file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    if file_ext not in ALLOWED_IMAGE_TYPES and file_ext not in ALLOWED_VIDEO_TYPES:
+        return None
+    return file_ext
+
+
+def _file_data(blob, deduplicated):
+    """上传结果的响应数据"""
+    return {
+        'file_path': blob['file_path'],
+        'file_name': blob['file_name'],
+        'file_size': blob['file_size'],
+        'sha256': blob['sha256'],
+        'deduplicated': deduplicated,
+        'upload_time': blob['created_at']
+    }
+
+
+def _session_data(session):
+    """分片上传会话的响应数据"""
+    return {
+        'session_id': session['session_id'],
+        'file_size': session['file_size'],
+        'offset': session['offset'],
+        'challenge': session.get('challenge')
+    }
+
+
+UNSUPPORTED_TYPE_MSG = '不支持的文件类型，仅支持图片(png,jpg,jpeg,gif)和视频(mp4,avi,mov,mkv)'
+
 @upload_ns.route('/')
 class UploadFile(Resource):
     """文件上传接口"""
@@ -26,7 +65,7 @@ class UploadFile(Resource):
         """
         上传文件到服务器
         
-        支持上传图片和视频文件
+        支持上传图片和视频文件，内容相同的文件只保存一份
         """
         try:
             # 确保上传目录存在
@@ -42,36 +81,23 @@ class UploadFile(Resource):
                 }, 200
             
             # 检查文件类型
-            file_ext = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
-            if file_ext not in ALLOWED_IMAGE_TYPES and file_ext not in ALLOWED_VIDEO_TYPES:
+            file_ext = _get_file_ext(file.filename)
+            if file_ext is None:
                 return {
                     'code': 400,
-                    'msg': '不支持的文件类型，仅支持图片(png,jpg,jpeg,gif)和视频(mp4,avi,mov,mkv)',
+                    'msg': UNSUPPORTED_TYPE_MSG,
                     'data': None
                 }, 200
             
-            # 生成唯一的文件名
-            timestamp = int(time.time())
-            unique_filename = f"{timestamp}_{uuid.uuid4().hex[:8]}.{file_ext}"
+            # 流式保存并按内容去重
+            blob, deduplicated = upload_store.put_stream(file.stream, file_ext)
             
-            # 保存文件
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
-            file.save(file_path)
-            
-            # 获取文件大小
-            file_size = os.path.getsize(file_path)
-            
-            logger.info(f"文件上传成功: {file.filename} -> {unique_filename}, 大小: {file_size} bytes")
+            logger.info(f"文件上传成功: {file.filename} -> {blob['file_name']}, 大小: {blob['file_size']} bytes, 复用: {deduplicated}")
             
             return {
                 'code': 200,
                 'msg': '文件上传成功',
-                'data': {
-                    'file_path': file_path,
-                    'file_name': unique_filename,
-                    'file_size': file_size,
-                    'upload_time': timestamp
-                }
+                'data': _file_data(blob, deduplicated)
             }, 200
             
         except Exception as e:
@@ -81,3 +107,160 @@ class UploadFile(Resource):
                 'msg': '文件上传失败',
                 'data': None
             }, 200
+
+@upload_ns.route('/sessions')
+class UploadSessionCreate(Resource):
+    """创建分片上传会话"""
+    
+    @upload_ns.expect(upload_session_model)
+    @auth_required
+    def post(self):
+        """
+        创建分片上传会话
+        
+        提供sha256且内容已存在时，会话附带challenge（文件中的随机片段），
+        客户端提交该片段的哈希通过校验后秒传，不返回他人文件的路径
+        """
+        try:
+            data = request.get_json()
+            file_name = data.get('file_name', '')
+            file_size = data.get('file_size')
+            sha256 = data.get('sha256')
+            sha256 = sha256.lower() if sha256 else None
+            
+            file_ext = _get_file_ext(file_name)
+            if file_ext is None:
+                return {'code': 400, 'msg': UNSUPPORTED_TYPE_MSG, 'data': None}, 200
+            if not isinstance(file_size, int) or file_size <= 0:
+                return {'code': 400, 'msg': '文件大小无效', 'data': None}, 200
+            
+            session = upload_store.create_session(file_ext, file_size, sha256)
+            return {
+                'code': 200,
+                'msg': '上传会话创建成功',
+                'data': _session_data(session)
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"创建上传会话失败: {e}")
+            return {'code': 500, 'msg': '创建上传会话失败', 'data': None}, 200
+
+@upload_ns.route('/sessions/<string:session_id>')
+class UploadSession(Resource):
+    """分片上传会话"""
+    
+    @auth_required
+    def get(self, session_id):
+        """查询会话已接收的字节数，断点续传时从该偏移继续"""
+        try:
+            session = upload_store.get_session(session_id)
+            if session is None:
+                return {'code': 404, 'msg': '上传会话不存在或已过期', 'data': None}, 200
+            
+            return {
+                'code': 200,
+                'msg': '获取上传会话成功',
+                'data': _session_data(session)
+            }, 200
+            
+        except Exception as e:
+            logger.error(f"获取上传会话失败: {e}")
+            return {'code': 500, 'msg': '获取上传会话失败', 'data': None}, 200
+    
+    @auth_required
+    def put(self, session_id):
+        """
+        上传一个分片
+        
+        请求体为分片的原始字节，offset查询参数为分片在文件中的起始位置
+        """
+        try:
+            offset = request.args.get('offset', type=int)
+            if offset is None:
+                return {'code': 400, 'msg': '缺少offset参数', 'data': None}, 200
+            
+            session = upload_store.append_chunk(session_id, offset, request.stream)
+            return {
+                'code': 200,
+                'msg': '分片上传成功',
+                'data': _session_data(session)
+            }, 200
+            
+        except KeyError:
+            return {'code': 404, 'msg': '上传会话不存在或已过期', 'data': None}, 200
+        except ValueError as e:
+            session = upload_store.get_session(session_id)
+            return {'code': 409, 'msg': str(e), 'data': _session_data(session) if session else None}, 200
+        except Exception as e:
+            logger.error(f"分片上传失败: {e}")
+            return {'code': 500, 'msg': '分片上传失败', 'data': None}, 200
+    
+    @auth_required
+    def delete(self, session_id):
+        """取消分片上传会话"""
+        try:
+            upload_store.abort_session(session_id)
+            return {'code': 200, 'msg': '上传会话已取消', 'data': None}, 200
+            
+        except Exception as e:
+            logger.error(f"取消上传会话失败: {e}")
+            return {'code': 500, 'msg': '取消上传会话失败', 'data': None}, 200
+
+@upload_ns.route('/sessions/<string:session_id>/proof')
+class UploadSessionProof(Resource):
+    """秒传校验"""
+    
+    @upload_ns.expect(upload_proof_model)
+    @auth_required
+    def post(self, session_id):
+        """
+        提交会话challenge指定片段的SHA-256，校验通过时复用已有文件
+        
+        每个会话只能校验一次，失败后继续通过该会话上传文件内容
+        """
+        try:
+            data = request.get_json()
+            blob = upload_store.prove_session(session_id, data.get('chunk_sha256'))
+            
+            logger.info(f"秒传成功: {session_id} -> {blob['file_name']}")
+            
+            return {
+                'code': 200,
+                'msg': '文件上传成功',
+                'data': _file_data(blob, True)
+            }, 200
+            
+        except KeyError:
+            return {'code': 404, 'msg': '上传会话不存在或已过期', 'data': None}, 200
+        except ValueError as e:
+            session = upload_store.get_session(session_id)
+            return {'code': 409, 'msg': str(e), 'data': _session_data(session) if session else None}, 200
+        except Exception as e:
+            logger.error(f"秒传校验失败: {e}")
+            return {'code': 500, 'msg': '秒传校验失败', 'data': None}, 200
+
+@upload_ns.route('/sessions/<string:session_id>/complete')
+class UploadSessionComplete(Resource):
+    """完成分片上传"""
+    
+    @auth_required
+    def post(self, session_id):
+        """校验文件完整性并保存，内容已存在时复用已有文件"""
+        try:
+            blob, deduplicated = upload_store.complete_session(session_id)
+            
+            logger.info(f"分片上传完成: {session_id} -> {blob['file_name']}, 复用: {deduplicated}")
+            
+            return {
+                'code': 200,
+                'msg': '文件上传成功',
+                'data': _file_data(blob, deduplicated)
+            }, 200
+            
+        except KeyError:
+            return {'code': 404, 'msg': '上传会话不存在或已过期', 'data': None}, 200
+        except ValueError as e:
+            return {'code': 400, 'msg': str(e), 'data': None}, 200
+        except Exception as e:
+            logger.error(f"完成分片上传失败: {e}")
+            return {'code': 500, 'msg': '完成分片上传失败', 'data': None}, 200
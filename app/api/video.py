@@ -1,9 +1,11 @@
+import os
 from flask import request
 from flask_restx import Namespace, Resource, fields
 from utils.task_manager import task_manager
 from utils.logger import logger
 from middlewares.auth import auth_required
 from utils.lora_utils import validate_lora_names, validate_lora_files
+from utils.result_delivery import send_result_file
 
 # 创建命名空间
 video_ns = Namespace('video', description='视频生成接口')
@@ -182,10 +184,43 @@ class VideoResult(Resource):
                     'task_id': task_id,
                     'status': task_info['status'],
                     'result': task_info['result'],
-                    'error': task_info['error']
+                    'error': task_info['error'],
+                    # 生成中的低分辨率预览（预览图路径、当前步数、总步数）
+                    'preview': task_manager.get_task_preview(task_id) if task_info['status'] == 'processing' else None
                 }
             }, 200
             
         except Exception as e:
             logger.error(f"获取视频生成结果失败: {e}")
-            return {'code': 500, 'msg': '获取任务结果失败', 'data': None}, 200
\ No newline at end of file
+            return {'code': 500, 'msg': '获取任务结果失败', 'data': None}, 200
+
+@video_ns.route('/result/<task_id>/file')
+class VideoResultFile(Resource):
+    @video_ns.response(200, '视频文件')
+    @video_ns.response(206, '视频文件片段')
+    @video_ns.response(304, '视频未修改')
+    @auth_required
+    def get(self, task_id):
+        """下载视频生成结果，支持 Range 请求与 ETag 条件请求，默认返回 faststart 版本（variant=original 返回原始文件）"""
+        try:
+            task_info = task_manager.get_task(task_id)
+            
+            if not task_info:
+                return {'code': 404, 'msg': '任务不存在', 'data': None}, 200
+            if task_info['status'] != 'completed' or not task_info['result']:
+                return {'code': 400, 'msg': '任务尚未完成', 'data': None}, 200
+            
+            result = task_info['result']
+            variant = request.args.get('variant', 'faststart')
+            delivered_path = result.get('faststart_path') or result['video_path']
+            video_path = result['video_path'] if variant == 'original' else delivered_path
+            if not os.path.exists(video_path):
+                return {'code': 404, 'msg': '结果文件不存在', 'data': None}, 200
+            
+            # 完成时已计算过内容哈希的文件直接复用
+            etag = result.get('video_etag') if video_path == delivered_path else None
+            return send_result_file(video_path, etag=etag)
+            
+        except Exception as e:
+            logger.error(f"下载视频生成结果失败: {e}")
+            return {'code': 500, 'msg': '下载任务结果失败', 'data': None}, 200
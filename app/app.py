@@ -16,8 +16,8 @@ CORS(app, resources={
     r"/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "expose_headers": ["Content-Length"],
+        "allow_headers": ["Content-Type", "Authorization", "Range", "If-None-Match", "If-Range"],
+        "expose_headers": ["Content-Length", "Content-Range", "Accept-Ranges", "ETag"],
         "supports_credentials": True
     }
 })
@@ -39,6 +39,33 @@ class Config:
     WAN_MODEL_CONFIG_DIR = os.environ.get('WAN_MODEL_CONFIG_DIR', os.path.join(CONFIG_DIR, os.environ.get('WAN_TYPE', 'wan')))
     
     LORA_DIR = os.environ.get('LORA_DIR', '/loras')
+    # 预合并LoRA的模型缓存目录（为空表示不启用）与磁盘上限（GB）
+    MERGED_LORA_CACHE_DIR = os.environ.get('MERGED_LORA_CACHE_DIR', '')
+    MERGED_LORA_CACHE_MAX_GB = float(os.environ.get('MERGED_LORA_CACHE_MAX_GB', 200))
+    # 量化模型转换缓存目录（为空表示不启用，量化权重缺失时由原始权重转换一次）与磁盘上限（GB）
+    QUANT_CKPT_CACHE_DIR = os.environ.get('QUANT_CKPT_CACHE_DIR', '')
+    QUANT_CKPT_CACHE_MAX_GB = float(os.environ.get('QUANT_CKPT_CACHE_MAX_GB', 200))
+    # 音频特征缓存：内存层上限（MB，0 且未配置目录表示不启用）、磁盘层目录（为空表示只用内存）与磁盘上限（GB）
+    AUDIO_FEATURE_CACHE_RAM_MB = int(os.environ.get('AUDIO_FEATURE_CACHE_RAM_MB', 512))
+    AUDIO_FEATURE_CACHE_DIR = os.environ.get('AUDIO_FEATURE_CACHE_DIR', '')
+    AUDIO_FEATURE_CACHE_MAX_GB = float(os.environ.get('AUDIO_FEATURE_CACHE_MAX_GB', 20))
     RIFE_STATE = os.environ.get('RIFE_STATE', 'False').lower() == 'true'
+
+    # 上传文件无引用后的保留时间（秒）、分片上传会话过期时间（秒）、垃圾回收最小间隔（秒）
+    UPLOAD_TTL = int(os.environ.get('UPLOAD_TTL', 7 * 24 * 3600))
+    UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+    UPLOAD_GC_INTERVAL = int(os.environ.get('UPLOAD_GC_INTERVAL', 600))
+
+    # 去噪 checkpoint 间隔步数，0 表示不保存；每次保存都同步写出完整的去噪状态，开启时宜取较大间隔
+    CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', 0))
+
+    # 视频生成预览：每隔多少步用轻量VAE解码一帧预览（0 表示不启用）、预览最长边（像素）、预览耗时占去噪耗时的上限
+    PREVIEW_INTERVAL = int(os.environ.get('PREVIEW_INTERVAL', 0))
+    PREVIEW_MAX_SIDE = int(os.environ.get('PREVIEW_MAX_SIDE', 320))
+    PREVIEW_MAX_OVERHEAD = float(os.environ.get('PREVIEW_MAX_OVERHEAD', 0.1))
+
+    # 结果文件下载接口的缓存时间（秒），以及视频完成后是否预生成 moov 前置的 faststart 版本
+    RESULT_CACHE_MAX_AGE = int(os.environ.get('RESULT_CACHE_MAX_AGE', 86400))
+    RESULT_FASTSTART = os.environ.get('RESULT_FASTSTART', 'True').lower() == 'true'
 # 创建配置实例
 config = Config()
\ No newline at end of file
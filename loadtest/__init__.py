@@ -0,0 +1 @@
+# 压测工具：假模型后端与负载生成器，用于单独度量 API、Redis、RabbitMQ 与任务工作器的编排开销
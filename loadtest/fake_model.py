@@ -0,0 +1,132 @@
+import os
+import json
+import time
+from utils.model_scheduler import ModelMessage
+
+# 假模型耗时：加载模型（秒），每个推理步的基准耗时（秒，按分辨率与帧数缩放）
+FAKE_LOAD_SECONDS = float(os.environ.get('LOADTEST_LOAD_SECONDS', 2.0))
+FAKE_STEP_SECONDS = {
+    'text2img': float(os.environ.get('LOADTEST_IMAGE_STEP_SECONDS', 0.05)),
+    'img2img': float(os.environ.get('LOADTEST_IMAGE_STEP_SECONDS', 0.05)),
+    'text2video': float(os.environ.get('LOADTEST_VIDEO_STEP_SECONDS', 0.5)),
+    'img2video': float(os.environ.get('LOADTEST_VIDEO_STEP_SECONDS', 0.5)),
+}
+# 假视频实际写入的帧数，只用于让封面截取与 faststart 走真实路径
+FAKE_VIDEO_FRAMES = int(os.environ.get('LOADTEST_VIDEO_FRAMES', 8))
+# 假模型的加载/推理事件日志（JSON Lines），压测报告据此拆分模型耗时与编排开销
+EVENTS_FILE = os.environ.get('LOADTEST_EVENTS_FILE', '')
+
+# 基准分辨率与帧数，耗时按与它们的比例缩放
+REF_PIXELS = 544 * 960
+REF_FRAMES = 81
+
+
+def run_seconds(task_type, params):
+    """
+    假模型推理耗时，只由任务参数决定，相同参数的任务耗时相同
+
+    Args:
+        task_type: str, 任务类型
+        params: dict, 推理参数（模型进程收到的参数）
+
+    Returns:
+        float: 推理耗时（秒）
+    """
+    if task_type in ('text2img', 'img2img'):
+        steps = params.get('num_inference_steps') or 9
+        pixels = (params.get('width') or 512) * (params.get('height') or 512)
+        frames = REF_FRAMES
+    else:
+        steps = params.get('infer_steps') or 4
+        pixels = (params.get('target_width') or 544) * (params.get('target_height') or 960)
+        frames = params.get('target_video_length') or REF_FRAMES
+    return FAKE_STEP_SECONDS[task_type] * steps * pixels / REF_PIXELS * frames / REF_FRAMES
+
+
+class FakePipelineOutput:
+    """与 diffusers 管线输出相同的 images 字段"""
+    def __init__(self, images):
+        self.images = images
+
+
+def _record_event(event):
+    if not EVENTS_FILE:
+        return
+    with open(EVENTS_FILE, 'a') as f:
+        f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+def _sleep_cancellable(seconds, cancel_event, step=0.05):
+    """分片等待，取消事件置位时提前返回 False"""
+    deadline = time.time() + seconds
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return True
+        if cancel_event is not None and cancel_event.is_set():
+            return False
+        time.sleep(min(step, remaining))
+
+
+def _write_outputs(task_type, params):
+    """写出与真实管线相同位置的结果：图片任务返回图片，视频任务写 mp4"""
+    if task_type in ('text2img', 'img2img'):
+        from PIL import Image
+        image = Image.new('RGB', (params.get('width') or 512, params.get('height') or 512), (127, 127, 127))
+        return FakePipelineOutput([image])
+
+    import cv2
+    import numpy as np
+    width = params.get('target_width') or 544
+    height = params.get('target_height') or 960
+    writer = cv2.VideoWriter(params['save_result_path'], cv2.VideoWriter_fourcc(*'mp4v'), 16, (width, height))
+    for i in range(FAKE_VIDEO_FRAMES):
+        writer.write(np.full((height, width, 3), (i * 16) % 256, dtype=np.uint8))
+    writer.release()
+    return None
+
+
+def fake_model_worker_process(task_queue, result_queue, cancel_event=None):
+    """
+    假模型工作进程，与 model_worker_process 使用相同的消息协议，
+    加载和推理只按参数确定的时长等待并写出结果文件，不占用GPU
+    """
+    from utils.logger import logger
+
+    logger.info("假模型工作进程启动")
+    current_task = None
+    while True:
+        msg = task_queue.get()
+        if msg.msg_type == 'exit':
+            logger.info("收到退出消息，假模型工作进程将退出")
+            break
+
+        start_time = time.time()
+        if msg.msg_type == 'load':
+            time.sleep(FAKE_LOAD_SECONDS)
+            current_task = msg.task_type
+            _record_event({'event': 'load', 'task_type': msg.task_type, 'start': start_time, 'end': time.time()})
+            result_queue.put(ModelMessage('result', msg.task_type, result="success"))
+
+        elif msg.msg_type == 'run':
+            params = dict(msg.params)
+            params.pop('lora_configs', None)
+            try:
+                if current_task is None:
+                    raise RuntimeError("模型未加载")
+                if not _sleep_cancellable(run_seconds(msg.task_type, params), cancel_event):
+                    _record_event({'event': 'run', 'task_type': msg.task_type, 'prompt': params.get('prompt'), 'start': start_time, 'end': time.time(), 'status': 'cancelled'})
+                    result_queue.put(ModelMessage('cancelled', msg.task_type))
+                    continue
+                result = _write_outputs(msg.task_type, params)
+                _record_event({'event': 'run', 'task_type': msg.task_type, 'prompt': params.get('prompt'), 'start': start_time, 'end': time.time(), 'status': 'completed'})
+                result_queue.put(ModelMessage('result', msg.task_type, result=result))
+            except Exception as e:
+                logger.error(f"假模型工作进程运行任务失败: {e}")
+                result_queue.put(ModelMessage('error', msg.task_type, error=f"假模型工作进程运行任务失败: {e}"))
+
+        elif msg.msg_type == 'unload':
+            current_task = None
+            result_queue.put(ModelMessage('result', msg.task_type, result="success"))
+
+    logger.info("假模型工作进程已退出")
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+端到端压测：按到达模式与请求配比提交任务，轮询至完成，输出吞吐、端到端分位数、
+排队等待与各阶段开销的 JSON 报告。配合 loadtest.worker 的假模型，模型耗时由参数确定，
+报告中的 overhead 即 API + Redis + RabbitMQ + TaskWorker 的编排开销
+
+    # 自动启动 API 与假模型工作器（需本地 Redis、RabbitMQ）
+    python -m loadtest.run --spawn --pattern poisson --rate 0.5 --duration 120 \\
+        --mix text2video=3,text2img=1 --output loadtest_report.json
+
+    # 压测已启动的服务（工作器需以 python -m loadtest.worker 启动并设置相同的 LOADTEST_EVENTS_FILE）
+    python -m loadtest.run --base_url http://127.0.0.1:5001 --password xxx --events_file /tmp/events.jsonl
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.logger import logger
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各任务类型的提交接口与默认参数（不带 LoRA，避免依赖本地 LoRA 文件）
+TASK_ENDPOINTS = {
+    'text2img': '/api/image/text2img',
+    'img2img': '/api/image/img2img',
+    'text2video': '/api/video/text2video',
+    'img2video': '/api/video/img2video',
+}
+DEFAULT_PARAMS = {
+    'text2img': {'prompt': 'a cat sitting on a windowsill', 'steps': 9, 'width': 512, 'height': 512},
+    'img2img': {'prompt': 'make it watercolor', 'steps': 9, 'width': 512, 'height': 512},
+    'text2video': {'prompt': 'waves rolling onto a beach', 'steps': 4, 'width': 544, 'height': 960, 'num_frames': 81},
+    'img2video': {'prompt': 'the person turns and smiles', 'steps': 4, 'width': 544, 'height': 960, 'num_frames': 81},
+}
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled')
+STAGES = ['submit', 'queue_wait', 'pre', 'model_load', 'model_run', 'post', 'report', 'overhead', 'e2e']
+
+
+def arrival_times(pattern, rate, duration, burst_size=10, seed=0):
+    """
+    到达时间（相对压测开始的秒数），相同参数生成相同序列
+
+    Args:
+        pattern: str, 'constant' 固定间隔、'poisson' 泊松到达、'burst' 每隔 burst_size/rate 秒一次提交 burst_size 个、
+            'ramp' 速率从 0 线性增加到 rate
+        rate: float, 平均到达速率（个/秒），ramp 为结束时的速率
+        duration: float, 压测时长（秒）
+
+    Returns:
+        list: 到达时间列表
+    """
+    rng = random.Random(seed)
+    times = []
+    if pattern == 'constant':
+        times = [i / rate for i in range(int(duration * rate))]
+    elif pattern == 'poisson':
+        t = rng.expovariate(rate)
+        while t < duration:
+            times.append(t)
+            t += rng.expovariate(rate)
+    elif pattern == 'burst':
+        period = burst_size / rate
+        t = 0.0
+        while t < duration:
+            times.extend([t] * burst_size)
+            t += period
+    elif pattern == 'ramp':
+        # 累计到达数 rate * t^2 / (2 * duration)
+        count = int(rate * duration / 2)
+        times = [math.sqrt(2 * i * duration / rate) for i in range(count)]
+    else:
+        raise ValueError(f"不支持的到达模式: {pattern}")
+    return times
+
+
+def parse_mix(mix):
+    """'text2video=3,text2img=1' -> {'text2video': 3.0, 'text2img': 1.0}"""
+    weights = {}
+    for item in mix.split(','):
+        task_type, _, weight = item.partition('=')
+        task_type = task_type.strip()
+        if task_type not in TASK_ENDPOINTS:
+            raise ValueError(f"不支持的任务类型: {task_type}")
+        weights[task_type] = float(weight or 1)
+    return weights
+
+
+def percentiles(values):
+    """最近秩分位数与均值"""
+    if not values:
+        return None
+    values = sorted(values)
+
+    def rank(p):
+        return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4),
+        'p50': round(rank(50), 4),
+        'p95': round(rank(95), 4),
+        'p99': round(rank(99), 4),
+        'max': round(values[-1], 4),
+    }
+
+
+class LoadTest:
+    """负载生成器：提交线程按到达时间提交任务，轮询线程跟踪未结束的任务"""
+
+    def __init__(self, base_url, password, arrivals, mix, params=None, image_path=None, poll_interval=0.2, concurrency=16, seed=0):
+        self.base_url = base_url.rstrip('/')
+        self.password = password
+        self.arrivals = arrivals
+        self.mix = mix
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.image_path = image_path
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.token = None
+        self.local = threading.local()
+        self.records = []
+        self.records_lock = threading.Lock()
+        self.pending = {}  # task_id -> record
+        self.pending_lock = threading.Lock()
+        self.submitting_done = threading.Event()
+
+    def session(self):
+        # requests.Session 不保证线程安全，每个线程一个
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            if self.token:
+                self.local.session.headers['Authorization'] = f"Bearer {self.token}"
+        return self.local.session
+
+    def login(self):
+        response = requests.post(f"{self.base_url}/api/auth/login", json={'password': self.password}, timeout=10)
+        body = response.json()
+        if body.get('code') != 200:
+            raise RuntimeError(f"登录失败: {body.get('msg')}")
+        self.token = body['data']['token']
+
+    def build_request(self, index):
+        task_types = list(self.mix.keys())
+        task_type = self.rng.choices(task_types, weights=[self.mix[t] for t in task_types])[0]
+        payload = dict(self.params[task_type])
+        # 提示词带上唯一标记，用于在假模型事件日志中找到该任务的加载与推理耗时
+        payload['prompt'] = f"loadtest {self.run_id}-{index}: {payload.get('prompt', '')}"
+        if task_type in ('img2img', 'img2video'):
+            payload['image_path'] = self.image_path
+        return task_type, payload
+
+    def submit(self, index, task_type, payload, scheduled_at):
+        record = {'index': index, 'task_type': task_type, 'prompt': payload['prompt'], 'scheduled_at': scheduled_at, 'send_time': time.time()}
+        try:
+            response = self.session().post(f"{self.base_url}{TASK_ENDPOINTS[task_type]}", json=payload, timeout=30)
+            body = response.json()
+            record['submitted_time'] = time.time()
+            if body.get('code') != 200:
+                record['status'] = 'rejected'
+                record['error'] = body.get('msg')
+            else:
+                record['task_id'] = body['data']['task_id']
+                record['status'] = 'pending'
+                with self.pending_lock:
+                    self.pending[record['task_id']] = record
+        except Exception as e:
+            record['status'] = 'rejected'
+            record['error'] = str(e)
+        with self.records_lock:
+            self.records.append(record)
+
+    def submit_loop(self):
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for index, offset in enumerate(self.arrivals):
+                delay = start + offset - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                task_type, payload = self.build_request(index)
+                executor.submit(self.submit, index, task_type, payload, start + offset)
+        self.submitting_done.set()
+
+    def poll_loop(self, drain_timeout):
+        drain_deadline = None
+        while True:
+            with self.pending_lock:
+                task_ids = list(self.pending.keys())
+            if self.submitting_done.is_set():
+                if not task_ids:
+                    break
+                drain_deadline = drain_deadline or time.time() + drain_timeout
+                if time.time() > drain_deadline:
+                    logger.warning(f"压测收尾超时，{len(task_ids)} 个任务未结束")
+                    break
+            for task_id in task_ids:
+                try:
+                    body = self.session().get(f"{self.base_url}/api/task/{task_id}", timeout=10).json()
+                except Exception as e:
+                    logger.warning(f"查询任务失败: {task_id}, {e}")
+                    continue
+                task = body.get('data') or {}
+                if task.get('status') in TERMINAL_STATUSES:
+                    with self.pending_lock:
+                        record = self.pending.pop(task_id)
+                    record['status'] = task['status']
+                    record['done_time'] = time.time()
+                    record['render_start_time'] = task.get('render_start_time')
+                    record['render_end_time'] = task.get('render_end_time')
+                    record['error'] = task.get('error')
+            time.sleep(self.poll_interval)
+        with self.pending_lock:
+            for record in self.pending.values():
+                record['status'] = 'timeout'
+
+    def run(self, drain_timeout=600):
+        self.login()
+        logger.info(f"开始压测 {self.run_id}: {len(self.arrivals)} 个请求，配比 {self.mix}")
+        submitter = threading.Thread(target=self.submit_loop, daemon=True)
+        submitter.start()
+        self.poll_loop(drain_timeout)
+        submitter.join()
+        return self.records
+
+
+def load_model_events(events_file):
+    """读取假模型事件日志，按提示词返回 {'model_load', 'model_run', 'run_start', 'run_end'}"""
+    if not events_file or not os.path.exists(events_file):
+        return {}
+    with open(events_file, 'r') as f:
+        events = sorted((json.loads(line) for line in f if line.strip()), key=lambda e: e['start'])
+    by_prompt = {}
+    load_s = 0.0
+    for event in events:
+        if event['event'] == 'load':
+            # 加载紧接着同一任务的推理，计入该任务
+            load_s += event['end'] - event['start']
+        elif event['event'] == 'run':
+            by_prompt[event['prompt']] = {
+                'model_load': load_s,
+                'model_run': event['end'] - event['start'],
+                'run_start': event['start'],
+                'run_end': event['end'],
+            }
+            load_s = 0.0
+    return by_prompt
+
+
+def stage_times(record, model):
+    """单个完成任务的各阶段耗时（秒）"""
+    stages = {
+        'submit': record['submitted_time'] - record['send_time'],
+        'e2e': record['done_time'] - record['send_time'],
+    }
+    if record.get('render_start_time') and record.get('render_end_time'):
+        stages['queue_wait'] = record['render_start_time'] - record['submitted_time']
+        stages['report'] = record['done_time'] - record['render_end_time']
+        if model is not None:
+            stages['model_load'] = model['model_load']
+            stages['model_run'] = model['model_run']
+            stages['pre'] = model['run_start'] - record['render_start_time'] - model['model_load']
+            stages['post'] = record['render_end_time'] - model['run_end']
+            stages['overhead'] = stages['e2e'] - model['model_load'] - model['model_run']
+    return stages
+
+
+def build_report(records, events_file, config):
+    model_events = load_model_events(events_file)
+    completed = [r for r in records if r['status'] == 'completed']
+    counts = {}
+    for record in records:
+        counts[record['status']] = counts.get(record['status'], 0) + 1
+
+    samples = {stage: [] for stage in STAGES}
+    by_type = {}
+    for record in completed:
+        stages = stage_times(record, model_events.get(record['prompt']))
+        record['stages'] = {k: round(v, 4) for k, v in stages.items()}
+        type_samples = by_type.setdefault(record['task_type'], {stage: [] for stage in STAGES})
+        for stage, value in stages.items():
+            samples[stage].append(value)
+            type_samples[stage].append(value)
+
+    wall = None
+    if completed:
+        wall = max(r['done_time'] for r in completed) - min(r['send_time'] for r in records)
+    return {
+        'config': config,
+        'requests': len(records),
+        'statuses': counts,
+        'wall_seconds': round(wall, 3) if wall else None,
+        'throughput_per_second': round(len(completed) / wall, 4) if wall else 0.0,
+        'stages': {stage: percentiles(values) for stage, values in samples.items() if values},
+        'by_task_type': {
+            task_type: {stage: percentiles(values) for stage, values in type_samples.items() if values}
+            for task_type, type_samples in by_type.items()
+        },
+        'failures': [{'task_type': r['task_type'], 'status': r['status'], 'error': r.get('error')} for r in records if r['status'] != 'completed'][:20],
+    }
+
+
+def wait_healthy(base_url, processes, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for process in processes:
+            if process.poll() is not None:
+                raise RuntimeError(f"压测服务进程已退出: {process.args}")
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError("等待 API 服务启动超时")
+
+
+def spawn_services(port, work_dir, events_file, password):
+    """启动 API 与假模型工作器，文件写入临时目录，返回进程列表"""
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'HOST': '127.0.0.1',
+        'LOGIN_PASSWORD': password,
+        'FILE_SAVE_DIR': work_dir,
+        'LOADTEST_EVENTS_FILE': events_file,
+    })
+    processes = [
+        subprocess.Popen([sys.executable, 'api.py'], cwd=ROOT_DIR, env=env),
+        subprocess.Popen([sys.executable, '-m', 'loadtest.worker'], cwd=ROOT_DIR, env=env),
+    ]
+    return processes
+
+
+def stop_services(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def make_input_image(path):
+    from PIL import Image
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', (544, 960), (90, 120, 150)).save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI API Server 端到端压测')
+    parser.add_argument('--base_url', default=None, help='API 地址，默认 http://127.0.0.1:<port>')
+    parser.add_argument('--port', type=int, default=5101, help='--spawn 时 API 监听端口')
+    parser.add_argument('--password', default=None, help='登录密码，默认取配置 LOGIN_PASSWORD')
+    parser.add_argument('--spawn', action='store_true', help='启动 API 与假模型工作器（使用本地 Redis、RabbitMQ）')
+    parser.add_argument('--pattern', default='poisson', choices=['constant', 'poisson', 'burst', 'ramp'])
+    parser.add_argument('--rate', type=float, default=0.5, help='平均到达速率（个/秒）')
+    parser.add_argument('--duration', type=float, default=60, help='提交请求的时长（秒）')
+    parser.add_argument('--burst_size', type=int, default=10)
+    parser.add_argument('--mix', default='text2video=1', help='请求配比，如 text2video=3,text2img=1')
+    parser.add_argument('--params_file', default=None, help='JSON 文件，按任务类型覆盖默认请求参数')
+    parser.add_argument('--image_path', default=None, help='img2img/img2video 使用的服务器上的图片路径')
+    parser.add_argument('--events_file', default=None, help='假模型事件日志，与工作器的 LOADTEST_EVENTS_FILE 一致')
+    parser.add_argument('--poll_interval', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, default=16, help='同时进行的提交请求数')
+    parser.add_argument('--drain_timeout', type=float, default=600, help='提交结束后等待任务完成的最长时间（秒）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='报告输出路径，默认打印到标准输出')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    params = None
+    if args.params_file:
+        with open(args.params_file, 'r') as f:
+            params = json.load(f)
+    arrivals = arrival_times(args.pattern, args.rate, args.duration, burst_size=args.burst_size, seed=args.seed)
+
+    processes = []
+    work_dir = None
+    password = args.password
+    events_file = args.events_file
+    image_path = args.image_path
+    base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    if args.spawn:
+        work_dir = tempfile.mkdtemp(prefix='ai-api-loadtest-')
+        events_file = events_file or os.path.join(work_dir, 'model_events.jsonl')
+        password = password or uuid.uuid4().hex
+        image_path = image_path or make_input_image(os.path.join(work_dir, 'loadtest', 'input.png'))
+        processes = spawn_services(args.port, work_dir, events_file, password)
+    elif password is None:
+        from config.config import config
+        password = config.LOGIN_PASSWORD
+    if any(t in mix for t in ('img2img', 'img2video')) and not image_path:
+        parser.error('img2img/img2video 需要 --image_path 或 --spawn')
+
+    try:
+        if processes:
+            wait_healthy(base_url, processes)
+        load_test = LoadTest(base_url, password, arrivals, mix, params=params, image_path=image_path,
+                             poll_interval=args.poll_interval, concurrency=args.concurrency, seed=args.seed)
+        records = load_test.run(drain_timeout=args.drain_timeout)
+    finally:
+        if processes:
+            stop_services(processes)
+
+    config = {k: v for k, v in vars(args).items() if k != 'password'}
+    config['work_dir'] = work_dir
+    report = build_report(records, events_file, config)
+    report['records'] = sorted(records, key=lambda r: r['index'])
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        logger.info(f"压测报告已写入: {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+压测用任务工作器启动脚本：与 start_worker.py 相同，但模型进程替换为假模型
+
+    python -m loadtest.worker
+"""
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.model_scheduler import model_scheduler
+from loadtest.fake_model import fake_model_worker_process
+import start_worker
+
+if __name__ == "__main__":
+    model_scheduler.worker_target = fake_model_worker_process
+    start_worker.main()
@@ -67,18 +67,22 @@ def _format_lora_configs(lora_configs: Optional[List[LoraConfig]] | None) -> Opt
     
     return formatted_configs
 
+class TaskCancelledError(Exception):
+    """推理被协作式取消，模型进程仍然可用"""
+    pass
+
 # 定义进程间通信的消息类型
 class ModelMessage:
     """模型进程间通信消息"""
     def __init__(self, msg_type, task_type=None, params=None, result=None, error=None):
-        self.msg_type = msg_type  # 'load', 'run', 'unload', 'exit', 'result', 'error'
+        self.msg_type = msg_type  # 'load', 'run', 'unload', 'exit', 'result', 'error', 'cancelled'
         self.task_type = task_type
         self.params = params
         self.result = result
         self.error = error
 
 # 模型工作进程函数
-def model_worker_process(task_queue, result_queue):
+def model_worker_process(task_queue, result_queue, cancel_event=None):
     """模型工作进程，负责加载和运行模型"""
     import torch
     from utils.logger import logger
@@ -120,6 +124,9 @@ def model_worker_process(task_queue, result_queue):
                     elif msg.task_type == 'img2video':
                         model_pipeline = _load_wan_i2v_model_worker(msg.params, lora_configs=lora_configs)
                     
+                    # 注入取消事件，推理在每个去噪 step 前检查
+                    if cancel_event is not None and hasattr(model_pipeline, 'set_stop_event'):
+                        model_pipeline.set_stop_event(cancel_event)
                     current_task = msg.task_type
                     logger.info(f"模型 (任务: {current_task}) 加载成功")
                     result_queue.put(ModelMessage('result', msg.task_type, result="success"))
@@ -143,6 +150,11 @@ def model_worker_process(task_queue, result_queue):
                     logger.info(f"模型工作进程运行任务: {msg.task_type}")
                     if model_pipeline is None:
                         raise RuntimeError("模型未加载")
+                    # 加载模型期间已收到取消请求，不再合并 LoRA 和推理
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info(f"模型工作进程任务已取消: {msg.task_type}")
+                        result_queue.put(ModelMessage('cancelled', msg.task_type))
+                        continue
                     lora_configs = msg.params.get('lora_configs')
                     if 'lora_configs' in msg.params:
                         del msg.params['lora_configs']
@@ -176,6 +188,10 @@ def model_worker_process(task_queue, result_queue):
                     logger.info(f"模型工作进程任务完成: {msg.task_type}")
                     result_queue.put(ModelMessage('result', msg.task_type, result=result))
                 except Exception as e:
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info(f"模型工作进程任务已取消: {msg.task_type}")
+                        result_queue.put(ModelMessage('cancelled', msg.task_type))
+                        continue
                     import traceback
                     error_traceback = traceback.format_exc()
                     logger.error(f"模型工作进程运行任务失败: {e}\n{error_traceback}")
@@ -474,6 +490,9 @@ class ModelScheduler:
         self.model_process = None  # 模型工作进程
         self.task_queue = None  # 任务队列
         self.result_queue = None  # 结果队列
+        self.cancel_event = None  # 协作式取消事件
+        # 模型工作进程入口，压测时替换为 loadtest.fake_model 中不加载模型的假模型
+        self.worker_target = model_worker_process
         
         # 确保multiprocessing以spawn模式启动（支持CUDA的多进程使用）
         mp.set_start_method('spawn', force=True)
@@ -524,11 +543,12 @@ class ModelScheduler:
         # 创建进程间通信队列
         self.task_queue = mp.Queue()
         self.result_queue = mp.Queue()
+        self.cancel_event = mp.Event()
         
         # 创建并启动工作进程
         self.model_process = mp.Process(
-            target=model_worker_process,
-            args=(self.task_queue, self.result_queue)
+            target=self.worker_target,
+            args=(self.task_queue, self.result_queue, self.cancel_event)
         )
         self.model_process.daemon = True  # 设置为守护进程
         self.model_process.start()
@@ -557,6 +577,7 @@ class ModelScheduler:
             # 清理队列和进程引用
             self.task_queue = None
             self.result_queue = None
+            self.cancel_event = None
             self.model_process = None
         
         self.current_task = None
@@ -713,10 +734,14 @@ class ModelScheduler:
             if self.model_process is None or not self.model_process.is_alive():
                 raise RuntimeError("模型工作进程未运行")
             
-            # 发送推理消息
+            # 发送推理消息（取消事件在任务开始时已清除，加载模型期间收到的取消请求保留到推理）
             msg = ModelMessage('run', self.current_task, params=kwargs)
             result_msg = self._send_message(msg, timeout=600)  # 增加推理超时时间
             
+            if result_msg.msg_type == 'cancelled':
+                # 取消不是故障，保留已加载的模型进程
+                raise TaskCancelledError("推理已取消")
+            
             if result_msg.msg_type == 'error':
                 # 如果推理失败，终止进程并抛出异常
                 logger.warning(f"推理失败，将终止模型进程: {result_msg.error}")
@@ -727,6 +752,17 @@ class ModelScheduler:
         
         return inference
     
+    def cancel_current(self):
+        """请求取消正在运行的推理，推理在下一个去噪 step 前停止"""
+        if self.cancel_event is not None and not self.cancel_event.is_set():
+            logger.info("请求取消当前推理")
+            self.cancel_event.set()
+    
+    def reset_cancel(self):
+        """清除上一个任务遗留的取消请求，在任务开始、加载模型之前调用"""
+        if self.cancel_event is not None:
+            self.cancel_event.clear()
+    
     def get_gpu_memory_info(self):
         import torch
         """
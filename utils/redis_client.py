@@ -72,9 +72,9 @@ class RedisClient:
         return self.client.get(key)
     
     @_reconnect_wrapper
-    def set(self, key, value, ex=None):
-        """设置键值，可选过期时间"""
-        return self.client.set(key, value, ex=ex)
+    def set(self, key, value, ex=None, nx=False):
+        """设置键值，可选过期时间；nx 为 True 时仅在键不存在时设置"""
+        return self.client.set(key, value, ex=ex, nx=nx)
     
     @_reconnect_wrapper
     def delete(self, key):
@@ -120,6 +120,26 @@ class RedisClient:
     def hdel(self, name, *keys):
         """删除Hash的字段"""
         return self.client.hdel(name, *keys)
+    
+    @_reconnect_wrapper
+    def sadd(self, name, *values):
+        """向集合添加成员"""
+        return self.client.sadd(name, *values)
+    
+    @_reconnect_wrapper
+    def srem(self, name, *values):
+        """从集合移除成员"""
+        return self.client.srem(name, *values)
+    
+    @_reconnect_wrapper
+    def scard(self, name):
+        """获取集合的成员数"""
+        return self.client.scard(name)
+    
+    @_reconnect_wrapper
+    def eval(self, script, numkeys, *keys_and_args):
+        """原子执行Lua脚本"""
+        return self.client.eval(script, numkeys, *keys_and_args)
 
 # 创建Redis客户端实例
 redis_client = RedisClient()
\ No newline at end of file
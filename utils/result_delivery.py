@@ -0,0 +1,135 @@
+import os
+import struct
+import hashlib
+import subprocess
+import threading
+from collections import OrderedDict
+from flask import send_file
+from utils.logger import logger
+from config.config import config
+
+# 计算内容哈希时的读取块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 内容哈希缓存的最大条目数
+ETAG_MEMO_SIZE = 1024
+
+# (路径, 大小, 修改时间) -> 内容哈希，最久未使用的在前
+_etag_memo = OrderedDict()
+_etag_lock = threading.Lock()
+
+
+def content_etag(file_path):
+    """
+    文件内容的强 ETag（SHA-256），按路径、大小和修改时间缓存
+
+    Args:
+        file_path: str, 文件路径
+
+    Returns:
+        str: 不带引号的 ETag
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _etag_lock:
+        if memo_key in _etag_memo:
+            _etag_memo.move_to_end(memo_key)
+            return _etag_memo[memo_key]
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    etag = hasher.hexdigest()
+    with _etag_lock:
+        _etag_memo[memo_key] = etag
+        _etag_memo.move_to_end(memo_key)
+        while len(_etag_memo) > ETAG_MEMO_SIZE:
+            _etag_memo.popitem(last=False)
+    return etag
+
+
+def is_faststart(file_path):
+    """
+    MP4 的 moov 是否位于 mdat 之前（播放器无需读到文件末尾即可开始播放）
+
+    Args:
+        file_path: str, MP4 文件路径
+
+    Returns:
+        bool: moov 在前返回 True，无法解析时返回 False
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, box_type = struct.unpack('>I4s', f.read(8))
+            if size == 1:
+                size = struct.unpack('>Q', f.read(8))[0]
+            elif size == 0:
+                size = file_size - offset
+            if box_type == b'moov':
+                return True
+            if box_type == b'mdat' or size < 8:
+                return False
+            offset += size
+    return False
+
+
+def faststart_path_of(video_path):
+    """视频的 faststart 版本路径"""
+    root, ext = os.path.splitext(video_path)
+    return f"{root}_faststart{ext}"
+
+
+def make_faststart(video_path):
+    """
+    预生成 moov 前置的 MP4（仅重新封装，不重新编码）
+
+    Args:
+        video_path: str, 原始视频路径
+
+    Returns:
+        str: 可用于边下边播的视频路径；原视频已是 faststart 时返回原路径，生成失败返回 None
+    """
+    try:
+        if is_faststart(video_path):
+            return video_path
+        output_path = faststart_path_of(video_path)
+        tmp_path = output_path + '.tmp.mp4'
+        subprocess.run(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_path, '-c', 'copy', '-map', '0', '-movflags', '+faststart', tmp_path],
+            check=True,
+            capture_output=True,
+            timeout=300
+        )
+        os.replace(tmp_path, output_path)
+        logger.info(f"生成 faststart 视频: {output_path}")
+        return output_path
+    except Exception as e:
+        logger.warning(f"生成 faststart 视频失败: {video_path}, {e}")
+        return None
+
+
+def send_result_file(file_path, etag=None):
+    """
+    发送任务结果文件，支持 Range 断点/拖动请求、If-None-Match/If-Range 条件请求与缓存头
+
+    Args:
+        file_path: str, 结果文件路径
+        etag: str, 预先计算的内容哈希，为空时按文件内容计算
+
+    Returns:
+        Response: Flask 响应（200/206/304/416）
+    """
+    response = send_file(
+        file_path,
+        conditional=True,
+        etag=etag or content_etag(file_path),
+        max_age=config.RESULT_CACHE_MAX_AGE,
+        last_modified=os.path.getmtime(file_path)
+    )
+    # 结果文件生成后不再修改，可被浏览器和中间缓存长期复用
+    response.cache_control.immutable = True
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
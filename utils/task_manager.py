@@ -3,6 +3,7 @@ import uuid
 import time
 from utils.redis_client import redis_client
 from utils.rabbitmq_client import rabbitmq_client
+from utils.upload_store import upload_store
 from utils.logger import logger
 
 class TaskManager:
@@ -13,6 +14,8 @@ class TaskManager:
         self.rabbitmq = rabbitmq_client
         self.task_queue_name = "ai_task_queue"
         self.task_info_hash_key = "ai_task:info"  # 使用单个Hash键存储所有任务信息
+        self.task_cancel_key_prefix = "ai_task:cancel:"  # 运行中任务的取消标记
+        self.task_preview_hash_key = "ai_task:preview"  # 生成预览单独存储，不改写任务记录
     
     def create_task(self, task_type, task_params):
         """
@@ -42,6 +45,9 @@ class TaskManager:
         # 存储任务信息到Redis Hash
         self.redis.hset(self.task_info_hash_key, task_id, json.dumps(task_info))
         
+        # 登记任务对上传文件的引用，防止执行前被垃圾回收
+        upload_store.acquire(task_params.get('image_path'), task_id)
+        
         # 将任务ID加入RabbitMQ队列
         self.rabbitmq.publish_message(self.task_queue_name, task_id, durable=True)
         
@@ -89,6 +95,10 @@ class TaskManager:
         # 更新任务信息到Redis Hash
         self.redis.hset(self.task_info_hash_key, task_id, json.dumps(task_info))
         
+        # 任务结束后释放输入文件的引用，重试时重新登记
+        if status in ('completed', 'cancelled', 'failed'):
+            upload_store.release(task_info['params'].get('image_path'), task_id)
+        
         logger.info(f"更新任务状态: {task_id}, 状态: {status}")
         return True
     
@@ -154,12 +164,49 @@ class TaskManager:
         
         # 更新任务状态为pending
         self.update_task_status(task_id, 'pending', result=None, error=None)
+        upload_store.acquire(task_info['params'].get('image_path'), task_id)
         
         # 将任务重新加入RabbitMQ队列
         self.rabbitmq.publish_message(self.task_queue_name, task_id, durable=True)
         logger.info(f"任务重新加入RabbitMQ队列: {task_id}")
         return True
     
+    def cancel_task(self, task_id):
+        """
+        取消任务，排队中的任务直接标记为cancelled，执行中的任务写入取消标记，
+        由任务工作者在下一个去噪 step 前停止推理
+        
+        Args:
+            task_id: str, 任务ID
+        
+        Returns:
+            bool: 是否成功
+        """
+        task_info = self.get_task(task_id)
+        if not task_info:
+            logger.warning(f"任务不存在: {task_id}")
+            return False
+        
+        if task_info['status'] == 'pending':
+            self.update_task_status(task_id, 'cancelled')
+            return True
+        
+        if task_info['status'] == 'processing':
+            self.redis.set(f"{self.task_cancel_key_prefix}{task_id}", 1, ex=3600)
+            logger.info(f"任务取消请求已发送: {task_id}")
+            return True
+        
+        logger.warning(f"任务已结束，无法取消: {task_id}")
+        return False
+    
+    def is_cancel_requested(self, task_id):
+        """检查执行中的任务是否收到取消请求"""
+        return bool(self.redis.exists(f"{self.task_cancel_key_prefix}{task_id}"))
+    
+    def clear_cancel(self, task_id):
+        """清除任务的取消标记"""
+        self.redis.delete(f"{self.task_cancel_key_prefix}{task_id}")
+    
     def update_task_render_time(self, task_id, time_type, timestamp):
         """
         更新任务渲染时间戳
@@ -187,6 +234,30 @@ class TaskManager:
         logger.info(f"更新任务渲染时间: {task_id}, 类型: {time_type}, 时间戳: {timestamp}")
         return True
     
+    def update_task_preview(self, task_id, preview):
+        """
+        更新任务的生成预览信息
+        
+        预览单独写入 task_preview_hash_key，不读改写任务记录，避免覆盖并发的状态更新
+        
+        Args:
+            task_id: str, 任务ID
+            preview: dict, 预览信息（预览图路径、步数、预览耗时等）
+        """
+        self.redis.hset(self.task_preview_hash_key, task_id, json.dumps(preview))
+        return True
+    
+    def get_task_preview(self, task_id):
+        """获取任务的生成预览信息，没有预览时返回None"""
+        preview_str = self.redis.hget(self.task_preview_hash_key, task_id)
+        if not preview_str:
+            return None
+        return json.loads(preview_str)
+    
+    def clear_task_preview(self, task_id):
+        """删除任务的生成预览信息"""
+        self.redis.hdel(self.task_preview_hash_key, task_id)
+    
     def delete_task(self, task_id):
         """
         删除任务
@@ -209,6 +280,8 @@ class TaskManager:
         
         # 从Redis中删除任务
         self.redis.hdel(self.task_info_hash_key, task_id)
+        self.clear_task_preview(task_id)
+        upload_store.release(task_info['params'].get('image_path'), task_id)
         logger.info(f"任务删除成功: {task_id}")
         return True
 
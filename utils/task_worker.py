@@ -3,12 +3,14 @@ import os
 import base64
 import threading
 import json
+import zlib
 from utils.logger import logger
-from utils.model_scheduler import model_scheduler
+from utils.model_scheduler import model_scheduler, TaskCancelledError
 from utils.task_manager import task_manager
 from utils.rabbitmq_client import rabbitmq_client
 from config.config import config
 from utils.lora_utils import get_lora_configs
+from utils.result_delivery import content_etag, make_faststart
 from PIL import Image
 class TaskWorker:
     """任务工作器，负责处理生成任务"""
@@ -64,6 +66,15 @@ class TaskWorker:
                         logger.error(f"执行ack操作失败: {ack_error}")
                     return
 
+                # 排队期间已被取消的任务直接确认
+                if task_info['status'] == 'cancelled':
+                    try:
+                        ch.basic_ack(delivery_tag=method.delivery_tag)
+                        logger.info(f"任务已取消，已确认消息: {task_id}")
+                    except Exception as ack_error:
+                        logger.error(f"执行ack操作失败: {ack_error}")
+                    return
+
                 # 更新任务状态为处理中
                 task_manager.update_task_status(task_id, 'processing')
                 
@@ -162,6 +173,26 @@ class TaskWorker:
             task_id: str, 任务ID
             task_info: dict, 任务信息
         """
+        # 清除上一个任务的取消请求后启动取消监听线程，加载模型期间的取消请求同样生效
+        model_scheduler.reset_cancel()
+        cancel_watcher_stop = threading.Event()
+        cancel_watcher = threading.Thread(target=self._watch_cancel, args=(task_id, cancel_watcher_stop))
+        cancel_watcher.daemon = True
+        cancel_watcher.start()
+        # 视频任务启动预览监听线程
+        preview_path = self._get_preview_path(task_id)
+        watchers = [cancel_watcher]
+        if task_info['task_type'] in ['text2video', 'img2video'] and config.PREVIEW_INTERVAL > 0:
+            preview_watcher = threading.Thread(target=self._watch_preview, args=(task_id, preview_path, cancel_watcher_stop))
+            preview_watcher.daemon = True
+            preview_watcher.start()
+            watchers.append(preview_watcher)
+
+        def stop_watchers():
+            # 写最终状态前停止并等待监听线程，避免迟到的预览或取消处理落在最终状态之后
+            cancel_watcher_stop.set()
+            for watcher in watchers:
+                watcher.join()
         try:
             task_type = task_info['task_type']
             task_params = task_info['params']
@@ -172,7 +203,7 @@ class TaskWorker:
             if task_type in ['text2img', 'img2img']:
                 result = self._process_image_task(task_type, task_params)
             elif task_type in ['text2video', 'img2video']:
-                result = self._process_video_task(task_type, task_params)
+                result = self._process_video_task(task_type, task_params, task_id)
             else:
                 raise ValueError(f"不支持的任务类型: {task_type}")
             
@@ -181,9 +212,21 @@ class TaskWorker:
             task_manager.update_task_render_time(task_id, 'end', render_end_time)
             
             # 更新任务状态为完成
+            stop_watchers()
             task_manager.update_task_status(task_id, 'completed', result)
             logger.info(f"任务处理完成: {task_id}")
 
+        except TaskCancelledError:
+            logger.info(f"任务已取消: {task_id}")
+            render_end_time = time.time()
+            task_manager.update_task_render_time(task_id, 'end', render_end_time)
+            stop_watchers()
+            task_manager.update_task_status(task_id, 'cancelled')
+            # 取消的任务不再恢复，删除 checkpoint；模型保持加载
+            checkpoint_path = self._get_checkpoint_path(task_id)
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+
         except Exception as e:
             logger.error(f"处理任务 {task_id} 失败: {e}")
             
@@ -192,10 +235,55 @@ class TaskWorker:
             task_manager.update_task_render_time(task_id, 'end', render_end_time)
     
             # 更新任务状态为失败
+            stop_watchers()
             task_manager.update_task_status(task_id, 'failed', error=str(e))
             # 只有在检测到内存溢出错误时才卸载模型
             logger.warning(f"任务 {task_id} 执行失败，卸载当前模型")
             model_scheduler.unload_model()
+        finally:
+            stop_watchers()
+            task_manager.clear_cancel(task_id)
+            task_manager.clear_task_preview(task_id)
+            # 任务结束后预览不再需要
+            for path in (preview_path, preview_path + '.json'):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _watch_cancel(self, task_id, stop_event, interval=0.5):
+        """
+        轮询任务的取消标记，收到取消请求后通知模型进程在下一个 step 前停止
+        
+        收到取消请求后继续轮询直到任务结束：加载模型时可能重建模型进程和取消事件，需要重新通知
+        """
+        while not stop_event.wait(interval):
+            try:
+                if task_manager.is_cancel_requested(task_id):
+                    model_scheduler.cancel_current()
+            except Exception as e:
+                logger.error(f"检查任务取消标记失败: {e}")
+    
+    def _watch_preview(self, task_id, preview_path, stop_event, interval=1.0):
+        """轮询模型进程写出的预览信息，有新预览时写入任务记录"""
+        info_path = preview_path + '.json'
+        last_mtime = None
+        while not stop_event.wait(interval):
+            try:
+                if not os.path.exists(info_path) or os.path.getmtime(info_path) == last_mtime:
+                    continue
+                last_mtime = os.path.getmtime(info_path)
+                with open(info_path, 'r') as f:
+                    preview = json.load(f)
+                task_manager.update_task_preview(task_id, preview)
+            except Exception as e:
+                logger.error(f"更新任务预览失败: {e}")
+    
+    def _get_preview_path(self, task_id):
+        """任务的生成预览图路径，位于文件服务目录下，客户端可直接访问"""
+        return os.path.join(config.FILE_SAVE_DIR, "ai-api-previews", f"{task_id}.webp")
+    
+    def _get_checkpoint_path(self, task_id):
+        """任务的去噪 checkpoint 路径，重试或重新投递时从这里恢复"""
+        return os.path.join(config.FILE_SAVE_DIR, "ai-api-checkpoints", f"{task_id}.pt")
                 
                 
     
@@ -286,16 +374,18 @@ class TaskWorker:
         
         return {
             'image_path': output_path,
+            'image_etag': content_etag(output_path),
             'task_type': task_type
         }
     
-    def _process_video_task(self, task_type, task_params):
+    def _process_video_task(self, task_type, task_params, task_id):
         """
         处理视频生成任务
         
         Args:
             task_type: str, 任务类型 ('text2video' 或 'img2video')
             task_params: dict, 任务参数
+            task_id: str, 任务ID，用于定位去噪 checkpoint
             
         Returns:
             dict: 处理结果
@@ -310,6 +400,10 @@ class TaskWorker:
         height = task_params.get('height', 960)
         num_frames = task_params.get('num_frames', 81)
         loras = task_params.get('loras', [])
+        # 未指定种子时由任务ID派生，保证重试时能命中同一个 checkpoint
+        if seed is None:
+            seed = zlib.crc32(task_id.encode('utf-8'))
+        checkpoint_path = self._get_checkpoint_path(task_id)
         
         # 处理LoRA配置
         lora_configs = self._get_lora_configs(task_type, loras)
@@ -331,7 +425,9 @@ class TaskWorker:
                 target_width=width,
                 target_height=height,
                 target_video_length=num_frames,
-                infer_steps=steps
+                infer_steps=steps,
+                checkpoint_path=checkpoint_path,
+                preview_path=self._get_preview_path(task_id)
             )
         elif task_type == 'img2video':
             # 图生视频
@@ -350,7 +446,9 @@ class TaskWorker:
                 target_width=width,
                 target_height=height,
                 target_video_length=num_frames,
-                infer_steps=steps
+                infer_steps=steps,
+                checkpoint_path=checkpoint_path,
+                preview_path=self._get_preview_path(task_id)
             )
         
         # 生成视频封面（截取第一帧）
@@ -367,9 +465,14 @@ class TaskWorker:
             logger.warning(f"无法打开视频文件: {output_path}")
             cover_path = None
 
+        # 预生成 moov 前置版本并计算内容哈希，供结果下载接口边下边播和条件请求使用
+        faststart_path = make_faststart(output_path) if config.RESULT_FASTSTART else None
+
         return {
             'video_path': output_path,
             'cover_path': cover_path,
+            'faststart_path': faststart_path,
+            'video_etag': content_etag(faststart_path or output_path),
             'task_type': task_type
         }
 
@@ -0,0 +1,460 @@
+import os
+import json
+import uuid
+import time
+import hashlib
+import secrets
+import threading
+from utils.redis_client import redis_client
+from utils.logger import logger
+from config.config import config
+
+# 文件上传目录
+UPLOAD_DIR = os.path.join(config.FILE_SAVE_DIR, "ai-api-uploads")
+
+# 流式读写块大小
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# 秒传校验时要求客户端提供哈希的随机片段长度
+PROOF_CHUNK_SIZE = 64 * 1024
+
+# 分片写入占用会话的时长，每写一块续期，进程中断后到期自动释放
+SESSION_WRITER_TTL = 60
+
+# 文件记录存在时才登记引用，与回收删除记录互斥
+ACQUIRE_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+return 1
+"""
+
+# 引用集合为空时才删除文件记录，与 acquire 互斥
+DELETE_BLOB_SCRIPT = """
+if redis.call('SCARD', KEYS[3]) > 0 then
+    return 0
+end
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[2])
+return 1
+"""
+
+# 会话存在且没有其他写入者时占用会话，偏移检查和写入在占用期间进行
+CLAIM_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+if not redis.call('SET', KEYS[2], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 0
+end
+return 1
+"""
+
+# 只释放自己持有的占用
+RELEASE_SESSION_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class UploadStore:
+    """
+    按内容 SHA-256 去重的上传文件存储
+
+    相同内容只保存一份，文件名为 {sha256}.{ext}。使用该文件的任务作为引用持有者，记录在
+    Redis 集合中，API 和工作进程通过 SADD/SREM 并发登记和释放；引用数为 0 且超过
+    UPLOAD_TTL 未被访问的文件由垃圾回收删除。大文件可通过分片上传会话断点续传，同一会话
+    同时只允许一个写入者，会话超过 UPLOAD_SESSION_TTL 未更新则过期。
+    """
+
+    def __init__(self):
+        self.redis = redis_client
+        self.blob_hash_key = "ai_upload:blob"  # sha256 -> 文件元信息
+        self.path_hash_key = "ai_upload:path"  # 文件路径 -> sha256
+        self.holders_key_prefix = "ai_upload:holders:"  # sha256 -> 引用持有者集合
+        self.session_key_prefix = "ai_upload:session:"  # 分片上传会话
+        self.session_dir = os.path.join(UPLOAD_DIR, ".sessions")
+        self.lock = threading.Lock()
+        self.last_gc_time = 0
+
+    def _holders_key(self, sha256):
+        return f"{self.holders_key_prefix}{sha256}"
+
+    def _get_blob(self, sha256):
+        blob_str = self.redis.hget(self.blob_hash_key, sha256)
+        if not blob_str:
+            return None
+        blob = json.loads(blob_str)
+        # 旧记录的引用持有者保存在 JSON 中，迁移到集合
+        holders = blob.pop('holders', None)
+        if holders is not None:
+            if holders:
+                self.redis.sadd(self._holders_key(sha256), *holders)
+            self._save_blob(blob)
+        return blob
+
+    def _save_blob(self, blob):
+        self.redis.hset(self.blob_hash_key, blob['sha256'], json.dumps(blob))
+
+    def lookup(self, sha256):
+        """
+        按内容哈希查找已上传的文件，文件丢失时清理记录
+
+        Args:
+            sha256: str, 文件内容的 SHA-256
+
+        Returns:
+            dict: 文件元信息，不存在时返回 None
+        """
+        with self.lock:
+            return self._lookup(sha256)
+
+    def _lookup(self, sha256):
+        blob = self._get_blob(sha256)
+        if blob is None:
+            return None
+        if not os.path.exists(blob['file_path']):
+            logger.warning(f"上传文件已丢失，清理记录: {blob['file_path']}")
+            self.redis.hdel(self.blob_hash_key, sha256)
+            self.redis.hdel(self.path_hash_key, blob['file_path'])
+            return None
+        blob['last_access'] = int(time.time())
+        self._save_blob(blob)
+        return blob
+
+    def _commit(self, tmp_path, sha256, file_ext, file_size):
+        """将已写完的临时文件登记到存储，内容已存在时丢弃临时文件"""
+        with self.lock:
+            existing = self._lookup(sha256)
+            if existing is not None:
+                os.remove(tmp_path)
+                logger.info(f"上传文件内容已存在，复用: {existing['file_path']}")
+                return existing, True
+
+            file_name = f"{sha256}.{file_ext}"
+            file_path = os.path.join(UPLOAD_DIR, file_name)
+            os.replace(tmp_path, file_path)
+            now = int(time.time())
+            blob = {
+                'sha256': sha256,
+                'file_path': file_path,
+                'file_name': file_name,
+                'file_size': file_size,
+                'created_at': now,
+                'last_access': now
+            }
+            self._save_blob(blob)
+            self.redis.hset(self.path_hash_key, file_path, sha256)
+        logger.info(f"上传文件已保存: {file_path}, 大小: {file_size} bytes")
+        return blob, False
+
+    def put_stream(self, stream, file_ext):
+        """
+        流式保存一个完整文件
+
+        Args:
+            stream: 可读的文件流
+            file_ext: str, 文件扩展名
+
+        Returns:
+            tuple: (文件元信息, 是否命中已有文件)
+        """
+        os.makedirs(self.session_dir, exist_ok=True)
+        tmp_path = os.path.join(self.session_dir, f"{uuid.uuid4().hex}.tmp")
+        hasher = hashlib.sha256()
+        file_size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    file_size += len(chunk)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        result = self._commit(tmp_path, hasher.hexdigest(), file_ext, file_size)
+        self.maybe_gc()
+        return result
+
+    def create_session(self, file_ext, file_size, sha256=None):
+        """
+        创建分片上传会话
+
+        提供的哈希对应的内容已存在时，会话附带一个随机片段的校验挑战，客户端提交该片段的
+        哈希证明持有文件后才能秒传，否则需要正常上传全部内容
+
+        Args:
+            file_ext: str, 文件扩展名
+            file_size: int, 文件总大小
+            sha256: str, 客户端预先计算的内容哈希（可选），用于秒传和完成时校验
+
+        Returns:
+            dict: 会话信息
+        """
+        os.makedirs(self.session_dir, exist_ok=True)
+        session_id = uuid.uuid4().hex
+        session = {
+            'session_id': session_id,
+            'file_ext': file_ext,
+            'file_size': file_size,
+            'sha256': sha256,
+            'offset': 0,
+            'challenge': None,
+            'created_at': int(time.time())
+        }
+        if sha256:
+            blob = self.lookup(sha256)
+            if blob is not None and blob['file_size'] == file_size:
+                length = min(PROOF_CHUNK_SIZE, file_size)
+                session['challenge'] = {
+                    'offset': secrets.randbelow(file_size - length + 1),
+                    'length': length
+                }
+        open(self._part_path(session_id), 'wb').close()
+        self._save_session(session)
+        logger.info(f"创建分片上传会话: {session_id}, 大小: {file_size} bytes")
+        return session
+
+    def prove_session(self, session_id, chunk_sha256):
+        """
+        校验秒传挑战，客户端提交的片段哈希与已有文件一致时直接复用已有文件
+
+        每个挑战只能提交一次，校验失败后会话继续用于正常上传
+
+        Returns:
+            dict: 已有文件的元信息
+        """
+        token = self._claim_session(session_id)
+        try:
+            session = self.get_session(session_id)
+            if session is None:
+                raise KeyError(f"上传会话不存在或已过期: {session_id}")
+            challenge = session.get('challenge')
+            if not challenge:
+                raise ValueError("该会话没有秒传校验，请上传文件内容")
+            session['challenge'] = None
+            self._save_session(session)
+
+            blob = self.lookup(session['sha256'])
+            if blob is None:
+                raise ValueError("已有文件不存在，请上传文件内容")
+            with open(blob['file_path'], 'rb') as f:
+                f.seek(challenge['offset'])
+                expected = hashlib.sha256(f.read(challenge['length'])).hexdigest()
+            if not secrets.compare_digest(expected, (chunk_sha256 or '').lower()):
+                raise ValueError("秒传校验失败，请上传文件内容")
+
+            self.abort_session(session_id)
+        finally:
+            self._release_session(session_id, token)
+        logger.info(f"秒传校验通过，复用: {blob['file_path']}")
+        return blob
+
+    def _part_path(self, session_id):
+        return os.path.join(self.session_dir, f"{session_id}.part")
+
+    def _save_session(self, session):
+        self.redis.set(f"{self.session_key_prefix}{session['session_id']}", json.dumps(session), ex=config.UPLOAD_SESSION_TTL)
+
+    def get_session(self, session_id):
+        """获取分片上传会话，过期或不存在时返回 None"""
+        session_str = self.redis.get(f"{self.session_key_prefix}{session_id}")
+        if not session_str or not os.path.exists(self._part_path(session_id)):
+            return None
+        session = json.loads(session_str)
+        # 以磁盘上实际写入的字节数为准，进程中断后也能从正确位置续传
+        session['offset'] = os.path.getsize(self._part_path(session_id))
+        return session
+
+    def _writer_key(self, session_id):
+        return f"{self.session_key_prefix}{session_id}:writer"
+
+    def _claim_session(self, session_id):
+        """占用会话用于写入，返回占用标识；会话不存在时抛出 KeyError，已被占用时抛出 ValueError"""
+        token = uuid.uuid4().hex
+        claimed = self.redis.eval(
+            CLAIM_SESSION_SCRIPT, 2,
+            f"{self.session_key_prefix}{session_id}", self._writer_key(session_id),
+            token, SESSION_WRITER_TTL
+        )
+        if claimed == -1:
+            raise KeyError(f"上传会话不存在或已过期: {session_id}")
+        if claimed == 0:
+            raise ValueError("该会话有分片正在写入，请稍后重试")
+        return token
+
+    def _release_session(self, session_id, token):
+        self.redis.eval(RELEASE_SESSION_SCRIPT, 1, self._writer_key(session_id), token)
+
+    def append_chunk(self, session_id, offset, stream):
+        """
+        向会话追加一个分片，offset 必须等于已接收的字节数
+
+        偏移检查和写入在占用会话期间进行，多个进程并发提交同一偏移的分片时只有一个成功
+
+        Returns:
+            dict: 更新后的会话信息
+        """
+        token = self._claim_session(session_id)
+        try:
+            session = self.get_session(session_id)
+            if session is None:
+                raise KeyError(f"上传会话不存在或已过期: {session_id}")
+            if offset != session['offset']:
+                raise ValueError(f"分片偏移不匹配，期望 {session['offset']}，实际 {offset}")
+
+            written = 0
+            with open(self._part_path(session_id), 'ab') as f:
+                while True:
+                    chunk = stream.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if session['offset'] + written + len(chunk) > session['file_size']:
+                        f.truncate(session['offset'])
+                        raise ValueError("分片超出文件总大小")
+                    f.write(chunk)
+                    written += len(chunk)
+                    self.redis.expire(self._writer_key(session_id), SESSION_WRITER_TTL)
+            session['offset'] += written
+            self._save_session(session)
+            return session
+        finally:
+            self._release_session(session_id, token)
+
+    def complete_session(self, session_id):
+        """
+        完成分片上传，校验大小和哈希后登记到存储
+
+        Returns:
+            tuple: (文件元信息, 是否命中已有文件)
+        """
+        token = self._claim_session(session_id)
+        try:
+            session = self.get_session(session_id)
+            if session is None:
+                raise KeyError(f"上传会话不存在或已过期: {session_id}")
+            if session['offset'] != session['file_size']:
+                raise ValueError(f"文件未上传完成: {session['offset']}/{session['file_size']}")
+
+            part_path = self._part_path(session_id)
+            hasher = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                while True:
+                    chunk = f.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+            sha256 = hasher.hexdigest()
+            if session['sha256'] and session['sha256'] != sha256:
+                self.abort_session(session_id)
+                raise ValueError("文件哈希校验失败")
+
+            self.redis.delete(f"{self.session_key_prefix}{session_id}")
+            result = self._commit(part_path, sha256, session['file_ext'], session['file_size'])
+        finally:
+            self._release_session(session_id, token)
+        self.maybe_gc()
+        return result
+
+    def abort_session(self, session_id):
+        """取消分片上传会话并删除已接收的数据"""
+        self.redis.delete(f"{self.session_key_prefix}{session_id}")
+        part_path = self._part_path(session_id)
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    def acquire(self, file_path, holder):
+        """
+        登记任务对上传文件的引用，非存储管理的路径直接忽略
+
+        Args:
+            file_path: str, 文件路径
+            holder: str, 引用持有者（任务ID）
+        """
+        if not file_path:
+            return
+        sha256 = self.redis.hget(self.path_hash_key, file_path)
+        if not sha256 or not self._get_blob(sha256):
+            return
+        self.redis.eval(ACQUIRE_SCRIPT, 2, self.blob_hash_key, self._holders_key(sha256), sha256, holder)
+        self._touch(sha256)
+
+    def release(self, file_path, holder):
+        """释放任务对上传文件的引用，重复释放无副作用"""
+        if not file_path:
+            return
+        sha256 = self.redis.hget(self.path_hash_key, file_path)
+        if not sha256 or not self._get_blob(sha256):
+            return
+        if self.redis.srem(self._holders_key(sha256), holder):
+            self._touch(sha256)
+
+    def _touch(self, sha256):
+        """更新文件的最后访问时间，从最后一个引用释放起计算 TTL"""
+        with self.lock:
+            blob = self._get_blob(sha256)
+            if blob is None:
+                return
+            blob['last_access'] = int(time.time())
+            self._save_blob(blob)
+
+    def maybe_gc(self):
+        """距离上次回收超过 UPLOAD_GC_INTERVAL 时执行一次垃圾回收"""
+        if time.time() - self.last_gc_time < config.UPLOAD_GC_INTERVAL:
+            return
+        self.last_gc_time = time.time()
+        try:
+            self.gc()
+        except Exception as e:
+            logger.error(f"上传文件垃圾回收失败: {e}")
+
+    def gc(self):
+        """
+        删除无引用且超过 TTL 未访问的文件，以及过期会话留下的分片数据
+
+        Returns:
+            int: 删除的文件数
+        """
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for sha256 in self.redis.hgetall(self.blob_hash_key):
+                blob = self._get_blob(sha256)
+                if blob is None or now - blob['last_access'] < config.UPLOAD_TTL:
+                    continue
+                # 记录删除与引用登记互斥，有引用时跳过
+                deleted = self.redis.eval(
+                    DELETE_BLOB_SCRIPT, 3,
+                    self.blob_hash_key, self.path_hash_key, self._holders_key(sha256),
+                    sha256, blob['file_path']
+                )
+                if not deleted:
+                    continue
+                if os.path.exists(blob['file_path']):
+                    os.remove(blob['file_path'])
+                removed += 1
+
+        if os.path.isdir(self.session_dir):
+            for name in os.listdir(self.session_dir):
+                path = os.path.join(self.session_dir, name)
+                session_id = name.split('.', 1)[0]
+                if name.endswith('.part') and self.redis.exists(f"{self.session_key_prefix}{session_id}"):
+                    continue
+                # 未登记的临时文件可能正在写入，按修改时间判断
+                if now - os.path.getmtime(path) > config.UPLOAD_SESSION_TTL:
+                    os.remove(path)
+
+        if removed:
+            logger.info(f"上传文件垃圾回收完成，删除 {removed} 个文件")
+        return removed
+
+
+# 创建全局上传存储实例
+upload_store = UploadStore()
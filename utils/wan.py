@@ -52,6 +52,7 @@ class WanModelPipeRunner:
     self.runner: DefaultRunner = None
     self.config: LockableDict = None
     self.lora_configs: Optional[list[LoraConfig]] = lora_configs
+    self.stop_event = None
 
   def load(self):
     # 准备基本参数
@@ -64,6 +65,28 @@ class WanModelPipeRunner:
       'lora_configs': self.lora_configs
     }
     
+    # 配置了缓存目录时，LoRA组合从预合并的模型缓存加载，未命中时构建一次
+    if config.MERGED_LORA_CACHE_DIR and self.lora_configs:
+      args_dict['merged_lora_cache'] = {
+        "cache_dir": config.MERGED_LORA_CACHE_DIR,
+        "max_gb": config.MERGED_LORA_CACHE_MAX_GB
+      }
+
+    # 配置了缓存目录时，量化配置（dit_quantized）下量化权重缺失则由原始权重转换一次并缓存
+    if config.QUANT_CKPT_CACHE_DIR:
+      args_dict['quantized_ckpt_cache'] = {
+        "cache_dir": config.QUANT_CKPT_CACHE_DIR,
+        "max_gb": config.QUANT_CKPT_CACHE_MAX_GB
+      }
+
+    # 数字人任务复用同一段音频时，跳过音频重采样、切分与音频编码
+    if config.AUDIO_FEATURE_CACHE_RAM_MB > 0 or config.AUDIO_FEATURE_CACHE_DIR:
+      args_dict['audio_feature_cache'] = {
+        "cache_dir": config.AUDIO_FEATURE_CACHE_DIR,
+        "ram_mb": config.AUDIO_FEATURE_CACHE_RAM_MB,
+        "max_gb": config.AUDIO_FEATURE_CACHE_MAX_GB
+      }
+
     # 只有当RIFE_STATE为True时，才添加视频插帧配置
     if config.RIFE_STATE:
       args_dict['video_frame_interpolation'] = {
@@ -91,6 +114,13 @@ class WanModelPipeRunner:
     torch.set_grad_enabled(False)
     self.runner = RUNNER_REGISTER[self.config["model_cls"]](self.config)
     self.runner.init_modules()
+    self.runner.stop_event = self.stop_event
+
+  def set_stop_event(self, stop_event):
+    """设置协作式取消事件，事件置位后推理在下一个 step 前停止"""
+    self.stop_event = stop_event
+    if self.runner is not None:
+      self.runner.stop_event = stop_event
     
 
   def infer(
@@ -103,7 +133,9 @@ class WanModelPipeRunner:
     target_width: int | None = None,
     negative_prompt: str | None = None, 
     seed: int | None = None,
-    infer_steps: int | None = None
+    infer_steps: int | None = None,
+    checkpoint_path: str | None = None,
+    preview_path: str | None = None
   ):
      # 检查self.runner是否为None
     if self.runner is None:
@@ -144,6 +176,17 @@ class WanModelPipeRunner:
         config_modify["target_width"] = target_width
       if infer_steps is not None:
         config_modify["infer_steps"] = infer_steps
+
+    # 每 CHECKPOINT_INTERVAL 步保存一次去噪状态，任务重试时从最近的 checkpoint 继续
+    config_modify["checkpoint_path"] = checkpoint_path
+    config_modify["checkpoint_interval"] = config.CHECKPOINT_INTERVAL if checkpoint_path else 0
+    # 每 PREVIEW_INTERVAL 步用轻量VAE解码一帧低分辨率预览写入 preview_path
+    config_modify["latent_preview"] = {
+      "path": preview_path,
+      "every_n_steps": config.PREVIEW_INTERVAL,
+      "max_side": config.PREVIEW_MAX_SIDE,
+      "max_overhead": config.PREVIEW_MAX_OVERHEAD
+    } if preview_path and config.PREVIEW_INTERVAL > 0 else None
       
     self.runner.set_config(config_modify)
 